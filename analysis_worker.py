@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+AI Email Assistant - Standalone AI Analysis Worker
+
+Drains the analysis job queue outside the web process:
+
+    python analysis_worker.py          # run ANALYSIS_QUEUE_WORKERS workers until stopped
+    python analysis_worker.py --prune  # delete done jobs past ANALYSIS_JOB_RETENTION_HOURS and exit
+"""
+import argparse
+import os
+import sys
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Add the current directory to Python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, current_dir)
+
+def main():
+    """Worker entry point"""
+    parser = argparse.ArgumentParser(description='Run background AI analysis of synced emails')
+    parser.add_argument('--prune', action='store_true', help='prune completed jobs and exit')
+    args = parser.parse_args()
+    
+    from app import create_app
+    
+    app = create_app()
+    queue = getattr(app, 'analysis_queue', None)
+    if queue is None:
+        print("❌ Analysis queue is disabled (ANALYSIS_QUEUE_ENABLED=false)")
+        return 1
+    
+    if args.prune:
+        with app.app_context():
+            print(f"🧹 Pruned {queue.prune()} completed analysis jobs")
+        return 0
+    
+    print(f"🧵 Analysis worker running: {queue.worker_count} workers, batch size {queue.batch_size}")
+    queue.start()
+    try:
+        for worker in queue._workers:
+            worker.join()
+    except KeyboardInterrupt:
+        print("\n👋 Stopping analysis worker...")
+        queue.stop()
+    
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
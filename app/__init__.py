@@ -8,7 +8,8 @@ def create_app():
     """Create Flask application with fixed blueprint registration"""
     app = Flask(__name__)
     
-    # Basic configuration
+    # Application settings, then the basic configuration
+    app.config.from_object('app.config.Config')
     app.config.update({
         'SECRET_KEY': os.environ.get('SECRET_KEY', 'dev-secret-key'),
         'SQLALCHEMY_DATABASE_URI': os.environ.get('DATABASE_URL', 'sqlite:///data/app.db'),
@@ -37,7 +38,9 @@ def create_app():
     
     try:
         from flask_socketio import SocketIO
-        socketio = SocketIO(app, cors_allowed_origins="*", manage_session=False)
+        # Kept on the app so run.py serves it and the chat routes can stream over it.
+        # Only the app's own origin may connect unless SOCKETIO_CORS_ORIGINS lists others
+        app.socketio = SocketIO(app, cors_allowed_origins=app.config.get('SOCKETIO_CORS_ORIGINS'), manage_session=False)
         print("✅ SocketIO initialized")
     except ImportError:
         print("⚠️ SocketIO not available")
@@ -87,8 +90,10 @@ def create_app():
         print(f"⚠️ email_bp failed: {e}")
     
     try:
-        from app.routes.chat import chat_bp
+        from app.routes.chat import chat_bp, init_chat_socketio
         app.register_blueprint(chat_bp, url_prefix='/api/chat')
+        if hasattr(app, 'socketio'):
+            init_chat_socketio(app.socketio)
         print("✅ chat_bp registered")
     except Exception as e:
         print(f"⚠️ chat_bp failed: {e}")
@@ -98,11 +103,106 @@ def create_app():
         try:
             from app.models.user import User
             from app.models.email import Email
+            from app.models.analysis_job import AnalysisJob
+            from app.models.email_neighbor import EmailNeighbor
             db.create_all()
             print("✅ Database tables created")
         except Exception as e:
             print(f"⚠️ Database warning: {e}")
     
+    # Full-text search index (FTS5 on SQLite, tsvector + GIN on PostgreSQL)
+    try:
+        from app.services.email_search import init_email_search
+        if init_email_search(app) and app.email_search.available:
+            print("✅ Full-text search index ready")
+    except Exception as e:
+        print(f"⚠️ Full-text search failed: {e}")
+    
+    # Vector store for semantic search (ChromaDB, or the built-in native backend)
+    if app.config['VECTOR_DB_ENABLED']:
+        try:
+            from app.services.vector_db import VectorDBService
+            with app.app_context():
+                vector_service = VectorDBService()
+                if vector_service.initialize():
+                    app.vector_service = vector_service
+                    print("✅ Vector database initialized")
+        except Exception as e:
+            print(f"⚠️ Vector database not available: {e}")
+    
+    # Lexical + vector retrieval behind /api/email/search and chat context
+    try:
+        from app.services.hybrid_search import init_hybrid_search
+        if init_hybrid_search(app):
+            print("✅ Hybrid search initialized")
+    except Exception as e:
+        print(f"⚠️ Hybrid search failed: {e}")
+    
+    # Precomputed similar-email lists, updated as new mail is embedded
+    try:
+        from app.services.similar_emails import init_similar_emails
+        if init_similar_emails(app):
+            print("✅ Similar-email index initialized")
+    except Exception as e:
+        print(f"⚠️ Similar-email index failed: {e}")
+    
+    # Ollama context tokens per chat session, so follow-up turns skip re-reading the history
+    try:
+        from app.services.conversation_context import init_conversation_contexts
+        if init_conversation_contexts(app):
+            print("✅ Conversation context reuse initialized")
+    except Exception as e:
+        print(f"⚠️ Conversation context reuse failed: {e}")
+    
+    # Spread Ollama requests over several servers when OLLAMA_BASE_URLS lists more than one
+    try:
+        from app.services.ollama_router import init_ollama_router
+        if init_ollama_router(app):
+            print(f"✅ Ollama router initialized ({len(app.ollama_router.backends)} servers)")
+    except Exception as e:
+        print(f"⚠️ Ollama router failed: {e}")
+    
+    # Answers to repeatable AI tasks, kept on disk across restarts
+    try:
+        from app.services.response_cache import init_response_cache
+        if init_response_cache(app):
+            print("✅ LLM response cache initialized")
+    except Exception as e:
+        print(f"⚠️ LLM response cache failed: {e}")
+    
+    # Priority queues in front of Ollama, so background analysis cannot starve chat
+    try:
+        from app.services.llm_scheduler import init_llm_scheduler
+        if init_llm_scheduler(app):
+            print("✅ LLM request scheduler initialized")
+    except Exception as e:
+        print(f"⚠️ LLM request scheduler failed: {e}")
+    
+    # Load the embedding model before a preforking server (e.g. gunicorn --preload) forks workers
+    if app.config['EMBEDDING_PRELOAD']:
+        try:
+            from app.services.embedding_models import preload_embedding_models
+            stats = preload_embedding_models([app.config['EMBEDDING_MODEL']])
+            print(f"✅ Embedding model preloaded ({stats['rss_mb']} MB resident)")
+        except Exception as e:
+            print(f"⚠️ Embedding model preload failed: {e}")
+    
+    # Attach the AI analysis queue; workers start with ANALYSIS_WORKERS_ENABLED (or run analysis_worker.py)
+    try:
+        from app.services.analysis_queue import init_analysis_queue
+        if init_analysis_queue(app):
+            print("✅ Analysis queue initialized")
+    except Exception as e:
+        print(f"⚠️ Analysis queue failed: {e}")
+    
+    # Start periodic mailbox sync (or run sync_worker.py as a separate process)
+    try:
+        from app.services.sync_scheduler import init_sync_scheduler
+        if init_sync_scheduler(app):
+            print("✅ Sync scheduler initialized")
+    except Exception as e:
+        print(f"⚠️ Sync scheduler failed: {e}")
+    
     # Error handlers
     @app.errorhandler(404)
     def not_found(error):
@@ -1,6 +1,7 @@
 """
 Configuration package for AI Email Assistant
 """
+from .settings import Config
 from .docker_config import DevelopmentConfig
 
-__all__ = ['DevelopmentConfig']
+__all__ = ['Config', 'DevelopmentConfig']
@@ -0,0 +1,218 @@
+"""
+Application Configuration
+"""
+import os
+from datetime import timedelta
+
+class Config:
+    """Base configuration class"""
+    
+    # Flask Core Settings
+    SECRET_KEY = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
+    DEBUG = os.getenv('FLASK_ENV') == 'development'
+    
+    # Database Configuration
+    SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL', 'sqlite:///./data/app.db')
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ECHO = os.getenv('DATABASE_ECHO', 'false').lower() == 'true'
+    
+    # Session Configuration
+    SESSION_TYPE = 'filesystem'
+    SESSION_PERMANENT = True
+    SESSION_USE_SIGNER = True
+    SESSION_KEY_PREFIX = 'ai_email_'
+    SESSION_FILE_DIR = './data/sessions'
+    SESSION_FILE_THRESHOLD = 500
+    SESSION_FILE_MODE = 384
+    PERMANENT_SESSION_LIFETIME = timedelta(hours=24)
+    
+    # Cookie Configuration
+    SESSION_COOKIE_NAME = 'ai_email_session'
+    SESSION_COOKIE_DOMAIN = None
+    SESSION_COOKIE_PATH = None
+    SESSION_COOKIE_HTTPONLY = True
+    SESSION_COOKIE_SECURE = False  # Set to True in production with HTTPS
+    SESSION_COOKIE_SAMESITE = 'Lax'
+    
+    # Microsoft Azure AD Configuration
+    AZURE_CLIENT_ID = os.getenv('AZURE_CLIENT_ID')
+    AZURE_CLIENT_SECRET = os.getenv('AZURE_CLIENT_SECRET')
+    AZURE_TENANT_ID = os.getenv('AZURE_TENANT_ID')
+    AZURE_REDIRECT_URI = os.getenv('AZURE_REDIRECT_URI', 'http://localhost:5000/auth/callback')
+    
+    # Microsoft Graph API
+    GRAPH_API_ENDPOINT = os.getenv('GRAPH_API_ENDPOINT', 'https://graph.microsoft.com/v1.0')
+    GRAPH_SCOPES = os.getenv('GRAPH_SCOPES', 'User.Read,Mail.Read,Mail.Send,Mail.ReadWrite,Calendars.Read').split(',')
+    GRAPH_POOL_SIZE = int(os.getenv('GRAPH_POOL_SIZE', '20'))  # Keep-alive connections per process
+    GRAPH_TENANT_CONCURRENCY = int(os.getenv('GRAPH_TENANT_CONCURRENCY', '4'))  # Parallel requests per tenant
+    GRAPH_MAX_RETRIES = int(os.getenv('GRAPH_MAX_RETRIES', '5'))
+    GRAPH_RETRY_BACKOFF_SECONDS = float(os.getenv('GRAPH_RETRY_BACKOFF_SECONDS', '1'))
+    GRAPH_RETRY_MAX_BACKOFF_SECONDS = float(os.getenv('GRAPH_RETRY_MAX_BACKOFF_SECONDS', '60'))
+    GRAPH_BATCH_SIZE = int(os.getenv('GRAPH_BATCH_SIZE', '20'))  # Sub-requests per $batch call (max 20)
+    
+    # Ollama Configuration
+    OLLAMA_BASE_URL = os.getenv('OLLAMA_BASE_URL', 'http://localhost:11434')
+    OLLAMA_BASE_URLS = os.getenv('OLLAMA_BASE_URLS', '')  # Comma-separated servers to load-balance across (overrides OLLAMA_BASE_URL)
+    OLLAMA_ROUTER_HEALTH_SECONDS = int(os.getenv('OLLAMA_ROUTER_HEALTH_SECONDS', '15'))  # Health and loaded-model polling
+    OLLAMA_ROUTER_RETRY_SECONDS = int(os.getenv('OLLAMA_ROUTER_RETRY_SECONDS', '30'))  # Skip an unreachable server this long
+    OLLAMA_ROUTER_SWAP_PENALTY = int(os.getenv('OLLAMA_ROUTER_SWAP_PENALTY', '4'))  # In-flight requests a model swap is worth
+    OLLAMA_MODEL = os.getenv('OLLAMA_MODEL', 'deepseek-r1:7b')
+    OLLAMA_TIMEOUT = int(os.getenv('OLLAMA_TIMEOUT', '120'))
+    OLLAMA_STREAM = os.getenv('OLLAMA_STREAM', 'true').lower() == 'true'
+    OLLAMA_POOL_SIZE = int(os.getenv('OLLAMA_POOL_SIZE', '10'))  # Keep-alive connections per process
+    OLLAMA_CONNECT_TIMEOUT = int(os.getenv('OLLAMA_CONNECT_TIMEOUT', '3'))
+    OLLAMA_HEALTH_TIMEOUT = int(os.getenv('OLLAMA_HEALTH_TIMEOUT', '5'))
+    OLLAMA_EMBEDDING_TIMEOUT = int(os.getenv('OLLAMA_EMBEDDING_TIMEOUT', '30'))
+    OLLAMA_PULL_TIMEOUT = int(os.getenv('OLLAMA_PULL_TIMEOUT', '300'))
+    OLLAMA_KEEP_ALIVE = os.getenv('OLLAMA_KEEP_ALIVE', '30m')  # Keep the model (and its KV cache) loaded between requests
+    
+    # Chat Conversation Configuration
+    CHAT_CONTEXT_REUSE = os.getenv('CHAT_CONTEXT_REUSE', 'true').lower() == 'true'  # Continue each session's Ollama context
+    CHAT_CONTEXT_CACHE_SIZE = int(os.getenv('CHAT_CONTEXT_CACHE_SIZE', '512'))  # Sessions kept per process
+    CHAT_CONTEXT_TTL = int(os.getenv('CHAT_CONTEXT_TTL', '1800'))  # Seconds an idle session's context is kept
+    CHAT_CONTEXT_MAX_TOKENS = int(os.getenv('CHAT_CONTEXT_MAX_TOKENS', '6144'))  # Longer contexts are rebuilt compactly
+    CHAT_HISTORY_TURNS = int(os.getenv('CHAT_HISTORY_TURNS', '6'))  # Exchanges replayed when a context is rebuilt
+    
+    # LLM Response Cache (email analysis, drafts and reply suggestions; never chat)
+    LLM_RESPONSE_CACHE_ENABLED = os.getenv('LLM_RESPONSE_CACHE_ENABLED', 'true').lower() == 'true'
+    LLM_RESPONSE_CACHE_PATH = os.getenv('LLM_RESPONSE_CACHE_PATH', './data/llm_response_cache.sqlite3')
+    LLM_RESPONSE_CACHE_MAX_MB = float(os.getenv('LLM_RESPONSE_CACHE_MAX_MB', '64'))  # Least recently used responses evicted past this
+    LLM_RESPONSE_CACHE_TTL = int(os.getenv('LLM_RESPONSE_CACHE_TTL', '604800'))  # Seconds each response is kept
+    LLM_RESPONSE_CACHE_MAX_TEMPERATURE = float(os.getenv('LLM_RESPONSE_CACHE_MAX_TEMPERATURE', '0.3'))  # Hotter requests bypass the cache
+    
+    # LLM Request Scheduler (interactive > near_real_time > batch; limits are per process)
+    LLM_SCHEDULER_ENABLED = os.getenv('LLM_SCHEDULER_ENABLED', 'true').lower() == 'true'
+    LLM_SCHEDULER_CONCURRENCY = int(os.getenv('LLM_SCHEDULER_CONCURRENCY', '2'))  # Match OLLAMA_NUM_PARALLEL, summed over OLLAMA_BASE_URLS
+    LLM_SCHEDULER_BATCH_SLOTS = int(os.getenv('LLM_SCHEDULER_BATCH_SLOTS', '0'))  # Slots background analysis may hold (0: all but one)
+    LLM_QUEUE_BUDGET_INTERACTIVE_MS = int(os.getenv('LLM_QUEUE_BUDGET_INTERACTIVE_MS', '30000'))  # Longer waits get a busy reply
+    LLM_QUEUE_BUDGET_NEAR_REAL_TIME_MS = int(os.getenv('LLM_QUEUE_BUDGET_NEAR_REAL_TIME_MS', '3000'))  # Longer waits use heuristic analysis
+    LLM_QUEUE_BUDGET_BATCH_MS = int(os.getenv('LLM_QUEUE_BUDGET_BATCH_MS', '0'))  # Longer waits retry the job later (0: wait)
+    
+    # Vector Database Configuration
+    VECTOR_DB_TYPE = os.getenv('VECTOR_DB_TYPE', 'chromadb')  # chromadb, or native (NumPy memmap, no server)
+    VECTOR_DB_ENABLED = os.getenv('VECTOR_DB_ENABLED', 'true').lower() == 'true'
+    VECTOR_DB_PATH = os.getenv('VECTOR_DB_PATH', './data/vector_db')
+    EMBEDDING_MODEL = os.getenv('EMBEDDING_MODEL', 'all-MiniLM-L6-v2')
+    VECTOR_COLLECTION_NAME = os.getenv('VECTOR_COLLECTION_NAME', 'email_embeddings')
+    VECTOR_PARTITION_MODE = os.getenv('VECTOR_PARTITION_MODE', 'shared')  # shared, user (collection per user) or bucket
+    VECTOR_PARTITION_BUCKETS = int(os.getenv('VECTOR_PARTITION_BUCKETS', '32'))  # Collections in bucket mode
+    VECTOR_NATIVE_IVF_THRESHOLD = int(os.getenv('VECTOR_NATIVE_IVF_THRESHOLD', '50000'))  # Exact search up to this many vectors
+    VECTOR_NATIVE_IVF_PROBES = int(os.getenv('VECTOR_NATIVE_IVF_PROBES', '12'))  # IVF lists scanned per query
+    VECTOR_NATIVE_PRECISION = os.getenv('VECTOR_NATIVE_PRECISION', 'float16')  # float32, float16 or int8 (per-vector scale) for new collections
+    VECTOR_NATIVE_RERANK = int(os.getenv('VECTOR_NATIVE_RERANK', '0'))  # int8: keep float16 originals, re-rank n_results x this many candidates
+    CHROMADB_MODE = os.getenv('CHROMADB_MODE', 'embedded')  # embedded (PersistentClient on VECTOR_DB_PATH) or http (shared server)
+    CHROMADB_HOST = os.getenv('CHROMADB_HOST', 'localhost')
+    CHROMADB_PORT = int(os.getenv('CHROMADB_PORT', '8000'))
+    CHROMADB_SSL = os.getenv('CHROMADB_SSL', 'false').lower() == 'true'
+    CHROMADB_POOL_SIZE = int(os.getenv('CHROMADB_POOL_SIZE', '10'))  # Keep-alive connections per process
+    CHROMADB_TIMEOUT = int(os.getenv('CHROMADB_TIMEOUT', '10'))  # Seconds per request
+    CHROMADB_RETRY_SECONDS = int(os.getenv('CHROMADB_RETRY_SECONDS', '30'))  # Treat the server as down this long after a failure
+    CHROMADB_BATCH_SIZE = int(os.getenv('CHROMADB_BATCH_SIZE', '256'))  # Records per write request
+    CHROMADB_FALLBACK = os.getenv('CHROMADB_FALLBACK', 'embedded')  # embedded, or none (disable vector search) when the server is down
+    EMBEDDING_PRELOAD = os.getenv('EMBEDDING_PRELOAD', 'false').lower() == 'true'  # Load at startup, before workers fork
+    EMBEDDING_BATCH_SIZE = int(os.getenv('EMBEDDING_BATCH_SIZE', '64'))  # Documents per model call
+    EMBEDDING_BUCKET_SIZE = int(os.getenv('EMBEDDING_BUCKET_SIZE', '1024'))  # Window sorted by length before batching
+    EMBEDDING_PROCESSES = int(os.getenv('EMBEDDING_PROCESSES', '0'))  # Encoder processes for backfills (0: in-process)
+    EMBEDDING_CACHE_ENABLED = os.getenv('EMBEDDING_CACHE_ENABLED', 'true').lower() == 'true'
+    EMBEDDING_CACHE_PATH = os.getenv('EMBEDDING_CACHE_PATH', './data/vector_db/embedding_cache.sqlite3')  # Content-hash keyed vectors
+    QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv('QUERY_EMBEDDING_CACHE_SIZE', '1024'))  # In-memory LRU of query embeddings (0: off)
+    QUERY_EMBEDDING_CACHE_TTL = int(os.getenv('QUERY_EMBEDDING_CACHE_TTL', '3600'))
+    
+    # Full-Text Search Configuration
+    SEARCH_FTS_ENABLED = os.getenv('SEARCH_FTS_ENABLED', 'true').lower() == 'true'  # FTS5 / tsvector index
+    SEARCH_SNIPPET_WORDS = int(os.getenv('SEARCH_SNIPPET_WORDS', '16'))
+    HYBRID_SEARCH_ENABLED = os.getenv('HYBRID_SEARCH_ENABLED', 'true').lower() == 'true'  # Full-text + vector, RRF-fused
+    HYBRID_RRF_K = int(os.getenv('HYBRID_RRF_K', '60'))
+    HYBRID_CANDIDATES = int(os.getenv('HYBRID_CANDIDATES', '50'))  # Results taken from each retriever
+    HYBRID_LEXICAL_BUDGET_MS = int(os.getenv('HYBRID_LEXICAL_BUDGET_MS', '300'))
+    HYBRID_VECTOR_BUDGET_MS = int(os.getenv('HYBRID_VECTOR_BUDGET_MS', '800'))
+    HYBRID_VECTOR_FILTER_MAX_IDS = int(os.getenv('HYBRID_VECTOR_FILTER_MAX_IDS', '1000'))  # Larger filters are post-checked
+    HYBRID_WORKERS = int(os.getenv('HYBRID_WORKERS', '4'))
+    SEARCH_CACHE_SIZE = int(os.getenv('SEARCH_CACHE_SIZE', '1024'))  # Cached result lists, keyed by user search generation (0: off)
+    SEARCH_CACHE_TTL = int(os.getenv('SEARCH_CACHE_TTL', '300'))
+    SIMILAR_EMAILS_ENABLED = os.getenv('SIMILAR_EMAILS_ENABLED', 'true').lower() == 'true'  # Precomputed top-k similar emails
+    SIMILAR_EMAILS_K = int(os.getenv('SIMILAR_EMAILS_K', '10'))  # Neighbors stored per email
+    SIMILAR_EMAILS_BATCH_SIZE = int(os.getenv('SIMILAR_EMAILS_BATCH_SIZE', '256'))  # Emails per batched vector query
+    
+    # Email Processing Configuration
+    MAX_EMAILS_PER_SYNC = int(os.getenv('MAX_EMAILS_PER_SYNC', '500'))
+    EMAIL_SYNC_INTERVAL_MINUTES = int(os.getenv('EMAIL_SYNC_INTERVAL_MINUTES', '30'))
+    INDEX_SENT_ITEMS = os.getenv('INDEX_SENT_ITEMS', 'true').lower() == 'true'
+    INDEX_INBOX = os.getenv('INDEX_INBOX', 'true').lower() == 'true'
+    EMAIL_SYNC_BODIES = os.getenv('EMAIL_SYNC_BODIES', 'false').lower() == 'true'  # False: headers + preview only
+    EMAIL_BODY_PREFETCH_COUNT = int(os.getenv('EMAIL_BODY_PREFETCH_COUNT', '20'))  # Newest unread bodies fetched after sync
+    
+    # Periodic Sync Scheduler
+    SYNC_SCHEDULER_ENABLED = os.getenv('SYNC_SCHEDULER_ENABLED', 'false').lower() == 'true'  # Or run sync_worker.py
+    SYNC_SCHEDULER_WORKERS = int(os.getenv('SYNC_SCHEDULER_WORKERS', '4'))  # Users synced in parallel
+    SYNC_SCHEDULER_POLL_SECONDS = int(os.getenv('SYNC_SCHEDULER_POLL_SECONDS', '60'))
+    SYNC_FOLDERS = os.getenv('SYNC_FOLDERS', 'inbox,sentitems').split(',')
+    SYNC_PAGE_SIZE = int(os.getenv('SYNC_PAGE_SIZE', '100'))
+    SYNC_ACTIVE_USER_DAYS = int(os.getenv('SYNC_ACTIVE_USER_DAYS', '7'))  # Recent logins get synced first
+    SYNC_FAILURE_BACKOFF_MAX_HOURS = int(os.getenv('SYNC_FAILURE_BACKOFF_MAX_HOURS', '24'))  # Cap on retry delay after failed syncs
+    SYNC_LEASE_MINUTES = int(os.getenv('SYNC_LEASE_MINUTES', '60'))  # A crashed process's claim on a user expires after this
+    TOKEN_ENCRYPTION_KEY = os.getenv('TOKEN_ENCRYPTION_KEY')  # Falls back to SECRET_KEY
+    
+    # Background AI Analysis Queue
+    ANALYSIS_QUEUE_ENABLED = os.getenv('ANALYSIS_QUEUE_ENABLED', 'true').lower() == 'true'
+    ANALYSIS_QUEUE_WORKERS = int(os.getenv('ANALYSIS_QUEUE_WORKERS', '2'))  # Max concurrent Ollama analyses
+    ANALYSIS_WORKERS_ENABLED = os.getenv('ANALYSIS_WORKERS_ENABLED', 'false').lower() == 'true'  # Or run analysis_worker.py
+    ANALYSIS_MAX_ATTEMPTS = int(os.getenv('ANALYSIS_MAX_ATTEMPTS', '4'))
+    ANALYSIS_RETRY_BACKOFF_SECONDS = int(os.getenv('ANALYSIS_RETRY_BACKOFF_SECONDS', '30'))
+    ANALYSIS_RETRY_MAX_BACKOFF_SECONDS = int(os.getenv('ANALYSIS_RETRY_MAX_BACKOFF_SECONDS', '900'))
+    ANALYSIS_QUEUE_POLL_SECONDS = int(os.getenv('ANALYSIS_QUEUE_POLL_SECONDS', '2'))
+    ANALYSIS_BATCH_SIZE = int(os.getenv('ANALYSIS_BATCH_SIZE', '1'))  # Emails packed into one analysis prompt
+    ANALYSIS_JOB_RETENTION_HOURS = int(os.getenv('ANALYSIS_JOB_RETENTION_HOURS', '24'))  # Completed jobs are deleted after this
+    
+    # Logging Configuration
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+    LOG_FILE = os.getenv('LOG_FILE', './logs/app.log')
+    
+    # Windows-specific Configuration
+    USE_WINDOWS_CREDENTIAL_MANAGER = os.getenv('USE_WINDOWS_CREDENTIAL_MANAGER', 'true').lower() == 'true'
+    WINDOWS_SERVICE_NAME = os.getenv('WINDOWS_SERVICE_NAME', 'AIEmailAssistant')
+    
+    # SocketIO Configuration
+    SOCKETIO_ASYNC_MODE = 'threading'
+    SOCKETIO_CORS_ORIGINS = [origin for origin in os.getenv('SOCKETIO_CORS_ORIGINS', '').split(',') if origin] or None  # None: same origin only
+    
+    @staticmethod
+    def init_app(app):
+        """Initialize configuration-specific setup"""
+        # Create necessary directories
+        os.makedirs('./data', exist_ok=True)
+        os.makedirs('./data/sessions', exist_ok=True)
+        os.makedirs('./logs', exist_ok=True)
+        os.makedirs(Config.VECTOR_DB_PATH, exist_ok=True)
+
+class DevelopmentConfig(Config):
+    """Development configuration"""
+    DEBUG = True
+    SQLALCHEMY_ECHO = True
+    LOG_LEVEL = 'DEBUG'
+
+class ProductionConfig(Config):
+    """Production configuration"""
+    DEBUG = False
+    SQLALCHEMY_ECHO = False
+    LOG_LEVEL = 'WARNING'
+    
+    # Use more secure session configuration
+    SESSION_COOKIE_SECURE = True
+    SESSION_COOKIE_HTTPONLY = True
+    SESSION_COOKIE_SAMESITE = 'Lax'
+
+class TestingConfig(Config):
+    """Testing configuration"""
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    WTF_CSRF_ENABLED = False
+    LOG_LEVEL = 'ERROR'
+
+# Configuration dictionary
+config = {
+    'development': DevelopmentConfig,
+    'production': ProductionConfig,
+    'testing': TestingConfig,
+    'default': DevelopmentConfig
+}
\ No newline at end of file
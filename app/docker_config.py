@@ -58,6 +58,7 @@ class DockerConfig:
     
     # Ollama Configuration
     OLLAMA_BASE_URL = os.getenv('OLLAMA_BASE_URL', 'http://localhost:11434')
+    OLLAMA_BASE_URLS = os.getenv('OLLAMA_BASE_URLS', '')  # e.g. http://ollama-1:11434,http://ollama-2:11434
     OLLAMA_MODEL = os.getenv('OLLAMA_MODEL', 'deepseek-r1:7b')
     OLLAMA_TIMEOUT = int(os.getenv('OLLAMA_TIMEOUT', '120'))
     OLLAMA_STREAM = os.getenv('OLLAMA_STREAM', 'true').lower() == 'true'
@@ -66,10 +67,11 @@ class DockerConfig:
     CHROMADB_HOST = os.getenv('CHROMADB_HOST', 'localhost')
     CHROMADB_PORT = int(os.getenv('CHROMADB_PORT', '8000'))
     CHROMADB_URL = f'http://{CHROMADB_HOST}:{CHROMADB_PORT}'
+    CHROMADB_MODE = os.getenv('CHROMADB_MODE', 'http')  # Every container shares the chromadb service
     
     # Vector Database Configuration
     VECTOR_DB_TYPE = os.getenv('VECTOR_DB_TYPE', 'chromadb')
-    VECTOR_DB_PATH = CHROMADB_URL  # Use HTTP endpoint for Docker ChromaDB
+    VECTOR_DB_PATH = os.getenv('VECTOR_DB_PATH', './data/vector_db')  # Embedded fallback when the server is down
     EMBEDDING_MODEL = os.getenv('EMBEDDING_MODEL', 'all-MiniLM-L6-v2')
     VECTOR_COLLECTION_NAME = os.getenv('VECTOR_COLLECTION_NAME', 'email_embeddings')
     
@@ -0,0 +1,163 @@
+"""
+Analysis job model for AI Email Assistant
+"""
+from datetime import datetime, timedelta
+from sqlalchemy import func, insert, literal, select
+from app.models import db
+
+class AnalysisJob(db.Model):
+    __tablename__ = 'analysis_jobs'
+    
+    # Primary key
+    id = db.Column(db.Integer, primary_key=True)
+    
+    # Email to analyze
+    email_id = db.Column(db.Integer, db.ForeignKey('emails.id', ondelete='CASCADE'), nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    
+    # Queue state
+    status = db.Column(db.String(20), default='pending', nullable=False, index=True)  # pending, running, done, failed
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+    last_error = db.Column(db.Text, nullable=True)
+    
+    # Timestamps
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    started_at = db.Column(db.DateTime, nullable=True)
+    completed_at = db.Column(db.DateTime, nullable=True, index=True)
+    
+    def __repr__(self):
+        return f'<AnalysisJob {self.id}: email {self.email_id} {self.status}>'
+    
+    def to_dict(self):
+        """Convert job to dictionary"""
+        return {
+            'id': self.id,
+            'email_id': self.email_id,
+            'user_id': self.user_id,
+            'status': self.status,
+            'attempts': self.attempts,
+            'next_attempt_at': self.next_attempt_at.isoformat() if self.next_attempt_at else None,
+            'last_error': self.last_error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'completed_at': self.completed_at.isoformat() if self.completed_at else None
+        }
+    
+    @classmethod
+    def enqueue_for_graph_ids(cls, user_id, graph_ids):
+        """Queue analysis of a user's stored emails by Graph ID (joins the caller's transaction)"""
+        # Import here to avoid circular imports
+        from app.models.email import Email
+        
+        now = datetime.utcnow()
+        for start in range(0, len(graph_ids), 500):
+            chunk = graph_ids[start:start + 500]
+            db.session.execute(
+                insert(cls).from_select(
+                    ['email_id', 'user_id', 'status', 'attempts', 'next_attempt_at', 'created_at'],
+                    select(Email.id, Email.user_id, literal('pending'), literal(0), literal(now), literal(now)).where(
+                        Email.user_id == user_id, Email.graph_id.in_(chunk)
+                    )
+                )
+            )
+    
+    @classmethod
+    def claim_next(cls, lease_seconds=600):
+        """Claim the next runnable job for this worker, or return None"""
+        jobs = cls.claim_batch(1, lease_seconds)
+        return jobs[0] if jobs else None
+    
+    @classmethod
+    def claim_batch(cls, limit, lease_seconds=600):
+        """Claim up to `limit` runnable jobs for this worker
+        
+        Jobs left 'running' longer than the lease (e.g. by a crashed worker) are
+        picked up again. Each claim is a compare-and-set so concurrent workers and
+        processes never run the same attempt twice.
+        """
+        now = datetime.utcnow()
+        stale_before = now - timedelta(seconds=lease_seconds)
+        
+        candidates = cls.query.filter(
+            db.or_(
+                db.and_(cls.status == 'pending', cls.next_attempt_at <= now),
+                db.and_(cls.status == 'running', cls.started_at < stale_before)
+            )
+        ).order_by(cls.next_attempt_at, cls.id).limit(limit).all()
+        
+        claimed_ids = []
+        for job in candidates:
+            claimed = cls.query.filter_by(
+                id=job.id, status=job.status, attempts=job.attempts
+            ).update({
+                cls.status: 'running',
+                cls.attempts: job.attempts + 1,
+                cls.started_at: now
+            }, synchronize_session=False)
+            if claimed:
+                claimed_ids.append(job.id)
+        db.session.commit()
+        
+        if not claimed_ids:
+            return []
+        return cls.query.filter(cls.id.in_(claimed_ids)).order_by(cls.id).all()
+    
+    def mark_done(self):
+        """Mark job as completed"""
+        self.status = 'done'
+        self.completed_at = datetime.utcnow()
+        self.last_error = None
+        db.session.commit()
+    
+    def mark_retry(self, error, delay_seconds):
+        """Return job to the queue after a failed attempt"""
+        self.status = 'pending'
+        self.last_error = error
+        self.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay_seconds)
+        db.session.commit()
+    
+    def mark_failed(self, error):
+        """Mark job as permanently failed"""
+        self.status = 'failed'
+        self.last_error = error
+        self.completed_at = datetime.utcnow()
+        db.session.commit()
+    
+    @classmethod
+    def prune_done(cls, completed_before):
+        """Delete jobs that completed before the given time and return how many"""
+        deleted = cls.query.filter(
+            cls.status == 'done', cls.completed_at < completed_before
+        ).delete(synchronize_session=False)
+        db.session.commit()
+        return deleted
+    
+    @classmethod
+    def get_queue_stats(cls, user_id=None):
+        """Get queue depth by status and recent throughput"""
+        query = db.session.query(cls.status, func.count(cls.id))
+        if user_id:
+            query = query.filter(cls.user_id == user_id)
+        counts = dict(query.group_by(cls.status).all())
+        
+        now = datetime.utcnow()
+        done_query = cls.query.filter(cls.status == 'done')
+        if user_id:
+            done_query = done_query.filter(cls.user_id == user_id)
+        completed_last_minute = done_query.filter(cls.completed_at >= now - timedelta(minutes=1)).count()
+        completed_last_5_minutes = done_query.filter(cls.completed_at >= now - timedelta(minutes=5)).count()
+        
+        oldest_query = db.session.query(func.min(cls.created_at)).filter(cls.status == 'pending')
+        if user_id:
+            oldest_query = oldest_query.filter(cls.user_id == user_id)
+        oldest_pending = oldest_query.scalar()
+        
+        return {
+            'pending': counts.get('pending', 0),
+            'running': counts.get('running', 0),
+            'done': counts.get('done', 0),
+            'failed': counts.get('failed', 0),
+            'completed_last_minute': completed_last_minute,
+            'throughput_per_minute': round(completed_last_5_minutes / 5, 2),
+            'oldest_pending_seconds': int((now - oldest_pending).total_seconds()) if oldest_pending else None
+        }
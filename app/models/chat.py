@@ -21,6 +21,7 @@ class ChatMessage(db.Model):
     message_type = db.Column(db.String(50), default='general')  # general, email_specific, action
     context_type = db.Column(db.String(50), nullable=True)  # email, summary, compose
     context_id = db.Column(db.Integer, nullable=True)  # email_id or other context reference
+    session_id = db.Column(db.String(100), nullable=True, index=True)  # Conversation the message belongs to
     
     # AI processing information
     ai_model = db.Column(db.String(100), nullable=True)
@@ -53,6 +54,7 @@ class ChatMessage(db.Model):
             'message_type': self.message_type,
             'context_type': self.context_type,
             'context_id': self.context_id,
+            'session_id': self.session_id,
             'ai_model': self.ai_model,
             'processing_time': self.processing_time,
             'confidence_score': self.confidence_score,
@@ -80,6 +82,16 @@ class ChatMessage(db.Model):
             context_id=email_id
         ).order_by(cls.created_at.asc()).limit(limit).all()
     
+    @classmethod
+    def get_session_messages(cls, session_id, user_id=None, limit=None):
+        """Get a conversation's messages, oldest first (the last limit of them)"""
+        query = cls.query.filter_by(session_id=session_id)
+        if user_id is not None:
+            query = query.filter_by(user_id=user_id)
+        if limit:
+            return list(reversed(query.order_by(cls.created_at.desc(), cls.id.desc()).limit(limit).all()))
+        return query.order_by(cls.created_at.asc(), cls.id.asc()).all()
+    
     @classmethod
     def create_message(cls, user_id, message, context_type=None, context_id=None, message_type='general'):
         """Create a new chat message"""
@@ -94,6 +106,29 @@ class ChatMessage(db.Model):
         db.session.commit()
         return chat_message
     
+    @classmethod
+    def create_completed(cls, user_id, message, response, context_type=None, context_id=None,
+                         message_type='general', ai_model=None, processing_time=None, intent=None,
+                         session_id=None):
+        """Save a finished exchange in a single insert (used once a streamed response completes)"""
+        chat_message = cls(
+            user_id=user_id,
+            message=message,
+            response=response,
+            message_type=message_type,
+            context_type=context_type,
+            context_id=context_id,
+            session_id=session_id,
+            ai_model=ai_model,
+            processing_time=processing_time,
+            intent=intent,
+            is_processed=True,
+            processed_at=datetime.utcnow()
+        )
+        db.session.add(chat_message)
+        db.session.commit()
+        return chat_message
+    
     def update_response(self, response, ai_model=None, processing_time=None, 
                        confidence_score=None, intent=None, entities=None):
         """Update the AI response for this message"""
@@ -6,6 +6,10 @@ from app.models import db
 
 class Email(db.Model):
     __tablename__ = 'emails'
+    __table_args__ = (
+        # Graph IDs are only unique within one mailbox
+        db.Index('uq_emails_user_graph_id', 'user_id', 'graph_id', unique=True),
+    )
     
     # Primary key
     id = db.Column(db.Integer, primary_key=True)
@@ -14,7 +18,7 @@ class Email(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
     
     # Microsoft Graph email ID
-    graph_id = db.Column(db.String(255), unique=True, nullable=False, index=True)
+    graph_id = db.Column(db.String(255), nullable=False, index=True)
     
     # Email metadata
     subject = db.Column(db.Text, nullable=True)
@@ -28,6 +32,10 @@ class Email(db.Model):
     body_text = db.Column(db.Text, nullable=True)
     body_html = db.Column(db.Text, nullable=True)
     body_preview = db.Column(db.Text, nullable=True)  # First 150 chars
+    body_fetched_at = db.Column(db.DateTime, nullable=True)  # Null until the full body is downloaded
+    
+    # Mailbox folder the email was synced from (inbox, sentitems, ...)
+    folder_name = db.Column(db.String(100), nullable=True, index=True)
     
     # Email properties
     importance = db.Column(db.String(20), default='normal')  # low, normal, high
@@ -77,6 +85,8 @@ class Email(db.Model):
             'recipient_emails': self.recipient_emails or [],
             'cc_emails': self.cc_emails or [],
             'body_preview': self.body_preview,
+            'folder_name': self.folder_name,
+            'is_sent_item': self.is_sent_item,
             'importance': self.importance,
             'is_read': self.is_read,
             'is_draft': self.is_draft,
@@ -99,11 +109,22 @@ class Email(db.Model):
         if include_body:
             data.update({
                 'body_text': self.body_text,
-                'body_html': self.body_html
+                'body_html': self.body_html,
+                'body_fetched': self.has_full_body
             })
         
         return data
     
+    @property
+    def has_full_body(self):
+        """Whether the full body has been downloaded (header-only syncs store just the preview)"""
+        return self.body_fetched_at is not None
+    
+    @property
+    def is_sent_item(self):
+        """Whether the email was synced from the sent items folder"""
+        return (self.folder_name or '').lower() in ['sent', 'sentitems', 'sent items']
+    
     @classmethod
     def find_by_graph_id(cls, graph_id):
         """Find email by Microsoft Graph ID"""
@@ -167,24 +188,36 @@ class Email(db.Model):
         db.session.commit()
     
     def get_related_emails(self, limit=5):
-        """Get related emails (same conversation or sender)"""
-        related = []
-        
-        # Get emails from same conversation
+        """Get related emails (same conversation, then recent emails from the same sender)"""
+        conditions = []
         if self.conversation_id:
-            conversation_emails = Email.get_by_conversation(self.conversation_id, limit)
-            related.extend([e for e in conversation_emails if e.id != self.id])
-        
-        # Get recent emails from same sender
-        if len(related) < limit and self.sender_email:
-            sender_emails = Email.get_by_sender(self.user_id, self.sender_email, limit)
-            for email in sender_emails:
-                if email.id != self.id and email not in related:
-                    related.append(email)
-                if len(related) >= limit:
-                    break
+            conditions.append(Email.conversation_id == self.conversation_id)
+        if self.sender_email:
+            conditions.append(Email.sender_email == self.sender_email)
+        if not conditions:
+            return []
         
-        return related[:limit]
+        # One query: the conversation in date order first, then the sender's newest emails
+        in_conversation = conditions[0] if self.conversation_id else db.false()
+        return Email.query.filter(
+            Email.user_id == self.user_id,
+            Email.id != self.id,
+            db.or_(*conditions)
+        ).order_by(
+            db.case((in_conversation, 0), else_=1),
+            db.case((in_conversation, Email.received_date), else_=None).asc(),
+            Email.received_date.desc()
+        ).limit(limit).all()
+    
+    def get_similar_emails(self, limit=5):
+        """Get the most similar emails from the precomputed neighbor lists"""
+        # Import here to avoid circular imports
+        from app.models.email_neighbor import EmailNeighbor
+        return Email.query.join(
+            EmailNeighbor, EmailNeighbor.neighbor_id == Email.id
+        ).filter(
+            EmailNeighbor.email_id == self.id
+        ).order_by(EmailNeighbor.rank).limit(limit).all()
     
     def get_user(self):
         """Get the user who owns this email"""
@@ -0,0 +1,69 @@
+"""
+Email neighbor model for AI Email Assistant
+"""
+from typing import Dict, Iterable, List, Tuple
+from app.models import db
+
+class EmailNeighbor(db.Model):
+    """One entry of an email's precomputed top-k similar emails
+    
+    Rows are keyed by (email_id, rank), so an email's list is a single primary-key
+    range scan; neighbor_id is indexed for removing deleted emails from other lists.
+    """
+    __tablename__ = 'email_neighbors'
+    
+    email_id = db.Column(db.Integer, db.ForeignKey('emails.id', ondelete='CASCADE'), primary_key=True)
+    rank = db.Column(db.SmallInteger, primary_key=True, autoincrement=False)
+    neighbor_id = db.Column(db.Integer, db.ForeignKey('emails.id', ondelete='CASCADE'), nullable=False, index=True)
+    score = db.Column(db.Float, nullable=False)
+    
+    def __repr__(self):
+        return f'<EmailNeighbor {self.email_id} #{self.rank}: {self.neighbor_id} ({self.score:.3f})>'
+    
+    @classmethod
+    def get_lists(cls, email_ids: Iterable[int]) -> Dict[int, List[Tuple[int, float]]]:
+        """Stored neighbor lists as {email_id: [(neighbor_id, score), ...]} in rank order"""
+        lists = {}
+        email_ids = list(email_ids)
+        # Chunked to stay under SQLite's bound-parameter limit
+        for start in range(0, len(email_ids), 500):
+            rows = db.session.query(cls.email_id, cls.neighbor_id, cls.score).filter(
+                cls.email_id.in_(email_ids[start:start + 500])
+            ).order_by(cls.email_id, cls.rank).all()
+            for email_id, neighbor_id, score in rows:
+                lists.setdefault(email_id, []).append((neighbor_id, score))
+        return lists
+    
+    @classmethod
+    def replace_lists(cls, lists: Dict[int, List[Tuple[int, float]]]):
+        """Overwrite the neighbor lists of the given emails (joins the caller's transaction)"""
+        email_ids = list(lists)
+        for start in range(0, len(email_ids), 500):
+            cls.query.filter(cls.email_id.in_(email_ids[start:start + 500])).delete(synchronize_session=False)
+        
+        rows = [
+            {'email_id': email_id, 'rank': rank, 'neighbor_id': neighbor_id, 'score': score}
+            for email_id, neighbors in lists.items()
+            for rank, (neighbor_id, score) in enumerate(neighbors)
+        ]
+        if rows:
+            db.session.execute(db.insert(cls), rows)
+    
+    @classmethod
+    def delete_for_emails(cls, email_ids: Iterable[int]) -> List[int]:
+        """Drop deleted emails' lists and their entries in other lists (joins the caller's transaction)
+        
+        Returns the emails whose lists lost an entry, so they can be topped up.
+        """
+        email_ids = list(email_ids)
+        affected = set()
+        for start in range(0, len(email_ids), 500):
+            chunk = email_ids[start:start + 500]
+            affected.update(
+                email_id for (email_id,) in
+                db.session.query(cls.email_id).filter(cls.neighbor_id.in_(chunk)).distinct()
+            )
+            cls.query.filter(db.or_(cls.email_id.in_(chunk), cls.neighbor_id.in_(chunk))).delete(
+                synchronize_session=False
+            )
+        return sorted(affected - set(email_ids))
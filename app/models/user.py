@@ -1,7 +1,8 @@
 """
 User model for AI Email Assistant
 """
-from datetime import datetime
+import json
+from datetime import datetime, timedelta
 from app.models import db
 
 class User(db.Model):
@@ -21,6 +22,7 @@ class User(db.Model):
     # Authentication tokens (hashed)
     access_token_hash = db.Column(db.Text, nullable=True)
     refresh_token_hash = db.Column(db.Text, nullable=True)
+    refresh_token_encrypted = db.Column(db.Text, nullable=True)  # Lets background sync refresh access tokens
     token_expires_at = db.Column(db.DateTime, nullable=True)
     
     # User preferences
@@ -29,9 +31,14 @@ class User(db.Model):
     
     # Status and metadata
     is_active = db.Column(db.Boolean, default=True, nullable=False)
+    is_admin = db.Column(db.Boolean, default=False, server_default=db.false(), nullable=False)  # Can see service-wide stats
     last_login = db.Column(db.DateTime, nullable=True)
     last_email_sync = db.Column(db.DateTime, nullable=True)
-    email_sync_cursor = db.Column(db.String(255), nullable=True)
+    email_sync_cursor = db.Column(db.Text, nullable=True)  # JSON map of folder -> Graph delta link
+    search_generation = db.Column(db.Integer, default=0, server_default='0', nullable=False)  # Keys cached search results
+    sync_failures = db.Column(db.Integer, default=0, server_default='0', nullable=False)  # Consecutive failed scheduled syncs
+    next_sync_at = db.Column(db.DateTime, nullable=True)  # Failed syncs back off until then
+    sync_lease_until = db.Column(db.DateTime, nullable=True)  # Held by the process syncing this user
     
     # Timestamps
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
@@ -48,6 +55,7 @@ class User(db.Model):
             'display_name': self.display_name,
             'azure_id': self.azure_id,
             'is_active': self.is_active,
+            'is_admin': self.is_admin,
             'last_login': self.last_login.isoformat() if self.last_login else None,
             'last_email_sync': self.last_email_sync.isoformat() if self.last_email_sync else None,
             'created_at': self.created_at.isoformat() if self.created_at else None,
@@ -70,13 +78,73 @@ class User(db.Model):
         self.last_login = datetime.utcnow()
         db.session.commit()
     
-    def update_sync_info(self, cursor=None):
+    def update_sync_info(self, cursor=None, folder='inbox'):
         """Update email sync information"""
         self.last_email_sync = datetime.utcnow()
+        # Drop cached search results, here and in other processes
+        self.search_generation = User.search_generation + 1
         if cursor:
-            self.email_sync_cursor = cursor
+            self.set_sync_cursor(folder, cursor, commit=False)
         db.session.commit()
     
+    @classmethod
+    def claim_sync(cls, user_id, lease_seconds):
+        """Claim a user for syncing; False while another thread or process holds the lease
+        
+        The claim is a compare-and-set on sync_lease_until, so web processes and sync
+        workers never sync the same mailbox at once. A lease left by a crashed
+        process expires after lease_seconds.
+        """
+        now = datetime.utcnow()
+        claimed = cls.query.filter(
+            cls.id == user_id,
+            db.or_(cls.sync_lease_until.is_(None), cls.sync_lease_until < now)
+        ).update({cls.sync_lease_until: now + timedelta(seconds=lease_seconds)}, synchronize_session=False)
+        db.session.commit()
+        return bool(claimed)
+    
+    @classmethod
+    def release_sync(cls, user_id):
+        """Release a sync claim taken with claim_sync"""
+        cls.query.filter_by(id=user_id).update({cls.sync_lease_until: None}, synchronize_session=False)
+        db.session.commit()
+    
+    def _get_sync_cursors(self):
+        """Decode the per-folder sync cursors"""
+        if not self.email_sync_cursor:
+            return {}
+        try:
+            cursors = json.loads(self.email_sync_cursor)
+            return cursors if isinstance(cursors, dict) else {}
+        except ValueError:
+            # Cursors written before per-folder storage cannot be resumed
+            return {}
+    
+    def get_sync_cursor(self, folder='inbox'):
+        """Get the stored Graph delta link for a mail folder"""
+        return self._get_sync_cursors().get(folder)
+    
+    def set_sync_cursor(self, folder, cursor, commit=True):
+        """Store (or clear, with cursor=None) the Graph delta link for a mail folder"""
+        cursors = self._get_sync_cursors()
+        if cursor:
+            cursors[folder] = cursor
+        else:
+            cursors.pop(folder, None)
+        self.email_sync_cursor = json.dumps(cursors) if cursors else None
+        if commit:
+            db.session.commit()
+    
+    def set_refresh_token(self, refresh_token):
+        """Store an encrypted refresh token for background sync"""
+        from app.utils.token_crypto import encrypt_token
+        self.refresh_token_encrypted = encrypt_token(refresh_token)
+    
+    def get_refresh_token(self):
+        """Get the decrypted refresh token, if one is stored"""
+        from app.utils.token_crypto import decrypt_token
+        return decrypt_token(self.refresh_token_encrypted)
+    
     def get_email_count(self):
         """Get count of user's emails"""
         # Import here to avoid circular imports
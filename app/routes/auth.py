@@ -9,6 +9,7 @@ from datetime import datetime, timedelta
 from flask import Blueprint, request, redirect, url_for, session, jsonify, current_app, flash
 from app.models import db
 from app.models.user import User
+from app.services.graph_tokens import remember_access_token
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -125,6 +126,8 @@ def callback():
             try:
                 user = create_or_update_user(user_info, token_data)
                 current_app.logger.info(f"User authenticated: {user.email}")
+                # The Graph token stays server-side; the session cookie is only signed, not encrypted
+                remember_access_token(user, token_data)
             except Exception as user_error:
                 current_app.logger.error(f"User creation failed: {user_error}")
                 # Fallback to demo user
@@ -302,6 +305,9 @@ def create_or_update_user(user_info, token_data):
         # Store token info (in production, encrypt these)
         if token_data and 'access_token' in token_data:
             user.access_token_hash = hash_token(token_data['access_token'])
+        if token_data and 'refresh_token' in token_data:
+            user.refresh_token_hash = hash_token(token_data['refresh_token'])
+            user.set_refresh_token(token_data['refresh_token'])
             
         if token_data and 'expires_in' in token_data:
             expires_in = int(token_data['expires_in'])
@@ -1,17 +1,27 @@
 """
 Chat routes for AI Email Assistant
 """
+import json
+import threading
 import time
 from datetime import datetime
-from flask import Blueprint, request, jsonify, session, current_app
+from flask import Blueprint, Response, request, jsonify, session, current_app, stream_with_context
 from app.models import db
 from app.models.user import User
 from app.models.email import Email
 from app.models.chat import ChatMessage
+from app.services.chat_processor import ChatProcessor
 from app.utils.auth_helpers import login_required
 
 chat_bp = Blueprint('chat', __name__)
 
+# ChatProcessor.stream_message events as sent to SocketIO clients (see chat.html)
+SOCKET_EVENTS = {'start': 'ai_thinking', 'token': 'ai_token', 'done': 'ai_response', 'error': 'ai_error'}
+
+# Cancel flags of the responses streaming to each SocketIO connection
+_socket_streams = {}
+_socket_streams_lock = threading.Lock()
+
 @chat_bp.route('/message', methods=['POST'])
 @login_required
 def chat_message():
@@ -67,6 +77,148 @@ def chat_message():
         current_app.logger.error(f"Chat message error: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@chat_bp.route('/stream', methods=['GET', 'POST'])
+@login_required
+def chat_stream():
+    """Stream an AI chat response as Server-Sent Events
+    
+    Takes message, and optionally email_id to chat about one email and session_id
+    to continue a conversation, as JSON, form data or query args (so EventSource
+    can use it). Sends start, token, done and
+    error events; the exchange is saved when the response completes. A client that
+    disconnects stops the generation.
+    """
+    try:
+        user_id = session.get('user_id')
+        data = request.get_json(silent=True) or request.values.to_dict()
+        
+        message = (data.get('message') or '').strip()
+        if not message:
+            return jsonify({'success': False, 'error': 'Message cannot be empty'}), 400
+        
+        context_data, error = _chat_context(user_id, data)
+        if error:
+            return error
+        
+        current_app.logger.info(f"Streaming chat message from user {user_id}: {message[:50]}...")
+        events = ChatProcessor().stream_message(
+            user_id, message, context_data=context_data, session_id=_chat_session(data, context_data)
+        )
+        
+        return Response(
+            stream_with_context(_format_sse(events)),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
+    
+    except Exception as e:
+        current_app.logger.error(f"Chat stream error: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+def _chat_context(user_id, data):
+    """Context for a chat request, or an error response if its email is invalid or not the user's"""
+    if not data.get('email_id'):
+        return {}, None
+    
+    try:
+        email_id = int(data['email_id'])
+    except (TypeError, ValueError):
+        return None, (jsonify({'success': False, 'error': 'Invalid email_id'}), 400)
+    
+    email = Email.query.filter_by(id=email_id, user_id=user_id).first()
+    if not email:
+        return None, (jsonify({'success': False, 'error': 'Email not found'}), 404)
+    return {'email_id': email.id}, None
+
+def _chat_session(data, context_data):
+    """Conversation a chat request continues (chats about an email share one per email)"""
+    if data.get('session_id'):
+        return str(data['session_id'])[:100]
+    if context_data.get('email_id'):
+        return f"email-{context_data['email_id']}"
+    return None
+
+def _format_sse(events):
+    """Encode stream events as SSE; closing this (client gone) closes the upstream stream"""
+    try:
+        for event in events:
+            name = event.pop('event')
+            yield f"event: {name}\ndata: {json.dumps(event)}\n\n"
+    finally:
+        events.close()
+
+def init_chat_socketio(socketio):
+    """Register the streaming chat events on the app's SocketIO server
+    
+    A chat_message event is answered with message_received, then ai_thinking,
+    ai_token per generated chunk and ai_response (or ai_error) to the sender only.
+    chat_cancel, a newer chat_message or disconnecting stops the response.
+    """
+    
+    @socketio.on('connect')
+    def handle_connect(auth=None):
+        # Same session cookie as the HTTP routes
+        if 'user_id' not in session:
+            return False
+    
+    @socketio.on('chat_message')
+    def handle_chat_message(data):
+        user_id = session.get('user_id')
+        data = data or {}
+        message = (data.get('message') or '').strip()
+        if not user_id or not message:
+            socketio.emit('ai_error', {'error': 'Message cannot be empty'}, to=request.sid)
+            return
+        
+        context_data, error = _chat_context(user_id, data)
+        if error:
+            socketio.emit('ai_error', {'error': error[0].get_json()['error']}, to=request.sid)
+            return
+        
+        cancel = threading.Event()
+        with _socket_streams_lock:
+            previous = _socket_streams.get(request.sid)
+            if previous:
+                previous.set()
+            _socket_streams[request.sid] = cancel
+        
+        socketio.emit('message_received', {'message': message}, to=request.sid)
+        socketio.start_background_task(
+            _stream_to_socket, current_app._get_current_object(), socketio,
+            request.sid, user_id, message, context_data, _chat_session(data, context_data), cancel
+        )
+    
+    @socketio.on('chat_cancel')
+    def handle_chat_cancel(data=None):
+        _cancel_socket_stream(request.sid)
+    
+    @socketio.on('disconnect')
+    def handle_disconnect(*args):
+        _cancel_socket_stream(request.sid)
+
+def _stream_to_socket(app, socketio, sid, user_id, message, context_data, session_id, cancel):
+    """Background task relaying ChatProcessor.stream_message to one SocketIO client"""
+    with app.app_context():
+        try:
+            events = ChatProcessor().stream_message(
+                user_id, message, context_data=context_data, cancel=cancel, session_id=session_id
+            )
+            for event in events:
+                socketio.emit(SOCKET_EVENTS[event.pop('event')], event, to=sid)
+        except Exception as e:
+            current_app.logger.error(f"Chat socket stream error: {e}")
+            socketio.emit('ai_error', {'error': str(e)}, to=sid)
+        finally:
+            with _socket_streams_lock:
+                if _socket_streams.get(sid) is cancel:
+                    del _socket_streams[sid]
+
+def _cancel_socket_stream(sid):
+    with _socket_streams_lock:
+        cancel = _socket_streams.pop(sid, None)
+    if cancel:
+        cancel.set()
+
 @chat_bp.route('/history', methods=['GET'])
 @login_required
 def chat_history():
@@ -99,6 +251,13 @@ def clear_chat():
     try:
         user_id = session.get('user_id')
         
+        # Forget the cleared conversations' Ollama contexts too
+        if hasattr(current_app, 'conversation_contexts'):
+            for (session_id,) in db.session.query(ChatMessage.session_id).filter(
+                ChatMessage.user_id == user_id, ChatMessage.session_id.isnot(None)
+            ).distinct():
+                current_app.conversation_contexts.discard(user_id, session_id)
+        
         # Delete all chat messages for user
         ChatMessage.query.filter_by(user_id=user_id).delete()
         db.session.commit()
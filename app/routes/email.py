@@ -8,7 +8,9 @@ from app.models import db
 from app.models.user import User
 from app.models.email import Email
 from app.models.chat import ChatMessage
-from app.utils.auth_helpers import login_required
+from app.services.graph_tokens import get_access_token
+from app.services.search_cache import bump_search_generation
+from app.utils.auth_helpers import login_required, admin_required
 
 email_bp = Blueprint('email', __name__)
 
@@ -22,7 +24,11 @@ def sync_emails():
         if not user:
             return jsonify({'success': False, 'error': 'User not found'}), 404
         
-        # For demo purposes, create some sample emails
+        access_token = get_access_token(user)
+        if access_token:
+            return _sync_from_graph(user, access_token)
+        
+        # Demo sign-ins have no Graph token, so create some sample emails
         sample_emails = [
             {
                 'graph_id': f'demo-email-{i}',
@@ -79,6 +85,41 @@ def sync_emails():
         current_app.logger.error(f"Email sync error: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+def _sync_from_graph(user, access_token):
+    """Run an incremental delta sync of the user's mail folders"""
+    from app.services.ms_graph import GraphService
+    from app.services.email_processor import EmailProcessor
+    
+    # Share the sync scheduler's lease so a mailbox is never synced twice at once
+    if not User.claim_sync(user.id, current_app.config.get('SYNC_LEASE_MINUTES', 60) * 60):
+        return jsonify({'success': False, 'error': 'A sync is already in progress'}), 409
+    
+    graph_service = GraphService(tenant_id=user.azure_tenant_id)
+    processor = EmailProcessor()
+    totals = {'synced_count': 0, 'new_count': 0, 'updated_count': 0, 'deleted_count': 0, 'errors': []}
+    
+    try:
+        for folder in current_app.config.get('SYNC_FOLDERS', ['inbox', 'sentitems']):
+            result = processor.sync_user_emails_delta(
+                user, graph_service, access_token, folder=folder,
+                page_size=current_app.config.get('SYNC_PAGE_SIZE', 100)
+            )
+            for key in ('synced_count', 'new_count', 'updated_count', 'deleted_count'):
+                totals[key] += result[key]
+            totals['errors'].extend(result['errors'])
+    finally:
+        db.session.rollback()
+        User.release_sync(user.id)
+    
+    current_app.logger.info(f"Delta sync for user {user.email}: {totals['new_count']} new emails")
+    
+    return jsonify({
+        'success': not totals['errors'],
+        'message': f"Synced {totals['new_count']} new emails",
+        **totals,
+        'total_emails': user.get_email_count()
+    })
+
 @email_bp.route('/list', methods=['GET'])
 @login_required
 def list_emails():
@@ -115,6 +156,23 @@ def list_emails():
         current_app.logger.error(f"List emails error: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+def _ensure_email_body(email):
+    """Download the full body of an email synced headers-only, when we hold a Graph token"""
+    if email.has_full_body:
+        return
+    
+    try:
+        access_token = get_access_token(db.session.get(User, email.user_id))
+        if not access_token:
+            return
+        
+        from app.services.ms_graph import GraphService
+        from app.services.email_processor import EmailProcessor
+        EmailProcessor().hydrate_email_bodies(GraphService(), access_token, [email])
+    except Exception as e:
+        current_app.logger.warning(f"Could not fetch body for email {email.id}: {e}")
+        db.session.rollback()
+
 @email_bp.route('/<int:email_id>', methods=['GET'])
 @login_required
 def get_email(email_id):
@@ -127,13 +185,18 @@ def get_email(email_id):
         if not email:
             return jsonify({'error': 'Email not found'}), 404
         
-        # Get related emails
+        # Bodies are fetched lazily for header-only syncs
+        _ensure_email_body(email)
+        
+        # Get related and similar emails (one indexed query each)
         related_emails = email.get_related_emails(limit=5)
+        similar_emails = email.get_similar_emails(limit=5)
         
         return jsonify({
             'success': True,
             'email': email.to_dict(include_body=True),
-            'related_emails': [e.to_dict() for e in related_emails]
+            'related_emails': [e.to_dict() for e in related_emails],
+            'similar_emails': [e.to_dict() for e in similar_emails]
         })
         
     except Exception as e:
@@ -152,11 +215,15 @@ def email_detail(email_id):
         if not email:
             return render_template('errors/404.html'), 404
         
+        # Bodies are fetched lazily for header-only syncs
+        _ensure_email_body(email)
+        
         # Get user
         user = User.query.get(user_id)
         
-        # Get related emails
+        # Get related and similar emails (one indexed query each)
         related_emails = email.get_related_emails(limit=5)
+        similar_emails = email.get_similar_emails(limit=5)
         
         # Get email-specific chat history
         chat_history = ChatMessage.get_email_specific_chat(user_id, email_id, limit=10)
@@ -165,6 +232,7 @@ def email_detail(email_id):
                              email=email.to_dict(include_body=True),
                              user=user.to_dict(),
                              related_emails=[e.to_dict() for e in related_emails],
+                             similar_emails=[e.to_dict() for e in similar_emails],
                              chat_history=[c.to_dict() for c in chat_history])
         
     except Exception as e:
@@ -185,6 +253,7 @@ def mark_email_read(email_id):
         
         # Mark as read
         email.mark_as_read()
+        bump_search_generation(user_id)
         
         current_app.logger.info(f"Email {email_id} marked as read by user {user_id}")
         
@@ -213,6 +282,7 @@ def mark_email_unread(email_id):
         
         # Mark as unread
         email.mark_as_unread()
+        bump_search_generation(user_id)
         
         current_app.logger.info(f"Email {email_id} marked as unread by user {user_id}")
         
@@ -227,6 +297,78 @@ def mark_email_unread(email_id):
         current_app.logger.error(f"Mark unread error: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+def _bulk_set_read_state(is_read):
+    """Set is_read on many emails locally and write it back to Graph in $batch calls"""
+    user_id = session.get('user_id')
+    data = request.get_json(silent=True) or {}
+    
+    query = Email.query.filter_by(user_id=user_id)
+    if data.get('all'):
+        query = query.filter(Email.is_read != is_read)
+    elif data.get('email_ids'):
+        query = query.filter(Email.id.in_(data['email_ids']))
+    else:
+        return jsonify({'success': False, 'error': 'Provide email_ids or all'}), 400
+    
+    rows = query.with_entities(Email.id, Email.graph_id).all()
+    email_ids = [row.id for row in rows]
+    
+    if email_ids:
+        Email.query.filter(Email.id.in_(email_ids)).update(
+            {'is_read': is_read, 'updated_at': datetime.utcnow()},
+            synchronize_session=False
+        )
+        bump_search_generation(user_id, commit=False)
+        db.session.commit()
+    
+    # Write back to the mailbox when we hold a Graph token for this user
+    graph_updated = None
+    graph_failed = []
+    graph_ids = [row.graph_id for row in rows if row.graph_id]
+    access_token = get_access_token(db.session.get(User, user_id)) if graph_ids else None
+    if access_token:
+        from app.services.ms_graph import GraphService
+        results = GraphService().mark_emails_read(access_token, graph_ids, is_read=is_read)
+        graph_updated = sum(1 for ok in results.values() if ok)
+        graph_failed = [graph_id for graph_id, ok in results.items() if not ok]
+    
+    current_app.logger.info(
+        f"{len(email_ids)} emails marked as {'read' if is_read else 'unread'} by user {user_id}"
+    )
+    
+    return jsonify({
+        'success': True,
+        'message': f"{len(email_ids)} emails marked as {'read' if is_read else 'unread'}",
+        'email_ids': email_ids,
+        'is_read': is_read,
+        'graph_updated': graph_updated,
+        'graph_failed': graph_failed
+    })
+
+@email_bp.route('/bulk/mark-read', methods=['POST'])
+@login_required
+def bulk_mark_read():
+    """Mark many emails as read (email_ids list, or all=true for every unread email)"""
+    try:
+        return _bulk_set_read_state(True)
+        
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Bulk mark read error: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@email_bp.route('/bulk/mark-unread', methods=['POST'])
+@login_required
+def bulk_mark_unread():
+    """Mark many emails as unread (email_ids list, or all=true for every read email)"""
+    try:
+        return _bulk_set_read_state(False)
+        
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Bulk mark unread error: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 @email_bp.route('/<int:email_id>/chat', methods=['POST'])
 @login_required
 def email_chat(email_id):
@@ -350,6 +492,38 @@ def email_chat(email_id):
         current_app.logger.error(f"Email chat error: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+def _parse_search_filters(args) -> dict:
+    """Read structured search filters (sender, date_from, date_to, folder, unread) from query args"""
+    filters = {}
+    if args.get('sender'):
+        filters['sender'] = args['sender'].strip()
+    for key in ('date_from', 'date_to'):
+        if args.get(key):
+            filters[key] = datetime.fromisoformat(args[key])
+    if args.get('folder'):
+        filters['folder'] = args['folder'].strip()
+    if args.get('unread'):
+        filters['unread'] = args['unread'].lower() in ('1', 'true', 'yes')
+    return filters
+
+def _apply_search_filters(email_query, filters: dict):
+    """Apply structured search filters to an Email query"""
+    if filters.get('sender'):
+        pattern = f"%{filters['sender'].lower()}%"
+        email_query = email_query.filter(db.or_(
+            db.func.lower(Email.sender_email).like(pattern),
+            db.func.lower(Email.sender_name).like(pattern)
+        ))
+    if filters.get('date_from'):
+        email_query = email_query.filter(Email.received_date >= filters['date_from'])
+    if filters.get('date_to'):
+        email_query = email_query.filter(Email.received_date <= filters['date_to'])
+    if filters.get('folder'):
+        email_query = email_query.filter(db.func.lower(Email.folder_name) == filters['folder'].lower())
+    if filters.get('unread') is not None:
+        email_query = email_query.filter(Email.is_read.is_(not filters['unread']))
+    return email_query
+
 @email_bp.route('/search', methods=['GET'])
 @login_required
 def search_emails():
@@ -362,21 +536,68 @@ def search_emails():
         if not query:
             return jsonify({'success': False, 'error': 'Search query required'}), 400
         
-        # Simple search in subject and body text
-        emails = Email.query.filter_by(user_id=user_id).filter(
-            db.or_(
-                Email.subject.contains(query),
-                Email.body_text.contains(query),
-                Email.sender_email.contains(query),
-                Email.sender_name.contains(query)
+        offset = int(request.args.get('offset', 0))
+        try:
+            filters = _parse_search_filters(request.args)
+        except ValueError:
+            return jsonify({'success': False, 'error': 'Dates must be ISO 8601'}), 400
+        
+        # Full-text and vector retrieval fused by rank; supports "exact phrases" and prefix* terms
+        search = None
+        if hasattr(current_app, 'hybrid_search'):
+            search = current_app.hybrid_search.search(user_id, query, filters=filters, limit=limit, offset=offset)
+        
+        if search is not None:
+            matches = search['results']
+            emails_by_id = {
+                email.id: email
+                for email in Email.query.filter(
+                    Email.id.in_([match['id'] for match in matches]),
+                    Email.user_id == user_id
+                ).all()
+            }
+            email_list = []
+            for match in matches:
+                email = emails_by_id.get(match['id'])
+                if email:
+                    email_list.append(dict(
+                        email.to_dict(),
+                        score=match['score'],
+                        lexical_rank=match['lexical_rank'],
+                        vector_rank=match['vector_rank'],
+                        similarity=match['similarity'],
+                        subject_highlight=match['subject_highlight'],
+                        snippet=match['snippet']
+                    ))
+            search_mode = search['mode']
+            timings = search['timings']
+            cached = search['cached']
+        else:
+            # Simple search in subject and body text
+            email_query = Email.query.filter_by(user_id=user_id).filter(
+                db.or_(
+                    Email.subject.contains(query),
+                    Email.body_text.contains(query),
+                    Email.sender_email.contains(query),
+                    Email.sender_name.contains(query)
+                )
             )
-        ).order_by(Email.received_date.desc()).limit(limit).all()
-        
-        email_list = [email.to_dict() for email in emails]
+            emails = _apply_search_filters(email_query, filters).order_by(
+                Email.received_date.desc()
+            ).offset(offset).limit(limit).all()
+            
+            email_list = [email.to_dict() for email in emails]
+            search_mode = 'basic'
+            timings = None
+            cached = False
         
         return jsonify({
             'success': True,
             'query': query,
+            'filters': {key: value.isoformat() if isinstance(value, datetime) else value for key, value in filters.items()},
+            'search_mode': search_mode,
+            'timings': timings,
+            'cached': cached,
             'results': len(email_list),
             'emails': email_list
         })
@@ -409,6 +630,65 @@ def send_email():
         current_app.logger.error(f"Send email error: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@email_bp.route('/analysis/status', methods=['GET'])
+@login_required
+def analysis_status():
+    """Get the AI analysis queue depth and throughput for the current user's emails"""
+    try:
+        from app.models.analysis_job import AnalysisJob
+        
+        user_id = session.get('user_id')
+        
+        return jsonify({
+            'success': True,
+            'queue': AnalysisJob.get_queue_stats(user_id)
+        })
+        
+    except Exception as e:
+        current_app.logger.error(f"Analysis status error: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@email_bp.route('/ai-cache', methods=['GET'])
+@admin_required
+def ai_cache_stats():
+    """Get LLM response cache hit/miss stats and size"""
+    if not hasattr(current_app, 'response_cache'):
+        return jsonify({'success': False, 'error': 'LLM response cache is disabled'}), 404
+    
+    try:
+        return jsonify({
+            'success': True,
+            'cache': current_app.response_cache.get_stats()
+        })
+    
+    except Exception as e:
+        current_app.logger.error(f"AI cache stats error: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@email_bp.route('/ai-cache/purge', methods=['POST'])
+@admin_required
+def purge_ai_cache():
+    """Delete cached LLM responses: all of them, one model's, or only expired ones"""
+    if not hasattr(current_app, 'response_cache'):
+        return jsonify({'success': False, 'error': 'LLM response cache is disabled'}), 404
+    
+    try:
+        data = request.get_json(silent=True) or {}
+        purged = current_app.response_cache.purge(
+            model=data.get('model'),
+            expired_only=bool(data.get('expired_only', False))
+        )
+        
+        return jsonify({
+            'success': True,
+            'purged': purged,
+            'cache': current_app.response_cache.get_stats()
+        })
+    
+    except Exception as e:
+        current_app.logger.error(f"AI cache purge error: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 @email_bp.route('/stats', methods=['GET'])
 @login_required
 def email_stats():
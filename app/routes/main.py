@@ -2,10 +2,11 @@
 Main routes for AI Email Assistant
 """
 from flask import Blueprint, render_template, redirect, url_for, session, current_app, jsonify
+from sqlalchemy import text
 from app.models import db
 from app.models.user import User
 from app.models.email import Email
-from app.utils.auth_helpers import login_required
+from app.utils.auth_helpers import login_required, admin_required
 
 main_bp = Blueprint('main', __name__)
 
@@ -170,7 +171,7 @@ def health():
     """Health check endpoint"""
     try:
         # Check database connection
-        db.session.execute('SELECT 1')
+        db.session.execute(text('SELECT 1'))
         
         # Check if we can query users table
         user_count = User.query.count()
@@ -185,8 +186,8 @@ def health():
         
         # Check AI services if available
         try:
-            from app.services.ollama_engine import OllamaService
-            ollama = OllamaService()
+            from app.services.ollama_engine import get_ollama_service
+            ollama = get_ollama_service()
             ollama_status = ollama.check_health()
             status['ai_service'] = 'available' if ollama_status else 'unavailable'
         except ImportError:
@@ -196,7 +197,7 @@ def health():
         
         # Check email sync capability
         try:
-            from app.services.ms_graph import MSGraphService
+            from app.services.ms_graph import GraphService
             status['graph_service'] = 'configured'
         except ImportError:
             status['graph_service'] = 'not_configured'
@@ -213,6 +214,39 @@ def health():
             'timestamp': datetime.utcnow().isoformat()
         }), 500
 
+@main_bp.route('/api/health/stats')
+@admin_required
+def health_stats():
+    """Service counters for monitoring: Graph requests, schedulers, caches and model routing"""
+    try:
+        from app.services.ms_graph import get_graph_stats
+        
+        stats = {
+            'graph_requests': get_graph_stats(),
+            'timestamp': datetime.utcnow().isoformat()
+        }
+        
+        if hasattr(current_app, 'sync_scheduler'):
+            stats['sync_scheduler'] = current_app.sync_scheduler.get_stats()
+        if hasattr(current_app, 'analysis_queue'):
+            stats['analysis_queue'] = current_app.analysis_queue.get_stats()
+        if hasattr(current_app, 'hybrid_search'):
+            stats['search'] = current_app.hybrid_search.get_stats()
+        if hasattr(current_app, 'vector_service') and current_app.vector_service.query_cache:
+            stats['query_embedding_cache'] = current_app.vector_service.query_cache.get_stats()
+        if hasattr(current_app, 'response_cache'):
+            stats['llm_response_cache'] = current_app.response_cache.get_stats()
+        if hasattr(current_app, 'llm_scheduler'):
+            stats['llm_scheduler'] = current_app.llm_scheduler.get_stats()
+        if hasattr(current_app, 'ollama_router'):
+            stats['ollama_router'] = current_app.ollama_router.get_stats()
+        
+        return jsonify(stats)
+        
+    except Exception as e:
+        current_app.logger.error(f"Health stats error: {e}")
+        return jsonify({'error': str(e)}), 500
+
 @main_bp.route('/api/status')
 def api_status():
     """API status endpoint"""
@@ -0,0 +1,194 @@
+"""
+Background AI Analysis Queue for AI Email Assistant
+"""
+import random
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from flask import Flask
+from app.models import db
+from app.models.analysis_job import AnalysisJob
+from app.models.email import Email
+
+PRUNE_INTERVAL_SECONDS = 600
+
+class AnalysisQueue:
+    """Pool of worker threads draining the table-backed analysis job queue
+    
+    Jobs live in the analysis_jobs table, so pending work survives restarts and can be
+    drained by several processes. The worker count bounds concurrent Ollama requests.
+    Idle workers delete done jobs older than ANALYSIS_JOB_RETENTION_HOURS.
+    """
+    
+    def __init__(self, app: Flask):
+        self.app = app
+        self.worker_count = app.config.get('ANALYSIS_QUEUE_WORKERS', 2)
+        self.max_attempts = app.config.get('ANALYSIS_MAX_ATTEMPTS', 4)
+        self.backoff_seconds = app.config.get('ANALYSIS_RETRY_BACKOFF_SECONDS', 30)
+        self.max_backoff_seconds = app.config.get('ANALYSIS_RETRY_MAX_BACKOFF_SECONDS', 900)
+        self.poll_seconds = app.config.get('ANALYSIS_QUEUE_POLL_SECONDS', 2)
+        self.lease_seconds = app.config.get('ANALYSIS_JOB_LEASE_SECONDS', app.config.get('OLLAMA_TIMEOUT', 120) * 5)
+        self.batch_size = max(1, app.config.get('ANALYSIS_BATCH_SIZE', 1))  # Emails per model prompt
+        self.retention = timedelta(hours=app.config.get('ANALYSIS_JOB_RETENTION_HOURS', 24))
+        
+        self._stop_event = threading.Event()
+        self._wake_event = threading.Event()
+        self._workers = []
+        self._lock = threading.Lock()
+        self._completed = deque(maxlen=1000)  # Completion timestamps for in-process throughput
+        self._counters = {'processed': 0, 'retried': 0, 'failed': 0, 'pruned': 0}
+        self._last_prune = 0.0
+    
+    def start(self):
+        """Start the worker threads"""
+        if self._workers:
+            return
+        
+        self._stop_event.clear()
+        for index in range(self.worker_count):
+            worker = threading.Thread(
+                target=self._worker_loop,
+                name=f"analysis-worker-{index}",
+                daemon=True
+            )
+            worker.start()
+            self._workers.append(worker)
+        
+        self.app.logger.info(f"Analysis queue started with {self.worker_count} workers")
+    
+    def stop(self, timeout: float = 10):
+        """Stop the worker threads after their current job"""
+        self._stop_event.set()
+        self._wake_event.set()
+        for worker in self._workers:
+            worker.join(timeout)
+        self._workers = []
+    
+    def notify(self):
+        """Wake idle workers after new jobs were enqueued"""
+        self._wake_event.set()
+    
+    def get_stats(self) -> Dict:
+        """Get in-process worker statistics"""
+        now = time.time()
+        with self._lock:
+            recent = sum(1 for completed_at in self._completed if completed_at >= now - 60)
+            counters = dict(self._counters)
+        
+        return {
+            'workers': self.worker_count,
+            'workers_alive': sum(1 for worker in self._workers if worker.is_alive()),
+            'processed_last_minute': recent,
+            **counters
+        }
+    
+    def _worker_loop(self):
+        """Claim and run jobs until stopped"""
+        # Import here to avoid circular imports
+        from app.services.email_processor import EmailProcessor
+        
+        with self.app.app_context():
+            processor = EmailProcessor()
+        
+        while not self._stop_event.is_set():
+            with self.app.app_context():
+                try:
+                    jobs = AnalysisJob.claim_batch(self.batch_size, self.lease_seconds)
+                    if jobs:
+                        self._run_jobs(processor, jobs)
+                    else:
+                        self.prune_if_due()
+                except Exception as e:
+                    self.app.logger.error(f"Analysis worker error: {e}")
+                    db.session.rollback()
+                    jobs = []
+                finally:
+                    db.session.remove()
+            
+            if not jobs:
+                self._wake_event.wait(self.poll_seconds)
+                self._wake_event.clear()
+    
+    def prune_if_due(self) -> int:
+        """Delete done jobs past the retention window, at most once per PRUNE_INTERVAL_SECONDS"""
+        with self._lock:
+            if time.time() - self._last_prune < PRUNE_INTERVAL_SECONDS:
+                return 0
+            self._last_prune = time.time()
+        return self.prune()
+    
+    def prune(self) -> int:
+        """Delete done jobs that completed longer than ANALYSIS_JOB_RETENTION_HOURS ago"""
+        pruned = AnalysisJob.prune_done(datetime.utcnow() - self.retention)
+        if pruned:
+            self.app.logger.info(f"Pruned {pruned} completed analysis jobs")
+            with self._lock:
+                self._counters['pruned'] += pruned
+        return pruned
+    
+    def _run_jobs(self, processor, jobs: List[AnalysisJob]):
+        """Run one analysis attempt for a batch of jobs and record the outcomes"""
+        emails = {email.id: email for email in Email.query.filter(Email.id.in_([job.email_id for job in jobs]))}
+        
+        runnable = []
+        for job in jobs:
+            if job.email_id in emails:
+                runnable.append(job)
+            else:
+                # Email was deleted after the job was queued
+                job.mark_done()
+        
+        # Jobs on their last attempt fall back to heuristic analysis instead of failing
+        retryable = [job for job in runnable if job.attempts < self.max_attempts]
+        final = [job for job in runnable if job.attempts >= self.max_attempts]
+        
+        for group, fallback in ((retryable, False), (final, True)):
+            if not group:
+                continue
+            try:
+                processor._analyze_emails_batch([emails[job.email_id] for job in group], fallback=fallback)
+                for job in group:
+                    job.mark_done()
+                    self._record('processed')
+            
+            except Exception as e:
+                db.session.rollback()
+                for job in group:
+                    self._record_failure(job, e)
+    
+    def _record_failure(self, job: AnalysisJob, error: Exception):
+        """Schedule a retry for a failed job, or fail it after the last attempt"""
+        if job.attempts >= self.max_attempts:
+            self.app.logger.error(f"Analysis of email {job.email_id} failed permanently: {error}")
+            job.mark_failed(str(error))
+            self._record('failed')
+        else:
+            delay = self._backoff_delay(job.attempts)
+            self.app.logger.warning(f"Analysis of email {job.email_id} failed, retrying in {delay:.0f}s: {error}")
+            job.mark_retry(str(error), delay)
+            self._record('retried')
+    
+    def _backoff_delay(self, attempts: int) -> float:
+        """Exponential backoff with jitter for a failed attempt"""
+        delay = min(self.backoff_seconds * (2 ** (attempts - 1)), self.max_backoff_seconds)
+        return delay * random.uniform(0.5, 1.0)
+    
+    def _record(self, outcome: str):
+        with self._lock:
+            self._counters[outcome] += 1
+            if outcome == 'processed':
+                self._completed.append(time.time())
+
+def init_analysis_queue(app: Flask) -> Optional[AnalysisQueue]:
+    """Attach the analysis queue to the app and start its workers when enabled"""
+    if not app.config.get('ANALYSIS_QUEUE_ENABLED', True):
+        return None
+    
+    app.analysis_queue = AnalysisQueue(app)
+    if (app.config.get('ANALYSIS_WORKERS_ENABLED', False) and app.config.get('ANALYSIS_QUEUE_WORKERS', 2) > 0
+            and not app.config.get('TESTING')):
+        app.analysis_queue.start()
+    
+    return app.analysis_queue
@@ -3,21 +3,26 @@ Chat Processing Service for AI Email Assistant
 """
 import re
 import json
-from typing import Dict, List, Optional
+import threading
+import time
+from typing import Dict, Generator, List, Optional, Tuple
 from datetime import datetime, timedelta
 from flask import current_app
 from app.models.user import User
-from app.models.email import Email, EmailThread
+from app.models.email import Email
 from app.models.chat import ChatMessage
-from app.services.ollama_engine import OllamaService
+from app.services.ollama_engine import get_ollama_service
 from app.services.email_processor import EmailProcessor
-from app import db
+from app.services.email_search import strip_highlight
+
+# Characters of each earlier answer replayed when a conversation's prompt is rebuilt
+HISTORY_RESPONSE_CHARS = 500
 
 class ChatProcessor:
     """Service for processing chat messages and generating AI responses"""
     
     def __init__(self):
-        self.ollama_service = OllamaService()
+        self.ollama_service = get_ollama_service()
         self.email_processor = EmailProcessor()
     
     def process_message(self, user_id: int, message: str, context_type: str = 'general', 
@@ -34,11 +39,13 @@ class ChatProcessor:
             # Get relevant context based on intent and user's emails
             context = self._get_relevant_context(user_id, message, intent, context_data)
             
-            # Build system prompt based on intent
-            system_prompt = self._build_system_prompt(intent, user)
+            # Continue the session's Ollama context, or start one with the system prompt
+            prompt, conversation = self._conversation_prompt(user_id, session_id, message, context)
+            system_prompt = None if conversation else self._build_system_prompt(intent, user)
             
             # Generate response
-            response = self._generate_ai_response(message, context, system_prompt)
+            response = self._generate_ai_response(prompt, system_prompt, conversation)
+            self._save_conversation(user_id, session_id, response.get('context'))
             
             # Add suggestions and related emails
             suggestions = self._generate_suggestions(intent, user_id)
@@ -56,7 +63,11 @@ class ChatProcessor:
                 },
                 'suggestions': suggestions,
                 'related_emails': [email.to_dict() for email in related_emails[:5]],
-                'response_time_ms': response.get('response_time_ms')
+                'response_time_ms': response.get('response_time_ms'),
+                'queue_ms': response.get('queue_ms'),
+                'context_reused': bool(conversation),
+                'prompt_eval_count': response.get('prompt_eval_count'),
+                'prompt_eval_ms': response.get('prompt_eval_ms')
             }
         
         except Exception as e:
@@ -66,6 +77,88 @@ class ChatProcessor:
                 'error': str(e)
             }
     
+    def stream_message(self, user_id: int, message: str, context_data: Dict = None,
+                       cancel: Optional[threading.Event] = None, session_id: str = None) -> Generator[Dict, None, None]:
+        """Process a chat message, yielding the response as Ollama generates it
+        
+        Yields a 'start' event before retrieval, a 'token' event per generated chunk,
+        then 'done' once the exchange is saved as one ChatMessage (or 'error'). With
+        context_data['email_id'] the chat is about that email, and with session_id it
+        continues that conversation. Setting cancel, or closing the generator, stops
+        the upstream generation and saves nothing.
+        """
+        started = time.time()
+        user = User.query.get(user_id)
+        if not user:
+            yield {'event': 'error', 'error': 'User not found'}
+            return
+        
+        intent = self._analyze_message_intent(message)
+        yield {'event': 'start', 'intent': intent, 'model': self.ollama_service.model}
+        
+        context = self._get_relevant_context(user_id, message, intent, context_data)
+        prompt, conversation = self._conversation_prompt(user_id, session_id, message, context)
+        stream = self.ollama_service.generate_streaming_response(
+            prompt=prompt,
+            system_prompt=None if conversation else self._build_system_prompt(intent, user),
+            conversation=conversation
+        )
+        
+        parts = []
+        first_token_ms = None
+        final = {}
+        try:
+            for chunk in stream:
+                if cancel is not None and cancel.is_set():
+                    current_app.logger.info(f"Chat stream for user {user_id} cancelled")
+                    return
+                if chunk.get('error'):
+                    yield {'event': 'error', 'error': chunk['error']}
+                    return
+                if chunk.get('done'):
+                    final = chunk
+                if chunk.get('text'):
+                    if first_token_ms is None:
+                        first_token_ms = int((time.time() - started) * 1000)
+                    parts.append(chunk['text'])
+                    yield {'event': 'token', 'text': chunk['text']}
+        finally:
+            stream.close()
+        
+        self._save_conversation(user_id, session_id, final.get('context'))
+        
+        text = ''.join(parts).strip()
+        processing_time = time.time() - started
+        email_id = (context_data or {}).get('email_id')
+        chat_message = ChatMessage.create_completed(
+            user_id=user_id,
+            message=message,
+            response=text,
+            context_type='email' if email_id else None,
+            context_id=email_id,
+            message_type='email_specific' if email_id else 'general',
+            ai_model=self.ollama_service.model,
+            processing_time=processing_time,
+            intent=intent,
+            session_id=session_id
+        )
+        
+        yield {
+            'event': 'done',
+            'message_id': chat_message.id,
+            'response': text,
+            'model_used': self.ollama_service.model,
+            'intent': intent,
+            'token_count': self.ollama_service._estimate_tokens(text),
+            'first_token_ms': first_token_ms,
+            'processing_time': round(processing_time, 3),
+            'context_reused': bool(conversation),
+            'prompt_eval_count': final.get('prompt_eval_count'),
+            'prompt_eval_ms': final.get('prompt_eval_ms'),
+            'suggestions': self._generate_suggestions(intent, user_id),
+            'related_emails': [email.to_dict() for email in self._find_related_emails(user_id, message, intent)[:5]]
+        }
+    
     def _analyze_message_intent(self, message: str) -> str:
         """Analyze the intent of the user's message"""
         message_lower = message.lower()
@@ -111,10 +204,23 @@ class ChatProcessor:
         try:
             context_parts = []
             
+            # A chat about one email always has that email in view
+            if context_data and context_data.get('email_id'):
+                email = Email.query.filter_by(id=context_data['email_id'], user_id=user_id).first()
+                if email:
+                    context_parts.append(
+                        f"Email being discussed:\nFrom: {email.sender_name} ({email.sender_email})\n"
+                        f"Subject: {email.subject}\nContent: {(email.body_text or email.body_preview or '')[:2000]}"
+                    )
+            
             # Add specific context based on intent
             if intent in ['summarize_emails', 'search_emails', 'priority_emails']:
-                # Get recent emails context
-                if hasattr(current_app, 'vector_service'):
+                retrieved = self._retrieve_emails(user_id, message)[:5]
+                if retrieved:
+                    context_parts.append(f"Relevant emails:\n{self._format_email_context(retrieved)}")
+                
+                # Vector-only context when hybrid search is not configured or found nothing
+                elif hasattr(current_app, 'vector_service'):
                     email_context = current_app.vector_service.get_user_email_context(
                         user_id=user_id,
                         query=message,
@@ -137,18 +243,11 @@ class ChatProcessor:
                         thread_context.append(f"From: {email.sender_name}\nSubject: {email.subject}\nContent: {email.body_preview[:200]}")
                     context_parts.append(f"Thread emails:\n{'---'.join(thread_context)}")
             
-            elif intent == 'suggest_reply' and context_data and context_data.get('email_id'):
-                # Get specific email context for reply
-                email_id = context_data['email_id']
-                email = Email.query.filter_by(id=email_id, user_id=user_id).first()
-                if email:
-                    context_parts.append(f"Original email to reply to:\nFrom: {email.sender_name}\nSubject: {email.subject}\nContent: {email.body_preview}")
-            
             # Add general user context
             user = User.query.get(user_id)
             if user:
                 user_context = f"User: {user.display_name} ({user.email})"
-                if user.job_title:
+                if getattr(user, 'job_title', None):
                     user_context += f", {user.job_title}"
                 context_parts.append(user_context)
             
@@ -158,6 +257,45 @@ class ChatProcessor:
             current_app.logger.error(f"Error getting relevant context: {e}")
             return ""
     
+    def _retrieve_emails(self, user_id: int, message: str, limit: int = 10) -> List[Tuple[Email, Dict]]:
+        """Find the user's emails relevant to a chat message with hybrid search
+        
+        Any query term may match, since chat messages are natural language. The prompt
+        context and related emails both call this; the second call is served from the
+        search result cache.
+        """
+        if not hasattr(current_app, 'hybrid_search'):
+            return []
+        
+        filters = {'unread': True} if 'unread' in message.lower() else None
+        search = current_app.hybrid_search.search(user_id, message, filters=filters, limit=limit, match_all=False)
+        matches = search['results'] if search else []
+        if not matches:
+            return []
+        
+        emails = {
+            email.id: email
+            for email in Email.query.filter(
+                Email.id.in_([match['id'] for match in matches]),
+                Email.user_id == user_id
+            ).all()
+        }
+        return [(emails[match['id']], match) for match in matches if match['id'] in emails]
+    
+    def _format_email_context(self, retrieved: List[Tuple[Email, Dict]]) -> str:
+        """Format retrieved emails for the prompt, preferring the matched snippet over the preview"""
+        context_parts = []
+        for email, match in retrieved:
+            excerpt = strip_highlight(match.get('snippet'))
+            received = email.received_date.strftime('%Y-%m-%d') if email.received_date else 'Unknown date'
+            context_parts.append(
+                f"Email from {email.sender_name or 'Unknown'} ({email.sender_email or ''}):\n"
+                f"Subject: {email.subject or 'No subject'}\n"
+                f"Date: {received}\n"
+                f"Preview: {(excerpt or email.body_preview or '')[:300]}"
+            )
+        return "\n\n---\n\n".join(context_parts)
+    
     def _build_system_prompt(self, intent: str, user: User) -> str:
         """Build system prompt based on message intent"""
         base_prompt = f"""You are an AI assistant helping {user.display_name} manage their emails. 
@@ -188,17 +326,50 @@ class ChatProcessor:
         
         return intent_prompts.get(intent, base_prompt)
     
-    def _generate_ai_response(self, message: str, context: str, system_prompt: str) -> Dict:
+    def _conversation_prompt(self, user_id: int, session_id: Optional[str], message: str,
+                             context: str) -> Tuple[str, Optional[List[int]]]:
+        """The prompt for a chat turn and the session's Ollama context to continue, if any
+        
+        When the session has a reusable context only this turn is sent. Otherwise the
+        session's last CHAT_HISTORY_TURNS exchanges are replayed in a compact form,
+        and the response's context is kept for the next turn.
+        """
+        prompt = self._build_user_prompt(message, context)
+        if not session_id:
+            return prompt, None
+        
+        contexts = getattr(current_app, 'conversation_contexts', None)
+        conversation = contexts.get(user_id, session_id, self.ollama_service.model) if contexts else None
+        if conversation:
+            return prompt, conversation
+        
+        history = self.get_conversation_context(
+            session_id, limit=current_app.config.get('CHAT_HISTORY_TURNS', 6), user_id=user_id
+        )
+        if history:
+            prompt = f"Conversation so far:\n{history}\n\n{prompt}"
+        return prompt, None
+    
+    def _save_conversation(self, user_id: int, session_id: Optional[str], context: Optional[List[int]]):
+        """Keep the context Ollama returned for a session's turn"""
+        contexts = getattr(current_app, 'conversation_contexts', None)
+        if session_id and contexts:
+            contexts.save(user_id, session_id, self.ollama_service.model, context)
+    
+    def _build_user_prompt(self, message: str, context: str) -> str:
+        """Build full prompt with context"""
+        if context:
+            return f"Context:\n{context}\n\nUser question: {message}"
+        return message
+    
+    def _generate_ai_response(self, prompt: str, system_prompt: Optional[str],
+                              conversation: Optional[List[int]] = None) -> Dict:
         """Generate AI response using Ollama"""
         try:
-            # Build full prompt with context
-            full_message = message
-            if context:
-                full_message = f"Context:\n{context}\n\nUser question: {message}"
-            
             response = self.ollama_service.generate_response(
-                prompt=full_message,
-                system_prompt=system_prompt
+                prompt=prompt,
+                system_prompt=system_prompt,
+                conversation=conversation
             )
             
             return response
@@ -274,6 +445,10 @@ class ChatProcessor:
             if intent in ['general_query', 'draft_email']:
                 return []
             
+            retrieved = self._retrieve_emails(user_id, message)
+            if retrieved:
+                return [email for email, _ in retrieved]
+            
             # Use vector search if available
             if hasattr(current_app, 'vector_service'):
                 search_results = current_app.vector_service.search_emails(
@@ -291,7 +466,9 @@ class ChatProcessor:
                     return emails
             
             # Fallback to basic text search
-            return Email.search_emails(user_id, message, limit=5)
+            return Email.query.filter_by(user_id=user_id).filter(
+                Email.subject.contains(message)
+            ).order_by(Email.received_date.desc()).limit(5).all()
         
         except Exception as e:
             current_app.logger.error(f"Error finding related emails: {e}")
@@ -373,17 +550,19 @@ class ChatProcessor:
             current_app.logger.error(f"Error handling email command: {e}")
             return {'success': False, 'error': str(e)}
     
-    def get_conversation_context(self, session_id: str, limit: int = 5) -> str:
-        """Get conversation context from previous messages"""
+    def get_conversation_context(self, session_id: str, limit: int = 5, user_id: int = None) -> str:
+        """Get conversation context from previous messages (answers shortened)"""
         try:
-            messages = ChatMessage.get_session_messages(session_id)
-            recent_messages = messages[-limit:] if messages else []
+            recent_messages = ChatMessage.get_session_messages(session_id, user_id=user_id, limit=limit)
             
             context_parts = []
             for msg in recent_messages:
                 if msg.message and msg.response:
+                    response = msg.response
+                    if len(response) > HISTORY_RESPONSE_CHARS:
+                        response = response[:HISTORY_RESPONSE_CHARS].rsplit(' ', 1)[0] + '...'
                     context_parts.append(f"User: {msg.message}")
-                    context_parts.append(f"Assistant: {msg.response}")
+                    context_parts.append(f"Assistant: {response}")
             
             return '\n'.join(context_parts) if context_parts else ""
         
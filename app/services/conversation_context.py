@@ -0,0 +1,73 @@
+"""
+Conversation Context Reuse for AI Email Assistant
+"""
+import threading
+from array import array
+from typing import Dict, List, Optional
+from flask import Flask
+from app.services.search_cache import LRUCache
+
+class ConversationContextManager:
+    """Ollama context tokens per chat session, so each turn only evaluates its new prompt
+    
+    /api/generate returns the conversation so far as a token array; sending it back
+    with the next prompt continues from it instead of re-evaluating the whole
+    history, and OLLAMA_KEEP_ALIVE keeps the model (and its KV cache) loaded between
+    turns. Arrays are kept per (user, session) in this process, and only reused with
+    the model that produced them. Without a usable one (new session, model switch,
+    eviction, restart, or a context past max_tokens) ChatProcessor rebuilds a compact
+    prompt from the session's last CHAT_HISTORY_TURNS exchanges instead.
+    """
+    
+    def __init__(self, app: Flask):
+        self.max_tokens = app.config.get('CHAT_CONTEXT_MAX_TOKENS', 6144)
+        self.cache = LRUCache(app.config.get('CHAT_CONTEXT_CACHE_SIZE', 512), app.config.get('CHAT_CONTEXT_TTL', 1800))
+        self._lock = threading.Lock()
+        self._stats = {'reused': 0, 'missing': 0, 'model_changed': 0, 'too_long': 0, 'saved': 0}
+    
+    def get(self, user_id: int, session_id: str, model: str) -> Optional[List[int]]:
+        """The session's context tokens if they can be continued with model, else None"""
+        entry = self.cache.get((user_id, session_id))
+        if entry is None:
+            outcome = 'missing'
+        elif entry[0] != model:
+            outcome = 'model_changed'
+        else:
+            outcome = 'reused'
+        
+        with self._lock:
+            self._stats[outcome] += 1
+        return list(entry[1]) if outcome == 'reused' else None
+    
+    def save(self, user_id: int, session_id: str, model: str, context: Optional[List[int]]):
+        """Store the context returned for a session's latest turn"""
+        if not context:
+            return
+        if len(context) > self.max_tokens:
+            # Past the model's window Ollama would truncate it anyway; start compact next turn
+            self.cache.discard((user_id, session_id))
+            with self._lock:
+                self._stats['too_long'] += 1
+            return
+        
+        # array('i') holds a token in 4 bytes rather than a 28-byte int object
+        self.cache.put((user_id, session_id), (model, array('i', context)))
+        with self._lock:
+            self._stats['saved'] += 1
+    
+    def discard(self, user_id: int, session_id: str):
+        self.cache.discard((user_id, session_id))
+    
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+        stats['cache'] = self.cache.get_stats()
+        return stats
+
+def init_conversation_contexts(app: Flask) -> Optional[ConversationContextManager]:
+    """Attach the conversation context manager to the app"""
+    if not app.config.get('CHAT_CONTEXT_REUSE', True):
+        return None
+    
+    app.conversation_contexts = ConversationContextManager(app)
+    return app.conversation_contexts
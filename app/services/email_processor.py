@@ -3,20 +3,29 @@ Email Processing Service for AI Email Assistant
 """
 from datetime import datetime, timezone
 from typing import Dict, List, Optional, Tuple
+import json
 import re
 from bs4 import BeautifulSoup
 from flask import current_app
-from app.models.email import Email, EmailThread
+from sqlalchemy import insert, update
+from app.models import db
+from app.models.analysis_job import AnalysisJob
+from app.models.email import Email
+from app.models.email_neighbor import EmailNeighbor
 from app.models.user import User
-from app.services.ms_graph import GraphService
-from app.services.ollama_engine import OllamaService
-from app import db
+from app.services.ms_graph import GraphService, DeltaTokenExpired
+from app.services.ollama_engine import get_ollama_service, TASK_OPTIONS
+from app.services.search_cache import bump_search_generation
+
+class AnalysisError(Exception):
+    """Raised when AI analysis of an email could not be completed"""
+
 
 class EmailProcessor:
     """Service for processing and analyzing emails"""
     
     def __init__(self):
-        self.ollama_service = OllamaService()
+        self.ollama_service = get_ollama_service()
     
     def sync_user_emails(self, user: User, graph_service: GraphService, access_token: str, 
                         folder: str = 'inbox', limit: int = 50, force_refresh: bool = False) -> Dict:
@@ -33,95 +42,318 @@ class EmailProcessor:
             emails_data = graph_service.get_emails(
                 access_token=access_token,
                 folder=folder,
-                limit=limit
+                limit=limit,
+                include_body=self._sync_bodies()
             )
             
             if not emails_data or 'value' not in emails_data:
                 current_app.logger.warning(f"No emails retrieved for user {user.id}")
                 return result
             
-            emails_to_embed = []  # For batch vector database operations
+            # Upsert the whole page in one transaction
+            new_emails = self._ingest_email_page(user, emails_data['value'], folder, force_refresh, result)
             
-            for email_data in emails_data['value']:
-                try:
-                    # Process individual email
-                    email, is_new = self._process_email_data(user, email_data, folder, force_refresh)
-                    
-                    if email:
-                        result['synced_count'] += 1
-                        if is_new:
-                            result['new_count'] += 1
-                            # Add to embedding queue if it's a sent item or configured for indexing
-                            if (email.is_sent_item and current_app.config.get('INDEX_SENT_ITEMS', True)) or \
-                               (not email.is_sent_item and current_app.config.get('INDEX_INBOX', True)):
-                                emails_to_embed.append((email.id, email.to_dict(include_body=True), user.id))
-                        else:
-                            result['updated_count'] += 1
-                
-                except Exception as e:
-                    current_app.logger.error(f"Error processing email {email_data.get('id', 'unknown')}: {e}")
-                    result['errors'].append(str(e))
-            
-            # Batch add to vector database
-            if emails_to_embed and hasattr(current_app, 'vector_service'):
-                try:
-                    embedded_count = current_app.vector_service.batch_add_emails(emails_to_embed)
-                    current_app.logger.info(f"Added {embedded_count} emails to vector database")
-                except Exception as e:
-                    current_app.logger.error(f"Error adding emails to vector database: {e}")
+            # Analysis and embedding run after the page is committed
+            self._process_new_emails(user, new_emails, folder)
+            bump_search_generation(user.id)
             
             # Update email threads
             self._update_email_threads(user.id)
             
+            self.prefetch_email_bodies(user, graph_service, access_token)
+            
             return result
         
         except Exception as e:
             current_app.logger.error(f"Email sync error for user {user.id}: {e}")
             return {'synced_count': 0, 'new_count': 0, 'updated_count': 0, 'errors': [str(e)]}
     
-    def _process_email_data(self, user: User, email_data: Dict, folder: str, force_refresh: bool = False) -> Tuple[Optional[Email], bool]:
-        """Process individual email data from Microsoft Graph"""
+    def sync_user_emails_delta(self, user: User, graph_service: GraphService, access_token: str,
+                               folder: str = 'inbox', page_size: int = 100) -> Dict:
+        """Incrementally sync a folder using Microsoft Graph delta queries
+        
+        The first run walks the whole folder once; later runs resume from the delta link
+        stored in User.email_sync_cursor and only receive added, changed and removed
+        messages, which are applied as upserts and deletes.
+        """
+        result = {
+            'synced_count': 0,
+            'new_count': 0,
+            'updated_count': 0,
+            'deleted_count': 0,
+            'errors': [],
+            'mode': 'delta'
+        }
+        
+        delta_link = user.get_sync_cursor(folder)
+        if not delta_link:
+            result['mode'] = 'delta_initial'
+        
         try:
+            try:
+                self._apply_delta_pages(user, graph_service, access_token, folder, delta_link,
+                                        page_size, result)
+            except DeltaTokenExpired:
+                # Graph dropped the sync state; start a new round from scratch
+                current_app.logger.warning(f"Delta link expired for user {user.id} folder {folder}, resyncing")
+                user.set_sync_cursor(folder, None)
+                result['mode'] = 'delta_reset'
+                self._apply_delta_pages(user, graph_service, access_token, folder, None,
+                                        page_size, result)
+            
+            self._update_email_threads(user.id)
+            user.update_sync_info()
+            
+            self.prefetch_email_bodies(user, graph_service, access_token)
+            
+            return result
+        
+        except Exception as e:
+            current_app.logger.error(f"Delta email sync error for user {user.id}: {e}")
+            db.session.rollback()
+            result['errors'].append(str(e))
+            return result
+    
+    def _apply_delta_pages(self, user: User, graph_service: GraphService, access_token: str, folder: str,
+                           delta_link: Optional[str], page_size: int, result: Dict):
+        """Apply every page of a delta round, persisting the cursor after each page"""
+        for page in graph_service.iter_email_delta_pages(access_token, folder, delta_link, page_size,
+                                                         include_body=self._sync_bodies()):
+            new_emails = self._ingest_email_page(user, page.get('value', []), folder, True, result)
+            
+            # A nextLink lets an interrupted round resume; the final deltaLink starts the next one
+            cursor = page.get('@odata.deltaLink') or page.get('@odata.nextLink')
+            if cursor:
+                user.set_sync_cursor(folder, cursor)
+            
+            self._process_new_emails(user, new_emails, folder)
+            
+            # Searches see the page once it is both stored and embedded
+            bump_search_generation(user.id)
+    
+    def _ingest_email_page(self, user: User, messages: List[Dict], folder: str, force_refresh: bool,
+                           result: Dict) -> List[Email]:
+        """Apply one page of Graph messages as bulk upserts/deletes in a single transaction
+        
+        The user's existing rows are resolved with one IN query, new rows are bulk
+        inserted and changed rows bulk updated by primary key. Returns the newly
+        inserted emails.
+        """
+        removed_ids = []
+        parsed = {}
+        stale_neighbors = []
+        
+        for email_data in messages:
             message_id = email_data.get('id')
             if not message_id:
-                return None, False
-            
-            # Check if email already exists
-            existing_email = Email.find_by_message_id(message_id)
-            is_new = existing_email is None
-            
-            if existing_email and not force_refresh:
-                return existing_email, False
-            
-            # Parse email data
-            email_info = self._parse_email_data(email_data, folder)
-            
-            if is_new:
-                # Create new email
-                email = Email(
-                    message_id=message_id,
-                    user_id=user.id,
-                    **email_info
-                )
-                db.session.add(email)
-            else:
-                # Update existing email
-                for key, value in email_info.items():
-                    setattr(existing_email, key, value)
-                email = existing_email
+                continue
+            if '@removed' in email_data:
+                removed_ids.append(message_id)
+                continue
+            try:
+                parsed[message_id] = self._parse_email_data(email_data, folder)
+            except Exception as e:
+                current_app.logger.error(f"Error parsing email {message_id}: {e}")
+                result['errors'].append(str(e))
+        
+        try:
+            existing = self._find_existing_emails(user.id, list(parsed) + removed_ids)
+            
+            inserts = [
+                dict(email_info, graph_id=message_id, user_id=user.id)
+                for message_id, email_info in parsed.items() if message_id not in existing
+            ]
+            updates = [
+                dict(email_info, id=existing[message_id])
+                for message_id, email_info in parsed.items()
+                if message_id in existing and force_refresh
+            ]
+            deleted = [existing[message_id] for message_id in removed_ids if message_id in existing]
+            
+            if inserts:
+                self._bulk_insert_emails(inserts)
+                if self._analysis_queue_enabled():
+                    AnalysisJob.enqueue_for_graph_ids(user.id, [row['graph_id'] for row in inserts])
+            if updates:
+                now = datetime.utcnow()
+                db.session.execute(update(Email), [dict(u, updated_at=now) for u in updates])
+            if deleted:
+                Email.query.filter(Email.id.in_(deleted)).delete(synchronize_session=False)
+                stale_neighbors = EmailNeighbor.delete_for_emails(deleted)
             
             db.session.commit()
-            
-            # Generate AI analysis for new emails
-            if is_new:
+        
+        except Exception as e:
+            current_app.logger.error(f"Error ingesting email page for user {user.id}: {e}")
+            db.session.rollback()
+            result['errors'].append(str(e))
+            return []
+        
+        result['synced_count'] += len(parsed)
+        result['new_count'] += len(inserts)
+        result['updated_count'] += len(updates)
+        if 'deleted_count' in result:
+            result['deleted_count'] += len(deleted)
+        
+        if deleted and hasattr(current_app, 'vector_service'):
+            for email_id in deleted:
+                current_app.vector_service.delete_email(email_id, user.id)
+        if stale_neighbors:
+            self._index_similar_emails(user.id, stale_ids=stale_neighbors)
+        
+        if not inserts:
+            return []
+        new_graph_ids = [row['graph_id'] for row in inserts]
+        new_emails = []
+        for start in range(0, len(new_graph_ids), 500):
+            chunk = new_graph_ids[start:start + 500]
+            new_emails.extend(Email.query.filter(Email.user_id == user.id, Email.graph_id.in_(chunk)).all())
+        return new_emails
+    
+    def _find_existing_emails(self, user_id: int, graph_ids: List[str]) -> Dict[str, int]:
+        """Map the user's Graph IDs that are already stored to email ids"""
+        existing = {}
+        # Chunked to stay under SQLite's bound-parameter limit
+        for start in range(0, len(graph_ids), 500):
+            chunk = graph_ids[start:start + 500]
+            rows = db.session.query(Email.graph_id, Email.id).filter(
+                Email.user_id == user_id, Email.graph_id.in_(chunk)
+            ).all()
+            existing.update(dict(rows))
+        return existing
+    
+    def _bulk_insert_emails(self, rows: List[Dict]):
+        """Bulk insert email rows, skipping Graph IDs inserted concurrently"""
+        dialect = db.engine.dialect.name
+        
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        elif dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            db.session.execute(insert(Email), rows)
+            return
+        
+        db.session.execute(
+            dialect_insert(Email).on_conflict_do_nothing(index_elements=['user_id', 'graph_id']),
+            rows
+        )
+    
+    def _process_new_emails(self, user: User, new_emails: List[Email], folder: str):
+        """Run AI analysis and embedding for emails committed by an ingest page"""
+        if not new_emails:
+            return
+        
+        if self._analysis_queue_enabled():
+            # Jobs were queued with the page; wake the workers
+            if hasattr(current_app, 'analysis_queue'):
+                current_app.analysis_queue.notify()
+        else:
+            for email in new_emails:
                 self._analyze_email_with_ai(email)
-            
-            return email, is_new
+        
+        # Add to vector database if the folder is configured for indexing
+        if self._should_index_folder(folder):
+            self._embed_emails([(email.id, email.to_dict(include_body=True), user.id) for email in new_emails])
+            self._index_similar_emails(user.id, new_ids=[email.id for email in new_emails])
+    
+    def _sync_bodies(self) -> bool:
+        """Check whether list syncs download full bodies or only headers and bodyPreview"""
+        return current_app.config.get('EMAIL_SYNC_BODIES', False)
+    
+    def hydrate_email_bodies(self, graph_service: GraphService, access_token: str,
+                             emails: List[Email]) -> int:
+        """Download full bodies for emails synced headers-only, using $batch requests
+        
+        Hydrated emails in indexed folders are re-embedded from the full body.
+        """
+        pending = [email for email in emails if not email.has_full_body and email.graph_id]
+        if not pending:
+            return 0
+        
+        messages = graph_service.get_emails_by_ids(
+            access_token, [email.graph_id for email in pending], select='body'
+        )
+        
+        now = datetime.utcnow()
+        hydrated = []
+        for email in pending:
+            message = messages.get(email.graph_id)
+            if not message:
+                continue
+            email.body_html, email.body_text = self._parse_body(message.get('body'))
+            email.body_fetched_at = now
+            hydrated.append(email)
+        
+        # Full bodies add searchable text
+        if hydrated:
+            for user_id in {email.user_id for email in hydrated}:
+                bump_search_generation(user_id, commit=False)
+        db.session.commit()
+        
+        # ...and are embedded in place of the preview; neighbor lists follow the new vectors
+        by_user = {}
+        for email in hydrated:
+            if self._should_index_folder(email.folder_name or 'inbox'):
+                by_user.setdefault(email.user_id, []).append(email)
+        for user_id, emails in by_user.items():
+            self._embed_emails([(email.id, email.to_dict(include_body=True), user_id) for email in emails])
+            self._index_similar_emails(user_id, new_ids=[email.id for email in emails])
+        
+        return len(hydrated)
+    
+    def prefetch_email_bodies(self, user: User, graph_service: GraphService, access_token: str) -> int:
+        """Hydrate bodies for the newest unread emails so they open without a Graph round trip"""
+        limit = current_app.config.get('EMAIL_BODY_PREFETCH_COUNT', 20)
+        if self._sync_bodies() or limit <= 0:
+            return 0
+        
+        try:
+            emails = Email.query.filter_by(user_id=user.id, is_read=False).filter(
+                Email.body_fetched_at.is_(None)
+            ).order_by(Email.received_date.desc()).limit(limit).all()
+            return self.hydrate_email_bodies(graph_service, access_token, emails)
         
         except Exception as e:
-            current_app.logger.error(f"Error processing email data: {e}")
+            current_app.logger.error(f"Body prefetch error for user {user.id}: {e}")
+            db.session.rollback()
+            return 0
+    
+    def _analysis_queue_enabled(self) -> bool:
+        """Check whether AI analysis is handed to the background queue"""
+        return current_app.config.get('ANALYSIS_QUEUE_ENABLED', True)
+    
+    def _should_index_folder(self, folder: str) -> bool:
+        """Check whether emails from a folder should be added to the vector database"""
+        if self._is_sent_folder(folder):
+            return current_app.config.get('INDEX_SENT_ITEMS', True)
+        return current_app.config.get('INDEX_INBOX', True)
+    
+    def _is_sent_folder(self, folder: str) -> bool:
+        """Check whether a folder name refers to sent items"""
+        return folder.lower() in ['sent', 'sentitems', 'sent items']
+    
+    def _embed_emails(self, emails_to_embed: List):
+        """Batch add synced emails to the vector database"""
+        if emails_to_embed and hasattr(current_app, 'vector_service'):
+            try:
+                embedded_count = current_app.vector_service.batch_add_emails(emails_to_embed)
+                current_app.logger.info(f"Added {embedded_count} emails to vector database")
+            except Exception as e:
+                current_app.logger.error(f"Error adding emails to vector database: {e}")
+    
+    def _index_similar_emails(self, user_id: int, new_ids: List[int] = (), stale_ids: List[int] = ()):
+        """Update precomputed similar-email lists for new emails and lists that lost an entry"""
+        if not hasattr(current_app, 'similar_emails'):
+            return
+        try:
+            if new_ids:
+                current_app.similar_emails.add_emails(user_id, new_ids)
+            if stale_ids:
+                current_app.similar_emails.refresh_emails(user_id, stale_ids)
+        except Exception as e:
+            current_app.logger.error(f"Error updating similar emails for user {user_id}: {e}")
             db.session.rollback()
-            return None, False
     
     def _parse_email_data(self, email_data: Dict, folder: str) -> Dict:
         """Parse email data from Microsoft Graph API response"""
@@ -134,57 +366,48 @@ class EmailProcessor:
         def parse_recipients(recipients_data):
             if not recipients_data:
                 return []
-            return [{
-                'emailAddress': {
-                    'address': r.get('emailAddress', {}).get('address', ''),
-                    'name': r.get('emailAddress', {}).get('name', '')
-                }
-            } for r in recipients_data]
-        
-        to_recipients = parse_recipients(email_data.get('toRecipients', []))
-        cc_recipients = parse_recipients(email_data.get('ccRecipients', []))
-        bcc_recipients = parse_recipients(email_data.get('bccRecipients', []))
+            return [r.get('emailAddress', {}).get('address', '') for r in recipients_data]
         
         # Parse dates
         received_date = self._parse_date(email_data.get('receivedDateTime'))
         sent_date = self._parse_date(email_data.get('sentDateTime'))
         
-        # Parse body content
-        body = email_data.get('body', {})
-        body_content = body.get('content', '')
-        body_content_type = body.get('contentType', 'html').lower()
-        
-        # Clean body content if HTML
-        if body_content_type == 'html':
-            body_preview = self._extract_text_from_html(body_content)[:500]
-        else:
-            body_preview = body_content[:500]
-        
-        # Determine if this is a sent item
-        is_sent_item = folder.lower() in ['sent', 'sentitems', 'sent items']
-        
-        return {
-            'conversation_id': email_data.get('conversationId', ''),
+        email_info = {
+            'conversation_id': email_data.get('conversationId'),
+            'folder_name': folder,
             'subject': email_data.get('subject', ''),
             'sender_email': sender_email,
             'sender_name': sender_name,
-            'to_recipients': to_recipients,
-            'cc_recipients': cc_recipients,
-            'bcc_recipients': bcc_recipients,
-            'body_preview': body_preview,
-            'body_content': body_content,
-            'body_content_type': body_content_type,
+            'recipient_emails': parse_recipients(email_data.get('toRecipients', [])),
+            'cc_emails': parse_recipients(email_data.get('ccRecipients', [])),
+            'bcc_emails': parse_recipients(email_data.get('bccRecipients', [])),
+            'body_preview': email_data.get('bodyPreview') or '',
             'received_date': received_date,
             'sent_date': sent_date,
-            'importance': email_data.get('importance', 'normal').lower(),
+            'importance': (email_data.get('importance') or 'normal').lower(),
             'is_read': email_data.get('isRead', False),
             'is_draft': email_data.get('isDraft', False),
-            'is_sent_item': is_sent_item,
-            'has_attachments': email_data.get('hasAttachments', False),
-            'categories': email_data.get('categories', []),
-            'folder_id': email_data.get('parentFolderId', ''),
-            'folder_name': folder
+            'has_attachments': email_data.get('hasAttachments', False)
         }
+        
+        # Header-only syncs leave any previously downloaded body untouched
+        if 'body' in email_data:
+            email_info['body_html'], email_info['body_text'] = self._parse_body(email_data['body'])
+            email_info['body_fetched_at'] = datetime.utcnow()
+            if not email_info['body_preview']:
+                email_info['body_preview'] = email_info['body_text'][:500]
+        
+        return email_info
+    
+    def _parse_body(self, body: Optional[Dict]) -> Tuple[Optional[str], str]:
+        """Split a Graph body resource into (body_html, body_text)"""
+        body = body or {}
+        body_content = body.get('content', '')
+        
+        # Clean body content if HTML
+        if body.get('contentType', 'html').lower() == 'html':
+            return body_content, self._extract_text_from_html(body_content)
+        return None, body_content
     
     def _parse_date(self, date_string: Optional[str]) -> Optional[datetime]:
         """Parse date string from Microsoft Graph API"""
@@ -192,11 +415,14 @@ class EmailProcessor:
             return None
         
         try:
-            # Parse ISO 8601 format
+            # Parse ISO 8601 format, stored as naive UTC like the rest of the models
             if date_string.endswith('Z'):
-                return datetime.fromisoformat(date_string[:-1]).replace(tzinfo=timezone.utc)
+                return datetime.fromisoformat(date_string[:-1])
             else:
-                return datetime.fromisoformat(date_string)
+                parsed = datetime.fromisoformat(date_string)
+                if parsed.tzinfo:
+                    parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+                return parsed
         except ValueError:
             current_app.logger.warning(f"Could not parse date: {date_string}")
             return None
@@ -227,16 +453,15 @@ class EmailProcessor:
             current_app.logger.error(f"Error extracting text from HTML: {e}")
             return html_content[:1000]  # Fallback to raw content
     
-    def _analyze_email_with_ai(self, email: Email):
-        """Analyze email with AI to generate tags, summary, and sentiment"""
+    def _analyze_email_with_ai(self, email: Email, fallback: bool = True, priority: str = 'near_real_time'):
+        """Analyze email with AI to generate tags, summary, and sentiment
+        
+        With fallback=False an unavailable or overloaded model raises AnalysisError
+        instead of falling back to basic analysis, so the analysis queue can retry later.
+        """
         try:
             # Create analysis prompt
-            email_text = f"""
-            Subject: {email.subject}
-            From: {email.sender_name} ({email.sender_email})
-            Date: {email.received_date}
-            Content: {email.body_preview}
-            """
+            email_text = self._format_email_for_analysis(email)
             
             system_prompt = """You are an AI assistant that analyzes emails. For each email, provide:
             1. A brief summary (1-2 sentences)
@@ -249,32 +474,127 @@ class EmailProcessor:
             # Get AI analysis
             response = self.ollama_service.generate_response(
                 prompt=f"Analyze this email:\n\n{email_text}",
-                system_prompt=system_prompt
+                system_prompt=system_prompt,
+                options=TASK_OPTIONS,
+                priority=priority
             )
             
+            if response.get('error'):
+                raise AnalysisError(f"Ollama request failed: {response['error']}")
+            
             if response and 'text' in response:
                 try:
                     # Try to parse JSON response
-                    import json
                     analysis = json.loads(response['text'])
                     
                     # Update email with AI analysis
-                    email.update_ai_analysis(
-                        summary=analysis.get('summary'),
-                        tags=analysis.get('tags', []),
-                        sentiment=analysis.get('sentiment'),
-                        priority_score=analysis.get('priority_score')
-                    )
+                    self._apply_ai_analysis(email, analysis)
                     
                 except json.JSONDecodeError:
                     # Fallback to basic analysis
                     self._basic_email_analysis(email, response['text'])
         
         except Exception as e:
+            if not fallback:
+                raise
             current_app.logger.error(f"Error analyzing email with AI: {e}")
             # Fallback to basic analysis
             self._basic_email_analysis(email)
     
+    def _analyze_emails_batch(self, emails: List[Email], fallback: bool = True, priority: str = 'batch'):
+        """Analyze several emails with one prompt
+        
+        The shared instructions are sent once for the whole batch and the model answers
+        with a JSON array. If the output is malformed the batch is split in half and each
+        half retried, down to the single-email path.
+        """
+        if not emails:
+            return
+        if len(emails) == 1:
+            self._analyze_email_with_ai(emails[0], fallback=fallback, priority=priority)
+            return
+        
+        email_blocks = []
+        for index, email in enumerate(emails, start=1):
+            email_blocks.append(f"[Email {index}]\n{self._format_email_for_analysis(email)}")
+        
+        system_prompt = f"""You are an AI assistant that analyzes emails. You will receive {len(emails)} emails, each starting with a numbered marker such as [Email N]. For each email, provide:
+            1. A brief summary (1-2 sentences)
+            2. 3-5 relevant tags/keywords
+            3. Sentiment (positive, negative, or neutral)
+            4. Priority score (1-10, where 10 is most urgent)
+            
+            Respond with only a JSON array containing one object per email, in order, with keys: index, summary, tags, sentiment, priority_score"""
+        
+        response = self.ollama_service.generate_response(
+            prompt="Analyze these emails:\n\n" + "\n\n".join(email_blocks),
+            system_prompt=system_prompt,
+            options=TASK_OPTIONS,
+            priority=priority
+        )
+        
+        if response.get('error'):
+            if not fallback:
+                raise AnalysisError(f"Ollama request failed: {response['error']}")
+            current_app.logger.error(f"Batch analysis failed: {response['error']}")
+            for email in emails:
+                self._basic_email_analysis(email)
+            return
+        
+        analyses = self._parse_batch_analysis(response.get('text', ''), len(emails))
+        
+        if analyses is None:
+            current_app.logger.warning(f"Malformed batch analysis for {len(emails)} emails, splitting batch")
+            middle = len(emails) // 2
+            self._analyze_emails_batch(emails[:middle], fallback=fallback, priority=priority)
+            self._analyze_emails_batch(emails[middle:], fallback=fallback, priority=priority)
+            return
+        
+        for email, analysis in zip(emails, analyses):
+            self._apply_ai_analysis(email, analysis)
+    
+    def _parse_batch_analysis(self, text: str, expected_count: int) -> Optional[List[Dict]]:
+        """Parse a batch analysis JSON array, or return None if it is unusable"""
+        # Models often wrap the array in prose or code fences
+        start, end = text.find('['), text.rfind(']')
+        if start == -1 or end <= start:
+            return None
+        
+        try:
+            items = json.loads(text[start:end + 1])
+        except json.JSONDecodeError:
+            return None
+        
+        if not isinstance(items, list) or len(items) != expected_count:
+            return None
+        if not all(isinstance(item, dict) for item in items):
+            return None
+        
+        # Honour explicit indexes when the model reorders its answers
+        indexes = [item.get('index') for item in items]
+        if sorted(i for i in indexes if isinstance(i, int)) == list(range(1, expected_count + 1)):
+            items = sorted(items, key=lambda item: item['index'])
+        
+        return items
+    
+    def _format_email_for_analysis(self, email: Email) -> str:
+        """Format the email fields sent to the model for analysis"""
+        return (
+            f"Subject: {email.subject}\n"
+            f"From: {email.sender_name} ({email.sender_email})\n"
+            f"Date: {email.received_date}\n"
+            f"Content: {email.body_preview}"
+        )
+    
+    def _apply_ai_analysis(self, email: Email, analysis: Dict):
+        """Store a parsed model analysis on an email"""
+        email.update_ai_analysis(
+            summary=analysis.get('summary'),
+            tags=analysis.get('tags', []),
+            sentiment=analysis.get('sentiment'),
+            priority_score=analysis.get('priority_score')
+        )
+    
     def _basic_email_analysis(self, email: Email, ai_response: str = None):
         """Basic email analysis without AI parsing"""
         try:
@@ -324,40 +644,16 @@ class EmailProcessor:
     def _update_email_threads(self, user_id: int):
         """Update email threads for a user"""
         try:
-            # Get all emails without thread assignment
-            unthreaded_emails = Email.query.filter_by(
+            # Emails are threaded by their Graph conversation
+            Email.query.filter_by(
                 user_id=user_id,
                 thread_id=None
-            ).filter(Email.conversation_id.isnot(None)).all()
-            
-            for email in unthreaded_emails:
-                if not email.conversation_id:
-                    continue
-                
-                # Find or create thread
-                thread = EmailThread.find_by_conversation_id(email.conversation_id)
-                
-                if not thread:
-                    # Create new thread
-                    thread = EmailThread(
-                        conversation_id=email.conversation_id,
-                        subject=email.subject
-                    )
-                    db.session.add(thread)
-                    db.session.flush()  # Get thread ID
-                
-                # Assign email to thread
-                email.thread_id = thread.id
+            ).filter(Email.conversation_id.isnot(None)).update(
+                {Email.thread_id: Email.conversation_id},
+                synchronize_session=False
+            )
             
             db.session.commit()
-            
-            # Update thread statistics
-            threads_to_update = EmailThread.query.join(Email).filter(
-                Email.user_id == user_id
-            ).distinct().all()
-            
-            for thread in threads_to_update:
-                thread.update_thread_stats()
         
         except Exception as e:
             current_app.logger.error(f"Error updating email threads: {e}")
@@ -381,7 +677,8 @@ class EmailProcessor:
             
             response = self.ollama_service.generate_response(
                 prompt=prompt,
-                system_prompt=system_prompt
+                system_prompt=system_prompt,
+                options=TASK_OPTIONS
             )
             
             if response and 'text' in response:
@@ -414,7 +711,8 @@ class EmailProcessor:
             
             response = self.ollama_service.generate_response(
                 prompt=prompt,
-                system_prompt=system_prompt
+                system_prompt=system_prompt,
+                options=TASK_OPTIONS
             )
             
             if response and 'text' in response:
@@ -0,0 +1,312 @@
+"""
+Full-Text Email Search for AI Email Assistant
+"""
+import html
+import re
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from flask import Flask
+from sqlalchemy import bindparam, text
+from app.models import db
+
+# Columns indexed for search, in FTS5 column order
+SEARCH_COLUMNS = ('subject', 'sender_name', 'sender_email', 'body_text', 'body_preview')
+
+# The owner is indexed as a token too, so FTS5 intersects posting lists per user
+# instead of ranking every tenant's matches and discarding most of them
+FTS_COLUMNS = SEARCH_COLUMNS + ('user_id',)
+
+# BM25 column weights: subject matches count most, then the sender, then the body
+SQLITE_BM25_WEIGHTS = (10.0, 4.0, 4.0, 1.0, 1.0, 0.0)
+
+HIGHLIGHT_START = '<mark>'
+HIGHLIGHT_END = '</mark>'
+
+# Private-use characters the database wraps matched terms in. The email text around
+# them is HTML-escaped before they become HIGHLIGHT_START/END, so subjects and bodies
+# cannot inject markup into the results page.
+MATCH_START = '\ue000'
+MATCH_END = '\ue001'
+
+_TERM_PATTERN = re.compile(r'"([^"]*)"|(\S+)')
+_WORD_PATTERN = re.compile(r'\w', re.UNICODE)
+
+SQLITE_INDEX_SQL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS emails_fts USING fts5("
+    f"{', '.join(FTS_COLUMNS)}, content='emails', content_rowid='id', "
+    f"tokenize='porter unicode61 remove_diacritics 1', prefix='2 3')",
+    
+    f"CREATE TRIGGER IF NOT EXISTS emails_fts_insert AFTER INSERT ON emails BEGIN "
+    f"INSERT INTO emails_fts(rowid, {', '.join(FTS_COLUMNS)}) "
+    f"VALUES (new.id, {', '.join('new.' + c for c in FTS_COLUMNS)}); END",
+    
+    f"CREATE TRIGGER IF NOT EXISTS emails_fts_delete AFTER DELETE ON emails BEGIN "
+    f"INSERT INTO emails_fts(emails_fts, rowid, {', '.join(FTS_COLUMNS)}) "
+    f"VALUES ('delete', old.id, {', '.join('old.' + c for c in FTS_COLUMNS)}); END",
+    
+    # Only content changes touch the index; read-state and AI updates do not
+    f"CREATE TRIGGER IF NOT EXISTS emails_fts_update AFTER UPDATE OF {', '.join(FTS_COLUMNS)} ON emails BEGIN "
+    f"INSERT INTO emails_fts(emails_fts, rowid, {', '.join(FTS_COLUMNS)}) "
+    f"VALUES ('delete', old.id, {', '.join('old.' + c for c in FTS_COLUMNS)}); "
+    f"INSERT INTO emails_fts(rowid, {', '.join(FTS_COLUMNS)}) "
+    f"VALUES (new.id, {', '.join('new.' + c for c in FTS_COLUMNS)}); END",
+]
+
+POSTGRES_INDEX_SQL = [
+    "ALTER TABLE emails ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('english', coalesce(subject, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(sender_name, '') || ' ' || coalesce(sender_email, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(body_text, '')), 'C') || "
+    "setweight(to_tsvector('english', coalesce(body_preview, '')), 'D')) STORED",
+    
+    "CREATE INDEX IF NOT EXISTS ix_emails_search_vector ON emails USING GIN (search_vector)",
+]
+
+def parse_search_query(query: str) -> List[Tuple[str, str]]:
+    """Split a user query into ('phrase', text) and ('prefix', word) terms
+    
+    "quoted text" is matched as a phrase, a trailing * (e.g. invoi*) as a prefix and
+    anything else as a single term. All terms must match.
+    """
+    terms = []
+    for match in _TERM_PATTERN.finditer(query):
+        phrase, word = match.group(1), match.group(2)
+        if phrase is not None:
+            if _WORD_PATTERN.search(phrase):
+                terms.append(('phrase', phrase))
+        elif word.endswith('*') and re.fullmatch(r'\w+', word[:-1] or '-'):
+            terms.append(('prefix', word[:-1]))
+        elif _WORD_PATTERN.search(word):
+            terms.append(('phrase', word))
+    return terms
+
+def to_fts5_query(terms: List[Tuple[str, str]], user_id: Optional[int] = None, match_all: bool = True) -> str:
+    """Build an FTS5 MATCH expression, quoting every term so user input is never parsed as syntax"""
+    parts = []
+    for kind, value in terms:
+        quoted = '"' + value.replace('"', '""') + '"'
+        parts.append(quoted + '*' if kind == 'prefix' else quoted)
+    
+    match = ' '.join(parts) if match_all else ' OR '.join(parts)
+    if user_id is not None:
+        match = f'user_id : "{int(user_id)}" AND ({match})'
+    return match
+
+def build_filter_clause(filters: Optional[Dict], alias: str = 'e') -> Tuple[str, Dict]:
+    """Translate structured filters into SQL conditions, each prefixed with AND
+    
+    Supported keys: sender (part of the sender address or name), date_from and
+    date_to (inclusive received_date bounds), folder and unread.
+    """
+    filters = filters or {}
+    conditions = []
+    params = {}
+    
+    if filters.get('sender'):
+        conditions.append(f"(lower({alias}.sender_email) LIKE :f_sender OR lower({alias}.sender_name) LIKE :f_sender)")
+        params['f_sender'] = f"%{filters['sender'].lower()}%"
+    if filters.get('date_from'):
+        conditions.append(f"{alias}.received_date >= :f_date_from")
+        params['f_date_from'] = filters['date_from']
+    if filters.get('date_to'):
+        conditions.append(f"{alias}.received_date <= :f_date_to")
+        params['f_date_to'] = filters['date_to']
+    if filters.get('folder'):
+        conditions.append(f"lower({alias}.folder_name) = :f_folder")
+        params['f_folder'] = filters['folder'].lower()
+    if filters.get('unread') is not None:
+        conditions.append(f"{alias}.is_read = :f_is_read")
+        params['f_is_read'] = not filters['unread']
+    
+    return ''.join(f" AND {condition}" for condition in conditions), params
+
+def filter_email_ids(user_id: int, filters: Optional[Dict], candidate_ids: Optional[List[int]] = None,
+                     limit: Optional[int] = None) -> List[int]:
+    """IDs of a user's emails matching the filters, optionally restricted to candidates"""
+    filter_sql, params = build_filter_clause(filters)
+    params['user_id'] = user_id
+    
+    statement = f"SELECT e.id FROM emails e WHERE e.user_id = :user_id{filter_sql}"
+    if candidate_ids is not None:
+        if not candidate_ids:
+            return []
+        statement += f" AND e.id IN ({', '.join(str(int(i)) for i in candidate_ids)})"
+    if limit is not None:
+        statement += " LIMIT :limit"
+        params['limit'] = limit
+    
+    return [row.id for row in _execute(statement, params)]
+
+def _execute(statement: str, params: Dict):
+    """Run raw SQL, binding datetimes with the column type so they compare like stored values"""
+    clause = text(statement)
+    typed = [bindparam(key, type_=db.DateTime) for key, value in params.items() if isinstance(value, datetime)]
+    if typed:
+        clause = clause.bindparams(*typed)
+    return db.session.execute(clause, params)
+
+def render_highlight(value: Optional[str]) -> Optional[str]:
+    """HTML-escape a highlight()/snippet()/ts_headline() result and mark its matches with HIGHLIGHT_START/END"""
+    if value is None:
+        return None
+    return html.escape(value).replace(MATCH_START, HIGHLIGHT_START).replace(MATCH_END, HIGHLIGHT_END)
+
+def strip_highlight(value: Optional[str]) -> str:
+    """Plain text of a rendered highlight, for prompts and other non-HTML uses"""
+    return html.unescape((value or '').replace(HIGHLIGHT_START, '').replace(HIGHLIGHT_END, ''))
+
+class EmailSearchService:
+    """BM25-ranked full-text search over a user's emails
+    
+    Uses an external-content FTS5 table on SQLite and a generated, GIN-indexed
+    tsvector column on PostgreSQL. Both are maintained by the database itself on
+    every insert/update/delete, so every ingest path keeps the index current.
+    """
+    
+    def __init__(self, app: Flask):
+        self.app = app
+        self.snippet_words = app.config.get('SEARCH_SNIPPET_WORDS', 16)
+        self.dialect = None
+        self.available = False
+    
+    def ensure_index(self, rebuild: bool = False) -> bool:
+        """Create the search index if missing (and populate it from existing emails)"""
+        try:
+            self.dialect = db.engine.dialect.name
+            
+            if self.dialect == 'sqlite':
+                exists = db.session.execute(text(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'emails_fts'"
+                )).first() is not None
+                for statement in SQLITE_INDEX_SQL:
+                    db.session.execute(text(statement))
+                if rebuild or not exists:
+                    db.session.execute(text("INSERT INTO emails_fts(emails_fts) VALUES ('rebuild')"))
+            
+            elif self.dialect == 'postgresql':
+                # The generated column is computed for existing rows when it is added
+                for statement in POSTGRES_INDEX_SQL:
+                    db.session.execute(text(statement))
+            
+            else:
+                self.app.logger.warning(f"Full-text search not supported on {self.dialect}")
+                return False
+            
+            db.session.commit()
+            self.available = True
+        
+        except Exception as e:
+            db.session.rollback()
+            self.app.logger.warning(f"Full-text search index unavailable: {e}")
+            self.available = False
+        
+        return self.available
+    
+    def search(self, user_id: int, query: str, limit: int = 20, offset: int = 0,
+               filters: Optional[Dict] = None, match_all: bool = True) -> Optional[List[Dict]]:
+        """Search a user's emails, best match first
+        
+        Structured filters (see build_filter_clause) are applied before ranking. With
+        match_all=False any term may match, which suits natural-language questions.
+        Returns [{'id', 'rank', 'subject_highlight', 'snippet'}], or None when the
+        index is unavailable or the query has no searchable terms.
+        """
+        terms = parse_search_query(query)
+        if not self.available or not terms:
+            return None
+        
+        if self.dialect == 'sqlite':
+            return self._search_sqlite(user_id, terms, limit, offset, filters, match_all)
+        return self._search_postgres(user_id, terms, limit, offset, filters, match_all)
+    
+    def _search_sqlite(self, user_id: int, terms: List[Tuple[str, str]], limit: int, offset: int,
+                       filters: Optional[Dict], match_all: bool) -> List[Dict]:
+        match = to_fts5_query(terms, match_all=match_all)
+        weights = ', '.join(str(w) for w in SQLITE_BM25_WEIGHTS)
+        filter_sql, params = build_filter_clause(filters)
+        params.update({'match': to_fts5_query(terms, user_id, match_all), 'limit': limit, 'offset': offset})
+        
+        # The owner is matched inside FTS5; other filters need the email row
+        join = "JOIN emails e ON e.id = emails_fts.rowid " if filter_sql else ""
+        ranked = _execute(
+            f"SELECT emails_fts.rowid AS id, bm25(emails_fts, {weights}) AS rank "
+            f"FROM emails_fts {join}WHERE emails_fts MATCH :match{filter_sql} "
+            f"ORDER BY rank LIMIT :limit OFFSET :offset",
+            params
+        ).all()
+        if not ranked:
+            return []
+        
+        # Highlights are built only for the page of results, not every match
+        ids = [row.id for row in ranked]
+        highlights = {
+            row.id: row for row in db.session.execute(text(
+                f"SELECT rowid AS id, highlight(emails_fts, 0, :start, :end) AS subject_highlight, "
+                f"snippet(emails_fts, -1, :start, :end, '…', :words) AS snippet "
+                f"FROM emails_fts WHERE emails_fts MATCH :match "
+                f"AND rowid IN ({', '.join(str(int(i)) for i in ids)})"
+            ), {'match': match, 'start': MATCH_START, 'end': MATCH_END, 'words': self.snippet_words})
+        }
+        
+        # bm25() is lower-is-better; report higher-is-better like PostgreSQL
+        return [
+            {
+                'id': row.id,
+                'rank': round(-row.rank, 4),
+                'subject_highlight': render_highlight(highlights[row.id].subject_highlight) if row.id in highlights else None,
+                'snippet': render_highlight(highlights[row.id].snippet) if row.id in highlights else None
+            }
+            for row in ranked
+        ]
+    
+    def _search_postgres(self, user_id: int, terms: List[Tuple[str, str]], limit: int, offset: int,
+                         filters: Optional[Dict], match_all: bool) -> List[Dict]:
+        filter_sql, params = build_filter_clause(filters)
+        params.update({'user_id': user_id, 'limit': limit, 'offset': offset})
+        parts = []
+        for i, (kind, value) in enumerate(terms):
+            params[f't{i}'] = value
+            if kind == 'prefix':
+                parts.append(f"to_tsquery('english', :t{i} || ':*')")
+            else:
+                parts.append(f"phraseto_tsquery('english', :t{i})")
+        
+        options = (f"StartSel={MATCH_START}, StopSel={MATCH_END}, "
+                   f"MaxWords={self.snippet_words}, MinWords={max(1, self.snippet_words // 3)}, MaxFragments=1")
+        params['options'] = options
+        params['subject_options'] = f"StartSel={MATCH_START}, StopSel={MATCH_END}, HighlightAll=true"
+        
+        # Headlines are built only for the page of results, not every match
+        rows = _execute(
+            f"SELECT ranked.id, ranked.rank, "
+            f"ts_headline('english', coalesce(ranked.subject, ''), ranked.q, :subject_options) AS subject_highlight, "
+            f"ts_headline('english', coalesce(ranked.body_text, ranked.body_preview, ''), ranked.q, :options) AS snippet "
+            f"FROM (SELECT e.id, e.subject, e.body_text, e.body_preview, query.q, "
+            f"ts_rank_cd(e.search_vector, query.q) AS rank "
+            f"FROM emails e, (SELECT {(' && ' if match_all else ' || ').join(parts)} AS q) AS query "
+            f"WHERE e.user_id = :user_id AND e.search_vector @@ query.q{filter_sql} "
+            f"ORDER BY rank DESC LIMIT :limit OFFSET :offset) AS ranked "
+            f"ORDER BY ranked.rank DESC",
+            params
+        ).all()
+        
+        return [
+            {
+                'id': row.id,
+                'rank': round(row.rank, 4),
+                'subject_highlight': render_highlight(row.subject_highlight),
+                'snippet': render_highlight(row.snippet)
+            }
+            for row in rows
+        ]
+
+def init_email_search(app: Flask) -> Optional[EmailSearchService]:
+    """Attach the search service to the app and make sure the index exists"""
+    if not app.config.get('SEARCH_FTS_ENABLED', True):
+        return None
+    
+    app.email_search = EmailSearchService(app)
+    with app.app_context():
+        app.email_search.ensure_index()
+    
+    return app.email_search
@@ -0,0 +1,127 @@
+"""
+Persistent Embedding Cache for AI Email Assistant
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+from typing import Callable, Dict, List
+import numpy as np
+
+def content_hash(text: str) -> str:
+    """Hash document text for cache lookups"""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+class EmbeddingCache:
+    """Embeddings stored on disk in SQLite, keyed by (model, content hash)
+    
+    Vectors are kept as float32 blobs, so an email whose document text has not changed
+    is never embedded twice, even across restarts or a rebuilt vector collection.
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'misses': 0}
+        
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "model TEXT NOT NULL, content_hash TEXT NOT NULL, dim INTEGER NOT NULL, "
+                "vector BLOB NOT NULL, PRIMARY KEY (model, content_hash))"
+            )
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Get this thread's connection"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+    
+    def get_many(self, model: str, hashes: List[str]) -> Dict[str, np.ndarray]:
+        """Get cached vectors for the given content hashes"""
+        found = {}
+        conn = self._connect()
+        unique = list(dict.fromkeys(hashes))
+        
+        # Chunked to stay under SQLite's bound-parameter limit
+        for start in range(0, len(unique), 500):
+            chunk = unique[start:start + 500]
+            placeholders = ','.join('?' * len(chunk))
+            rows = conn.execute(
+                f"SELECT content_hash, vector FROM embeddings WHERE model = ? AND content_hash IN ({placeholders})",
+                [model, *chunk]
+            ).fetchall()
+            for key, blob in rows:
+                found[key] = np.frombuffer(blob, dtype=np.float32)
+        
+        with self._lock:
+            self._counters['hits'] += len(found)
+            self._counters['misses'] += len(unique) - len(found)
+        return found
+    
+    def put_many(self, model: str, vectors: Dict[str, np.ndarray]):
+        """Store vectors by content hash"""
+        if not vectors:
+            return
+        
+        rows = []
+        for key, vector in vectors.items():
+            array = np.asarray(vector, dtype=np.float32)
+            rows.append((model, key, array.shape[0], array.tobytes()))
+        
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, content_hash, dim, vector) VALUES (?, ?, ?, ?)",
+                rows
+            )
+    
+    def get_stats(self) -> Dict:
+        """Get hit/miss counters and the number of cached vectors"""
+        count = self._connect().execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        with self._lock:
+            counters = dict(self._counters)
+        
+        lookups = counters['hits'] + counters['misses']
+        return {
+            'entries': count,
+            'hit_rate': round(counters['hits'] / lookups, 3) if lookups else None,
+            **counters
+        }
+
+class CachedEmbeddingFunction:
+    """Embedding function that only runs the model for text it has not seen
+    
+    Wraps any callable taking a list of texts and returning one vector per text (such
+    as a ChromaDB embedding function), so it can be handed to a collection directly.
+    """
+    
+    def __init__(self, embed: Callable[[List[str]], List], cache: EmbeddingCache, model_name: str):
+        self.embed = embed
+        self.cache = cache
+        self.model_name = model_name
+    
+    def __call__(self, input: List[str]) -> List[List[float]]:
+        hashes = [content_hash(text) for text in input]
+        vectors = self.cache.get_many(self.model_name, hashes)
+        
+        missing = {}
+        for key, text in zip(hashes, input):
+            if key not in vectors and key not in missing:
+                missing[key] = text
+        
+        if missing:
+            computed = self.embed(list(missing.values()))
+            new_vectors = {key: np.asarray(vector, dtype=np.float32) for key, vector in zip(missing, computed)}
+            self.cache.put_many(self.model_name, new_vectors)
+            vectors.update(new_vectors)
+        
+        return [vectors[key].tolist() for key in hashes]
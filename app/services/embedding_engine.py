@@ -0,0 +1,119 @@
+"""
+Batched Embedding Engine for AI Email Assistant
+"""
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Callable, Dict, Hashable, Iterable, Iterator, List, Optional, Tuple
+import numpy as np
+from app.services.embedding_models import get_embedding_model
+
+class ModelEncoder:
+    """Picklable encoder that runs the shared registry model in whichever process calls it"""
+    
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+    
+    def __call__(self, texts: List[str]) -> np.ndarray:
+        model = get_embedding_model(self.model_name)
+        return model.encode(texts, batch_size=len(texts), convert_to_numpy=True)
+
+class EmbeddingEngine:
+    """Embeds large streams of documents in length-bucketed micro-batches
+    
+    Documents are read in windows of bucket_size, sorted by length inside the window
+    and cut into micro-batches of batch_size, so each batch pads to a similar length.
+    Vectors are yielded back in input order, one window at a time, so memory stays
+    bounded by the window no matter how large the mailbox is. With processes > 0 the
+    micro-batches of a window are encoded in parallel worker processes.
+    """
+    
+    def __init__(self, encoder: Callable[[List[str]], np.ndarray], batch_size: int = 64,
+                 bucket_size: Optional[int] = None, processes: int = 0, start_method: str = 'spawn'):
+        self.encoder = encoder
+        self.batch_size = max(1, batch_size)
+        self.bucket_size = max(self.batch_size, bucket_size or self.batch_size * 16)
+        self.processes = processes
+        self.start_method = start_method
+        self._executor = None
+        self._stats = {'documents': 0, 'batches': 0, 'padded_chars': 0, 'chars': 0}
+    
+    @classmethod
+    def from_config(cls, config: Dict, encoder: Optional[Callable] = None) -> 'EmbeddingEngine':
+        """Build an engine from EMBEDDING_* app configuration"""
+        return cls(
+            encoder or ModelEncoder(config.get('EMBEDDING_MODEL', 'all-MiniLM-L6-v2')),
+            batch_size=config.get('EMBEDDING_BATCH_SIZE', 64),
+            bucket_size=config.get('EMBEDDING_BUCKET_SIZE'),
+            processes=config.get('EMBEDDING_PROCESSES', 0)
+        )
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+    
+    def close(self):
+        """Shut down the encoder processes"""
+        if self._executor:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+    
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """Embed a list of texts, returning vectors in input order"""
+        vectors = [vector for _, vector in self.stream(enumerate(texts))]
+        return np.vstack(vectors) if vectors else np.empty((0, 0), dtype=np.float32)
+    
+    def stream(self, items: Iterable[Tuple[Hashable, str]]) -> Iterator[Tuple[Hashable, np.ndarray]]:
+        """Consume (key, text) pairs and yield (key, vector) pairs in the same order"""
+        iterator = iter(items)
+        while True:
+            window = list(islice(iterator, self.bucket_size))
+            if not window:
+                return
+            
+            vectors = self._embed_window([text for _, text in window])
+            for (key, _), vector in zip(window, vectors):
+                yield key, vector
+    
+    def get_stats(self) -> Dict:
+        """Get document/batch counters and the share of encoded characters that were padding"""
+        stats = dict(self._stats)
+        stats['padding_ratio'] = round(1 - stats['chars'] / stats['padded_chars'], 3) if stats['padded_chars'] else None
+        return stats
+    
+    def _embed_window(self, texts: List[str]) -> np.ndarray:
+        """Embed one window: sort by length, encode micro-batches, restore input order"""
+        # Character length is a cheap proxy for token count
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        batches = [order[i:i + self.batch_size] for i in range(0, len(order), self.batch_size)]
+        
+        for batch in batches:
+            longest = len(texts[batch[-1]])
+            self._stats['padded_chars'] += longest * len(batch)
+            self._stats['chars'] += sum(len(texts[i]) for i in batch)
+        self._stats['documents'] += len(texts)
+        self._stats['batches'] += len(batches)
+        
+        batch_texts = [[texts[i] for i in batch] for batch in batches]
+        if self.processes > 0:
+            results = list(self._get_executor().map(self.encoder, batch_texts))
+        else:
+            results = [self.encoder(batch) for batch in batch_texts]
+        
+        vectors = None
+        for batch, result in zip(batches, results):
+            result = np.asarray(result, dtype=np.float32)
+            if vectors is None:
+                vectors = np.empty((len(texts), result.shape[1]), dtype=np.float32)
+            vectors[batch] = result
+        return vectors
+    
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.processes,
+                mp_context=multiprocessing.get_context(self.start_method)
+            )
+        return self._executor
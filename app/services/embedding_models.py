@@ -0,0 +1,105 @@
+"""
+Shared Embedding Model Registry for AI Email Assistant
+"""
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+_models = {}
+_load_stats = {}
+_lock = threading.Lock()
+_lock_pid = os.getpid()
+
+def _get_lock() -> threading.Lock:
+    """Get the registry lock, replacing one inherited from a parent process"""
+    global _lock, _lock_pid
+    if _lock_pid != os.getpid():
+        # A lock held by another thread at fork time would never be released here
+        _lock = threading.Lock()
+        _lock_pid = os.getpid()
+    return _lock
+
+def get_rss_mb() -> Optional[float]:
+    """Resident memory of this process in MB (None where it cannot be measured)"""
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmRSS:'):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    
+    try:
+        import resource
+        import sys
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Peak RSS: kilobytes on Linux, bytes on macOS
+        return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+    except ImportError:
+        return None
+
+def get_embedding_model(model_name: str):
+    """Get the process-wide SentenceTransformer for a model, loading it on first use"""
+    model = _models.get(model_name)
+    if model is not None:
+        return model
+    
+    with _get_lock():
+        model = _models.get(model_name)
+        if model is None:
+            from sentence_transformers import SentenceTransformer
+            
+            rss_before = get_rss_mb()
+            started = time.perf_counter()
+            model = SentenceTransformer(model_name)
+            rss_after = get_rss_mb()
+            
+            _load_stats[model_name] = {
+                'load_seconds': round(time.perf_counter() - started, 2),
+                'rss_mb': rss_after,
+                'rss_delta_mb': round(rss_after - rss_before, 1) if rss_before is not None else None,
+                'loaded_at': datetime.utcnow().isoformat(),
+                'loaded_in_pid': os.getpid()
+            }
+            _models[model_name] = model
+    
+    return model
+
+def preload_embedding_models(model_names: List[str]) -> Dict:
+    """Load models now, e.g. in a preforking server's master before workers fork
+    
+    Workers forked afterwards share the model weights copy-on-write instead of each
+    loading their own copy on the first request.
+    """
+    for model_name in model_names:
+        get_embedding_model(model_name)
+    return get_model_stats()
+
+def get_model_stats() -> Dict:
+    """Get load time and memory figures for the models loaded in this process"""
+    return {
+        'pid': os.getpid(),
+        'rss_mb': get_rss_mb(),
+        'models': {
+            name: dict(stats, inherited=stats['loaded_in_pid'] != os.getpid())
+            for name, stats in _load_stats.items()
+        }
+    }
+
+class SharedModelEmbeddingFunction:
+    """ChromaDB embedding function backed by the shared registry model
+    
+    The model is resolved on the first call, so creating collections or services does
+    not load it.
+    """
+    
+    def __init__(self, model_name: str, batch_size: int = 32):
+        self.model_name = model_name
+        self.batch_size = batch_size
+    
+    def __call__(self, input: List[str]) -> List[List[float]]:
+        model = get_embedding_model(self.model_name)
+        embeddings = model.encode(list(input), batch_size=self.batch_size, convert_to_numpy=True)
+        return embeddings.tolist()
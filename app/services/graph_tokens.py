@@ -0,0 +1,57 @@
+"""
+Server-side Graph Access Tokens for AI Email Assistant
+"""
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+from app.models import db
+from app.models.user import User
+
+# user_id -> (access_token, expires_at); tokens never leave the server process
+_tokens: Dict[int, Tuple[str, datetime]] = {}
+_tokens_lock = threading.Lock()
+
+def remember_access_token(user: User, token_data: Dict):
+    """Keep the access token from a sign-in so the first Graph calls need no refresh"""
+    if not token_data or 'access_token' not in token_data:
+        return
+    expires_at = datetime.utcnow() + timedelta(seconds=int(token_data.get('expires_in', 3600)))
+    with _tokens_lock:
+        _tokens[user.id] = (token_data['access_token'], expires_at)
+
+def forget_access_token(user_id: int):
+    """Drop a user's cached access token"""
+    with _tokens_lock:
+        _tokens.pop(user_id, None)
+
+def get_access_token(user: User) -> Optional[str]:
+    """Get a Graph access token for a user, minted from their stored refresh token
+    
+    Tokens are cached per process until five minutes before they expire. Used by
+    request handlers and the sync scheduler alike, so the bearer token is never
+    put in the (client-side) session cookie.
+    """
+    with _tokens_lock:
+        cached = _tokens.get(user.id)
+    if cached and cached[1] > datetime.utcnow() + timedelta(minutes=5):
+        return cached[0]
+    
+    refresh_token = user.get_refresh_token()
+    if not refresh_token:
+        return None
+    
+    # Import here to avoid circular imports
+    from app.services.ms_graph import GraphService
+    token_data = GraphService(tenant_id=user.azure_tenant_id).refresh_access_token(refresh_token)
+    if not token_data or 'access_token' not in token_data:
+        return None
+    
+    remember_access_token(user, token_data)
+    
+    # Refresh tokens rotate; keep the newest one
+    if token_data.get('refresh_token'):
+        user.set_refresh_token(token_data['refresh_token'])
+    user.token_expires_at = datetime.utcnow() + timedelta(seconds=int(token_data.get('expires_in', 3600)))
+    db.session.commit()
+    
+    return token_data['access_token']
@@ -0,0 +1,224 @@
+"""
+Hybrid Email Retrieval for AI Email Assistant
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Callable, Dict, List, Optional, Tuple
+from flask import Flask
+from app.models import db
+from app.services.email_search import filter_email_ids
+from app.services.search_cache import LRUCache, get_search_generation, normalize_query
+
+RETRIEVERS = ('lexical', 'vector')
+
+def reciprocal_rank_fusion(rankings: Dict[str, List[int]], k: int = 60) -> List[Tuple[int, float]]:
+    """Fuse ranked ID lists: each list adds 1 / (k + rank) to an ID's score"""
+    scores = {}
+    for ids in rankings.values():
+        for rank, email_id in enumerate(ids, start=1):
+            scores[email_id] = scores.get(email_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+class HybridSearchService:
+    """Full-text and vector retrieval run concurrently and fused with reciprocal-rank fusion
+    
+    Each retriever has its own latency budget, measured from the start of the search;
+    one that misses it is left out of the fusion rather than holding up the response.
+    Structured filters are applied inside each retriever before ranking: as SQL
+    conditions for the full-text index, and as an email_id allow-list for the vector
+    store (or a post-check when the filter matches too many emails to list).
+    
+    Fused results are cached per (user, query, filters) under the user's search
+    generation, which syncs bump, so a cached result never outlives the mailbox
+    state it was computed from.
+    """
+    
+    def __init__(self, app: Flask):
+        self.app = app
+        self.rrf_k = app.config.get('HYBRID_RRF_K', 60)
+        self.candidates = app.config.get('HYBRID_CANDIDATES', 50)
+        self.vector_filter_max_ids = app.config.get('HYBRID_VECTOR_FILTER_MAX_IDS', 1000)
+        self.budgets = {
+            'lexical': app.config.get('HYBRID_LEXICAL_BUDGET_MS', 300) / 1000,
+            'vector': app.config.get('HYBRID_VECTOR_BUDGET_MS', 800) / 1000
+        }
+        
+        cache_size = app.config.get('SEARCH_CACHE_SIZE', 1024)
+        self.result_cache = LRUCache(cache_size, app.config.get('SEARCH_CACHE_TTL', 300)) if cache_size > 0 else None
+        
+        self._executor = ThreadPoolExecutor(
+            max_workers=app.config.get('HYBRID_WORKERS', 4), thread_name_prefix='hybrid-search'
+        )
+        self._lock = threading.Lock()
+        self._stats = {'searches': 0, 'timeouts': dict.fromkeys(RETRIEVERS, 0), 'errors': dict.fromkeys(RETRIEVERS, 0)}
+    
+    def search(self, user_id: int, query: str, filters: Optional[Dict] = None, limit: int = 20,
+               offset: int = 0, match_all: bool = True) -> Optional[Dict]:
+        """Search a user's emails with every available retriever
+        
+        Returns {'mode', 'results', 'timings', 'skipped', 'cached'}, where each result is
+        {'id', 'score', 'lexical_rank', 'vector_rank', 'similarity', 'subject_highlight',
+        'snippet'}, or None when neither retriever is available.
+        """
+        retrievers = {}
+        if self._lexical_available():
+            retrievers['lexical'] = self._lexical_search
+        if self._vector_available():
+            retrievers['vector'] = self._vector_search
+        if not retrievers:
+            return None
+        
+        started = time.perf_counter()
+        cache_key = None
+        if self.result_cache is not None:
+            generation = get_search_generation(user_id)
+            if generation is not None:
+                filters_key = tuple(sorted((filters or {}).items()))
+                cache_key = (user_id, generation, normalize_query(query), filters_key, match_all, tuple(retrievers))
+                cached = self.result_cache.get(cache_key)
+                if cached is not None:
+                    with self._lock:
+                        self._stats['searches'] += 1
+                    return {
+                        'mode': cached['mode'],
+                        'results': cached['results'][offset:offset + limit],
+                        'timings': {'total_ms': round((time.perf_counter() - started) * 1000, 2)},
+                        'skipped': [],
+                        'cached': True
+                    }
+        
+        futures = {
+            name: self._executor.submit(self._run_retriever, retriever, user_id, query, filters, match_all)
+            for name, retriever in retrievers.items()
+        }
+        
+        hits = {}
+        timings = {}
+        skipped = []
+        for name, future in futures.items():
+            remaining = self.budgets[name] - (time.perf_counter() - started)
+            try:
+                hits[name], timings[f'{name}_ms'] = future.result(timeout=max(remaining, 0))
+            except FutureTimeout:
+                self._record(name, 'timeouts')
+                skipped.append(name)
+                self.app.logger.warning(f"{name.capitalize()} search exceeded its {self.budgets[name] * 1000:.0f}ms budget")
+            except Exception as e:
+                self._record(name, 'errors')
+                skipped.append(name)
+                self.app.logger.error(f"{name.capitalize()} search failed: {e}")
+        
+        fusion_started = time.perf_counter()
+        fused = self._fuse(hits)
+        timings['fusion_ms'] = round((time.perf_counter() - fusion_started) * 1000, 2)
+        timings['total_ms'] = round((time.perf_counter() - started) * 1000, 2)
+        
+        with self._lock:
+            self._stats['searches'] += 1
+        
+        if len(hits) == 2:
+            mode = 'hybrid'
+        elif 'lexical' in hits:
+            mode = 'fulltext'
+        else:
+            mode = 'vector' if hits else 'none'
+        
+        # Partial results (a retriever timed out or failed) are not worth keeping
+        if cache_key is not None and not skipped:
+            self.result_cache.put(cache_key, {'mode': mode, 'results': fused})
+        
+        return {
+            'mode': mode,
+            'results': fused[offset:offset + limit],
+            'timings': timings,
+            'skipped': skipped,
+            'cached': False
+        }
+    
+    def get_stats(self) -> Dict:
+        """Get search counts and per-retriever timeouts and errors"""
+        with self._lock:
+            stats = {key: dict(value) if isinstance(value, dict) else value for key, value in self._stats.items()}
+        stats['retrievers'] = {'lexical': self._lexical_available(), 'vector': self._vector_available()}
+        stats['budgets_ms'] = {name: budget * 1000 for name, budget in self.budgets.items()}
+        stats['result_cache'] = self.result_cache.get_stats() if self.result_cache else None
+        return stats
+    
+    def _record(self, retriever: str, counter: str):
+        with self._lock:
+            self._stats[counter][retriever] += 1
+    
+    def _lexical_available(self) -> bool:
+        return hasattr(self.app, 'email_search') and self.app.email_search.available
+    
+    def _vector_available(self) -> bool:
+        return hasattr(self.app, 'vector_service') and self.app.vector_service.available
+    
+    def _run_retriever(self, retriever: Callable, user_id: int, query: str, filters: Optional[Dict],
+                       match_all: bool) -> Tuple[List[Dict], float]:
+        """Run a retriever on a worker thread with its own app context and session"""
+        with self.app.app_context():
+            started = time.perf_counter()
+            try:
+                hits = retriever(user_id, query, filters, match_all)
+            finally:
+                db.session.remove()
+            return hits, round((time.perf_counter() - started) * 1000, 2)
+    
+    def _lexical_search(self, user_id: int, query: str, filters: Optional[Dict], match_all: bool) -> List[Dict]:
+        return self.app.email_search.search(
+            user_id, query, limit=self.candidates, filters=filters, match_all=match_all
+        ) or []
+    
+    def _vector_search(self, user_id: int, query: str, filters: Optional[Dict], match_all: bool) -> List[Dict]:
+        where = None
+        fetch = self.candidates
+        if filters:
+            allowed = filter_email_ids(user_id, filters, limit=self.vector_filter_max_ids + 1)
+            if not allowed:
+                return []
+            if len(allowed) <= self.vector_filter_max_ids:
+                where = {"email_id": {"$in": allowed}}
+            else:
+                # Too many matches to list; over-fetch and check the candidates instead
+                fetch = self.candidates * 4
+        
+        results = self.app.vector_service.search_emails(user_id, query, limit=fetch, where=where)
+        hits = [
+            {'id': result['email_id'], 'similarity': result.get('similarity_score')}
+            for result in results if result.get('email_id') is not None
+        ]
+        
+        if filters and where is None:
+            allowed = set(filter_email_ids(user_id, filters, candidate_ids=[hit['id'] for hit in hits]))
+            hits = [hit for hit in hits if hit['id'] in allowed][:self.candidates]
+        return hits
+    
+    def _fuse(self, hits: Dict[str, List[Dict]]) -> List[Dict]:
+        """Merge retriever hits into one list ordered by RRF score"""
+        rankings = {name: [hit['id'] for hit in name_hits] for name, name_hits in hits.items()}
+        details = {}
+        for name, name_hits in hits.items():
+            for rank, hit in enumerate(name_hits, start=1):
+                entry = details.setdefault(hit['id'], {
+                    'lexical_rank': None, 'vector_rank': None, 'similarity': None,
+                    'subject_highlight': None, 'snippet': None
+                })
+                entry[f'{name}_rank'] = rank
+                for key in ('similarity', 'subject_highlight', 'snippet'):
+                    if hit.get(key) is not None:
+                        entry[key] = hit[key]
+        
+        return [
+            dict(details[email_id], id=email_id, score=round(score, 6))
+            for email_id, score in reciprocal_rank_fusion(rankings, self.rrf_k)
+        ]
+
+def init_hybrid_search(app: Flask) -> Optional[HybridSearchService]:
+    """Attach the hybrid search service to the app"""
+    if not app.config.get('HYBRID_SEARCH_ENABLED', True):
+        return None
+    
+    app.hybrid_search = HybridSearchService(app)
+    return app.hybrid_search
@@ -0,0 +1,145 @@
+"""
+Priority-Aware LLM Request Scheduler for AI Email Assistant
+"""
+import itertools
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+from flask import Flask
+
+# Priority classes, most urgent first
+INTERACTIVE = 'interactive'  # A user is waiting on the answer: chat, reply suggestions, drafts
+NEAR_REAL_TIME = 'near_real_time'  # Inline analysis while a sync is running
+BATCH = 'batch'  # Background analysis queue
+PRIORITIES = (INTERACTIVE, NEAR_REAL_TIME, BATCH)
+
+class LLMOverloaded(Exception):
+    """Raised when a request waited longer than its class's queue budget and was shed"""
+
+class LLMScheduler:
+    """Admission control in front of Ollama with per-class priority queues
+    
+    At most concurrency requests run at once (match it to the server's
+    OLLAMA_NUM_PARALLEL); the rest wait, and a free slot always goes to the oldest
+    request of the most urgent class. Batch requests may only hold batch_slots of
+    the slots, so a backlog of analyses cannot take every slot from chat. A request
+    that waits past its class's budget raises LLMOverloaded, and callers fall back
+    (heuristic analysis, a retry later, or a busy message) instead of queueing forever.
+    Limits are per process.
+    """
+    
+    def __init__(self, concurrency: int = 2, batch_slots: Optional[int] = None,
+                 budgets_ms: Optional[Dict[str, float]] = None):
+        self.concurrency = max(1, concurrency)
+        self.limits = {priority: self.concurrency for priority in PRIORITIES}
+        self.limits[BATCH] = max(1, min(self.concurrency, batch_slots or self.concurrency - 1))
+        self.budgets_ms = {priority: 0 for priority in PRIORITIES}
+        self.budgets_ms.update(budgets_ms or {})
+        
+        self._cond = threading.Condition()
+        self._tickets = itertools.count()
+        self._waiting = {priority: deque() for priority in PRIORITIES}
+        self._running = {priority: 0 for priority in PRIORITIES}
+        self._waits_ms = {priority: deque(maxlen=500) for priority in PRIORITIES}
+        self._counters = {priority: {'admitted': 0, 'shed': 0} for priority in PRIORITIES}
+    
+    def _next_ticket(self) -> Optional[int]:
+        """The ticket that gets the next free slot: oldest of the most urgent class with room"""
+        if sum(self._running.values()) >= self.concurrency:
+            return None
+        for priority in PRIORITIES:
+            if self._waiting[priority] and self._running[priority] < self.limits[priority]:
+                return self._waiting[priority][0]
+        return None
+    
+    def acquire(self, priority: str = INTERACTIVE, budget_ms: Optional[float] = None) -> float:
+        """Wait for a slot; returns the milliseconds spent queued
+        
+        budget_ms overrides the class budget (0 waits indefinitely).
+        """
+        if priority not in self.limits:
+            raise ValueError(f"Unknown LLM priority class: {priority}")
+        budget = self.budgets_ms[priority] if budget_ms is None else budget_ms
+        started = time.monotonic()
+        deadline = started + budget / 1000 if budget else None
+        
+        with self._cond:
+            ticket = next(self._tickets)
+            self._waiting[priority].append(ticket)
+            
+            while self._next_ticket() != ticket:
+                remaining = deadline - time.monotonic() if deadline else None
+                if remaining is not None and remaining <= 0:
+                    self._waiting[priority].remove(ticket)
+                    self._counters[priority]['shed'] += 1
+                    # Removing a head ticket can let someone behind it run
+                    self._cond.notify_all()
+                    raise LLMOverloaded(
+                        f"{priority} LLM request shed after {(time.monotonic() - started) * 1000:.0f} ms in queue"
+                    )
+                self._cond.wait(remaining)
+            
+            self._waiting[priority].popleft()
+            self._running[priority] += 1
+            waited_ms = (time.monotonic() - started) * 1000
+            self._waits_ms[priority].append(waited_ms)
+            self._counters[priority]['admitted'] += 1
+            # The next ticket may be able to run too
+            self._cond.notify_all()
+        return waited_ms
+    
+    def release(self, priority: str = INTERACTIVE):
+        with self._cond:
+            self._running[priority] -= 1
+            self._cond.notify_all()
+    
+    @contextmanager
+    def slot(self, priority: str = INTERACTIVE, budget_ms: Optional[float] = None) -> Iterator[float]:
+        """Hold a slot for the duration of a request; yields the queue time in milliseconds"""
+        waited_ms = self.acquire(priority, budget_ms)
+        try:
+            yield waited_ms
+        finally:
+            self.release(priority)
+    
+    def get_stats(self) -> Dict:
+        """Get running and waiting requests, shed counts and queue times per class"""
+        with self._cond:
+            classes = {}
+            for priority in PRIORITIES:
+                waits = sorted(self._waits_ms[priority])
+                classes[priority] = {
+                    'running': self._running[priority],
+                    'waiting': len(self._waiting[priority]),
+                    'slots': self.limits[priority],
+                    'budget_ms': self.budgets_ms[priority],
+                    **self._counters[priority],
+                    'queue_ms_avg': round(sum(waits) / len(waits), 1) if waits else None,
+                    'queue_ms_p95': round(waits[int(0.95 * (len(waits) - 1))], 1) if waits else None,
+                    'queue_ms_max': round(waits[-1], 1) if waits else None
+                }
+            running = sum(self._running.values())
+        
+        return {
+            'concurrency': self.concurrency,
+            'running': running,
+            'classes': classes
+        }
+
+def init_llm_scheduler(app: Flask) -> Optional[LLMScheduler]:
+    """Attach the LLM request scheduler to the app"""
+    if not app.config.get('LLM_SCHEDULER_ENABLED', True):
+        return None
+    
+    app.llm_scheduler = LLMScheduler(
+        concurrency=app.config.get('LLM_SCHEDULER_CONCURRENCY', 2),
+        batch_slots=app.config.get('LLM_SCHEDULER_BATCH_SLOTS', 0),
+        budgets_ms={
+            INTERACTIVE: app.config.get('LLM_QUEUE_BUDGET_INTERACTIVE_MS', 30000),
+            NEAR_REAL_TIME: app.config.get('LLM_QUEUE_BUDGET_NEAR_REAL_TIME_MS', 3000),
+            BATCH: app.config.get('LLM_QUEUE_BUDGET_BATCH_MS', 0)
+        }
+    )
+    return app.llm_scheduler
@@ -3,26 +3,269 @@ Microsoft Graph API Service for AI Email Assistant
 """
 import requests
 import json
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
 from urllib.parse import urlencode
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from flask import current_app
+from app.utils.http_session import get_pooled_session
+
+# Responses Graph sends when a request was throttled or not processed
+RETRYABLE_STATUS_CODES = {429, 503, 504}
+
+# Most sub-requests Graph accepts in one $batch call
+MAX_BATCH_SIZE = 20
+
+_tenant_throttles = {}
+_tenant_throttles_lock = threading.Lock()
+_stats = {
+    'requests': 0,
+    'retries': 0,
+    'throttled': 0,
+    'unavailable': 0,
+    'connection_errors': 0,
+    'gave_up': 0,
+    'batch_calls': 0,
+    'batched_requests': 0,
+    'retry_wait_seconds': 0.0
+}
+_stats_lock = threading.Lock()
+
+def _record_stat(name, amount=1):
+    with _stats_lock:
+        _stats[name] += amount
+
+def get_graph_stats():
+    """Get process-wide Graph request, retry and throttling counters"""
+    with _stats_lock:
+        stats = dict(_stats)
+    stats['retry_wait_seconds'] = round(stats['retry_wait_seconds'], 2)
+    return stats
+
+class TenantThrottle:
+    """Concurrency limit and shared throttling cooldown for one tenant"""
+    
+    def __init__(self, max_concurrency):
+        self.semaphore = threading.BoundedSemaphore(max_concurrency)
+        self.blocked_until = 0.0
+        self.lock = threading.Lock()
+    
+    def wait_for_cooldown(self):
+        """Sleep until a Retry-After issued to any request for this tenant has passed"""
+        delay = self.blocked_until - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+    
+    def block_for(self, seconds):
+        """Hold back every request for this tenant"""
+        with self.lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+def get_tenant_throttle(tenant_id, max_concurrency):
+    """Get the process-wide throttle for a tenant"""
+    with _tenant_throttles_lock:
+        throttle = _tenant_throttles.get(tenant_id)
+        if throttle is None:
+            throttle = TenantThrottle(max_concurrency)
+            _tenant_throttles[tenant_id] = throttle
+        return throttle
+
+class GraphRequestError(Exception):
+    """Raised when a Microsoft Graph request fails"""
+
+
+class DeltaTokenExpired(GraphRequestError):
+    """Raised when a stored delta link is no longer accepted by Microsoft Graph"""
+
 
 class GraphService:
     """Microsoft Graph API integration service"""
     
-    def __init__(self):
+    # Header fields plus bodyPreview; full bodies are fetched on demand
+    MESSAGE_HEADER_FIELDS = 'id,subject,sender,toRecipients,ccRecipients,bccRecipients,receivedDateTime,sentDateTime,bodyPreview,importance,isRead,isDraft,hasAttachments,conversationId,parentFolderId'
+    MESSAGE_SELECT_FIELDS = MESSAGE_HEADER_FIELDS + ',body'
+    
+    def __init__(self, tenant_id=None):
         self.client_id = current_app.config['AZURE_CLIENT_ID']
         self.client_secret = current_app.config['AZURE_CLIENT_SECRET']
-        self.tenant_id = current_app.config['AZURE_TENANT_ID']
+        self.tenant_id = tenant_id or current_app.config['AZURE_TENANT_ID']
         self.redirect_uri = current_app.config['AZURE_REDIRECT_URI']
         self.scopes = current_app.config['GRAPH_SCOPES']
         self.graph_endpoint = current_app.config['GRAPH_API_ENDPOINT']
         
+        # Shared connection pool and throttling settings
+        self.session = get_pooled_session('graph', current_app.config.get('GRAPH_POOL_SIZE', 20))
+        self.max_retries = current_app.config.get('GRAPH_MAX_RETRIES', 5)
+        self.backoff_seconds = current_app.config.get('GRAPH_RETRY_BACKOFF_SECONDS', 1)
+        self.max_backoff_seconds = current_app.config.get('GRAPH_RETRY_MAX_BACKOFF_SECONDS', 60)
+        self.batch_size = min(current_app.config.get('GRAPH_BATCH_SIZE', MAX_BATCH_SIZE), MAX_BATCH_SIZE)
+        self.throttle = get_tenant_throttle(
+            self.tenant_id, current_app.config.get('GRAPH_TENANT_CONCURRENCY', 4)
+        )
+        
         # OAuth endpoints
         self.authority = f"https://login.microsoftonline.com/{self.tenant_id}"
         self.auth_endpoint = f"{self.authority}/oauth2/v2.0/authorize"
         self.token_endpoint = f"{self.authority}/oauth2/v2.0/token"
     
+    def _request(self, method, url, idempotent=None, **kwargs):
+        """Send a request through the pooled session, retrying throttled responses
+        
+        Retryable responses (see _is_retryable) are retried after their Retry-After
+        delay (or exponential backoff with jitter when none is given); a 429 also pauses
+        every other request for the tenant until the delay has passed. idempotent
+        defaults to method == 'GET'; only idempotent requests are retried after a
+        connection error, a 504 or a 503 without Retry-After, so a message is never
+        sent twice.
+        """
+        kwargs.setdefault('timeout', 30)
+        if idempotent is None:
+            idempotent = method == 'GET'
+        
+        for attempt in range(self.max_retries + 1):
+            self.throttle.wait_for_cooldown()
+            
+            with self.throttle.semaphore:
+                _record_stat('requests')
+                try:
+                    response = self.session.request(method, url, **kwargs)
+                except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                    _record_stat('connection_errors')
+                    if not idempotent or attempt >= self.max_retries:
+                        raise
+                    response = None
+            
+            if response is not None and not self._is_retryable(response.status_code, response.headers, idempotent):
+                return response
+            if attempt >= self.max_retries:
+                _record_stat('gave_up')
+                return response
+            
+            delay = None
+            if response is not None:
+                _record_stat('throttled' if response.status_code == 429 else 'unavailable')
+                delay = self._retry_after_seconds(response.headers)
+            if delay is None:
+                delay = self._backoff_delay(attempt)
+            if response is not None and response.status_code == 429:
+                self.throttle.block_for(delay)
+            
+            current_app.logger.warning(
+                f"Graph {method} {url.split('?')[0]} "
+                f"{'failed' if response is None else response.status_code}, retrying in {delay:.1f}s"
+            )
+            _record_stat('retries')
+            _record_stat('retry_wait_seconds', delay)
+            time.sleep(delay)
+    
+    @staticmethod
+    def _is_retryable(status, headers, idempotent):
+        """Whether a throttled or failed response can safely be sent again
+        
+        Idempotent requests are retried on any of RETRYABLE_STATUS_CODES. Others only on
+        429 or a 503 with Retry-After, which Graph returns before acting on a request; a
+        504 or bare 503 may have been sent after the message already went out.
+        """
+        if status not in RETRYABLE_STATUS_CODES:
+            return False
+        return idempotent or status == 429 or (status == 503 and bool((headers or {}).get('Retry-After')))
+    
+    def _retry_after_seconds(self, headers):
+        """Parse a Retry-After header given in seconds or as an HTTP date"""
+        retry_after = headers.get('Retry-After')
+        if not retry_after:
+            return None
+        
+        try:
+            return min(float(retry_after), self.max_backoff_seconds)
+        except ValueError:
+            pass
+        
+        try:
+            retry_at = parsedate_to_datetime(retry_after)
+            delay = (retry_at - datetime.now(timezone.utc)).total_seconds()
+            return min(max(delay, 0), self.max_backoff_seconds)
+        except (TypeError, ValueError):
+            return None
+    
+    def _backoff_delay(self, attempt):
+        """Exponential backoff with full jitter"""
+        return random.uniform(0, min(self.backoff_seconds * (2 ** attempt), self.max_backoff_seconds))
+    
+    def execute_batch(self, access_token, batch_requests):
+        """Send sub-requests through Graph JSON batching ($batch)
+        
+        batch_requests is a list of dicts with 'method', 'url' (relative to the API root,
+        e.g. '/me/messages/{id}') and an optional JSON 'body'. Up to 20 are coalesced into
+        each /$batch call; throttled sub-requests are resent after the longest Retry-After
+        in the batch, under the same rules as _request (only GETs after a 504), and the
+        /$batch call itself counts as idempotent only when every sub-request is a GET.
+        Returns one {'status', 'headers', 'body'} dict per request, in input order.
+        """
+        headers = {
+            'Authorization': f'Bearer {access_token}',
+            'Content-Type': 'application/json'
+        }
+        results = [None] * len(batch_requests)
+        pending = list(range(len(batch_requests)))
+        
+        for attempt in range(self.max_retries + 1):
+            retry, delays = [], []
+            
+            for offset in range(0, len(pending), self.batch_size):
+                chunk = pending[offset:offset + self.batch_size]
+                payload = {'requests': []}
+                for index in chunk:
+                    item = batch_requests[index]
+                    sub_request = {'id': str(index), 'method': item['method'], 'url': item['url']}
+                    if item.get('body') is not None:
+                        sub_request['body'] = item['body']
+                        sub_request['headers'] = {'Content-Type': 'application/json'}
+                    payload['requests'].append(sub_request)
+                
+                _record_stat('batch_calls')
+                _record_stat('batched_requests', len(chunk))
+                idempotent = all(batch_requests[index]['method'] == 'GET' for index in chunk)
+                response = self._request('POST', f"{self.graph_endpoint}/$batch", idempotent=idempotent,
+                                         headers=headers, json=payload, timeout=60)
+                
+                if response.status_code != 200:
+                    current_app.logger.error(f"Batch request failed: {response.status_code} {response.text}")
+                    for index in chunk:
+                        results[index] = {'status': response.status_code, 'headers': {}, 'body': None}
+                    continue
+                
+                for item in response.json().get('responses', []):
+                    index = int(item['id'])
+                    results[index] = {
+                        'status': item.get('status'),
+                        'headers': item.get('headers') or {},
+                        'body': item.get('body')
+                    }
+                    if self._is_retryable(item.get('status'), results[index]['headers'],
+                                          batch_requests[index]['method'] == 'GET'):
+                        retry.append(index)
+                        _record_stat('throttled' if item['status'] == 429 else 'unavailable')
+                        delays.append(self._retry_after_seconds(results[index]['headers']))
+            
+            if not retry:
+                break
+            if attempt >= self.max_retries:
+                _record_stat('gave_up')
+                break
+            
+            known_delays = [d for d in delays if d is not None]
+            delay = max(known_delays) if known_delays else self._backoff_delay(attempt)
+            current_app.logger.warning(f"Graph batch: {len(retry)} sub-requests throttled, retrying in {delay:.1f}s")
+            _record_stat('retries')
+            _record_stat('retry_wait_seconds', delay)
+            time.sleep(delay)
+            pending = sorted(retry)
+        
+        return results
+    
     def get_authorization_url(self, state):
         """Generate Microsoft OAuth authorization URL"""
         params = {
@@ -48,7 +291,8 @@ class GraphService:
                 'scope': ' '.join(self.scopes)
             }
             
-            response = requests.post(
+            response = self._request(
+                'POST',
                 self.token_endpoint,
                 data=data,
                 headers={'Content-Type': 'application/x-www-form-urlencoded'},
@@ -76,7 +320,8 @@ class GraphService:
                 'scope': ' '.join(self.scopes)
             }
             
-            response = requests.post(
+            response = self._request(
+                'POST',
                 self.token_endpoint,
                 data=data,
                 headers={'Content-Type': 'application/x-www-form-urlencoded'},
@@ -101,7 +346,8 @@ class GraphService:
                 'Content-Type': 'application/json'
             }
             
-            response = requests.get(
+            response = self._request(
+                'GET',
                 f"{self.graph_endpoint}/me",
                 headers=headers,
                 timeout=30
@@ -117,7 +363,16 @@ class GraphService:
             current_app.logger.error(f"Get user info error: {e}")
             return None
     
-    def get_emails(self, access_token, folder='inbox', limit=50, skip=0):
+    def _folder_messages_url(self, folder):
+        """Build the messages URL for a mail folder"""
+        if folder.lower() == 'inbox':
+            return f"{self.graph_endpoint}/me/mailFolders/inbox/messages"
+        elif folder.lower() == 'sent':
+            return f"{self.graph_endpoint}/me/mailFolders/sentitems/messages"
+        else:
+            return f"{self.graph_endpoint}/me/mailFolders/{folder}/messages"
+    
+    def get_emails(self, access_token, folder='inbox', limit=50, skip=0, include_body=True):
         """Get emails from specified folder"""
         try:
             headers = {
@@ -126,21 +381,17 @@ class GraphService:
             }
             
             # Build URL based on folder
-            if folder.lower() == 'inbox':
-                url = f"{self.graph_endpoint}/me/mailFolders/inbox/messages"
-            elif folder.lower() == 'sent':
-                url = f"{self.graph_endpoint}/me/mailFolders/sentitems/messages"
-            else:
-                url = f"{self.graph_endpoint}/me/mailFolders/{folder}/messages"
+            url = self._folder_messages_url(folder)
             
             params = {
                 '$top': min(limit, 1000),  # Graph API limit
                 '$skip': skip,
                 '$orderby': 'receivedDateTime desc',
-                '$select': 'id,subject,sender,toRecipients,ccRecipients,bccRecipients,receivedDateTime,sentDateTime,bodyPreview,body,importance,isRead,isDraft,hasAttachments,conversationId,parentFolderId'
+                '$select': self.MESSAGE_SELECT_FIELDS if include_body else self.MESSAGE_HEADER_FIELDS
             }
             
-            response = requests.get(
+            response = self._request(
+                'GET',
                 url,
                 headers=headers,
                 params=params,
@@ -157,6 +408,44 @@ class GraphService:
             current_app.logger.error(f"Get emails error: {e}")
             return None
     
+    def iter_email_delta_pages(self, access_token, folder='inbox', delta_link=None, page_size=50,
+                               include_body=True):
+        """Iterate over pages of a folder's /messages/delta query
+        
+        Starts a fresh delta round when no delta_link is given, otherwise resumes from
+        the stored link. Each yielded page is the raw Graph response: 'value' holds added,
+        changed and '@removed' messages, and either '@odata.nextLink' (more pages follow)
+        or '@odata.deltaLink' (round complete, persist it for the next sync) is set.
+        Raises DeltaTokenExpired when Graph no longer accepts the stored link. The
+        $select (with or without bodies) is fixed for a round by the links Graph returns.
+        """
+        headers = {
+            'Authorization': f'Bearer {access_token}',
+            'Content-Type': 'application/json',
+            'Prefer': f'odata.maxpagesize={min(page_size, 1000)}'
+        }
+        
+        if delta_link:
+            url, params = delta_link, None
+        else:
+            url = f"{self._folder_messages_url(folder)}/delta"
+            params = {'$select': self.MESSAGE_SELECT_FIELDS if include_body else self.MESSAGE_HEADER_FIELDS}
+        
+        while url:
+            response = self._request('GET', url, headers=headers, params=params, timeout=60)
+            
+            if response.status_code == 410 or (
+                    response.status_code == 400 and 'syncStateNotFound' in response.text):
+                raise DeltaTokenExpired(response.text)
+            if response.status_code != 200:
+                raise GraphRequestError(f"Delta query failed ({response.status_code}): {response.text}")
+            
+            page = response.json()
+            yield page
+            
+            # nextLink/deltaLink already carry every query option
+            url, params = page.get('@odata.nextLink'), None
+    
     def send_email(self, access_token, to_recipients, subject, body, cc_recipients=None, bcc_recipients=None, importance='normal'):
         """Send an email with detailed debugging"""
         try:
@@ -216,7 +505,8 @@ class GraphService:
             
             current_app.logger.info("Making HTTP POST request to Microsoft Graph...")
             
-            response = requests.post(
+            response = self._request(
+                'POST',
                 url,
                 headers=headers,
                 json=data,
@@ -262,7 +552,8 @@ class GraphService:
                 'Content-Type': 'application/json'
             }
             
-            response = requests.get(
+            response = self._request(
+                'GET',
                 f"{self.graph_endpoint}/me/messages/{message_id}",
                 headers=headers,
                 timeout=30
@@ -278,6 +569,28 @@ class GraphService:
             current_app.logger.error(f"Get email by ID error: {e}")
             return None
     
+    def get_emails_by_ids(self, access_token, message_ids, select=None):
+        """Get many emails by ID using $batch; returns {message_id: message or None}"""
+        try:
+            query = f"?$select={select}" if select else ''
+            results = self.execute_batch(access_token, [
+                {'method': 'GET', 'url': f"/me/messages/{message_id}{query}"}
+                for message_id in message_ids
+            ])
+            
+            emails = {}
+            for message_id, result in zip(message_ids, results):
+                if result['status'] == 200:
+                    emails[message_id] = result['body']
+                else:
+                    current_app.logger.warning(f"Get email {message_id} failed in batch: {result['status']}")
+                    emails[message_id] = None
+            return emails
+        
+        except Exception as e:
+            current_app.logger.error(f"Get emails by ID error: {e}")
+            return {message_id: None for message_id in message_ids}
+    
     def reply_to_email(self, access_token, message_id, reply_body, reply_all=False):
         """Reply to an email"""
         try:
@@ -292,7 +605,8 @@ class GraphService:
             
             endpoint = 'replyAll' if reply_all else 'reply'
             
-            response = requests.post(
+            response = self._request(
+                'POST',
                 f"{self.graph_endpoint}/me/messages/{message_id}/{endpoint}",
                 headers=headers,
                 json=data,
@@ -317,7 +631,8 @@ class GraphService:
                 'isRead': is_read
             }
             
-            response = requests.patch(
+            response = self._request(
+                'PATCH',
                 f"{self.graph_endpoint}/me/messages/{message_id}",
                 headers=headers,
                 json=data,
@@ -330,6 +645,19 @@ class GraphService:
             current_app.logger.error(f"Mark email read error: {e}")
             return False
     
+    def mark_emails_read(self, access_token, message_ids, is_read=True):
+        """Mark many emails as read or unread using $batch; returns {message_id: success}"""
+        try:
+            results = self.execute_batch(access_token, [
+                {'method': 'PATCH', 'url': f"/me/messages/{message_id}", 'body': {'isRead': is_read}}
+                for message_id in message_ids
+            ])
+            return {message_id: result['status'] == 200 for message_id, result in zip(message_ids, results)}
+        
+        except Exception as e:
+            current_app.logger.error(f"Mark emails read error: {e}")
+            return {message_id: False for message_id in message_ids}
+    
     def get_mail_folders(self, access_token):
         """Get list of mail folders"""
         try:
@@ -338,7 +666,8 @@ class GraphService:
                 'Content-Type': 'application/json'
             }
             
-            response = requests.get(
+            response = self._request(
+                'GET',
                 f"{self.graph_endpoint}/me/mailFolders",
                 headers=headers,
                 params={'$select': 'id,displayName,parentFolderId,childFolderCount,unreadItemCount,totalItemCount'},
@@ -371,7 +700,8 @@ class GraphService:
                 '$select': 'id,subject,sender,toRecipients,receivedDateTime,bodyPreview,importance,isRead,conversationId'
             }
             
-            response = requests.get(
+            response = self._request(
+                'GET',
                 f"{self.graph_endpoint}/me/messages",
                 headers=headers,
                 params=params,
@@ -3,25 +3,71 @@ Ollama Engine Service for AI Email Assistant
 """
 import requests
 import json
+import threading
 import time
+from contextlib import nullcontext
 from typing import Dict, List, Optional, Generator
 from flask import current_app
+from app.services.llm_scheduler import LLMOverloaded
+from app.services.ollama_router import get_backend_urls
+from app.utils.http_session import get_pooled_session
+
+_service_lock = threading.Lock()
+
+# Sampling options for email tasks (analysis, drafts, reply suggestions): a low temperature and
+# a fixed seed make the answer repeatable, so it can be served from the response cache
+TASK_OPTIONS = {'temperature': 0.2, 'seed': 42}
+
+def get_ollama_service() -> 'OllamaService':
+    """Get the app's shared OllamaService instance"""
+    app = current_app._get_current_object()
+    
+    if not hasattr(app, 'ollama_service'):
+        with _service_lock:
+            if not hasattr(app, 'ollama_service'):
+                app.ollama_service = OllamaService()
+    
+    return app.ollama_service
 
 class OllamaService:
     """Service for interacting with Ollama local AI models"""
     
     def __init__(self):
-        self.base_url = current_app.config['OLLAMA_BASE_URL']
+        # With several servers the router picks one per request; this one serves model listing and pulls
+        self.base_url = get_backend_urls(current_app.config)[0]
         self.model = current_app.config['OLLAMA_MODEL']
         self.timeout = current_app.config['OLLAMA_TIMEOUT']
         self.stream = current_app.config['OLLAMA_STREAM']
+        # How long Ollama keeps the model loaded after a request, so follow-up turns reuse its KV cache
+        self.keep_alive = current_app.config.get('OLLAMA_KEEP_ALIVE', '30m')
+        
+        # Per-endpoint read timeouts (seconds); connecting is always bounded by the connect timeout
+        self.connect_timeout = current_app.config.get('OLLAMA_CONNECT_TIMEOUT', 3)
+        self.timeouts = {
+            'health': current_app.config.get('OLLAMA_HEALTH_TIMEOUT', 5),
+            'tags': current_app.config.get('OLLAMA_TAGS_TIMEOUT', 10),
+            'show': current_app.config.get('OLLAMA_SHOW_TIMEOUT', 10),
+            'pull': current_app.config.get('OLLAMA_PULL_TIMEOUT', 300),
+            'generate': self.timeout,
+            'embeddings': current_app.config.get('OLLAMA_EMBEDDING_TIMEOUT', 30)
+        }
+        self.session = get_pooled_session('ollama', current_app.config.get('OLLAMA_POOL_SIZE', 10))
+    
+    def _timeout(self, endpoint: str):
+        """Get the (connect, read) timeout for an endpoint"""
+        return (self.connect_timeout, self.timeouts.get(endpoint, self.timeout))
     
     def check_health(self) -> bool:
-        """Check if Ollama service is running"""
+        """Check if Ollama service is running (any backend, with several configured)"""
+        router = getattr(current_app, 'ollama_router', None)
+        if router:
+            router.refresh()
+            return router.get_stats()['healthy'] > 0
+        
         try:
-            response = requests.get(
+            response = self.session.get(
                 f"{self.base_url}/api/tags",
-                timeout=5
+                timeout=self._timeout('health')
             )
             return response.status_code == 200
         except Exception as e:
@@ -31,9 +77,9 @@ class OllamaService:
     def list_models(self) -> Optional[List[Dict]]:
         """List available models"""
         try:
-            response = requests.get(
+            response = self.session.get(
                 f"{self.base_url}/api/tags",
-                timeout=10
+                timeout=self._timeout('tags')
             )
             
             if response.status_code == 200:
@@ -51,69 +97,79 @@ class OllamaService:
         try:
             data = {'name': model_name}
             
-            response = requests.post(
+            with self.session.post(
                 f"{self.base_url}/api/pull",
                 json=data,
-                timeout=300,  # 5 minutes for model download
+                timeout=self._timeout('pull'),
                 stream=True
-            )
-            
-            if response.status_code == 200:
-                # Process streaming response
-                for line in response.iter_lines():
-                    if line:
-                        try:
-                            chunk = json.loads(line)
-                            if chunk.get('status') == 'success':
-                                return True
-                        except json.JSONDecodeError:
-                            continue
-                return True
-            else:
-                current_app.logger.error(f"Pull model failed: {response.text}")
-                return False
+            ) as response:
+                if response.status_code == 200:
+                    # Process streaming response
+                    for line in response.iter_lines():
+                        if line:
+                            try:
+                                chunk = json.loads(line)
+                                if chunk.get('status') == 'success':
+                                    return True
+                            except json.JSONDecodeError:
+                                continue
+                    return True
+                else:
+                    current_app.logger.error(f"Pull model failed: {response.text}")
+                    return False
         except Exception as e:
             current_app.logger.error(f"Pull model error: {e}")
             return False
     
-    def generate_response(self, prompt: str, context: Optional[str] = None, system_prompt: Optional[str] = None) -> Dict:
-        """Generate response from Ollama model"""
+    def generate_response(self, prompt: str, context: Optional[str] = None, system_prompt: Optional[str] = None,
+                          conversation: Optional[List[int]] = None, options: Optional[Dict] = None,
+                          priority: str = 'interactive') -> Dict:
+        """Generate response from Ollama model
+        
+        conversation is the 'context' token array an earlier response returned; the
+        prompt then continues that conversation instead of starting a new one.
+        options override the default sampling options; email tasks pass TASK_OPTIONS,
+        which makes them eligible for the persistent response cache.
+        priority is the request's scheduler class (interactive, near_real_time or batch).
+        """
         try:
             # Build the full prompt
-            full_prompt = self._build_prompt(prompt, context, system_prompt)
+            full_prompt = self._build_prompt(prompt, context, system_prompt, continuing=bool(conversation))
             
-            data = {
-                'model': self.model,
-                'prompt': full_prompt,
-                'stream': False,  # Non-streaming for API responses
-                'options': {
-                    'temperature': 0.7,
-                    'top_p': 0.9,
-                    'top_k': 40,
-                    'num_predict': 2048
-                }
-            }
+            # Non-streaming for API responses
+            data = self._generate_request(full_prompt, stream=False, conversation=conversation, options=options)
             
             start_time = time.time()
             
-            response = requests.post(
-                f"{self.base_url}/api/generate",
-                json=data,
-                timeout=self.timeout
-            )
+            cache = getattr(current_app, 'response_cache', None)
+            if cache and not cache.accepts(data):
+                cache = None
+            if cache:
+                cached = cache.get(data)
+                if cached:
+                    return dict(cached, model_used=self.model, context=None, done=True, cached=True,
+                                response_time_ms=int((time.time() - start_time) * 1000))
+            
+            with self._admit(priority) as queue_ms:
+                response = self._post('/api/generate', data, 'generate')
             
             response_time = int((time.time() - start_time) * 1000)
             
             if response.status_code == 200:
                 result = response.json()
-                return {
-                    'text': result.get('response', '').strip(),
+                text = result.get('response', '').strip()
+                if cache and text:
+                    cache.put(data, {'text': text, 'token_count': self._estimate_tokens(result.get('response', ''))})
+                return dict({
+                    'text': text,
                     'model_used': self.model,
                     'response_time_ms': response_time,
                     'token_count': self._estimate_tokens(result.get('response', '')),
                     'context': result.get('context'),
-                    'done': result.get('done', True)
-                }
+                    'done': result.get('done', True),
+                    'cached': False,
+                    'queue_ms': round(queue_ms, 1)
+                }, **self._eval_stats(result))
             else:
                 current_app.logger.error(f"Generate response failed: {response.text}")
                 return {
@@ -122,6 +178,9 @@ class OllamaService:
                     'response_time_ms': response_time
                 }
         
+        except LLMOverloaded as e:
+            current_app.logger.warning(f"Ollama request shed: {e}")
+            return self._overloaded_response()
         except requests.exceptions.Timeout:
             current_app.logger.error("Ollama request timeout")
             return {
@@ -135,50 +194,52 @@ class OllamaService:
                 'error': str(e)
             }
     
-    def generate_streaming_response(self, prompt: str, context: Optional[str] = None, system_prompt: Optional[str] = None) -> Generator[Dict, None, None]:
-        """Generate streaming response from Ollama model"""
+    def generate_streaming_response(self, prompt: str, context: Optional[str] = None, system_prompt: Optional[str] = None,
+                                    conversation: Optional[List[int]] = None,
+                                    priority: str = 'interactive') -> Generator[Dict, None, None]:
+        """Generate streaming response from Ollama model
+        
+        The final chunk (done) carries the conversation's 'context' tokens and the
+        prompt evaluation stats; see generate_response for conversation and priority.
+        The scheduler slot is held until the stream ends or is closed.
+        """
         try:
-            full_prompt = self._build_prompt(prompt, context, system_prompt)
+            full_prompt = self._build_prompt(prompt, context, system_prompt, continuing=bool(conversation))
             
-            data = {
-                'model': self.model,
-                'prompt': full_prompt,
-                'stream': True,
-                'options': {
-                    'temperature': 0.7,
-                    'top_p': 0.9,
-                    'top_k': 40,
-                    'num_predict': 2048
-                }
-            }
+            data = self._generate_request(full_prompt, stream=True, conversation=conversation)
             
-            response = requests.post(
-                f"{self.base_url}/api/generate",
+            # Closing the response returns the connection to the pool. If this generator is
+            # closed before the last chunk, the connection is dropped instead, and Ollama
+            # stops generating for a client that has gone away.
+            with self._admit(priority), self._route(timed=False) as base_url, self.session.post(
+                f"{base_url}/api/generate",
                 json=data,
-                timeout=self.timeout,
+                timeout=self._timeout('generate'),
                 stream=True
-            )
-            
-            if response.status_code == 200:
-                for line in response.iter_lines():
-                    if line:
-                        try:
-                            chunk = json.loads(line)
-                            if 'response' in chunk:
-                                yield {
-                                    'text': chunk['response'],
-                                    'done': chunk.get('done', False),
-                                    'context': chunk.get('context')
-                                }
-                        except json.JSONDecodeError:
-                            continue
-            else:
-                yield {
-                    'text': "Error generating response",
-                    'error': response.text,
-                    'done': True
-                }
+            ) as response:
+                if response.status_code == 200:
+                    for line in response.iter_lines():
+                        if line:
+                            try:
+                                chunk = json.loads(line)
+                                if 'response' in chunk:
+                                    yield dict({
+                                        'text': chunk['response'],
+                                        'done': chunk.get('done', False),
+                                        'context': chunk.get('context')
+                                    }, **(self._eval_stats(chunk) if chunk.get('done') else {}))
+                            except json.JSONDecodeError:
+                                continue
+                else:
+                    yield {
+                        'text': "Error generating response",
+                        'error': response.text,
+                        'done': True
+                    }
         
+        except LLMOverloaded as e:
+            current_app.logger.warning(f"Ollama request shed: {e}")
+            yield dict(self._overloaded_response(), done=True)
         except Exception as e:
             current_app.logger.error(f"Streaming response error: {e}")
             yield {
@@ -193,25 +254,12 @@ class OllamaService:
             # Convert messages to Ollama format
             prompt = self._format_chat_messages(messages, system_prompt)
             
-            data = {
-                'model': self.model,
-                'prompt': prompt,
-                'stream': False,
-                'options': {
-                    'temperature': 0.7,
-                    'top_p': 0.9,
-                    'top_k': 40,
-                    'num_predict': 2048
-                }
-            }
+            data = self._generate_request(prompt, stream=False)
             
             start_time = time.time()
             
-            response = requests.post(
-                f"{self.base_url}/api/generate",
-                json=data,
-                timeout=self.timeout
-            )
+            with self._admit('interactive'):
+                response = self._post('/api/generate', data, 'generate')
             
             response_time = int((time.time() - start_time) * 1000)
             
@@ -231,6 +279,9 @@ class OllamaService:
                     'response_time_ms': response_time
                 }
         
+        except LLMOverloaded as e:
+            current_app.logger.warning(f"Ollama request shed: {e}")
+            return self._overloaded_response()
         except Exception as e:
             current_app.logger.error(f"Chat completion error: {e}")
             return {
@@ -246,11 +297,7 @@ class OllamaService:
                 'prompt': text
             }
             
-            response = requests.post(
-                f"{self.base_url}/api/embeddings",
-                json=data,
-                timeout=30
-            )
+            response = self._post('/api/embeddings', data, 'embeddings')
             
             if response.status_code == 200:
                 result = response.json()
@@ -263,14 +310,90 @@ class OllamaService:
             current_app.logger.error(f"Generate embedding error: {e}")
             return None
     
-    def _build_prompt(self, prompt: str, context: Optional[str] = None, system_prompt: Optional[str] = None) -> str:
-        """Build complete prompt with context and system instructions"""
+    def _route(self, timed: bool = True):
+        """Context manager yielding the base URL for a request to self.model
+        
+        With several servers configured the router picks one and tracks the request
+        as in flight; otherwise it is always OLLAMA_BASE_URL.
+        """
+        router = getattr(current_app, 'ollama_router', None)
+        return router.dispatch(self.model, timed=timed) if router else nullcontext(self.base_url)
+    
+    def _post(self, path: str, data: Dict, endpoint: str) -> requests.Response:
+        """POST a non-streaming request, failing over to the next backend if one cannot be reached
+        
+        Only connection failures are retried: the request never reached that server.
+        """
+        router = getattr(current_app, 'ollama_router', None)
+        attempts = len(router.backends) if router else 1
+        
+        for attempt in range(attempts):
+            try:
+                with self._route() as base_url:
+                    return self.session.post(f"{base_url}{path}", json=data, timeout=self._timeout(endpoint))
+            except requests.exceptions.ConnectionError as e:
+                if attempt == attempts - 1:
+                    raise
+                current_app.logger.warning(f"Ollama backend unreachable, failing over: {e}")
+    
+    def _admit(self, priority: str):
+        """Wait for an Ollama slot in the request's priority class (a no-op without the scheduler)
+        
+        Yields the milliseconds spent queued; raises LLMOverloaded if the wait passed the class budget.
+        """
+        scheduler = getattr(current_app, 'llm_scheduler', None)
+        return scheduler.slot(priority) if scheduler else nullcontext(0.0)
+    
+    def _overloaded_response(self) -> Dict:
+        """Response for a request shed by the scheduler"""
+        return {
+            'text': "I'm sorry, the AI assistant is busy right now. Please try again in a moment.",
+            'error': 'overloaded',
+            'shed': True
+        }
+    
+    def _generate_request(self, prompt: str, stream: bool, conversation: Optional[List[int]] = None,
+                          options: Optional[Dict] = None) -> Dict:
+        """Body of an /api/generate request"""
+        data = {
+            'model': self.model,
+            'prompt': prompt,
+            'stream': stream,
+            'options': {
+                'temperature': 0.7,
+                'top_p': 0.9,
+                'top_k': 40,
+                'num_predict': 2048,
+                **(options or {})
+            }
+        }
+        if conversation:
+            data['context'] = conversation
+        if self.keep_alive:
+            data['keep_alive'] = self.keep_alive
+        return data
+    
+    def _eval_stats(self, result: Dict) -> Dict:
+        """Prompt evaluation and generation counts from a final /api/generate response"""
+        return {
+            'prompt_eval_count': result.get('prompt_eval_count'),
+            'prompt_eval_ms': round(result['prompt_eval_duration'] / 1e6, 1) if result.get('prompt_eval_duration') else None,
+            'eval_count': result.get('eval_count')
+        }
+    
+    def _build_prompt(self, prompt: str, context: Optional[str] = None, system_prompt: Optional[str] = None,
+                      continuing: bool = False) -> str:
+        """Build complete prompt with context and system instructions
+        
+        A turn continuing a conversation only gets a system line if one is given;
+        the conversation's first turn already set it.
+        """
         parts = []
         
         # Add system prompt
         if system_prompt:
             parts.append(f"SYSTEM: {system_prompt}")
-        else:
+        elif not continuing:
             parts.append("SYSTEM: You are an AI assistant helping with email management. Be helpful, concise, and professional.")
         
         # Add context if provided
@@ -308,10 +431,10 @@ class OllamaService:
         try:
             model_to_check = model_name or self.model
             
-            response = requests.post(
+            response = self.session.post(
                 f"{self.base_url}/api/show",
                 json={'name': model_to_check},
-                timeout=10
+                timeout=self._timeout('show')
             )
             
             if response.status_code == 200:
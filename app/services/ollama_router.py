@@ -0,0 +1,199 @@
+"""
+Multi-Instance Ollama Router for AI Email Assistant
+"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+import requests
+from flask import Flask
+from app.utils.http_session import get_pooled_session
+
+class OllamaBackend:
+    """One Ollama server and what this process knows about it"""
+    
+    def __init__(self, url: str):
+        self.url = url.rstrip('/')
+        self.healthy = True
+        self.retry_at = 0.0
+        self.in_flight = 0
+        self.latency_ms = None  # Moving average of non-streaming request time
+        self.loaded = set()  # Models in memory (/api/ps, plus models it just served)
+        self.available = None  # Models pulled (/api/tags); None until probed
+        self.checked_at = None
+        self.requests = 0
+        self.failures = 0
+    
+    def to_dict(self) -> Dict:
+        return {
+            'url': self.url,
+            'healthy': self.healthy,
+            'in_flight': self.in_flight,
+            'latency_ms': round(self.latency_ms, 1) if self.latency_ms is not None else None,
+            'loaded_models': sorted(self.loaded),
+            'available_models': sorted(self.available) if self.available is not None else None,
+            'requests': self.requests,
+            'failures': self.failures
+        }
+
+class OllamaRouter:
+    """Dispatches Ollama calls across several servers by health, load and loaded model
+    
+    Each request goes to the healthy backend with the fewest requests in flight from
+    this process, counting a penalty for backends that would have to load the model
+    first: swap_penalty if another model is loaded there (Ollama would evict or
+    squeeze it), 1 if nothing is. So requests stay with the nodes that have the model
+    in memory and only spill to an idle node once those are busier, and a node serving
+    a different model is left alone unless everything else is swap_penalty deeper.
+    Backends that do not have the model pulled are skipped while any other has it.
+    
+    A backend that cannot be reached is skipped for retry_seconds. A background
+    thread polls /api/ps and /api/tags every health_seconds for loaded and available
+    models and to bring recovered backends back.
+    """
+    
+    def __init__(self, urls: List[str], retry_seconds: float = 30, health_seconds: float = 15,
+                 health_timeout: float = 3, swap_penalty: int = 4, pool_size: int = 10):
+        self.backends = [OllamaBackend(url) for url in urls]
+        self.retry_seconds = retry_seconds
+        self.health_seconds = health_seconds
+        self.health_timeout = health_timeout
+        self.swap_penalty = swap_penalty
+        self.session = get_pooled_session('ollama', pool_size)
+        
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+    
+    def start(self):
+        """Start the health check thread"""
+        if self._thread:
+            return
+        
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._health_loop, name='ollama-router-health', daemon=True)
+        self._thread.start()
+    
+    def stop(self, timeout: float = 5):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+    
+    def _health_loop(self):
+        while not self._stop_event.is_set():
+            self.refresh()
+            self._stop_event.wait(self.health_seconds)
+    
+    def refresh(self):
+        """Probe every backend for health and its loaded and available models"""
+        for backend in self.backends:
+            try:
+                loaded = self.session.get(f"{backend.url}/api/ps", timeout=self.health_timeout)
+                tags = self.session.get(f"{backend.url}/api/tags", timeout=self.health_timeout)
+                loaded.raise_for_status()
+                tags.raise_for_status()
+            except requests.exceptions.RequestException:
+                self.mark_failed(backend)
+                continue
+            
+            with self._lock:
+                backend.loaded = {model['name'] for model in loaded.json().get('models', [])}
+                backend.available = {model['name'] for model in tags.json().get('models', [])}
+                backend.healthy = True
+                backend.checked_at = time.time()
+    
+    def choose(self, model: str) -> OllamaBackend:
+        """Pick the backend for a request to model"""
+        with self._lock:
+            now = time.monotonic()
+            candidates = [b for b in self.backends if b.healthy or now >= b.retry_at]
+            if not candidates:
+                # Everything is down; try the one that failed longest ago
+                return min(self.backends, key=lambda b: b.retry_at)
+            
+            with_model = [b for b in candidates if b.available is None or model in b.available]
+            if with_model:
+                candidates = with_model
+            
+            def cost(backend: OllamaBackend):
+                if model in backend.loaded:
+                    penalty = 0
+                elif backend.loaded:
+                    penalty = self.swap_penalty
+                else:
+                    penalty = 1
+                return (backend.in_flight + penalty, backend.latency_ms or 0.0)
+            
+            return min(candidates, key=cost)
+    
+    @contextmanager
+    def dispatch(self, model: str, timed: bool = True) -> Iterator[str]:
+        """Route one request to model; yields the chosen backend's base URL
+        
+        Tracks the request as in flight until the block exits. A connection failure
+        marks the backend down; timed=False skips the latency sample (for streams,
+        which stay open as long as the model generates).
+        """
+        backend = self.choose(model)
+        with self._lock:
+            backend.in_flight += 1
+            backend.requests += 1
+        started = time.monotonic()
+        
+        try:
+            yield backend.url
+        except (requests.exceptions.ConnectionError, requests.exceptions.ConnectTimeout):
+            self.mark_failed(backend)
+            raise
+        else:
+            with self._lock:
+                backend.healthy = True
+                backend.loaded.add(model)
+                if timed:
+                    elapsed = (time.monotonic() - started) * 1000
+                    backend.latency_ms = elapsed if backend.latency_ms is None else 0.7 * backend.latency_ms + 0.3 * elapsed
+        finally:
+            with self._lock:
+                backend.in_flight -= 1
+    
+    def mark_failed(self, backend: OllamaBackend):
+        with self._lock:
+            backend.healthy = False
+            backend.retry_at = time.monotonic() + self.retry_seconds
+            backend.failures += 1
+    
+    def get_stats(self) -> Dict:
+        with self._lock:
+            backends = [backend.to_dict() for backend in self.backends]
+        return {
+            'backends': backends,
+            'healthy': sum(1 for backend in backends if backend['healthy'])
+        }
+
+def get_backend_urls(config) -> List[str]:
+    """Ollama servers from OLLAMA_BASE_URLS (comma-separated), else OLLAMA_BASE_URL"""
+    urls = config.get('OLLAMA_BASE_URLS') or ''
+    if isinstance(urls, str):
+        urls = urls.split(',')
+    urls = [url.strip() for url in urls if url.strip()]
+    return urls or [config.get('OLLAMA_BASE_URL', 'http://localhost:11434')]
+
+def init_ollama_router(app: Flask) -> Optional[OllamaRouter]:
+    """Attach the Ollama router to the app when several Ollama servers are configured"""
+    urls = get_backend_urls(app.config)
+    if len(urls) < 2:
+        return None
+    
+    app.ollama_router = OllamaRouter(
+        urls,
+        retry_seconds=app.config.get('OLLAMA_ROUTER_RETRY_SECONDS', 30),
+        health_seconds=app.config.get('OLLAMA_ROUTER_HEALTH_SECONDS', 15),
+        health_timeout=app.config.get('OLLAMA_HEALTH_TIMEOUT', 5),
+        swap_penalty=app.config.get('OLLAMA_ROUTER_SWAP_PENALTY', 4),
+        pool_size=app.config.get('OLLAMA_POOL_SIZE', 10)
+    )
+    if not app.config.get('TESTING'):
+        app.ollama_router.start()
+    
+    return app.ollama_router
@@ -0,0 +1,181 @@
+"""
+Persistent LLM Response Cache for AI Email Assistant
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+from flask import Flask
+
+def response_cache_key(request: Dict) -> str:
+    """Hash the parts of an /api/generate request that determine its answer
+    
+    The prompt has its whitespace collapsed, so re-indenting a prompt template
+    does not invalidate everything cached for it.
+    """
+    normalized = {
+        'model': request.get('model'),
+        'options': request.get('options') or {},
+        'prompt': ' '.join((request.get('prompt') or '').split())
+    }
+    return hashlib.sha256(json.dumps(normalized, sort_keys=True).encode('utf-8')).hexdigest()
+
+class ResponseCache:
+    """Model responses stored on disk in SQLite, keyed by (model, options, prompt) hash
+    
+    Only email tasks (analysis, drafts, reply suggestions) are cached: OllamaService
+    uses it for requests at or below max_temperature that do not continue a chat
+    conversation, and chat keeps the default (hotter) sampling. Each entry expires ttl_seconds after it was stored, and once the
+    stored responses pass max_bytes the least recently used ones are evicted.
+    """
+    
+    def __init__(self, path: str, max_bytes: int = 64 * 1024 * 1024, ttl_seconds: float = 7 * 24 * 3600,
+                 max_temperature: float = 0.3):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.max_temperature = max_temperature
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'misses': 0, 'expired': 0, 'stores': 0, 'evictions': 0}
+        
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_responses ("
+                "key TEXT PRIMARY KEY, model TEXT NOT NULL, response TEXT NOT NULL, size INTEGER NOT NULL, "
+                "created_at REAL NOT NULL, accessed_at REAL NOT NULL, expires_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_responses_accessed ON llm_responses (accessed_at)")
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Get this thread's connection"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+    
+    def _count(self, counter: str, amount: int = 1):
+        with self._lock:
+            self._counters[counter] += amount
+    
+    def accepts(self, request: Dict) -> bool:
+        """Whether a generate request is deterministic enough to answer from the cache"""
+        if request.get('context'):
+            return False
+        temperature = (request.get('options') or {}).get('temperature', 0.8)
+        return temperature <= self.max_temperature
+    
+    def get(self, request: Dict) -> Optional[Dict]:
+        """Get the cached response for a generate request, or None"""
+        key = response_cache_key(request)
+        conn = self._connect()
+        row = conn.execute("SELECT response, expires_at FROM llm_responses WHERE key = ?", (key,)).fetchone()
+        now = time.time()
+        
+        if row is not None and row[1] <= now:
+            with conn:
+                conn.execute("DELETE FROM llm_responses WHERE key = ?", (key,))
+            self._count('expired')
+            row = None
+        if row is None:
+            self._count('misses')
+            return None
+        
+        with conn:
+            conn.execute("UPDATE llm_responses SET accessed_at = ? WHERE key = ?", (now, key))
+        self._count('hits')
+        return json.loads(row[0])
+    
+    def put(self, request: Dict, response: Dict, ttl_seconds: Optional[float] = None):
+        """Store the response to a generate request, evicting the least recently used past max_bytes"""
+        payload = json.dumps(response)
+        size = len(payload.encode('utf-8'))
+        if size > self.max_bytes:
+            return
+        
+        now = time.time()
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_responses (key, model, response, size, created_at, accessed_at, expires_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (response_cache_key(request), request.get('model') or '', payload, size, now, now, now + ttl)
+            )
+        self._count('stores')
+        self._evict(conn, now)
+    
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        """Drop expired entries, then the least recently used ones until under max_bytes"""
+        with conn:
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_responses").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            
+            expired = conn.execute("DELETE FROM llm_responses WHERE expires_at <= ?", (now,)).rowcount
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_responses").fetchone()[0]
+            
+            victims = []
+            for key, size in conn.execute("SELECT key, size FROM llm_responses ORDER BY accessed_at ASC"):
+                if total <= self.max_bytes:
+                    break
+                victims.append((key,))
+                total -= size
+            conn.executemany("DELETE FROM llm_responses WHERE key = ?", victims)
+        
+        self._count('expired', expired)
+        self._count('evictions', len(victims))
+    
+    def purge(self, model: Optional[str] = None, expired_only: bool = False) -> int:
+        """Delete cached responses (all, one model's, or only expired ones); returns how many"""
+        clauses, params = [], []
+        if model:
+            clauses.append("model = ?")
+            params.append(model)
+        if expired_only:
+            clauses.append("expires_at <= ?")
+            params.append(time.time())
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        
+        conn = self._connect()
+        with conn:
+            return conn.execute(f"DELETE FROM llm_responses{where}", params).rowcount
+    
+    def get_stats(self) -> Dict:
+        """Get hit/miss counters and the size of the cache"""
+        entries, size = self._connect().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_responses"
+        ).fetchone()
+        with self._lock:
+            counters = dict(self._counters)
+        
+        lookups = counters['hits'] + counters['misses']
+        return {
+            'entries': entries,
+            'bytes': size,
+            'max_bytes': self.max_bytes,
+            'hit_rate': round(counters['hits'] / lookups, 3) if lookups else None,
+            **counters
+        }
+
+def init_response_cache(app: Flask) -> Optional[ResponseCache]:
+    """Attach the LLM response cache to the app"""
+    if not app.config.get('LLM_RESPONSE_CACHE_ENABLED', True):
+        return None
+    
+    app.response_cache = ResponseCache(
+        app.config.get('LLM_RESPONSE_CACHE_PATH', './data/llm_response_cache.sqlite3'),
+        max_bytes=int(app.config.get('LLM_RESPONSE_CACHE_MAX_MB', 64) * 1024 * 1024),
+        ttl_seconds=app.config.get('LLM_RESPONSE_CACHE_TTL', 7 * 24 * 3600),
+        max_temperature=app.config.get('LLM_RESPONSE_CACHE_MAX_TEMPERATURE', 0.3)
+    )
+    return app.response_cache
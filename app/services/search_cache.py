@@ -0,0 +1,92 @@
+"""
+Search Caches for AI Email Assistant
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+from app.models import db
+from app.models.user import User
+
+def normalize_query(text: str) -> str:
+    """Cache key form of query text: whitespace collapsed and case folded
+    
+    The default embedding model (all-MiniLM-L6-v2) is uncased and full-text
+    matching is case-insensitive, so this does not change results.
+    """
+    return ' '.join((text or '').split()).casefold()
+
+class LRUCache:
+    """Thread-safe LRU cache whose entries also expire after ttl_seconds"""
+    
+    def __init__(self, max_entries: int = 1024, ttl_seconds: Optional[float] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expired': 0}
+    
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Get a cached value, or None on a miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl_seconds is not None and time.monotonic() - entry[1] > self.ttl_seconds:
+                del self._entries[key]
+                self._stats['expired'] += 1
+                entry = None
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return entry[0]
+    
+    def put(self, key: Hashable, value: Any):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+    
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """Get a cached value, computing and storing it on a miss"""
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.put(key, value)
+        return value
+    
+    def discard(self, key: Hashable):
+        with self._lock:
+            self._entries.pop(key, None)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def get_stats(self) -> Dict:
+        """Get hit/miss counters, hit rate and current size"""
+        with self._lock:
+            stats = dict(self._stats, entries=len(self._entries), max_entries=self.max_entries)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 3) if lookups else None
+        return stats
+
+def get_search_generation(user_id: int) -> Optional[int]:
+    """Current search generation for a user (None if the user does not exist)"""
+    return db.session.execute(
+        db.select(User.search_generation).where(User.id == user_id)
+    ).scalar()
+
+def bump_search_generation(user_id: int, commit: bool = True):
+    """Invalidate a user's cached search results after their emails change
+    
+    The counter lives on the user row, so a sync in another process (sync_worker.py)
+    invalidates the web process's caches too.
+    """
+    db.session.execute(
+        db.update(User).where(User.id == user_id).values(search_generation=User.search_generation + 1)
+    )
+    if commit:
+        db.session.commit()
@@ -0,0 +1,100 @@
+"""
+Precomputed Similar Emails for AI Email Assistant
+"""
+from typing import Dict, Iterable, List, Optional, Tuple
+from flask import Flask
+from app.models import db
+from app.models.email import Email
+from app.models.email_neighbor import EmailNeighbor
+
+class SimilarEmailIndex:
+    """Top-k similar emails per email, kept in the email_neighbors table
+    
+    Lists are computed from the embeddings already in the vector store (no
+    re-embedding), in batches of batched nearest-neighbor queries. New mail is added
+    incrementally: each new email gets its own list, and is inserted into the lists
+    of its neighbors where it beats their weakest entry. Detail views then read a
+    list with one indexed lookup instead of querying the vector store.
+    """
+    
+    def __init__(self, app: Flask):
+        self.app = app
+        self.k = app.config.get('SIMILAR_EMAILS_K', 10)
+        self.batch_size = app.config.get('SIMILAR_EMAILS_BATCH_SIZE', 256)
+    
+    @property
+    def available(self) -> bool:
+        return hasattr(self.app, 'vector_service') and self.app.vector_service.available
+    
+    def add_emails(self, user_id: int, email_ids: Iterable[int]) -> int:
+        """Index newly embedded emails and update the lists they now belong in
+        
+        Returns the number of neighbor lists written.
+        """
+        written = 0
+        email_ids = list(email_ids)
+        for start in range(0, len(email_ids), self.batch_size):
+            fresh = self._neighbors(user_id, email_ids[start:start + self.batch_size])
+            lists = dict(fresh)
+            
+            # Reverse insertion: a new email may displace the weakest entry of a neighbor's list.
+            # Emails without a list yet are left for the next rebuild.
+            candidates = {}
+            for email_id, neighbors in fresh.items():
+                for neighbor_id, score in neighbors:
+                    if neighbor_id not in fresh:
+                        candidates.setdefault(neighbor_id, []).append((email_id, score))
+            
+            for neighbor_id, current in EmailNeighbor.get_lists(candidates).items():
+                merged = self._merge(current, candidates[neighbor_id])
+                if merged != current:
+                    lists[neighbor_id] = merged
+            
+            EmailNeighbor.replace_lists(lists)
+            db.session.commit()
+            written += len(lists)
+        return written
+    
+    def refresh_emails(self, user_id: int, email_ids: Iterable[int]) -> int:
+        """Recompute the lists of the given emails from scratch
+        
+        Emails that no longer have a stored vector get an empty list. Returns the
+        number of emails refreshed.
+        """
+        email_ids = list(email_ids)
+        for start in range(0, len(email_ids), self.batch_size):
+            batch = email_ids[start:start + self.batch_size]
+            fresh = self._neighbors(user_id, batch)
+            EmailNeighbor.replace_lists({email_id: fresh.get(email_id, []) for email_id in batch})
+            db.session.commit()
+        return len(email_ids)
+    
+    def rebuild_user(self, user_id: int) -> int:
+        """Recompute every neighbor list for a user's mailbox"""
+        email_ids = [
+            email_id for (email_id,) in
+            db.session.query(Email.id).filter_by(user_id=user_id).order_by(Email.id)
+        ]
+        self.refresh_emails(user_id, email_ids)
+        self.app.logger.info(f"Rebuilt similar-email lists for {len(email_ids)} emails of user {user_id}")
+        return len(email_ids)
+    
+    def _neighbors(self, user_id: int, email_ids: List[int]) -> Dict[int, List[Tuple[int, float]]]:
+        if not self.available:
+            return {}
+        return self.app.vector_service.get_neighbors(user_id, email_ids, self.k)
+    
+    def _merge(self, current: List[Tuple[int, float]], candidates: List[Tuple[int, float]]) -> List[Tuple[int, float]]:
+        """Best k entries of two neighbor lists, one entry per neighbor"""
+        scores = dict(current)
+        for neighbor_id, score in candidates:
+            scores[neighbor_id] = max(score, scores.get(neighbor_id, score))
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:self.k]
+
+def init_similar_emails(app: Flask) -> Optional[SimilarEmailIndex]:
+    """Attach the similar-email index to the app"""
+    if not app.config.get('SIMILAR_EMAILS_ENABLED', True):
+        return None
+    
+    app.similar_emails = SimilarEmailIndex(app)
+    return app.similar_emails
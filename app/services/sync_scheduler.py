@@ -0,0 +1,257 @@
+"""
+Periodic Email Sync Scheduler for AI Email Assistant
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+from flask import Flask
+from app.models import db
+from app.models.user import User
+from app.services.graph_tokens import get_access_token
+
+class SyncScheduler:
+    """Runs delta syncs for every active user on a bounded thread pool
+    
+    Each pass picks the users whose last sync is older than EMAIL_SYNC_INTERVAL_MINUTES,
+    most overdue (and recently active) first, and syncs their SYNC_FOLDERS one after
+    another on a worker thread. A lease on the user row (User.claim_sync) keeps a user
+    from being synced twice at once, across threads and processes. A user whose sync fails is not retried until next_sync_at, one interval after
+    the first failure and twice as long after each further one (capped at
+    SYNC_FAILURE_BACKOFF_MAX_HOURS). Runs inside the web app or as a standalone worker
+    (sync_worker.py).
+    """
+    
+    def __init__(self, app: Flask, token_provider: Optional[Callable[[User], Optional[str]]] = None):
+        self.app = app
+        self.interval = timedelta(minutes=app.config.get('EMAIL_SYNC_INTERVAL_MINUTES', 30))
+        self.worker_count = app.config.get('SYNC_SCHEDULER_WORKERS', 4)
+        self.poll_seconds = app.config.get('SYNC_SCHEDULER_POLL_SECONDS', 60)
+        self.folders = app.config.get('SYNC_FOLDERS', ['inbox', 'sentitems'])
+        self.page_size = app.config.get('SYNC_PAGE_SIZE', 100)
+        self.active_window = timedelta(days=app.config.get('SYNC_ACTIVE_USER_DAYS', 7))
+        self.max_backoff = timedelta(hours=app.config.get('SYNC_FAILURE_BACKOFF_MAX_HOURS', 24))
+        self.lease_seconds = app.config.get('SYNC_LEASE_MINUTES', 60) * 60
+        self.token_provider = token_provider or get_access_token
+        
+        self._executor = ThreadPoolExecutor(max_workers=self.worker_count, thread_name_prefix='email-sync')
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._syncing = set()
+        self._last_run = None
+        self._runs = 0
+    
+    def start(self):
+        """Start the scheduling loop in a background thread"""
+        if self._thread:
+            return
+        
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self.run_forever, name='sync-scheduler', daemon=True)
+        self._thread.start()
+        self.app.logger.info(f"Sync scheduler started with {self.worker_count} workers")
+    
+    def stop(self, timeout: float = 30):
+        """Stop scheduling; in-flight user syncs are allowed to finish"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+        self._executor.shutdown(wait=True)
+    
+    def run_forever(self):
+        """Run sync passes until stopped"""
+        while not self._stop_event.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                self.app.logger.error(f"Sync scheduler error: {e}")
+            self._stop_event.wait(self.poll_seconds)
+    
+    def run_once(self) -> Dict:
+        """Sync every due user once and return the run report"""
+        started = time.perf_counter()
+        started_at = datetime.utcnow()
+        
+        with self.app.app_context():
+            try:
+                user_ids = self.get_due_user_ids()
+            finally:
+                db.session.remove()
+        
+        futures = [self._executor.submit(self._sync_user, user_id) for user_id in user_ids]
+        results = [future.result() for future in futures]
+        
+        report = {
+            'started_at': started_at.isoformat(),
+            'duration_seconds': round(time.perf_counter() - started, 3),
+            'users_due': len(user_ids),
+            'users_synced': sum(1 for r in results if r['status'] == 'synced'),
+            'users_skipped': sum(1 for r in results if r['status'] != 'synced'),
+            'new_count': sum(r.get('new_count', 0) for r in results),
+            'errors': sum(len(r.get('errors', [])) for r in results),
+            'users': results
+        }
+        
+        with self._lock:
+            self._last_run = report
+            self._runs += 1
+        
+        if user_ids:
+            self.app.logger.info(
+                f"Sync run: {report['users_synced']}/{len(user_ids)} users, "
+                f"{report['new_count']} new emails in {report['duration_seconds']:.1f}s"
+            )
+        return report
+    
+    def get_due_user_ids(self, now: Optional[datetime] = None) -> List[int]:
+        """Get active users due for a sync, highest priority first
+        
+        Priority is staleness measured in sync intervals (never-synced users count as
+        most stale), doubled for users who logged in within SYNC_ACTIVE_USER_DAYS.
+        """
+        now = now or datetime.utcnow()
+        cutoff = now - self.interval
+        
+        rows = db.session.query(User.id, User.last_email_sync, User.last_login).filter(
+            User.is_active.is_(True),
+            db.or_(User.last_email_sync.is_(None), User.last_email_sync <= cutoff),
+            db.or_(User.next_sync_at.is_(None), User.next_sync_at <= now)
+        ).all()
+        
+        def priority(row):
+            if row.last_email_sync is None:
+                staleness = float('inf')
+            else:
+                staleness = (now - row.last_email_sync) / self.interval
+            active = row.last_login is not None and now - row.last_login <= self.active_window
+            return staleness * (2 if active else 1)
+        
+        return [row.id for row in sorted(rows, key=priority, reverse=True)]
+    
+    def sync_user_now(self, user_id: int) -> Dict:
+        """Sync one user immediately (used by manual sync triggers)"""
+        return self._sync_user(user_id)
+    
+    def get_stats(self) -> Dict:
+        """Get scheduler configuration and the last run report (without per-user detail)"""
+        with self._lock:
+            last_run = dict(self._last_run, users=None) if self._last_run else None
+            syncing = len(self._syncing)
+            runs = self._runs
+        
+        return {
+            'running': bool(self._thread and self._thread.is_alive()),
+            'workers': self.worker_count,
+            'interval_minutes': self.interval.total_seconds() / 60,
+            'folders': self.folders,
+            'runs': runs,
+            'syncing_users': syncing,
+            'last_run': last_run
+        }
+    
+    def _sync_user(self, user_id: int) -> Dict:
+        """Sync all configured folders for one user, skipping if already in progress"""
+        with self.app.app_context():
+            try:
+                claimed = User.claim_sync(user_id, self.lease_seconds)
+            finally:
+                db.session.remove()
+        if not claimed:
+            return {'user_id': user_id, 'status': 'already_syncing'}
+        
+        with self._lock:
+            self._syncing.add(user_id)
+        
+        # Import here to avoid circular imports
+        from app.services.ms_graph import GraphService
+        from app.services.email_processor import EmailProcessor
+        
+        started = time.perf_counter()
+        result = {'user_id': user_id, 'status': 'synced', 'new_count': 0, 'errors': [], 'folders': {}}
+        
+        try:
+            with self.app.app_context():
+                try:
+                    user = db.session.get(User, user_id)
+                    if not user or not user.is_active:
+                        result['status'] = 'inactive'
+                        return result
+                    
+                    access_token = self.token_provider(user)
+                    if not access_token:
+                        result['status'] = 'no_token'
+                        self._record_outcome(user_id, result)
+                        return result
+                    
+                    graph_service = GraphService(tenant_id=user.azure_tenant_id)
+                    processor = EmailProcessor()
+                    
+                    for folder in self.folders:
+                        folder_started = time.perf_counter()
+                        folder_result = processor.sync_user_emails_delta(
+                            user, graph_service, access_token, folder=folder, page_size=self.page_size
+                        )
+                        result['folders'][folder] = round(time.perf_counter() - folder_started, 3)
+                        result['new_count'] += folder_result['new_count']
+                        result['errors'].extend(folder_result['errors'])
+                
+                    self._record_outcome(user_id, result)
+                
+                except Exception as e:
+                    self.app.logger.error(f"Scheduled sync failed for user {user_id}: {e}")
+                    db.session.rollback()
+                    result['status'] = 'error'
+                    result['errors'].append(str(e))
+                    self._record_outcome(user_id, result)
+                finally:
+                    self._release(user_id)
+                    db.session.remove()
+        finally:
+            with self._lock:
+                self._syncing.discard(user_id)
+            result['duration_seconds'] = round(time.perf_counter() - started, 3)
+        
+        return result
+    
+    def _release(self, user_id: int):
+        """Release the user's sync lease"""
+        try:
+            User.release_sync(user_id)
+        except Exception as e:
+            self.app.logger.error(f"Could not release sync lease for user {user_id}: {e}")
+            db.session.rollback()
+    
+    def _record_outcome(self, user_id: int, result: Dict):
+        """Back off from a user whose sync failed; a clean sync clears the backoff"""
+        try:
+            user = db.session.get(User, user_id)
+            if result['status'] == 'synced' and not result['errors']:
+                if user.sync_failures or user.next_sync_at:
+                    user.sync_failures = 0
+                    user.next_sync_at = None
+                    db.session.commit()
+                return
+            
+            user.sync_failures = (user.sync_failures or 0) + 1
+            delay = min(self.interval * 2 ** (user.sync_failures - 1), self.max_backoff)
+            user.next_sync_at = datetime.utcnow() + delay
+            db.session.commit()
+            result['next_sync_at'] = user.next_sync_at.isoformat()
+        
+        except Exception as e:
+            self.app.logger.error(f"Could not record sync outcome for user {user_id}: {e}")
+            db.session.rollback()
+    
+def init_sync_scheduler(app: Flask) -> Optional[SyncScheduler]:
+    """Attach the sync scheduler to the app and start it when enabled"""
+    if not app.config.get('SYNC_SCHEDULER_ENABLED', False):
+        return None
+    
+    app.sync_scheduler = SyncScheduler(app)
+    if not app.config.get('TESTING'):
+        app.sync_scheduler.start()
+    
+    return app.sync_scheduler
@@ -0,0 +1,854 @@
+"""
+Vector Store Backends for AI Email Assistant
+"""
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Protocol
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+
+VECTOR_BACKENDS = ('chromadb', 'native')
+VECTOR_PRECISIONS = ('float32', 'float16', 'int8')
+
+class VectorCollection(Protocol):
+    """The part of the ChromaDB collection API that VectorDBService relies on"""
+    
+    name: str
+    
+    def count(self) -> int: ...
+    
+    def get(self, ids: Optional[List[str]] = None, where: Optional[Dict] = None, limit: Optional[int] = None,
+            offset: Optional[int] = None, include: Optional[List[str]] = None) -> Dict: ...
+    
+    def query(self, query_texts: Optional[List[str]] = None, query_embeddings: Optional[List] = None,
+              n_results: int = 10, where: Optional[Dict] = None, include: Optional[List[str]] = None) -> Dict: ...
+    
+    def upsert(self, ids: List[str], documents: Optional[List[str]] = None, metadatas: Optional[List[Dict]] = None,
+               embeddings: Optional[List] = None) -> None: ...
+    
+    def delete(self, ids: Optional[List[str]] = None, where: Optional[Dict] = None) -> None: ...
+
+class VectorClient(Protocol):
+    """The part of the ChromaDB client API that VectorDBService relies on"""
+    
+    def get_collection(self, name: str, embedding_function: Optional[Callable] = None) -> VectorCollection: ...
+    
+    def create_collection(self, name: str, embedding_function: Optional[Callable] = None,
+                          metadata: Optional[Dict] = None) -> VectorCollection: ...
+    
+    def get_or_create_collection(self, name: str, embedding_function: Optional[Callable] = None,
+                                 metadata: Optional[Dict] = None) -> VectorCollection: ...
+    
+    def delete_collection(self, name: str) -> None: ...
+    
+    def list_collections(self) -> List[VectorCollection]: ...
+
+def create_vector_client(backend: str, path: str, **options) -> VectorClient:
+    """Open the configured vector store backend at path
+    
+    For 'chromadb', passing host connects to a Chroma server instead (see
+    get_remote_client) and path is unused.
+    """
+    if backend == 'chromadb':
+        if options.get('host'):
+            return get_remote_client(**options)
+        
+        import chromadb
+        from chromadb.config import Settings
+        
+        return chromadb.PersistentClient(
+            path=path,
+            settings=Settings(
+                anonymized_telemetry=False,
+                allow_reset=True
+            )
+        )
+    if backend == 'native':
+        return NativeVectorClient(os.path.join(path, 'native'), **options)
+    raise ValueError(f"Unknown vector backend {backend!r}; expected one of {', '.join(VECTOR_BACKENDS)}")
+
+_remote_clients = {}
+_remote_clients_lock = threading.Lock()
+
+def get_remote_client(host: str, port: int = 8000, ssl: bool = False, **options) -> 'RemoteChromaClient':
+    """The process-wide client for a Chroma server, created on first use
+    
+    Every VectorDBService in the process (app, workers, scripts) shares its
+    connection pool. Raises if the server does not answer a heartbeat.
+    """
+    key = (host, int(port), ssl)
+    with _remote_clients_lock:
+        client = _remote_clients.get(key)
+        if client is None:
+            client = _remote_clients[key] = RemoteChromaClient(host, port, ssl, **options)
+        return client
+
+class PooledHTTPAdapter(HTTPAdapter):
+    """requests adapter with a bounded connection pool, a default timeout and a failure breaker
+    
+    After a connection error or timeout the server is reported unhealthy for
+    retry_after seconds, so callers skip it instead of each waiting out the timeout.
+    """
+    
+    OPERATIONS = ('heartbeat', 'add', 'upsert', 'update', 'get', 'query', 'delete', 'count')
+    
+    def __init__(self, pool_size: int = 10, timeout: float = 10.0, retry_after: float = 30.0):
+        super().__init__(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self._down_until = 0.0
+        self._stats_lock = threading.Lock()
+        self._stats = {'requests': 0, 'failures': 0, 'operations': {}}
+    
+    @property
+    def healthy(self) -> bool:
+        return time.monotonic() >= self._down_until
+    
+    def send(self, request, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.timeout
+        
+        operation = request.path_url.split('?')[0].rstrip('/').rsplit('/', 1)[-1]
+        operation = operation if operation in self.OPERATIONS else 'other'
+        with self._stats_lock:
+            self._stats['requests'] += 1
+            self._stats['operations'][operation] = self._stats['operations'].get(operation, 0) + 1
+        
+        try:
+            response = super().send(request, **kwargs)
+        except (requests.ConnectionError, requests.Timeout):
+            with self._stats_lock:
+                self._stats['failures'] += 1
+            self._down_until = time.monotonic() + self.retry_after
+            raise
+        self._down_until = 0.0
+        return response
+    
+    def get_stats(self) -> Dict:
+        with self._stats_lock:
+            stats = dict(self._stats, operations=dict(self._stats['operations']))
+        stats.update(healthy=self.healthy, pool_size=self.pool_size, timeout=self.timeout)
+        return stats
+
+class RemoteChromaClient:
+    """A Chroma server reached through chromadb.HttpClient over a PooledHTTPAdapter
+    
+    Collections are opened with the caller's embedding function and VectorDBService
+    sends embeddings with every write and query, so the server never needs the model.
+    """
+    
+    def __init__(self, host: str, port: int = 8000, ssl: bool = False, headers: Optional[Dict[str, str]] = None,
+                 pool_size: int = 10, timeout: float = 10.0, retry_after: float = 30.0):
+        import chromadb
+        from chromadb.config import Settings
+        
+        self.url = f"{'https' if ssl else 'http'}://{host}:{port}"
+        self.adapter = PooledHTTPAdapter(pool_size, timeout, retry_after)
+        
+        # Probe first: HttpClient calls the server while it is constructed, before a timeout can be set
+        probe = requests.Session()
+        probe.mount('http://', self.adapter)
+        probe.mount('https://', self.adapter)
+        probe.get(f"{self.url}/api/v1/heartbeat", headers=headers).raise_for_status()
+        
+        self.client = chromadb.HttpClient(
+            host=host, port=str(port), ssl=ssl, headers=headers,
+            settings=Settings(anonymized_telemetry=False)
+        )
+        # chromadb's HTTP API keeps one requests session; route it through the shared pool
+        session = self.client._server._session
+        session.mount('http://', self.adapter)
+        session.mount('https://', self.adapter)
+        self._max_batch_size = None
+    
+    @property
+    def healthy(self) -> bool:
+        """False for retry_after seconds after the server last failed to answer"""
+        return self.adapter.healthy
+    
+    @property
+    def max_batch_size(self) -> Optional[int]:
+        """Most records the server accepts in one write, if it says"""
+        if self._max_batch_size is None:
+            try:
+                self._max_batch_size = self.client.max_batch_size
+            except Exception:
+                return None
+        return self._max_batch_size
+    
+    def heartbeat(self) -> int:
+        return self.client.heartbeat()
+    
+    def get_collection(self, name: str, embedding_function: Optional[Callable] = None):
+        return self.client.get_collection(name=name, embedding_function=embedding_function)
+    
+    def create_collection(self, name: str, embedding_function: Optional[Callable] = None,
+                          metadata: Optional[Dict] = None):
+        return self.client.create_collection(name=name, embedding_function=embedding_function, metadata=metadata)
+    
+    def get_or_create_collection(self, name: str, embedding_function: Optional[Callable] = None,
+                                 metadata: Optional[Dict] = None):
+        return self.client.get_or_create_collection(name=name, embedding_function=embedding_function, metadata=metadata)
+    
+    def delete_collection(self, name: str):
+        self.client.delete_collection(name=name)
+    
+    def list_collections(self) -> List:
+        return self.client.list_collections()
+    
+    def get_stats(self) -> Dict:
+        return dict(self.adapter.get_stats(), url=self.url, max_batch_size=self._max_batch_size)
+
+class NativeVectorClient:
+    """Embedded vector store: one directory of memory-mapped float16 vectors per collection
+    
+    Needs nothing beyond NumPy and SQLite and opens collections lazily, so startup
+    cost is a directory listing. Each collection is meant to be written by one
+    process at a time, as with the ChromaDB persistent client.
+    """
+    
+    def __init__(self, path: str, ivf_threshold: int = 50000, ivf_probes: int = 12, precision: str = 'float16',
+                 rerank: int = 0):
+        if precision not in VECTOR_PRECISIONS:
+            raise ValueError(f"Unknown vector precision {precision!r}; expected one of {', '.join(VECTOR_PRECISIONS)}")
+        self.path = path
+        self.ivf_threshold = ivf_threshold
+        self.ivf_probes = ivf_probes
+        self.precision = precision
+        self.rerank = rerank
+        os.makedirs(path, exist_ok=True)
+        
+        self._collections = {}
+        self._lock = threading.Lock()
+    
+    def get_collection(self, name: str, embedding_function: Optional[Callable] = None) -> 'NativeCollection':
+        with self._lock:
+            if not os.path.exists(os.path.join(self.path, name, NativeCollection.RECORDS_FILE)):
+                raise ValueError(f"Collection {name} does not exist.")
+            return self._open(name, embedding_function)
+    
+    def create_collection(self, name: str, embedding_function: Optional[Callable] = None,
+                          metadata: Optional[Dict] = None) -> 'NativeCollection':
+        with self._lock:
+            if os.path.exists(os.path.join(self.path, name, NativeCollection.RECORDS_FILE)):
+                raise ValueError(f"Collection {name} already exists.")
+            return self._open(name, embedding_function, metadata)
+    
+    def get_or_create_collection(self, name: str, embedding_function: Optional[Callable] = None,
+                                 metadata: Optional[Dict] = None) -> 'NativeCollection':
+        with self._lock:
+            return self._open(name, embedding_function, metadata)
+    
+    def delete_collection(self, name: str):
+        with self._lock:
+            if not os.path.isdir(os.path.join(self.path, name)):
+                raise ValueError(f"Collection {name} does not exist.")
+            collection = self._collections.pop(name, None)
+            if collection:
+                collection.close()
+            shutil.rmtree(os.path.join(self.path, name))
+    
+    def list_collections(self) -> List['NativeCollection']:
+        names = sorted(
+            name for name in os.listdir(self.path)
+            if os.path.exists(os.path.join(self.path, name, NativeCollection.RECORDS_FILE))
+        )
+        return [self.get_collection(name) for name in names]
+    
+    def _open(self, name: str, embedding_function: Optional[Callable], metadata: Optional[Dict] = None) -> 'NativeCollection':
+        collection = self._collections.get(name)
+        if collection is None:
+            collection = NativeCollection(
+                os.path.join(self.path, name), name, metadata=metadata,
+                ivf_threshold=self.ivf_threshold, ivf_probes=self.ivf_probes,
+                precision=self.precision, rerank=self.rerank
+            )
+            self._collections[name] = collection
+        if embedding_function is not None:
+            collection.embedding_function = embedding_function
+        return collection
+
+class NativeCollection:
+    """A collection stored as memory-mapped vectors plus a SQLite table of IDs, documents and metadata
+    
+    Vectors are normalised on write and scored by cosine similarity; query distances
+    are 1 - cosine. Deletes tombstone a row, and the row is reused by a later insert.
+    Collections up to ivf_threshold live vectors are searched exactly; larger ones use
+    an IVF index once build_index() has run, probing the ivf_probes lists nearest the
+    query. The vector precision (see VectorStorage) is fixed when the collection is
+    created and can be changed later with convert(). When int8 codes are stored with
+    float16 originals, the best n_results * rerank candidates are re-scored against them.
+    """
+    
+    RECORDS_FILE = 'records.sqlite3'
+    INDEX_FILE = 'ivf.npz'
+    
+    def __init__(self, path: str, name: str, metadata: Optional[Dict] = None, embedding_function: Optional[Callable] = None,
+                 ivf_threshold: int = 50000, ivf_probes: int = 12, precision: str = 'float16', rerank: int = 0):
+        self.path = path
+        self.name = name
+        self.embedding_function = embedding_function
+        self.ivf_threshold = ivf_threshold
+        self.ivf_probes = ivf_probes
+        self.rerank = rerank
+        os.makedirs(path, exist_ok=True)
+        
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(os.path.join(path, self.RECORDS_FILE), check_same_thread=False)
+        self._conn.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS records (
+                row INTEGER PRIMARY KEY,
+                doc_id TEXT UNIQUE,
+                document TEXT,
+                metadata TEXT
+            );
+            CREATE TABLE IF NOT EXISTS info (key TEXT PRIMARY KEY, value TEXT);
+        """)
+        if metadata is not None:
+            self._conn.execute("INSERT OR IGNORE INTO info VALUES ('metadata', ?)", (json.dumps(metadata),))
+        
+        info = dict(self._conn.execute("SELECT key, value FROM info WHERE key IN ('dim', 'precision', 'refine')"))
+        if 'precision' not in info:
+            # Collections written before precision was configurable hold float16 vectors
+            info['precision'] = 'float16' if 'dim' in info else precision
+            info['refine'] = '0' if 'dim' in info else str(int(precision == 'int8' and rerank > 0))
+            self._conn.executemany("INSERT OR REPLACE INTO info VALUES (?, ?)",
+                                   [('precision', info['precision']), ('refine', info['refine'])])
+        self._conn.commit()
+        self.precision = info['precision']
+        self.refine = info.get('refine') == '1'
+        
+        self._loaded = False
+    
+    @property
+    def metadata(self) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM info WHERE key = 'metadata'").fetchone()
+        return json.loads(row[0]) if row else None
+    
+    def count(self) -> int:
+        with self._lock:
+            self._load()
+            return len(self._rows)
+    
+    def get(self, ids: Optional[List[str]] = None, where: Optional[Dict] = None, limit: Optional[int] = None,
+            offset: Optional[int] = None, include: Optional[List[str]] = None) -> Dict:
+        include = ['metadatas', 'documents'] if include is None else include
+        with self._lock:
+            self._load()
+            if ids is not None:
+                rows = np.array([self._rows[doc_id] for doc_id in ids if doc_id in self._rows], dtype=np.int64)
+                if where:
+                    rows = rows[self._where_mask(where)[rows]]
+            else:
+                rows = np.flatnonzero(self._where_mask(where) if where else self._alive[:self._size])
+            rows = rows[offset or 0:]
+            if limit is not None:
+                rows = rows[:limit]
+            return self._result(rows, include)
+    
+    def query(self, query_texts: Optional[List[str]] = None, query_embeddings: Optional[List] = None,
+              n_results: int = 10, where: Optional[Dict] = None, include: Optional[List[str]] = None) -> Dict:
+        include = ['metadatas', 'documents', 'distances'] if include is None else include
+        if query_embeddings is None:
+            query_embeddings = self._embed(query_texts)
+        queries = self._normalise(np.asarray(query_embeddings, dtype=np.float32))
+        
+        batches = {key: [] for key in ('ids', 'documents', 'metadatas', 'embeddings', 'distances')}
+        with self._lock:
+            self._load()
+            mask = self._where_mask(where) if where else None
+            for query in queries:
+                rows, scores = self._search(query, n_results, mask)
+                result = self._result(rows, include)
+                result['distances'] = (1 - scores).tolist() if 'distances' in include else None
+                for key in batches:
+                    batches[key].append(result[key])
+        
+        return {key: (values if values and values[0] is not None else None) for key, values in batches.items()}
+    
+    def upsert(self, ids: List[str], documents: Optional[List[str]] = None, metadatas: Optional[List[Dict]] = None,
+               embeddings: Optional[List] = None):
+        if embeddings is None:
+            embeddings = self._embed(documents)
+        vectors = self._normalise(np.asarray(embeddings, dtype=np.float32))
+        documents = documents or [None] * len(ids)
+        metadatas = metadatas or [None] * len(ids)
+        
+        with self._lock:
+            self._load()
+            if self._dim is None:
+                self._dim = vectors.shape[1]
+                self._conn.execute("INSERT OR REPLACE INTO info VALUES ('dim', ?)", (str(self._dim),))
+                self._storage = VectorStorage(self.path, self.precision, self._dim, len(self._alive), self.refine)
+            elif vectors.shape[1] != self._dim:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match collection dimension {self._dim}")
+            
+            # Last write wins for IDs repeated within one call
+            latest = {doc_id: i for i, doc_id in enumerate(ids)}
+            records = []
+            rows = []
+            for doc_id, i in latest.items():
+                row = self._rows.get(doc_id)
+                if row is None:
+                    row = self._free.pop() if self._free else self._append_row()
+                    self._rows[doc_id] = row
+                    self._ids[row] = doc_id
+                    self._alive[row] = True
+                self._metadatas[row] = metadatas[i]
+                rows.append(row)
+                records.append((row, doc_id, documents[i], json.dumps(metadatas[i]) if metadatas[i] is not None else None))
+            
+            rows = np.array(rows, dtype=np.int64)
+            written = vectors[list(latest.values())]
+            self._storage.write(rows, written)
+            if self._assignments is not None:
+                self._assignments[rows] = self._assign(written)
+                self._lists = None
+            
+            self._conn.executemany("INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?)", records)
+            self._conn.commit()
+            self._columns = {}
+    
+    def delete(self, ids: Optional[List[str]] = None, where: Optional[Dict] = None):
+        with self._lock:
+            self._load()
+            if ids is not None:
+                rows = [self._rows[doc_id] for doc_id in ids if doc_id in self._rows]
+                if where:
+                    mask = self._where_mask(where)
+                    rows = [row for row in rows if mask[row]]
+            else:
+                rows = np.flatnonzero(self._where_mask(where)).tolist() if where else []
+            rows = sorted(set(rows))
+            if not rows:
+                return
+            
+            # Tombstone: the vector stays in place until an insert reuses the row
+            for row in rows:
+                del self._rows[self._ids[row]]
+                self._ids[row] = None
+                self._metadatas[row] = None
+                self._alive[row] = False
+                self._free.append(row)
+            self._conn.executemany(
+                "UPDATE records SET doc_id = NULL, document = NULL, metadata = NULL WHERE row = ?",
+                [(row,) for row in rows]
+            )
+            self._conn.commit()
+            self._columns = {}
+    
+    def build_index(self, lists: Optional[int] = None, iterations: int = 10, seed: int = 0) -> Dict:
+        """Train an IVF index (spherical k-means over a sample) and assign every row to a list"""
+        with self._lock:
+            self._load()
+            live = np.flatnonzero(self._alive[:self._size])
+            if not len(live):
+                return {'lists': 0, 'vectors': 0}
+            
+            lists = min(lists or max(1, int(2 * np.sqrt(len(live)))), len(live))
+            rng = np.random.default_rng(seed)
+            sample = np.sort(rng.choice(live, size=min(len(live), lists * 40), replace=False))
+            sample = self._storage.decode(sample)
+            
+            centroids = sample[rng.choice(len(sample), size=lists, replace=False)]
+            for _ in range(iterations):
+                assignment = np.argmax(sample @ centroids.T, axis=1)
+                sums = np.zeros_like(centroids)
+                np.add.at(sums, assignment, sample)
+                empty = np.bincount(assignment, minlength=lists) == 0
+                sums[empty] = sample[rng.choice(len(sample), size=int(empty.sum()))]
+                centroids = self._normalise(sums)
+            
+            self._centroids = centroids
+            self._assignments = np.full(len(self._alive), -1, dtype=np.int32)
+            for start in range(0, self._size, 16384):
+                end = min(start + 16384, self._size)
+                self._assignments[start:end] = self._assign(self._storage.decode(slice(start, end)))
+            self._lists = None
+            
+            np.savez(os.path.join(self.path, self.INDEX_FILE), centroids=self._centroids,
+                     assignments=self._assignments[:self._size], trained_size=len(live))
+            self._trained_size = len(live)
+            return {'lists': lists, 'vectors': len(live)}
+    
+    def convert(self, precision: str, refine: bool = False) -> Dict:
+        """Rewrite the stored vectors in another precision
+        
+        refine keeps float16 originals beside int8 codes for re-ranking. Converting
+        int8 codes without originals to a wider precision does not restore accuracy.
+        """
+        if precision not in VECTOR_PRECISIONS:
+            raise ValueError(f"Unknown vector precision {precision!r}; expected one of {', '.join(VECTOR_PRECISIONS)}")
+        refine = refine and precision == 'int8'
+        
+        with self._lock:
+            self._load()
+            if (precision, refine) != (self.precision, self.refine):
+                if self._storage is not None:
+                    # Written to a staging directory first: the new files may reuse the old names
+                    staging = os.path.join(self.path, 'converting')
+                    shutil.rmtree(staging, ignore_errors=True)
+                    converted = VectorStorage(staging, precision, self._dim, len(self._alive), refine)
+                    for start in range(0, self._size, VectorStorage.SCAN_CHUNK):
+                        rows = slice(start, min(start + VectorStorage.SCAN_CHUNK, self._size))
+                        converted.write(rows, self._storage.decode(rows))
+                    converted.close()
+                    
+                    for filename in self._storage.files():
+                        os.remove(os.path.join(self.path, filename))
+                    self._storage.close()
+                    for filename in converted.files():
+                        os.replace(os.path.join(staging, filename), os.path.join(self.path, filename))
+                    shutil.rmtree(staging)
+                
+                self._conn.executemany("INSERT OR REPLACE INTO info VALUES (?, ?)",
+                                       [('precision', precision), ('refine', str(int(refine)))])
+                self._conn.commit()
+                self.precision, self.refine = precision, refine
+                if self._storage is not None:
+                    self._storage = VectorStorage(self.path, precision, self._dim, len(self._alive), refine)
+            return self.get_storage_stats()
+    
+    def get_storage_stats(self) -> Dict:
+        """Precision and the bytes the vectors take on disk and per exact scan"""
+        with self._lock:
+            self._load()
+            stats = {'precision': self.precision, 'refine': self.refine, 'vectors': len(self._rows),
+                     'disk_bytes': 0, 'scan_bytes': 0}
+            if self._storage is not None:
+                stats.update(self._storage.get_stats(self._size))
+            return stats
+    
+    def index_stale(self) -> bool:
+        """Whether the collection is above the IVF threshold with no index, or has doubled since training"""
+        with self._lock:
+            self._load()
+            live = len(self._rows)
+            return live > self.ivf_threshold and (self._centroids is None or live > 2 * self._trained_size)
+    
+    def close(self):
+        with self._lock:
+            if self._loaded:
+                if self._storage is not None:
+                    self._storage.close()
+                self._storage = None
+                self._loaded = False
+            self._conn.close()
+    
+    def _load(self):
+        """Read IDs and metadata and map the vector file; runs on first use"""
+        if self._loaded:
+            return
+        
+        dim = self._conn.execute("SELECT value FROM info WHERE key = 'dim'").fetchone()
+        self._dim = int(dim[0]) if dim else None
+        
+        records = self._conn.execute("SELECT row, doc_id, metadata FROM records ORDER BY row").fetchall()
+        self._size = records[-1][0] + 1 if records else 0
+        capacity = max(self._size, 1024)
+        self._ids = [None] * capacity
+        self._metadatas = [None] * capacity
+        self._alive = np.zeros(capacity, dtype=bool)
+        self._rows = {}
+        for row, doc_id, metadata in records:
+            if doc_id is not None:
+                self._ids[row] = doc_id
+                self._metadatas[row] = json.loads(metadata) if metadata else None
+                self._alive[row] = True
+                self._rows[doc_id] = row
+        self._free = [row for row in range(self._size) if not self._alive[row]][::-1]
+        
+        self._storage = VectorStorage(self.path, self.precision, self._dim, capacity, self.refine) if self._dim else None
+        self._columns = {}
+        
+        self._centroids = None
+        self._assignments = None
+        self._lists = None
+        self._trained_size = 0
+        index_path = os.path.join(self.path, self.INDEX_FILE)
+        if os.path.exists(index_path):
+            with np.load(index_path) as index:
+                self._centroids = index['centroids']
+                self._trained_size = int(index['trained_size'])
+                self._assignments = np.full(capacity, -1, dtype=np.int32)
+                self._assignments[:len(index['assignments'])] = index['assignments']
+            # Rows written by another process since the index was saved
+            missing = np.flatnonzero(self._assignments[:self._size] < 0)
+            if len(missing):
+                self._assignments[missing] = self._assign(self._storage.decode(missing))
+        
+        self._loaded = True
+    
+    def _append_row(self) -> int:
+        """Next row at the end of the file, doubling capacity when full"""
+        row = self._size
+        if row >= len(self._alive):
+            capacity = len(self._alive) * 2
+            self._ids.extend([None] * (capacity - len(self._ids)))
+            self._metadatas.extend([None] * (capacity - len(self._metadatas)))
+            self._alive = np.concatenate([self._alive, np.zeros(capacity - len(self._alive), dtype=bool)])
+            self._storage.grow(capacity)
+            if self._assignments is not None:
+                self._assignments = np.concatenate([self._assignments, np.full(len(self._assignments), -1, dtype=np.int32)])
+        self._size += 1
+        return row
+    
+    def _search(self, query: np.ndarray, n_results: int, mask: Optional[np.ndarray]):
+        """Top-n rows by cosine similarity, exact or through the IVF index, on the stored precision"""
+        alive = self._alive[:self._size] if mask is None else mask & self._alive[:self._size]
+        if not self._size or not alive.any():
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        
+        rerank = self.refine and self.rerank > 0
+        candidates = n_results * self.rerank if rerank else n_results
+        
+        if self._centroids is not None and len(self._rows) > self.ivf_threshold:
+            probes = np.argsort(-(self._centroids @ query))[:self.ivf_probes]
+            rows = np.concatenate([self._ivf_lists()[probe] for probe in probes])
+            rows = np.sort(rows[alive[rows]])
+            scores = self._storage.score(rows, query)
+        elif mask is not None and alive.sum() * 4 < self._size:
+            # Narrow filter: convert just the matching rows
+            rows = np.flatnonzero(alive)
+            scores = self._storage.score(rows, query)
+        else:
+            rows = np.flatnonzero(alive)
+            scores = self._storage.score_all(query, self._size)[rows]
+        
+        rows, scores = self._top(rows, scores, candidates)
+        if rerank:
+            rows, scores = self._top(rows, self._storage.rescore(rows, query), n_results)
+        return rows, scores
+    
+    @staticmethod
+    def _top(rows: np.ndarray, scores: np.ndarray, n: int):
+        if len(rows) > n:
+            top = np.argpartition(-scores, n)[:n]
+            rows, scores = rows[top], scores[top]
+        order = np.argsort(-scores, kind='stable')
+        return rows[order], scores[order]
+    
+    def _ivf_lists(self) -> List[np.ndarray]:
+        """Rows grouped by IVF list"""
+        if self._lists is None:
+            assignments = self._assignments[:self._size]
+            order = np.argsort(assignments, kind='stable')
+            bounds = np.searchsorted(assignments[order], np.arange(len(self._centroids) + 1))
+            self._lists = [order[bounds[i]:bounds[i + 1]] for i in range(len(self._centroids))]
+        return self._lists
+    
+    def _assign(self, vectors: np.ndarray) -> np.ndarray:
+        if self._centroids is None:
+            return np.full(len(vectors), -1, dtype=np.int32)
+        return np.argmax(vectors @ self._centroids.T, axis=1).astype(np.int32)
+    
+    def _where_mask(self, where: Dict) -> np.ndarray:
+        """Evaluate a ChromaDB-style metadata filter over all rows"""
+        if '$and' in where:
+            return np.logical_and.reduce([self._where_mask(clause) for clause in where['$and']])
+        if '$or' in where:
+            return np.logical_or.reduce([self._where_mask(clause) for clause in where['$or']])
+        
+        mask = self._alive[:self._size].copy()
+        for key, condition in where.items():
+            values, present = self._column(key)
+            if not isinstance(condition, dict):
+                condition = {'$eq': condition}
+            for operator, operand in condition.items():
+                mask &= self._compare(values, present, operator, operand)
+        return mask
+    
+    def _column(self, key: str):
+        """One metadata field across all rows: (values, present), int64 when every value is an int"""
+        column = self._columns.get(key)
+        if column is None:
+            raw = [metadata.get(key) if metadata else None for metadata in self._metadatas[:self._size]]
+            present = np.array([value is not None for value in raw], dtype=bool)
+            if all(isinstance(value, int) and not isinstance(value, bool) for value in raw if value is not None):
+                values = np.array([value if value is not None else 0 for value in raw], dtype=np.int64)
+            else:
+                values = np.empty(len(raw), dtype=object)
+                values[:] = raw
+            column = self._columns[key] = (values, present)
+        return column
+    
+    @staticmethod
+    def _compare(values: np.ndarray, present: np.ndarray, operator: str, operand: Any) -> np.ndarray:
+        if operator == '$eq':
+            return present & (values == operand)
+        if operator == '$ne':
+            return ~present | (values != operand)
+        if operator in ('$in', '$nin'):
+            if values.dtype == object:
+                operands = set(operand)
+                matches = np.fromiter((value in operands for value in values), dtype=bool, count=len(values))
+            else:
+                matches = np.isin(values, np.asarray(operand, dtype=np.int64))
+            return present & matches if operator == '$in' else ~(present & matches)
+        comparisons = {'$gt': np.greater, '$gte': np.greater_equal, '$lt': np.less, '$lte': np.less_equal}
+        if operator in comparisons:
+            result = np.zeros(len(values), dtype=bool)
+            result[present] = comparisons[operator](values[present], operand)
+            return result
+        raise ValueError(f"Unsupported filter operator {operator}")
+    
+    def _result(self, rows: np.ndarray, include: List[str]) -> Dict:
+        rows = [int(row) for row in rows]
+        documents = None
+        if 'documents' in include:
+            stored = {}
+            for start in range(0, len(rows), 500):
+                chunk = rows[start:start + 500]
+                stored.update(self._conn.execute(
+                    f"SELECT row, document FROM records WHERE row IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall())
+            documents = [stored.get(row) for row in rows]
+        embeddings = None
+        if 'embeddings' in include:
+            embeddings = self._storage.decode(rows).tolist() if rows else []
+        return {
+            'ids': [self._ids[row] for row in rows],
+            'documents': documents,
+            'metadatas': [self._metadatas[row] for row in rows] if 'metadatas' in include else None,
+            'embeddings': embeddings
+        }
+    
+    def _embed(self, texts: List[str]) -> List:
+        if self.embedding_function is None:
+            raise ValueError(f"Collection {self.name} has no embedding function; pass embeddings instead")
+        return self.embedding_function(list(texts))
+    
+    @staticmethod
+    def _normalise(vectors: np.ndarray) -> np.ndarray:
+        return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+class VectorStorage:
+    """The memory-mapped vectors of a native collection, stored as float32, float16 or int8
+    
+    int8 rows are scalar-quantized with a per-row scale (1 byte per dimension plus 4
+    bytes per row) and scored from the codes a chunk at a time, so nothing larger than
+    the codes stays in memory. float32 rows are scored straight from the map. float16
+    halves the disk footprint but is scored against a float32 copy held in memory,
+    since NumPy converts float16 too slowly to do it per query. With refine, int8
+    storage also keeps float16 originals, read only for re-ranking and get().
+    """
+    
+    FILES = {'float32': ('vectors.f32', np.float32), 'float16': ('vectors.f16', np.float16), 'int8': ('vectors.i8', np.int8)}
+    SCALES_FILE = 'scales.f32'
+    REFINE_FILE = 'vectors.f16'
+    SCAN_CHUNK = 4096
+    
+    def __init__(self, path: str, precision: str, dim: int, capacity: int, refine: bool = False):
+        self.path = path
+        self.precision = precision
+        self.dim = dim
+        self.refine = refine and precision == 'int8'
+        os.makedirs(path, exist_ok=True)
+        
+        self.vectors = None
+        self.scales = None
+        self.originals = None
+        self.dense = None
+        self.grow(capacity)
+    
+    def grow(self, capacity: int):
+        """Map the files at capacity rows, extending them if needed"""
+        self.flush()
+        filename, dtype = self.FILES[self.precision]
+        self.vectors = self._map(filename, dtype, (capacity, self.dim))
+        if self.precision == 'int8':
+            self.scales = self._map(self.SCALES_FILE, np.float32, (capacity,))
+        if self.refine:
+            self.originals = self._map(self.REFINE_FILE, np.float16, (capacity, self.dim))
+        if self.dense is not None:
+            self.dense = np.concatenate([self.dense, np.zeros((capacity - len(self.dense), self.dim), dtype=np.float32)])
+    
+    def files(self) -> List[str]:
+        filenames = [self.FILES[self.precision][0]]
+        if self.precision == 'int8':
+            filenames.append(self.SCALES_FILE)
+        if self.refine:
+            filenames.append(self.REFINE_FILE)
+        return filenames
+    
+    def write(self, rows, vectors: np.ndarray):
+        """Store normalised float32 vectors at rows"""
+        if self.precision == 'int8':
+            scales = np.maximum(np.abs(vectors).max(axis=1), 1e-12) / 127
+            self.vectors[rows] = np.rint(vectors / scales[:, None]).astype(np.int8)
+            self.scales[rows] = scales
+        else:
+            self.vectors[rows] = vectors.astype(self.vectors.dtype)
+        if self.originals is not None:
+            self.originals[rows] = vectors.astype(np.float16)
+        if self.dense is not None:
+            self.dense[rows] = vectors
+        self.flush()
+    
+    def decode(self, rows) -> np.ndarray:
+        """Vectors at rows as float32: the float16 originals if kept, else the stored form"""
+        if self.originals is not None:
+            return self.originals[rows].astype(np.float32)
+        vectors = self.vectors[rows].astype(np.float32)
+        if self.scales is not None:
+            vectors *= self.scales[rows][:, None]
+        return vectors
+    
+    def score(self, rows, query: np.ndarray) -> np.ndarray:
+        """Dot products of query with the stored (possibly quantized) vectors at rows"""
+        scores = self.vectors[rows].astype(np.float32) @ query
+        if self.scales is not None:
+            scores *= self.scales[rows]
+        return scores
+    
+    def score_all(self, query: np.ndarray, size: int) -> np.ndarray:
+        """Dot products of query with the first size rows"""
+        if self.precision == 'float32':
+            return np.asarray(self.vectors[:size] @ query)
+        if self.precision == 'float16':
+            if self.dense is None:
+                self.dense = np.zeros((len(self.vectors), self.dim), dtype=np.float32)
+                self.dense[:size] = self.vectors[:size]
+            return self.dense[:size] @ query
+        
+        scores = np.empty(size, dtype=np.float32)
+        for start in range(0, size, self.SCAN_CHUNK):
+            end = min(start + self.SCAN_CHUNK, size)
+            scores[start:end] = self.vectors[start:end].astype(np.float32) @ query
+        return scores * self.scales[:size]
+    
+    def rescore(self, rows: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """Dot products of query with the float16 originals at rows"""
+        return self.originals[rows].astype(np.float32) @ query
+    
+    def get_stats(self, size: int) -> Dict:
+        """Bytes on disk, and bytes read from memory by one exact scan of size rows"""
+        disk = sum(os.path.getsize(os.path.join(self.path, filename)) for filename in self.files())
+        scan = size * self.dim * (4 if self.precision != 'int8' else 1) + (size * 4 if self.precision == 'int8' else 0)
+        return {'disk_bytes': disk, 'scan_bytes': scan}
+    
+    def flush(self):
+        for mapped in (self.vectors, self.scales, self.originals):
+            if mapped is not None:
+                mapped.flush()
+    
+    def close(self):
+        self.flush()
+        self.vectors = self.scales = self.originals = self.dense = None
+    
+    def _map(self, filename: str, dtype, shape) -> np.memmap:
+        path = os.path.join(self.path, filename)
+        size = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        with open(path, 'ab') as f:
+            if f.tell() < size:
+                f.truncate(size)
+        return np.memmap(path, dtype=dtype, mode='r+', shape=shape)
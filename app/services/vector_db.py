@@ -3,26 +3,83 @@ Vector Database Service for AI Email Assistant
 """
 import os
 import json
-import uuid
-from typing import List, Dict, Optional, Tuple
+import threading
+from itertools import islice
+from typing import Iterable, List, Dict, Optional, Tuple
 from datetime import datetime
-import chromadb
-from chromadb.config import Settings
-from sentence_transformers import SentenceTransformer
 import numpy as np
 from flask import current_app
+from app.services.embedding_cache import EmbeddingCache, CachedEmbeddingFunction, content_hash
+from app.services.embedding_models import SharedModelEmbeddingFunction, get_embedding_model, get_model_stats
+from app.services.embedding_engine import EmbeddingEngine
+from app.services.vector_backends import create_vector_client
+from app.services.search_cache import LRUCache, normalize_query
+
+PARTITION_MODES = ('shared', 'user', 'bucket')
+CHROMADB_MODES = ('embedded', 'http')
 
 class VectorDBService:
-    """Service for managing vector database operations"""
+    """Service for managing vector database operations
+    
+    Vectors are stored by the VECTOR_DB_TYPE backend: ChromaDB ('chromadb'), either
+    embedded on VECTOR_DB_PATH or, with CHROMADB_MODE='http', a server shared by
+    every app process, or the embedded NumPy store ('native'). Emails live in one shared collection filtered by user_id, or, with
+    VECTOR_PARTITION_MODE set to 'user' or 'bucket', in a collection per user or per
+    user_id % VECTOR_PARTITION_BUCKETS, so each query only searches that partition.
+    """
     
     def __init__(self):
         self.db_path = current_app.config['VECTOR_DB_PATH']
         self.collection_name = current_app.config['VECTOR_COLLECTION_NAME']
         self.embedding_model_name = current_app.config['EMBEDDING_MODEL']
+        self.backend = current_app.config.get('VECTOR_DB_TYPE', 'chromadb')
+        
+        self.partition_mode = current_app.config.get('VECTOR_PARTITION_MODE', 'shared')
+        self.partition_buckets = current_app.config.get('VECTOR_PARTITION_BUCKETS', 32)
+        if self.partition_mode not in PARTITION_MODES:
+            raise ValueError(f"VECTOR_PARTITION_MODE must be one of {', '.join(PARTITION_MODES)}")
+        
+        self.chromadb_mode = current_app.config.get('CHROMADB_MODE', 'embedded')
+        if self.chromadb_mode not in CHROMADB_MODES:
+            raise ValueError(f"CHROMADB_MODE must be one of {', '.join(CHROMADB_MODES)}")
+        self.remote = False
+        # Records per write request; also capped by the server's own limit
+        self.write_batch_size = current_app.config.get('CHROMADB_BATCH_SIZE', 256)
+        
+        self.cache_path = current_app.config.get(
+            'EMBEDDING_CACHE_PATH', os.path.join(self.db_path, 'embedding_cache.sqlite3')
+        )
         
         self.client = None
         self.collection = None
-        self.embedding_model = None
+        self.embedding_function = None
+        self.embedding_cache = None
+        
+        self._partitions = {}
+        self._partitions_lock = threading.Lock()
+        
+        # Query texts skip the on-disk document cache; repeats are served from memory
+        self._query_embedder = SharedModelEmbeddingFunction(self.embedding_model_name)
+        query_cache_size = current_app.config.get('QUERY_EMBEDDING_CACHE_SIZE', 1024)
+        self.query_cache = LRUCache(
+            query_cache_size, current_app.config.get('QUERY_EMBEDDING_CACHE_TTL', 3600)
+        ) if query_cache_size > 0 else None
+    
+    @property
+    def available(self) -> bool:
+        """Whether the vector database is initialized (and, for a server, answering)"""
+        if self.client is None or not (self.partitioned or self.collection is not None):
+            return False
+        return not self.remote or self.client.healthy
+    
+    @property
+    def partitioned(self) -> bool:
+        return self.partition_mode != 'shared'
+    
+    @property
+    def embedding_model(self):
+        """Shared SentenceTransformer instance, loaded on first use"""
+        return get_embedding_model(self.embedding_model_name)
     
     def initialize(self):
         """Initialize vector database and embedding model"""
@@ -30,33 +87,42 @@ class VectorDBService:
             # Ensure database directory exists
             os.makedirs(self.db_path, exist_ok=True)
             
-            # Initialize ChromaDB client
-            self.client = chromadb.PersistentClient(
-                path=self.db_path,
-                settings=Settings(
-                    anonymized_telemetry=False,
-                    allow_reset=True
+            # Initialize the vector store client
+            self.client = self._create_client()
+            if self.client is None:
+                return False
+            
+            self.embedding_function = self._get_embedding_function()
+            
+            if self.partitioned:
+                # The shared collection is only kept as the source for migrate_to_partitions
+                try:
+                    self.collection = self.client.get_collection(
+                        name=self.collection_name,
+                        embedding_function=self.embedding_function
+                    )
+                except Exception:
+                    self.collection = None
+                current_app.logger.info(
+                    f"Vector database partitioned by {self.partition_mode} ({self.collection_name}_{self.partition_mode}_*)"
                 )
-            )
+                return True
             
             # Get or create collection
             try:
                 self.collection = self.client.get_collection(
                     name=self.collection_name,
-                    embedding_function=self._get_embedding_function()
+                    embedding_function=self.embedding_function
                 )
                 current_app.logger.info(f"Loaded existing collection: {self.collection_name}")
             except Exception:
                 self.collection = self.client.create_collection(
                     name=self.collection_name,
-                    embedding_function=self._get_embedding_function(),
+                    embedding_function=self.embedding_function,
                     metadata={"description": "Email embeddings for AI assistant"}
                 )
                 current_app.logger.info(f"Created new collection: {self.collection_name}")
             
-            # Initialize embedding model
-            self.embedding_model = SentenceTransformer(self.embedding_model_name)
-            
             current_app.logger.info("Vector database service initialized successfully")
             return True
         
@@ -64,67 +130,193 @@ class VectorDBService:
             current_app.logger.error(f"Vector database initialization failed: {e}")
             return False
     
+    def _create_client(self):
+        """Open the configured backend, falling back from an unreachable Chroma server"""
+        if self.backend == 'native':
+            return create_vector_client(
+                self.backend, self.db_path,
+                ivf_threshold=current_app.config.get('VECTOR_NATIVE_IVF_THRESHOLD', 50000),
+                ivf_probes=current_app.config.get('VECTOR_NATIVE_IVF_PROBES', 12),
+                precision=current_app.config.get('VECTOR_NATIVE_PRECISION', 'float16'),
+                rerank=current_app.config.get('VECTOR_NATIVE_RERANK', 0)
+            )
+        
+        if self.backend != 'chromadb' or self.chromadb_mode != 'http':
+            return create_vector_client(self.backend, self.db_path)
+        
+        host = current_app.config.get('CHROMADB_HOST', 'localhost')
+        port = current_app.config.get('CHROMADB_PORT', 8000)
+        try:
+            client = create_vector_client(
+                self.backend, self.db_path, host=host, port=port,
+                ssl=current_app.config.get('CHROMADB_SSL', False),
+                pool_size=current_app.config.get('CHROMADB_POOL_SIZE', 10),
+                timeout=current_app.config.get('CHROMADB_TIMEOUT', 10),
+                retry_after=current_app.config.get('CHROMADB_RETRY_SECONDS', 30)
+            )
+            self.remote = True
+            current_app.logger.info(f"Using ChromaDB server at {client.url}")
+            return client
+        except Exception as e:
+            if current_app.config.get('CHROMADB_FALLBACK', 'embedded') != 'embedded':
+                current_app.logger.error(f"ChromaDB server {host}:{port} unavailable: {e}")
+                return None
+            current_app.logger.warning(
+                f"ChromaDB server {host}:{port} unavailable ({e}); using embedded store at {self.db_path}"
+            )
+            return create_vector_client(self.backend, self.db_path)
+    
+    def _upsert(self, collection, ids: List[str], documents: List[str], metadatas: List[Dict],
+                embeddings: Optional[List] = None):
+        """Write documents in batches, embedding any that come without vectors here
+        
+        Vectors are always computed in this process, so a Chroma server only stores
+        and searches them, and each batch is one request of at most write_batch_size
+        records (or the server's limit, if lower).
+        """
+        batch_size = self.write_batch_size
+        if self.remote and self.client.max_batch_size:
+            batch_size = min(batch_size, self.client.max_batch_size)
+        
+        for start in range(0, len(ids), batch_size):
+            end = start + batch_size
+            batch_documents = documents[start:end]
+            if embeddings is None:
+                batch_embeddings = [list(vector) for vector in self.embedding_function(batch_documents)]
+            else:
+                batch_embeddings = embeddings[start:end]
+            collection.upsert(
+                ids=ids[start:end],
+                documents=batch_documents,
+                metadatas=metadatas[start:end],
+                embeddings=batch_embeddings
+            )
+    
     def _get_embedding_function(self):
         """Get ChromaDB embedding function"""
-        from chromadb.utils import embedding_functions
+        # Backed by the process-wide model so it is loaded once, lazily
+        embedding_function = SharedModelEmbeddingFunction(self.embedding_model_name)
+        
+        if not current_app.config.get('EMBEDDING_CACHE_ENABLED', True):
+            return embedding_function
         
-        # Use sentence transformer embedding function
-        return embedding_functions.SentenceTransformerEmbeddingFunction(
-            model_name=self.embedding_model_name
+        # Unchanged document text is served from the on-disk cache instead of the model
+        try:
+            if not self.embedding_cache:
+                self.embedding_cache = EmbeddingCache(self.cache_path)
+            return CachedEmbeddingFunction(embedding_function, self.embedding_cache, self.embedding_model_name)
+        except Exception as e:
+            current_app.logger.warning(f"Embedding cache unavailable, embedding without it: {e}")
+            return embedding_function
+    
+    def _partition_name(self, user_id: int) -> str:
+        """Name of the collection holding a user's emails"""
+        if self.partition_mode == 'user':
+            return f"{self.collection_name}_user_{user_id}"
+        if self.partition_mode == 'bucket':
+            return f"{self.collection_name}_bucket_{user_id % self.partition_buckets:03d}"
+        return self.collection_name
+    
+    def _get_partition(self, user_id: int, create: bool = False):
+        """Collection holding a user's emails, or None if it has not been created yet"""
+        if not self.partitioned:
+            return self.collection
+        
+        name = self._partition_name(user_id)
+        collection = self._partitions.get(name)
+        if collection is not None:
+            return collection
+        
+        with self._partitions_lock:
+            collection = self._partitions.get(name)
+            if collection is None:
+                if create:
+                    collection = self.client.get_or_create_collection(
+                        name=name,
+                        embedding_function=self.embedding_function,
+                        metadata={"description": f"Email embeddings for AI assistant ({self.partition_mode} partition)"}
+                    )
+                else:
+                    try:
+                        collection = self.client.get_collection(name=name, embedding_function=self.embedding_function)
+                    except Exception:
+                        return None
+                self._partitions[name] = collection
+        return collection
+    
+    def _embed_query(self, query: str) -> List[float]:
+        """Embedding for search text, cached by model and normalized text"""
+        text = normalize_query(query)
+        if self.query_cache is None:
+            return self._query_embedder([text])[0]
+        return self.query_cache.get_or_compute(
+            (self.embedding_model_name, text), lambda: self._query_embedder([text])[0]
         )
     
+    def _user_where(self, user_id: int, where: Optional[Dict] = None) -> Optional[Dict]:
+        """Metadata filter for a user's documents; per-user partitions need no user_id condition"""
+        conditions = [] if self.partition_mode == 'user' else [{"user_id": user_id}]
+        if where:
+            conditions.append(where)
+        if len(conditions) > 1:
+            return {"$and": conditions}
+        return conditions[0] if conditions else None
+    
+    def _group_by_partition(self, email_data_list: List[Tuple[int, Dict, int]]) -> Dict[str, List[Tuple[int, Dict, int]]]:
+        """Split (email_id, email_data, user_id) tuples by the collection they belong in"""
+        groups = {}
+        for item in email_data_list:
+            groups.setdefault(self._partition_name(item[2]), []).append(item)
+        return groups
+    
+    def _doc_id(self, email_id: int, user_id: int) -> str:
+        """Deterministic document ID so re-syncs overwrite instead of duplicating"""
+        return f"email_{user_id}_{email_id}"
+    
+    def _create_metadata(self, email_id: int, email_data: Dict, user_id: int, document_hash: str) -> Dict:
+        """Build the metadata stored alongside an email document"""
+        return {
+            "email_id": email_id,
+            "user_id": user_id,
+            "subject": (email_data.get('subject') or '')[:500],  # Limit length
+            "sender_email": email_data.get('sender_email') or '',
+            "sender_name": email_data.get('sender_name') or '',
+            "received_date": email_data.get('received_date') or '',
+            "is_sent_item": email_data.get('is_sent_item', False),
+            "folder_name": email_data.get('folder_name') or '',
+            "content_hash": document_hash,
+            "created_at": datetime.utcnow().isoformat()
+        }
+    
     def add_email(self, email_id: int, email_data: Dict, user_id: int) -> bool:
         """Add email to vector database"""
         try:
-            if not self.collection:
+            if not self.available:
                 current_app.logger.error("Vector database not initialized")
                 return False
             
-            # Create document text from email data
-            document_text = self._create_email_document(email_data)
-            
-            # Create unique document ID
-            doc_id = f"email_{user_id}_{email_id}_{uuid.uuid4().hex[:8]}"
-            
-            # Prepare metadata
-            metadata = {
-                "email_id": email_id,
-                "user_id": user_id,
-                "subject": email_data.get('subject', '')[:500],  # Limit length
-                "sender_email": email_data.get('sender_email', ''),
-                "sender_name": email_data.get('sender_name', ''),
-                "received_date": email_data.get('received_date', ''),
-                "is_sent_item": email_data.get('is_sent_item', False),
-                "folder_name": email_data.get('folder_name', ''),
-                "created_at": datetime.utcnow().isoformat()
-            }
-            
-            # Add to collection
-            self.collection.add(
-                documents=[document_text],
-                metadatas=[metadata],
-                ids=[doc_id]
-            )
-            
-            current_app.logger.debug(f"Added email {email_id} to vector database")
-            return True
+            return self.batch_add_emails([(email_id, email_data, user_id)]) == 1
         
         except Exception as e:
             current_app.logger.error(f"Error adding email to vector database: {e}")
             return False
     
-    def search_emails(self, user_id: int, query: str, limit: int = 10) -> List[Dict]:
-        """Search emails using vector similarity"""
+    def search_emails(self, user_id: int, query: str, limit: int = 10, where: Optional[Dict] = None) -> List[Dict]:
+        """Search emails using vector similarity, optionally narrowed by a metadata filter"""
         try:
-            if not self.collection:
+            if not self.available:
                 current_app.logger.error("Vector database not initialized")
                 return []
             
-            # Search in collection with user filter
-            results = self.collection.query(
-                query_texts=[query],
+            collection = self._get_partition(user_id)
+            if collection is None:
+                return []
+            
+            # Search in the user's partition, with a user filter unless it holds only their emails
+            results = collection.query(
+                query_embeddings=[self._embed_query(query)],
                 n_results=min(limit, 100),
-                where={"user_id": user_id}
+                where=self._user_where(user_id, where)
             )
             
             # Format results
@@ -154,25 +346,23 @@ class VectorDBService:
     def get_similar_emails(self, email_id: int, user_id: int, limit: int = 5) -> List[Dict]:
         """Find similar emails to a given email"""
         try:
-            if not self.collection:
+            collection = self._get_partition(user_id) if self.available else None
+            if collection is None:
                 return []
             
-            # First, get the document for the given email
-            results = self.collection.get(
-                where={"$and": [{"email_id": email_id}, {"user_id": user_id}]}
+            # First, get the stored embedding for the given email
+            results = collection.get(
+                where=self._user_where(user_id, {"email_id": email_id}), include=['embeddings']
             )
             
-            if not results['documents']:
+            if not results['ids']:
                 return []
             
-            # Use the document text to find similar emails
-            document_text = results['documents'][0]
-            
             # Search for similar emails (excluding the original)
-            similar_results = self.collection.query(
-                query_texts=[document_text],
+            similar_results = collection.query(
+                query_embeddings=[results['embeddings'][0]],
                 n_results=limit + 1,  # +1 to account for the original email
-                where={"$and": [{"user_id": user_id}, {"email_id": {"$ne": email_id}}]}
+                where=self._user_where(user_id, {"email_id": {"$ne": email_id}})
             )
             
             # Format results
@@ -197,6 +387,39 @@ class VectorDBService:
             current_app.logger.error(f"Error finding similar emails: {e}")
             return []
     
+    def get_neighbors(self, user_id: int, email_ids: List[int], k: int = 10) -> Dict[int, List[Tuple[int, float]]]:
+        """Top-k similar emails for each of a user's emails, from their stored embeddings
+        
+        Returns {email_id: [(neighbor_id, similarity), ...]} best first; emails without a
+        stored vector are left out. All lookups go to the store as one batched query.
+        """
+        collection = self._get_partition(user_id) if self.available and email_ids else None
+        if collection is None:
+            return {}
+        
+        stored = collection.get(
+            ids=[self._doc_id(email_id, user_id) for email_id in email_ids], include=['embeddings', 'metadatas']
+        )
+        if not stored['ids']:
+            return {}
+        
+        results = collection.query(
+            query_embeddings=[list(embedding) for embedding in stored['embeddings']],
+            n_results=k + 1,  # +1 for the email itself
+            where=self._user_where(user_id),
+            include=['metadatas', 'distances']
+        )
+        
+        neighbors = {}
+        for source, metadatas, distances in zip(stored['metadatas'], results['metadatas'], results['distances']):
+            email_id = source['email_id']
+            neighbors[email_id] = [
+                (metadata['email_id'], round(1 - distance, 6))
+                for metadata, distance in zip(metadatas, distances)
+                if metadata.get('email_id') not in (None, email_id)
+            ][:k]
+        return neighbors
+    
     def get_user_email_context(self, user_id: int, query: str, limit: int = 5) -> str:
         """Get relevant email context for a user query"""
         try:
@@ -223,15 +446,31 @@ class VectorDBService:
     def delete_user_emails(self, user_id: int) -> bool:
         """Delete all emails for a user from vector database"""
         try:
-            if not self.collection:
+            if not self.available:
                 return False
             
+            if self.partition_mode == 'user':
+                # The partition holds only this user's emails, so drop it whole
+                name = self._partition_name(user_id)
+                with self._partitions_lock:
+                    self._partitions.pop(name, None)
+                    try:
+                        self.client.delete_collection(name=name)
+                    except ValueError:
+                        pass  # Nothing was ever indexed for the user
+                current_app.logger.info(f"Dropped vector partition {name} for user {user_id}")
+                return True
+            
+            collection = self._get_partition(user_id)
+            if collection is None:
+                return True
+            
             # Get all documents for the user
-            results = self.collection.get(where={"user_id": user_id})
+            results = collection.get(where={"user_id": user_id}, include=[])
             
             if results['ids']:
                 # Delete all documents
-                self.collection.delete(ids=results['ids'])
+                collection.delete(ids=results['ids'])
                 current_app.logger.info(f"Deleted {len(results['ids'])} email documents for user {user_id}")
             
             return True
@@ -243,13 +482,12 @@ class VectorDBService:
     def delete_email(self, email_id: int, user_id: int) -> bool:
         """Delete specific email from vector database"""
         try:
-            if not self.collection:
+            collection = self._get_partition(user_id) if self.available else None
+            if collection is None:
                 return False
             
             # Delete documents matching email_id and user_id
-            self.collection.delete(
-                where={"$and": [{"email_id": email_id}, {"user_id": user_id}]}
-            )
+            collection.delete(where={"$and": [{"email_id": email_id}, {"user_id": user_id}]})
             
             current_app.logger.debug(f"Deleted email {email_id} from vector database")
             return True
@@ -258,19 +496,136 @@ class VectorDBService:
             current_app.logger.error(f"Error deleting email from vector database: {e}")
             return False
     
+    def remove_legacy_documents(self, batch_size: int = 1000) -> int:
+        """Replace documents stored under the old random-suffix IDs (email_<user>_<email>_<uuid>)
+        
+        Works on the shared collection. A legacy document whose email has no
+        deterministic-ID document yet is re-keyed with its stored embedding first, so
+        no email loses its vector and nothing is re-embedded. Returns how many legacy
+        documents were removed.
+        """
+        try:
+            if not self.collection:
+                return 0
+            
+            ids = self.collection.get(include=[])['ids']
+            current = {doc_id for doc_id in ids if doc_id.count('_') <= 2}
+            legacy_ids = [doc_id for doc_id in ids if doc_id.count('_') > 2]
+            
+            # Chunked to keep individual get and delete calls small
+            for start in range(0, len(legacy_ids), batch_size):
+                chunk = legacy_ids[start:start + batch_size]
+                page = self.collection.get(ids=chunk, include=['documents', 'metadatas', 'embeddings'])
+                
+                rekeyed = {}
+                for document, metadata, embedding in zip(page['documents'], page['metadatas'], page['embeddings']):
+                    if not metadata or metadata.get('user_id') is None or metadata.get('email_id') is None:
+                        continue
+                    doc_id = self._doc_id(metadata['email_id'], metadata['user_id'])
+                    if doc_id not in current:
+                        rekeyed[doc_id] = (document, metadata, embedding)
+                
+                if rekeyed:
+                    self._upsert(
+                        self.collection,
+                        ids=list(rekeyed),
+                        documents=[document for document, _, _ in rekeyed.values()],
+                        metadatas=[metadata for _, metadata, _ in rekeyed.values()],
+                        embeddings=[list(embedding) for _, _, embedding in rekeyed.values()]
+                    )
+                    current.update(rekeyed)
+                self.collection.delete(ids=chunk)
+            
+            current_app.logger.info(f"Removed {len(legacy_ids)} legacy email documents from vector database")
+            return len(legacy_ids)
+        
+        except Exception as e:
+            current_app.logger.error(f"Error removing legacy documents: {e}")
+            return 0
+    
+    def migrate_to_partitions(self, batch_size: int = 1000, drop_source: bool = False) -> Dict:
+        """Copy documents from the shared collection into their partitions
+        
+        Stored embeddings are copied as-is, so nothing is re-embedded. Documents are
+        re-keyed to the deterministic ID scheme on the way, which folds legacy
+        duplicates together. Safe to re-run; drop_source deletes the shared collection
+        once everything is copied.
+        """
+        if not self.partitioned:
+            raise ValueError("Set VECTOR_PARTITION_MODE to 'user' or 'bucket' before migrating")
+        
+        stats = {'copied': 0, 'skipped': 0, 'partitions': set(), 'source_dropped': False}
+        if self.collection is None:
+            return dict(stats, partitions=0)
+        
+        offset = 0
+        while True:
+            page = self.collection.get(
+                include=['documents', 'metadatas', 'embeddings'], limit=batch_size, offset=offset
+            )
+            if not page['ids']:
+                break
+            offset += len(page['ids'])
+            
+            batches = {}
+            for document, metadata, embedding in zip(page['documents'], page['metadatas'], page['embeddings']):
+                if not metadata or metadata.get('user_id') is None or metadata.get('email_id') is None:
+                    stats['skipped'] += 1
+                    continue
+                user_id = metadata['user_id']
+                batch = batches.setdefault(self._partition_name(user_id), {'user_id': user_id, 'documents': {}})
+                batch['documents'][self._doc_id(metadata['email_id'], user_id)] = (document, metadata, embedding)
+            
+            for name, batch in batches.items():
+                collection = self._get_partition(batch['user_id'], create=True)
+                documents = batch['documents']
+                self._upsert(
+                    collection,
+                    ids=list(documents),
+                    documents=[document for document, _, _ in documents.values()],
+                    metadatas=[metadata for _, metadata, _ in documents.values()],
+                    embeddings=[list(embedding) for _, _, embedding in documents.values()]
+                )
+                stats['copied'] += len(documents)
+                stats['partitions'].add(name)
+            
+            current_app.logger.info(f"Copied {offset} documents into vector partitions")
+        
+        if drop_source:
+            self.client.delete_collection(name=self.collection_name)
+            self.collection = None
+            stats['source_dropped'] = True
+        
+        return dict(stats, partitions=len(stats['partitions']))
+    
     def get_collection_info(self) -> Dict:
         """Get information about the vector collection"""
         try:
-            if not self.collection:
+            if not self.available:
                 return {"error": "Collection not initialized"}
             
-            count = self.collection.count()
+            if self.partitioned:
+                partitions = self._own_collections()
+                count = sum(collection.count() for collection in partitions)
+            else:
+                partitions = []
+                count = self.collection.count()
             
             return {
                 "collection_name": self.collection_name,
+                "backend": self.backend,
+                "vector_precision": self.client.precision if self.backend == 'native' else 'float32',
+                "chromadb_mode": ('http' if self.remote else 'embedded') if self.backend == 'chromadb' else None,
+                "chromadb_server": self.client.get_stats() if self.remote else None,
+                "partition_mode": self.partition_mode,
+                "partition_count": len(partitions),
+                "unmigrated_document_count": self.collection.count() if self.partitioned and self.collection else 0,
                 "document_count": count,
                 "embedding_model": self.embedding_model_name,
-                "database_path": self.db_path
+                "database_path": self.db_path,
+                "embedding_cache": self.embedding_cache.get_stats() if self.embedding_cache else None,
+                "query_embedding_cache": self.query_cache.get_stats() if self.query_cache else None,
+                "embedding_models": get_model_stats()
             }
         
         except Exception as e:
@@ -304,13 +659,13 @@ class VectorDBService:
             if recipients:
                 parts.append(f"To: {', '.join(recipients)}")
         
-        # Add body content
-        if email_data.get('body_preview'):
+        # Add body content: the full body once it has been downloaded, else the preview
+        body = email_data.get('body_text') or email_data.get('body_content')
+        if body:
+            # Limit length to avoid embedding size issues
+            parts.append(f"Content: {body[:2000]}")
+        elif email_data.get('body_preview'):
             parts.append(f"Content: {email_data['body_preview']}")
-        elif email_data.get('body_content'):
-            # Use body content but limit length
-            body = email_data['body_content'][:2000]  # Limit to avoid embedding size issues
-            parts.append(f"Content: {body}")
         
         # Add metadata
         if email_data.get('received_date'):
@@ -321,48 +676,150 @@ class VectorDBService:
         
         return "\n".join(parts)
     
+    def _get_changed_documents(self, collection, email_data_list: List[Tuple[int, Dict, int]]) -> Dict[str, Tuple[str, Dict]]:
+        """Build documents keyed by ID, leaving out those stored in the collection with the same content hash"""
+        documents = {}
+        for email_id, email_data, user_id in email_data_list:
+            document_text = self._create_email_document(email_data)
+            document_hash = content_hash(document_text)
+            documents[self._doc_id(email_id, user_id)] = (
+                document_text,
+                self._create_metadata(email_id, email_data, user_id, document_hash)
+            )
+        
+        existing = collection.get(ids=list(documents), include=['metadatas'])
+        for doc_id, metadata in zip(existing['ids'], existing['metadatas']):
+            if metadata and metadata.get('content_hash') == documents[doc_id][1]['content_hash']:
+                del documents[doc_id]
+        
+        return documents
+    
+    def backfill_emails(self, emails: Iterable[Tuple[int, Dict, int]], engine: Optional[EmbeddingEngine] = None) -> int:
+        """Index a large stream of emails using the batched embedding engine
+        
+        Consumes the iterator one engine window at a time, so a whole mailbox never has
+        to be loaded at once. Returns the number of documents written.
+        """
+        if not self.available:
+            current_app.logger.error("Vector database not initialized")
+            return 0
+        
+        if engine is None:
+            # The in-process engine goes through the embedding cache; worker processes cannot share it
+            in_process = current_app.config.get('EMBEDDING_PROCESSES', 0) <= 0
+            engine = EmbeddingEngine.from_config(
+                current_app.config, encoder=self.embedding_function if in_process else None
+            )
+        
+        written = 0
+        iterator = iter(emails)
+        with engine:
+            while True:
+                chunk = list(islice(iterator, engine.bucket_size))
+                if not chunk:
+                    break
+                
+                partitions = []
+                for items in self._group_by_partition(chunk).values():
+                    collection = self._get_partition(items[0][2], create=True)
+                    documents = self._get_changed_documents(collection, items)
+                    if documents:
+                        partitions.append((collection, documents))
+                if not partitions:
+                    continue
+                
+                # One engine pass per window, whichever partitions the documents go to
+                vectors = dict(engine.stream(
+                    (doc_id, document) for _, documents in partitions for doc_id, (document, _) in documents.items()
+                ))
+                for collection, documents in partitions:
+                    doc_ids = list(documents)
+                    self._upsert(
+                        collection,
+                        ids=doc_ids,
+                        documents=[documents[doc_id][0] for doc_id in doc_ids],
+                        metadatas=[documents[doc_id][1] for doc_id in doc_ids],
+                        embeddings=[vectors[doc_id].tolist() for doc_id in doc_ids]
+                    )
+                    written += len(doc_ids)
+        
+        current_app.logger.info(f"Backfilled {written} email documents ({engine.get_stats()})")
+        self.build_indexes()
+        return written
+    
+    def build_indexes(self) -> int:
+        """Build ANN indexes for native collections that have outgrown exact search
+        
+        ChromaDB maintains its own index, so this only applies to the native backend.
+        Returns the number of collections indexed.
+        """
+        if self.backend != 'native' or not self.available:
+            return 0
+        
+        built = 0
+        for collection in self._own_collections():
+            if collection.index_stale():
+                stats = collection.build_index()
+                current_app.logger.info(f"Built IVF index for {collection.name}: {stats}")
+                built += 1
+        return built
+    
+    def convert_precision(self, precision: str, refine: bool = False) -> List[Dict]:
+        """Rewrite every native collection's vectors in another precision
+        
+        New collections take VECTOR_NATIVE_PRECISION, so set it to match. Returns the
+        storage stats of each converted collection.
+        """
+        if self.backend != 'native' or not self.available:
+            return []
+        
+        collections = self._own_collections()
+        if self.partitioned and self.collection is not None:
+            collections.append(self.collection)
+        
+        converted = []
+        for collection in collections:
+            stats = collection.convert(precision, refine=refine)
+            current_app.logger.info(f"Converted {collection.name} to {precision}: {stats}")
+            converted.append(dict(stats, collection=collection.name))
+        return converted
+    
+    def _own_collections(self) -> List:
+        """The collections holding this service's emails (partitions, or the shared collection)"""
+        if not self.partitioned:
+            return [self.collection]
+        prefix = f"{self.collection_name}_{self.partition_mode}_"
+        return [collection for collection in self.client.list_collections() if collection.name.startswith(prefix)]
+    
     def batch_add_emails(self, email_data_list: List[Tuple[int, Dict, int]]) -> int:
-        """Batch add multiple emails to vector database"""
+        """Batch add or update emails in the vector database
+        
+        Documents are upserted under deterministic IDs; emails whose document text
+        hash matches the stored one are skipped without touching the collection.
+        Returns the number of emails that are indexed (written or already current).
+        """
         try:
-            if not self.collection or not email_data_list:
+            if not self.available or not email_data_list:
                 return 0
             
-            documents = []
-            metadatas = []
-            ids = []
-            
-            for email_id, email_data, user_id in email_data_list:
-                # Create document text
-                document_text = self._create_email_document(email_data)
+            upserted = 0
+            for items in self._group_by_partition(email_data_list).values():
+                collection = self._get_partition(items[0][2], create=True)
+                documents = self._get_changed_documents(collection, items)
                 
-                # Create unique document ID
-                doc_id = f"email_{user_id}_{email_id}_{uuid.uuid4().hex[:8]}"
-                
-                # Prepare metadata
-                metadata = {
-                    "email_id": email_id,
-                    "user_id": user_id,
-                    "subject": email_data.get('subject', '')[:500],
-                    "sender_email": email_data.get('sender_email', ''),
-                    "sender_name": email_data.get('sender_name', ''),
-                    "received_date": email_data.get('received_date', ''),
-                    "is_sent_item": email_data.get('is_sent_item', False),
-                    "folder_name": email_data.get('folder_name', ''),
-                    "created_at": datetime.utcnow().isoformat()
-                }
-                
-                documents.append(document_text)
-                metadatas.append(metadata)
-                ids.append(doc_id)
-            
-            # Batch add to collection
-            self.collection.add(
-                documents=documents,
-                metadatas=metadatas,
-                ids=ids
+                if documents:
+                    self._upsert(
+                        collection,
+                        ids=list(documents),
+                        documents=[document for document, _ in documents.values()],
+                        metadatas=[metadata for _, metadata in documents.values()]
+                    )
+                    upserted += len(documents)
+            
+            current_app.logger.info(
+                f"Upserted {upserted} of {len(email_data_list)} emails in vector database "
+                f"({len(email_data_list) - upserted} unchanged)"
             )
-            
-            current_app.logger.info(f"Batch added {len(email_data_list)} emails to vector database")
             return len(email_data_list)
         
         except Exception as e:
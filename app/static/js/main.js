@@ -717,6 +717,51 @@ function sendChatMessage(message, sessionId = null) {
     });
 }
 
+// Streaming chat: POST to /api/chat/stream and call onEvent(name, data) for each
+// Server-Sent Event (start, token, done, error) as it arrives
+function streamChatMessage(payload, onEvent) {
+    return fetch('/api/chat/stream', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify(payload)
+    })
+    .then(response => {
+        if (!response.ok) {
+            return response.json().then(data => {
+                throw new Error(data.error || response.statusText);
+            });
+        }
+
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+
+        function read() {
+            return reader.read().then(({ done, value }) => {
+                if (done) return;
+
+                buffer += decoder.decode(value, { stream: true });
+                let boundary;
+                while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                    const block = buffer.slice(0, boundary);
+                    buffer = buffer.slice(boundary + 2);
+
+                    const name = (block.match(/^event: (.*)$/m) || [])[1];
+                    const data = (block.match(/^data: (.*)$/m) || [])[1];
+                    if (name && data) {
+                        onEvent(name, JSON.parse(data));
+                    }
+                }
+                return read();
+            });
+        }
+
+        return read();
+    });
+}
+
 // Update chat form submission
 document.addEventListener('DOMContentLoaded', function() {
     const chatForm = document.getElementById('chat-form');
@@ -100,8 +100,8 @@ def admin_required(f):
             else:
                 return redirect(url_for('auth.login'))
         
-        # Check if user has admin privileges (you can extend User model for this)
-        if not getattr(user, 'is_admin', False):
+        # Check if user has admin privileges (granted with grant_admin.py)
+        if not user.is_admin:
             if request.is_json or request.path.startswith('/api/'):
                 return jsonify({'error': 'Admin privileges required'}), 403
             else:
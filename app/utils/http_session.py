@@ -0,0 +1,32 @@
+"""
+Shared HTTP session utilities for AI Email Assistant
+"""
+import os
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+def get_pooled_session(name: str, pool_size: int = 10) -> requests.Session:
+    """Get the process-wide keep-alive session for an upstream service
+    
+    Connections are pooled and reused across requests and threads. A new session is
+    created after a fork so worker processes never share sockets with their parent.
+    """
+    pid = os.getpid()
+    entry = _sessions.get(name)
+    
+    if entry is None or entry[1] != pid:
+        with _sessions_lock:
+            entry = _sessions.get(name)
+            if entry is None or entry[1] != pid:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                entry = (session, pid)
+                _sessions[name] = entry
+    
+    return entry[0]
@@ -0,0 +1,38 @@
+"""
+Token encryption utilities for AI Email Assistant
+"""
+import base64
+import hashlib
+from flask import current_app
+
+try:
+    from cryptography.fernet import Fernet, InvalidToken
+    CRYPTOGRAPHY_AVAILABLE = True
+except ImportError:
+    CRYPTOGRAPHY_AVAILABLE = False
+
+def _get_fernet():
+    """Build a Fernet cipher keyed from TOKEN_ENCRYPTION_KEY (or SECRET_KEY)"""
+    secret = current_app.config.get('TOKEN_ENCRYPTION_KEY') or current_app.config.get('SECRET_KEY')
+    if not CRYPTOGRAPHY_AVAILABLE or not secret:
+        return None
+    key = base64.urlsafe_b64encode(hashlib.sha256(secret.encode('utf-8')).digest())
+    return Fernet(key)
+
+def encrypt_token(token):
+    """Encrypt a token for storage; returns None when encryption is unavailable"""
+    fernet = _get_fernet()
+    if not token or not fernet:
+        return None
+    return fernet.encrypt(token.encode('utf-8')).decode('ascii')
+
+def decrypt_token(value):
+    """Decrypt a stored token; returns None if it cannot be decrypted"""
+    fernet = _get_fernet()
+    if not value or not fernet:
+        return None
+    try:
+        return fernet.decrypt(value.encode('ascii')).decode('utf-8')
+    except InvalidToken:
+        current_app.logger.warning("Stored token could not be decrypted (key changed?)")
+        return None
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Benchmark batched multi-email AI analysis against a stub Ollama server
+
+The stub charges a fixed prompt-prefix cost per request plus a per-email cost,
+roughly how a local 7B model spends time on the shared system prompt versus each
+email. Reports emails analyzed per second for each batch size.
+
+    python benchmark_batch_analysis.py --emails 64 --batch-sizes 1,2,4,8,16
+"""
+import argparse
+import json
+import random
+import re
+import sys
+import time
+
+sys.path.append('.')
+
+from fake_ollama_server import FakeOllamaServer, DEFAULT_ANALYSIS
+from test_delta_sync import create_test_app
+
+
+def make_responder(prefix_cost, per_email_cost, malformed_rate):
+    def responder(request):
+        count = max(1, len(re.findall(r'\[Email \d+\]', request.get('prompt', ''))))
+        time.sleep(prefix_cost + per_email_cost * count)
+
+        if count > 1 and random.random() < malformed_rate:
+            return '[{"index": 1, "summary": "truncated'
+        if count > 1:
+            return json.dumps([dict(DEFAULT_ANALYSIS, index=i) for i in range(1, count + 1)])
+        return json.dumps(DEFAULT_ANALYSIS)
+    return responder
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--emails', type=int, default=64)
+    parser.add_argument('--batch-sizes', default='1,2,4,8,16')
+    parser.add_argument('--prefix-cost', type=float, default=0.15, help='seconds per request')
+    parser.add_argument('--per-email-cost', type=float, default=0.02, help='seconds per email in a prompt')
+    parser.add_argument('--malformed-rate', type=float, default=0.0, help='chance a batch answer is malformed')
+    args = parser.parse_args()
+
+    responder = make_responder(args.prefix_cost, args.per_email_cost, args.malformed_rate)
+
+    with FakeOllamaServer(responder=responder) as ollama_fake:
+        app = create_test_app('http://127.0.0.1:9')
+        app.config.update({'OLLAMA_BASE_URL': ollama_fake.url, 'OLLAMA_TIMEOUT': 30})
+
+        with app.app_context():
+            from app.models import db
+            from app.models.user import User
+            from app.models.email import Email
+            from app.services.email_processor import EmailProcessor
+
+            db.create_all()
+            user = User(email='bench@example.com', display_name='Bench User')
+            db.session.add(user)
+            db.session.commit()
+            for i in range(args.emails):
+                db.session.add(Email(user_id=user.id, graph_id=f'bench-{i}', subject=f'Bench email {i}',
+                                     sender_email='a@example.com', body_preview=f'Body {i}'))
+            db.session.commit()
+
+            emails = Email.query.all()
+            processor = EmailProcessor()
+
+            print(f"📊 Batch analysis benchmark: {args.emails} emails, "
+                  f"{args.prefix_cost * 1000:.0f}ms prefix + {args.per_email_cost * 1000:.0f}ms/email")
+            for batch_size in (int(b) for b in args.batch_sizes.split(',')):
+                requests_before = ollama_fake.generate_count
+                start = time.perf_counter()
+                for offset in range(0, len(emails), batch_size):
+                    processor._analyze_emails_batch(emails[offset:offset + batch_size])
+                elapsed = time.perf_counter() - start
+                requests = ollama_fake.generate_count - requests_before
+                print(f"   batch {batch_size:>3}: {len(emails) / elapsed:8.1f} emails/s  "
+                      f"({requests} model calls, {elapsed:.2f}s)")
+
+
+if __name__ == '__main__':
+    main()
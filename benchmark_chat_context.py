@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Benchmark prompt evaluation per turn over a multi-turn chat conversation
+
+Runs the same conversation three ways and reports Ollama's prompt_eval_count and
+prompt_eval_duration for each turn:
+  replay   every turn re-sends the whole history as text (the previous behaviour)
+  compact  every turn rebuilds a prompt from the last CHAT_HISTORY_TURNS exchanges
+  reuse    follow-up turns continue the session's Ollama context (CHAT_CONTEXT_REUSE)
+
+By default it runs against the local stub Ollama server, which counts one token
+per word and charges --prompt-token-ms per evaluated prompt token; pass
+--ollama-url to measure a real server instead.
+
+    python benchmark_chat_context.py --turns 20
+    python benchmark_chat_context.py --turns 20 --ollama-url http://localhost:11434 --model llama3.2:3b
+"""
+import argparse
+import sys
+import time
+
+sys.path.append('.')
+
+from fake_ollama_server import FakeOllamaServer
+from test_delta_sync import create_test_app
+
+MODES = {
+    'replay': {'CHAT_CONTEXT_REUSE': False, 'CHAT_HISTORY_TURNS': 1000},
+    'compact': {'CHAT_CONTEXT_REUSE': False},
+    'reuse': {'CHAT_CONTEXT_REUSE': True},
+}
+
+
+def run_conversation(ollama_url, model, mode, turns, history_turns):
+    from app.models import db
+    from app.models.user import User
+    from app.services.chat_processor import ChatProcessor
+    from app.services.conversation_context import init_conversation_contexts
+
+    app = create_test_app('http://127.0.0.1:9')
+    app.config.update({
+        'OLLAMA_BASE_URL': ollama_url, 'OLLAMA_MODEL': model, 'OLLAMA_TIMEOUT': 600,
+        'CHAT_HISTORY_TURNS': history_turns, **MODES[mode]
+    })
+    init_conversation_contexts(app)
+
+    rows = []
+    with app.app_context():
+        db.create_all()
+        user = User(email='bench@example.com', display_name='Bench User')
+        db.session.add(user)
+        db.session.commit()
+        processor = ChatProcessor()
+
+        for i in range(turns):
+            started = time.perf_counter()
+            message = f"Question {i + 1}: what should I do next about the quarterly planning thread?"
+            done = list(processor.stream_message(user.id, message, session_id='bench'))[-1]
+            assert done['event'] == 'done', done
+            rows.append((done['prompt_eval_count'] or 0, done['prompt_eval_ms'] or 0.0,
+                         (time.perf_counter() - started) * 1000))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--turns', type=int, default=20)
+    parser.add_argument('--history-turns', type=int, default=6, help='exchanges replayed in compact mode')
+    parser.add_argument('--ollama-url', help='real Ollama server (default: local stub)')
+    parser.add_argument('--model', default='test-model')
+    parser.add_argument('--answer-words', type=int, default=120, help='stub answer length')
+    parser.add_argument('--prompt-token-ms', type=float, default=0.5, help='stub prompt evaluation cost per token')
+    args = parser.parse_args()
+
+    fake = None
+    url = args.ollama_url
+    if not url:
+        answer = ' '.join(f'point{i}' for i in range(args.answer_words))
+        fake = FakeOllamaServer(responder=lambda request: answer, model=args.model,
+                                prompt_token_seconds=args.prompt_token_ms / 1000).start()
+        url = fake.url
+
+    try:
+        print(f"💬 {args.turns}-turn conversation against {'stub Ollama' if fake else url}")
+        results = {mode: run_conversation(url, args.model, mode, args.turns, args.history_turns) for mode in MODES}
+    finally:
+        if fake:
+            fake.stop()
+
+    header = ''.join(f"{mode + ' tokens':>15}{mode + ' ms':>13}" for mode in MODES)
+    print(f"\n   {'turn':>4}{header}")
+    for i in range(args.turns):
+        print(f"   {i + 1:>4}" + ''.join(f"{results[mode][i][0]:>15}{results[mode][i][1]:>13.1f}" for mode in MODES))
+
+    print()
+    for mode, rows in results.items():
+        print(f"   {mode:<8} prompt tokens {sum(r[0] for r in rows):>7}   prompt eval {sum(r[1] for r in rows):>9.1f} ms"
+              f"   wall {sum(r[2] for r in rows):>9.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
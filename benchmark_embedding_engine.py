@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Benchmark the batched embedding engine on a synthetic mailbox backfill
+
+Streams synthetic emails of widely varying length (one-line replies up to long
+newsletters) through EmbeddingEngine and reports docs/sec and peak RSS for:
+
+    naive      fixed micro-batches in arrival order (no length bucketing)
+    bucketed   micro-batches cut from length-sorted windows
+    processes  bucketed, encoded by a pool of worker processes
+
+By default a CPU-bound stand-in encoder is used whose cost grows with padded
+sequence length like a small transformer (embedding projection plus attention).
+Pass --model to use a real sentence-transformers model instead.
+
+    python benchmark_embedding_engine.py --emails 100000 --processes 4
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+sys.path.append('.')
+
+from app.services.embedding_engine import EmbeddingEngine, ModelEncoder
+
+WORDS = ('meeting project update invoice quarterly review please attached thanks regards team schedule '
+         'deadline budget report customer release follow proposal contract agenda call notes').split()
+MAX_TOKENS = 256  # all-MiniLM-L6-v2 truncates at 256 tokens
+
+
+class SyntheticEncoder:
+    """Stand-in for a MiniLM-sized encoder: cost scales with batch size x padded length"""
+
+    def __init__(self, dim=384, hidden=64):
+        rng = np.random.default_rng(0)
+        self.table = rng.standard_normal((256, hidden)).astype(np.float32)
+        self.projection = rng.standard_normal((hidden, dim)).astype(np.float32)
+
+    def __call__(self, texts):
+        # ~4 characters per token, padded to the longest text in the batch
+        lengths = [min(MAX_TOKENS, len(text) // 4 + 2) for text in texts]
+        padded = max(lengths)
+        ids = np.zeros((len(texts), padded), dtype=np.uint8)
+        for row, (text, length) in enumerate(zip(texts, lengths)):
+            encoded = np.frombuffer(text.encode('utf-8')[:length], dtype=np.uint8)
+            ids[row, :len(encoded)] = encoded
+
+        hidden = self.table[ids]
+        attention = np.matmul(hidden, hidden.transpose(0, 2, 1)) / np.sqrt(hidden.shape[-1])
+        attention = np.exp(attention - attention.max(axis=-1, keepdims=True))
+        attention /= attention.sum(axis=-1, keepdims=True)
+        pooled = np.matmul(attention, hidden).mean(axis=1)
+        vectors = pooled @ self.projection
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def synthetic_emails(count, seed=42):
+    """Yield (email_id, document) pairs without materializing the mailbox"""
+    rng = random.Random(seed)
+    for i in range(count):
+        kind = rng.random()
+        if kind < 0.5:
+            words = rng.randint(3, 30)       # quick replies
+        elif kind < 0.85:
+            words = rng.randint(30, 150)     # ordinary messages
+        else:
+            words = rng.randint(150, 600)    # threads and newsletters
+        body = ' '.join(rng.choice(WORDS) for _ in range(words))
+        yield i, f"Subject: Message {i}\nFrom: sender{i % 500}@example.com\nContent: {body}"
+
+
+def peak_rss_mb():
+    """Peak RSS of this process and of its largest finished/joined child, in MB"""
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale
+    return round(own, 1), round(children, 1)
+
+
+def run_mode(args):
+    """Run one configuration and print a JSON result line (called in a fresh process)"""
+    encoder = ModelEncoder(args.model) if args.model else SyntheticEncoder()
+    bucket_size = args.batch_size if args.run_mode == 'naive' else args.bucket_size
+    processes = args.processes if args.run_mode == 'processes' else 0
+
+    engine = EmbeddingEngine(encoder, batch_size=args.batch_size, bucket_size=bucket_size, processes=processes)
+    checksum = 0.0
+    count = 0
+    start = time.perf_counter()
+    with engine:
+        for _, vector in engine.stream(synthetic_emails(args.emails)):
+            checksum += float(vector[0])
+            count += 1
+    elapsed = time.perf_counter() - start
+
+    own, children = peak_rss_mb()
+    print(json.dumps({
+        'mode': args.run_mode,
+        'documents': count,
+        'seconds': round(elapsed, 2),
+        'docs_per_second': round(count / elapsed, 1),
+        'peak_rss_mb': own,
+        'peak_child_rss_mb': children,
+        'stats': engine.get_stats()
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--emails', type=int, default=100000)
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--bucket-size', type=int, default=1024)
+    parser.add_argument('--processes', type=int, default=max(1, min(4, (os.cpu_count() or 2) - 1)))
+    parser.add_argument('--modes', default='naive,bucketed,processes')
+    parser.add_argument('--model', help='sentence-transformers model name (default: synthetic encoder)')
+    parser.add_argument('--run-mode', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_mode:
+        run_mode(args)
+        return
+
+    print(f"📊 Embedding backfill benchmark: {args.emails} emails, batch {args.batch_size}, "
+          f"window {args.bucket_size}, {args.processes} processes, "
+          f"encoder {args.model or 'synthetic'}")
+
+    # Each mode runs in its own interpreter so peak RSS is measured independently
+    for mode in args.modes.split(','):
+        command = [sys.executable, __file__, '--run-mode', mode, '--emails', str(args.emails),
+                   '--batch-size', str(args.batch_size), '--bucket-size', str(args.bucket_size),
+                   '--processes', str(args.processes)]
+        if args.model:
+            command += ['--model', args.model]
+        output = subprocess.run(command, capture_output=True, text=True, check=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+
+        rss = f"{result['peak_rss_mb']:.0f}MB"
+        if mode == 'processes':
+            rss += f" (+{result['peak_child_rss_mb']:.0f}MB per worker)"
+        print(f"   {mode:>9}: {result['docs_per_second']:9.1f} docs/s  {result['seconds']:7.1f}s  "
+              f"padding {result['stats']['padding_ratio']:.0%}  peak RSS {rss}")
+
+
+if __name__ == '__main__':
+    main()
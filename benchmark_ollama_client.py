@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark per-request overhead of the Ollama HTTP client
+
+Compares a fresh connection per call (plain requests.get/post, the previous
+behaviour) with the pooled keep-alive session used by OllamaService, against
+the local stub Ollama server.
+
+    python benchmark_ollama_client.py --requests 500
+"""
+import argparse
+import sys
+import time
+
+import requests
+
+sys.path.append('.')
+
+from fake_ollama_server import FakeOllamaServer
+from test_delta_sync import create_test_app
+
+
+def time_calls(label, count, call):
+    call()  # Warm up
+    start = time.perf_counter()
+    for _ in range(count):
+        call()
+    elapsed = time.perf_counter() - start
+    print(f"   {label:<28} {elapsed / count * 1000:7.3f} ms/request")
+    return elapsed / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--requests', type=int, default=500)
+    args = parser.parse_args()
+
+    with FakeOllamaServer() as ollama_fake:
+        app = create_test_app('http://127.0.0.1:9')
+        app.config.update({'OLLAMA_BASE_URL': ollama_fake.url})
+
+        with app.app_context():
+            from app.services.ollama_engine import get_ollama_service
+            service = get_ollama_service()
+            payload = {'model': 'test-model', 'prompt': 'ping', 'stream': False}
+
+            print(f"📊 Ollama client overhead ({args.requests} requests to {ollama_fake.url})")
+            before = time_calls('GET  /api/tags   new conn', args.requests,
+                                lambda: requests.get(f"{ollama_fake.url}/api/tags", timeout=5))
+            after = time_calls('GET  /api/tags   pooled', args.requests, service.list_models)
+            print(f"   speedup: {before / after:.1f}x")
+
+            before = time_calls('POST /api/generate new conn', args.requests,
+                                lambda: requests.post(f"{ollama_fake.url}/api/generate", json=payload, timeout=5))
+            after = time_calls('POST /api/generate pooled', args.requests,
+                               lambda: service.generate_response('ping'))
+            print(f"   speedup: {before / after:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
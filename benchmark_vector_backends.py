@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Benchmark vector search per user mailbox: native memmap backend versus ChromaDB
+
+For each mailbox size, loads clustered synthetic embeddings into a fresh
+collection and reports query latency (median and p95), open-to-first-result
+time and recall@10 against brute force. The native backend is measured with
+exact search and with its IVF index; ChromaDB is included when installed.
+
+    python benchmark_vector_backends.py --sizes 10000,50000,200000
+"""
+import argparse
+import importlib.util
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append('.')
+
+from app.services.vector_backends import create_vector_client
+
+
+def clustered_vectors(count, dim, clusters, seed):
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((clusters, dim))
+    vectors = centres[rng.integers(clusters, size=count)] + 0.35 * rng.standard_normal((count, dim))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def load(collection, vectors, batch=5000):
+    start = time.perf_counter()
+    for offset in range(0, len(vectors), batch):
+        end = min(offset + batch, len(vectors))
+        collection.upsert(
+            ids=[f'email_1_{i}' for i in range(offset, end)],
+            documents=[f'email {i}' for i in range(offset, end)],
+            metadatas=[{'email_id': i, 'user_id': 1} for i in range(offset, end)],
+            embeddings=vectors[offset:end].tolist()
+        )
+    return time.perf_counter() - start
+
+
+def measure(collection, vectors, queries, truth, where=None):
+    timings = []
+    recall = []
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        result = collection.query(query_embeddings=[query.tolist()], n_results=10, where=where)
+        timings.append((time.perf_counter() - start) * 1000)
+        found = {int(doc_id.rsplit('_', 1)[1]) for doc_id in result['ids'][0]}
+        recall.append(len(found & set(expected)) / 10)
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.95) - 1], float(np.mean(recall))
+
+
+def report(label, load_seconds, open_ms, stats):
+    median, p95, recall = stats
+    print(f"   {label:<16} {load_seconds:>8.1f} {open_ms:>10.1f} {median:>9.2f} {p95:>9.2f} {recall:>8.3f}")
+
+
+def run_size(size, dim, queries_count, backends):
+    vectors = clustered_vectors(size, dim, clusters=max(50, size // 500), seed=0)
+    queries = clustered_vectors(queries_count, dim, clusters=max(50, size // 500), seed=1)
+    truth = [np.argsort(-(vectors @ query))[:10] for query in queries]
+
+    print(f"\n📦 {size:,} vectors x {dim} dims per mailbox")
+    print(f"   {'backend':<16} {'load s':>8} {'open ms':>10} {'p50 ms':>9} {'p95 ms':>9} {'recall':>8}")
+
+    if 'native' in backends:
+        with tempfile.TemporaryDirectory() as tmp:
+            client = create_vector_client('native', tmp, ivf_threshold=size + 1)
+            load_seconds = load(client.get_or_create_collection('mailbox'), vectors)
+
+            # A fresh client, as after a restart: open, map and answer one query
+            start = time.perf_counter()
+            collection = create_vector_client('native', tmp, ivf_threshold=size + 1).get_collection('mailbox')
+            collection.query(query_embeddings=[queries[0].tolist()], n_results=10)
+            open_ms = (time.perf_counter() - start) * 1000
+            report('native exact', load_seconds, open_ms, measure(collection, vectors, queries, truth))
+
+            start = time.perf_counter()
+            collection.ivf_threshold = 0
+            collection.build_index()
+            build_seconds = time.perf_counter() - start
+            report('native IVF', load_seconds + build_seconds, open_ms, measure(collection, vectors, queries, truth))
+            report('native IVF+where', load_seconds + build_seconds, open_ms, measure(
+                collection, vectors, queries, truth, where={'user_id': 1}
+            ))
+
+    if 'chromadb' in backends:
+        with tempfile.TemporaryDirectory() as tmp:
+            client = create_vector_client('chromadb', tmp)
+            load_seconds = load(client.get_or_create_collection('mailbox', metadata={'hnsw:space': 'cosine'}), vectors)
+
+            start = time.perf_counter()
+            collection = create_vector_client('chromadb', tmp).get_collection('mailbox')
+            collection.query(query_embeddings=[queries[0].tolist()], n_results=10)
+            open_ms = (time.perf_counter() - start) * 1000
+            report('chromadb', load_seconds, open_ms, measure(collection, vectors, queries, truth))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--sizes', default='10000,50000,200000')
+    parser.add_argument('--dim', type=int, default=384)
+    parser.add_argument('--queries', type=int, default=100)
+    parser.add_argument('--backends', default='native,chromadb')
+    args = parser.parse_args()
+
+    backends = set(args.backends.split(','))
+    if 'chromadb' in backends and not importlib.util.find_spec('chromadb'):
+        print("⚠️ chromadb is not installed; benchmarking the native backend only")
+        backends.discard('chromadb')
+
+    print("📊 Vector backend benchmark")
+    for size in (int(s) for s in args.sizes.split(',')):
+        run_size(size, args.dim, args.queries, backends)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Benchmark native vector storage precision: float32 baseline versus float16 and int8
+
+For each mailbox size, loads the same clustered synthetic embeddings into a
+collection per precision and reports disk size, bytes read per exact scan, query
+latency (median and p95) and recall@10 against brute-force float32 search, for
+exact search and through the IVF index. int8+rerank keeps float16 originals and
+re-scores the best 10 x --rerank candidates against them.
+
+    python benchmark_vector_quantization.py --sizes 50000,200000 --rerank 4
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append('.')
+
+from app.services.vector_backends import create_vector_client
+from benchmark_vector_backends import clustered_vectors, load, measure
+
+
+def report(label, storage, stats):
+    median, p95, recall = stats
+    print(f"   {label:<22} {storage['disk_bytes'] / 1e6:>8.1f} {storage['scan_bytes'] / 1e6:>8.1f} "
+          f"{median:>9.2f} {p95:>9.2f} {recall:>8.3f}")
+
+
+def run_size(size, dim, queries_count, rerank):
+    vectors = clustered_vectors(size, dim, clusters=max(50, size // 500), seed=0)
+    queries = clustered_vectors(queries_count, dim, clusters=max(50, size // 500), seed=1)
+    truth = [np.argsort(-(vectors @ query))[:10] for query in queries]
+
+    print(f"\n📦 {size:,} vectors x {dim} dims")
+    print(f"   {'precision':<22} {'disk MB':>8} {'scan MB':>8} {'p50 ms':>9} {'p95 ms':>9} {'recall':>8}")
+
+    variants = [('float32', 0), ('float16', 0), ('int8', 0)] + ([('int8', rerank)] if rerank else [])
+    with tempfile.TemporaryDirectory() as tmp:
+        for precision, variant_rerank in variants:
+            label = f'{precision}+rerank x{variant_rerank}' if variant_rerank else precision
+            client = create_vector_client('native', os.path.join(tmp, label), ivf_threshold=size + 1,
+                                          precision=precision, rerank=variant_rerank)
+            collection = client.get_or_create_collection('mailbox')
+            load(collection, vectors)
+            storage = collection.get_storage_stats()
+
+            report(label, storage, measure(collection, vectors, queries, truth))
+            collection.ivf_threshold = 0
+            collection.build_index()
+            report(f'{label} IVF', storage, measure(collection, vectors, queries, truth))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--sizes', default='50000,200000')
+    parser.add_argument('--dim', type=int, default=384)
+    parser.add_argument('--queries', type=int, default=100)
+    parser.add_argument('--rerank', type=int, default=4, help='candidates per result for int8+rerank (0: skip)')
+    args = parser.parse_args()
+
+    print("📊 Vector precision benchmark")
+    for size in (int(s) for s in args.sizes.split(',')):
+        run_size(size, args.dim, args.queries, args.rerank)
+
+
+if __name__ == '__main__':
+    main()
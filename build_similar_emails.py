@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Build the precomputed similar-email lists shown on email detail pages
+
+Neighbor lists are computed from the embeddings already in the vector store, so
+run this after the vector database has been backfilled. Syncs keep the lists up
+to date afterwards; re-run it after changing SIMILAR_EMAILS_K or the embedding
+model.
+
+    python build_similar_emails.py [--user USER_ID]
+"""
+import sys
+import time
+
+sys.path.append('.')
+
+def build(user_id=None):
+    """Rebuild neighbor lists for one user, or for every user"""
+    print("🔄 Building similar-email lists")
+    print("=" * 35)
+    
+    try:
+        from app import create_app
+        from app.models import db
+        from app.models.user import User
+        from app.services.similar_emails import SimilarEmailIndex
+        
+        app = create_app()
+        with app.app_context():
+            index = getattr(app, 'similar_emails', None) or SimilarEmailIndex(app)
+            if not index.available:
+                print("❌ Vector database is not available")
+                return False
+            
+            if user_id is not None:
+                user_ids = [user_id]
+            else:
+                user_ids = [uid for (uid,) in db.session.query(User.id).order_by(User.id)]
+            
+            total = 0
+            for uid in user_ids:
+                started = time.perf_counter()
+                count = index.rebuild_user(uid)
+                total += count
+                print(f"✅ User {uid}: {count} emails ({time.perf_counter() - started:.1f}s)")
+            
+            print(f"✅ Built top-{index.k} lists for {total} emails of {len(user_ids)} users")
+        
+        return True
+    
+    except Exception as e:
+        print(f"❌ Build error: {e}")
+        return False
+
+if __name__ == "__main__":
+    user_arg = None
+    if '--user' in sys.argv:
+        user_arg = int(sys.argv[sys.argv.index('--user') + 1])
+    success = build(user_arg)
+    sys.exit(0 if success else 1)
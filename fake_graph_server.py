@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+Local fake Microsoft Graph server for sync tests and benchmarks
+
+Serves an in-memory mailbox over HTTP so GraphService can be pointed at it via
+GRAPH_API_ENDPOINT. Supports folder listing, /messages/delta rounds with paging,
+delta links and removed-message tombstones, single-message GET/PATCH, JSON
+batching via /$batch and $select projections.
+"""
+import json
+import threading
+import uuid
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+FOLDER_ALIASES = {'sent': 'sentitems'}
+
+
+def apply_select(message, select):
+    """Project a message onto a $select field list (id is always returned)"""
+    if not select or message is None or '@removed' in message:
+        return message
+    fields = set(select.split(',')) | {'id'}
+    return {key: value for key, value in message.items() if key in fields}
+
+
+def make_message(index, folder='inbox', **overrides):
+    """Build a synthetic Graph message resource"""
+    received = datetime(2024, 1, 1) + timedelta(minutes=index)
+    message = {
+        'id': f'AAMk-{folder}-{index}-{uuid.uuid4().hex[:8]}',
+        'subject': f'Synthetic message {index}',
+        'sender': {'emailAddress': {'address': f'sender{index % 50}@example.com', 'name': f'Sender {index % 50}'}},
+        'toRecipients': [{'emailAddress': {'address': 'me@example.com', 'name': 'Me'}}],
+        'ccRecipients': [],
+        'bccRecipients': [],
+        'receivedDateTime': received.strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'sentDateTime': received.strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'bodyPreview': f'Preview of synthetic message {index}',
+        'body': {'contentType': 'html', 'content': f'<p>Body of synthetic message {index}</p>'},
+        'importance': 'normal',
+        'isRead': False,
+        'isDraft': False,
+        'hasAttachments': False,
+        'conversationId': f'conv-{index // 3}',
+        'parentFolderId': folder
+    }
+    message.update(overrides)
+    return message
+
+
+class FakeGraphServer:
+    """In-memory Graph mailbox served on a local port"""
+
+    def __init__(self, host='127.0.0.1', port=0):
+        self.lock = threading.Lock()
+        self.version = 0
+        self.folders = {}  # folder -> {message_id: (version, message or None)}
+        self.expired_tokens = set()
+        self.requests = []
+        self.bytes_sent = 0
+        self.throttle_next = 0  # Number of upcoming requests answered with throttle_status
+        self.throttle_status = 429  # Or 503/504 to simulate an unavailable service
+        self.retry_after = '1'  # Retry-After header sent with throttled responses (None: no header)
+        self.throttle_batch_items = 0  # Number of upcoming $batch sub-requests answered with 429
+
+        self.httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        """Base URL to use as GRAPH_API_ENDPOINT"""
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1.0"
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # Mailbox mutation -------------------------------------------------------
+
+    def _folder(self, folder):
+        folder = FOLDER_ALIASES.get(folder.lower(), folder.lower())
+        return self.folders.setdefault(folder, {})
+
+    def add_message(self, folder='inbox', message=None, **overrides):
+        """Add a message and return its id"""
+        with self.lock:
+            entries = self._folder(folder)
+            message = message or make_message(len(entries), folder, **overrides)
+            self.version += 1
+            entries[message['id']] = (self.version, message)
+            return message['id']
+
+    def update_message(self, message_id, folder='inbox', **fields):
+        with self.lock:
+            entries = self._folder(folder)
+            _, message = entries[message_id]
+            message.update(fields)
+            self.version += 1
+            entries[message_id] = (self.version, message)
+
+    def remove_message(self, message_id, folder='inbox'):
+        with self.lock:
+            self.version += 1
+            self._folder(folder)[message_id] = (self.version, None)
+
+    def expire_delta_tokens(self):
+        """Make every delta link issued so far return 410 Gone"""
+        with self.lock:
+            self.expired_tokens.update(range(self.version + 1))
+
+    def get_message(self, message_id):
+        """Get a live message by id from any folder"""
+        with self.lock:
+            for entries in self.folders.values():
+                version, message = entries.get(message_id, (None, None))
+                if message is not None:
+                    return message
+        return None
+
+    # Request handling -------------------------------------------------------
+
+    def _message_request(self, method, message_id, body=None, select=None):
+        """Handle GET/PATCH /me/messages/{id}, returning (status, payload)"""
+        with self.lock:
+            for entries in self.folders.values():
+                version, message = entries.get(message_id, (None, None))
+                if message is None:
+                    continue
+                if method == 'PATCH':
+                    message.update(body or {})
+                    self.version += 1
+                    entries[message_id] = (self.version, message)
+                return 200, apply_select(message, select)
+        return 404, {'error': {'code': 'ErrorItemNotFound'}}
+
+    def _batch_request(self, sub_request):
+        """Handle one sub-request of a $batch call"""
+        with self.lock:
+            throttled = self.throttle_batch_items > 0
+            if throttled:
+                self.throttle_batch_items -= 1
+        if throttled:
+            status, headers, body = 429, {'Retry-After': self.retry_after}, {'error': {'code': 'TooManyRequests'}}
+        else:
+            parsed = urlparse(sub_request['url'])
+            parts = parsed.path.strip('/').split('/')
+            select = parse_qs(parsed.query).get('$select', [None])[0]
+            if len(parts) == 3 and parts[:2] == ['me', 'messages'] and sub_request['method'] in ('GET', 'PATCH'):
+                status, body = self._message_request(sub_request['method'], parts[2], sub_request.get('body'), select)
+            else:
+                status, body = 400, {'error': {'code': 'BadRequest'}}
+            headers = {'Content-Type': 'application/json'}
+        return {'id': sub_request['id'], 'status': status, 'headers': headers, 'body': body}
+
+    def _delta_page(self, folder, since, offset, snapshot, page_size, select=None):
+        with self.lock:
+            changes = []
+            for message_id, (version, message) in self._folder(folder).items():
+                if since < version <= snapshot:
+                    if message is None:
+                        if since:  # Tombstones are only reported to existing rounds
+                            changes.append({'id': message_id, '@removed': {'reason': 'deleted'}})
+                    else:
+                        changes.append(message)
+
+        page = [apply_select(message, select) for message in changes[offset:offset + page_size]]
+        base = f"{self.url}/me/mailFolders/{folder}/messages/delta"
+        # Like Graph, links carry the original $select forward
+        suffix = f"&$select={select}" if select else ''
+        result = {'value': page}
+        if offset + page_size < len(changes):
+            result['@odata.nextLink'] = f"{base}?$skiptoken={since}-{offset + page_size}-{snapshot}{suffix}"
+        else:
+            result['@odata.deltaLink'] = f"{base}?$deltatoken={snapshot}{suffix}"
+        return result
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, payload=None, headers=None):
+                body = json.dumps(payload).encode() if payload is not None else b''
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                with server.lock:
+                    server.bytes_sent += len(body)
+
+            def _read_json(self):
+                length = int(self.headers.get('Content-Length', 0))
+                return json.loads(self.rfile.read(length) or b'{}')
+
+            def _throttled(self):
+                with server.lock:
+                    throttled = server.throttle_next > 0
+                    if throttled:
+                        server.throttle_next -= 1
+                if throttled:
+                    headers = {'Retry-After': server.retry_after} if server.retry_after is not None else {}
+                    self._send(server.throttle_status, {'error': {'code': 'TooManyRequests'}}, headers)
+                return throttled
+
+            def do_POST(self):
+                body = self._read_json()
+                server.requests.append(('POST', self.path))
+                if self._throttled():
+                    return
+
+                if urlparse(self.path).path.rstrip('/').endswith('/$batch'):
+                    sub_requests = body.get('requests', [])
+                    if len(sub_requests) > 20:
+                        return self._send(400, {'error': {'code': 'BadRequest', 'message': 'Too many requests'}})
+                    return self._send(200, {'responses': [server._batch_request(r) for r in sub_requests]})
+
+                self._send(404, {'error': {'code': 'NotFound'}})
+
+            def do_PATCH(self):
+                body = self._read_json()
+                server.requests.append(('PATCH', self.path))
+                if self._throttled():
+                    return
+
+                parts = urlparse(self.path).path.strip('/').split('/')
+                if len(parts) == 4 and parts[1:3] == ['me', 'messages']:
+                    return self._send(*server._message_request('PATCH', parts[3], body))
+                self._send(404, {'error': {'code': 'NotFound'}})
+
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                query = parse_qs(parsed.query)
+                parts = parsed.path.strip('/').split('/')
+                select = query.get('$select', [None])[0]
+                server.requests.append(('GET', self.path))
+                if self._throttled():
+                    return
+
+                # /v1.0/me/messages/{id}
+                if len(parts) == 4 and parts[1:3] == ['me', 'messages']:
+                    return self._send(*server._message_request('GET', parts[3], select=select))
+
+                # /v1.0/me/mailFolders/{folder}/messages[/delta]
+                if len(parts) >= 5 and parts[1:3] == ['me', 'mailFolders'] and parts[4] == 'messages':
+                    folder = FOLDER_ALIASES.get(parts[3].lower(), parts[3].lower())
+
+                    if len(parts) == 6 and parts[5] == 'delta':
+                        prefer = self.headers.get('Prefer', '')
+                        page_size = int(prefer.split('=')[1]) if 'maxpagesize' in prefer else 10
+
+                        if '$skiptoken' in query:
+                            since, offset, snapshot = (int(v) for v in query['$skiptoken'][0].split('-'))
+                        else:
+                            since = int(query.get('$deltatoken', ['0'])[0])
+                            offset, snapshot = 0, server.version
+
+                        if since in server.expired_tokens and since:
+                            return self._send(410, {'error': {'code': 'syncStateNotFound'}})
+
+                        return self._send(200, server._delta_page(folder, since, offset, snapshot, page_size, select))
+
+                    top = int(query.get('$top', ['10'])[0])
+                    skip = int(query.get('$skip', ['0'])[0])
+                    with server.lock:
+                        messages = [m for _, m in server._folder(folder).values() if m is not None]
+                    messages.sort(key=lambda m: m['receivedDateTime'], reverse=True)
+                    return self._send(200, {'value': [apply_select(m, select) for m in messages[skip:skip + top]]})
+
+                self._send(404, {'error': {'code': 'NotFound'}})
+
+        return Handler
+
+
+if __name__ == '__main__':
+    with FakeGraphServer(port=8765) as fake:
+        for i in range(25):
+            fake.add_message('inbox')
+        print(f"Fake Graph server running at {fake.url} (Ctrl+C to stop)")
+        try:
+            fake.thread.join()
+        except KeyboardInterrupt:
+            pass
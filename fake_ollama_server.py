@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Local stub Ollama server for tests and benchmarks
+
+Implements /api/tags, /api/generate (streaming and non-streaming), /api/chat and
+/api/embeddings with configurable latency, scripted failures and a pluggable
+response function, so OllamaService can be pointed at it via OLLAMA_BASE_URL.
+With token_delay set, streamed responses are sent one chunk at a time like a
+model generating, and clients that hang up mid-stream are counted as cancelled.
+Generate responses return a 'context' token array (one token per word) and
+prompt_eval_count/duration: a request continuing a returned context only
+evaluates its new prompt, each token costing prompt_token_seconds.
+The first request for a model that is not loaded costs load_seconds, and loading
+it evicts the oldest model past max_loaded_models; /api/ps lists what is loaded.
+"""
+import json
+import re
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_ANALYSIS = {
+    'summary': 'Stub summary of the email.',
+    'tags': ['stub', 'test'],
+    'sentiment': 'neutral',
+    'priority_score': 5
+}
+
+
+def default_responder(request):
+    """Answer generate requests with a fixed JSON analysis (an array for batch prompts)"""
+    batch_size = len(re.findall(r'\[Email \d+\]', request.get('prompt', '')))
+    if batch_size:
+        return json.dumps([dict(DEFAULT_ANALYSIS, index=i) for i in range(1, batch_size + 1)])
+    return json.dumps(DEFAULT_ANALYSIS)
+
+
+def tokenize(text):
+    """Stand-in tokenizer: one token per word"""
+    return [zlib.crc32(word.encode()) % 32000 for word in text.split()]
+
+
+class FakeOllamaServer:
+    """Stub Ollama API served on a local port"""
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, responder=None, model='test-model', token_delay=0.0,
+                 prompt_token_seconds=0.0, models=None, load_seconds=0.0, max_loaded_models=1):
+        self.latency = latency  # Seconds per generate call
+        self.token_delay = token_delay  # Seconds between streamed chunks (0: send the whole stream at once)
+        self.prompt_token_seconds = prompt_token_seconds  # Prompt evaluation cost per token
+        self.responder = responder or default_responder
+        self.model = model
+        self.models = models  # Pulled models; requests for others get 404 (None: any model)
+        self.load_seconds = load_seconds  # Cost of loading a model that is not in memory
+        self.max_loaded_models = max_loaded_models
+        self.loaded = []  # Models in memory, least recently loaded first
+        self.model_loads = 0
+        self.fail_next = 0  # Number of upcoming generate calls answered with HTTP 500
+        self.requests = []
+        self.streamed_chunks = 0
+        self.cancelled = 0  # Streams the client disconnected from before the last chunk
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+        self.httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        """Base URL to use as OLLAMA_BASE_URL"""
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def generate_count(self):
+        return sum(1 for path, _ in self.requests if path in ('/api/generate', '/api/chat'))
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, payload):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _send_paced(self, chunks):
+                """Chunked transfer encoding, one JSON line every token_delay seconds"""
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/x-ndjson')
+                self.send_header('Transfer-Encoding', 'chunked')
+                self.end_headers()
+                try:
+                    for chunk in chunks:
+                        time.sleep(server.token_delay)
+                        line = json.dumps(chunk).encode() + b'\n'
+                        self.wfile.write(f'{len(line):x}\r\n'.encode() + line + b'\r\n')
+                        self.wfile.flush()
+                        with server.lock:
+                            server.streamed_chunks += 1
+                    self.wfile.write(b'0\r\n\r\n')
+                except (BrokenPipeError, ConnectionResetError):
+                    with server.lock:
+                        server.cancelled += 1
+                    self.close_connection = True
+
+            def _read_json(self):
+                length = int(self.headers.get('Content-Length', 0))
+                return json.loads(self.rfile.read(length) or b'{}')
+
+            def do_GET(self):
+                server.requests.append((self.path, None))
+                if self.path == '/api/tags':
+                    return self._send(200, {'models': [{'name': name} for name in server.models or [server.model]]})
+                if self.path == '/api/ps':
+                    with server.lock:
+                        return self._send(200, {'models': [{'name': name} for name in server.loaded]})
+                self._send(404, {'error': 'not found'})
+
+            def do_POST(self):
+                request = self._read_json()
+                server.requests.append((self.path, request))
+
+                if self.path == '/api/embeddings':
+                    text = request.get('prompt', '')
+                    return self._send(200, {'embedding': [float(len(text) % 7), 1.0, 0.5]})
+
+                if self.path not in ('/api/generate', '/api/chat'):
+                    return self._send(404, {'error': 'not found'})
+
+                model = request.get('model')
+                if server.models is not None and model not in server.models:
+                    return self._send(404, {'error': f"model '{model}' not found"})
+
+                with server.lock:
+                    loading = model not in server.loaded
+                    if loading:
+                        server.model_loads += 1
+                        server.loaded.append(model)
+                        del server.loaded[:-server.max_loaded_models]
+                    if server.fail_next > 0:
+                        server.fail_next -= 1
+                        fail = True
+                    else:
+                        fail = False
+                    server.in_flight += 1
+                    server.max_in_flight = max(server.max_in_flight, server.in_flight)
+
+                try:
+                    if fail:
+                        return self._send(500, {'error': 'model overloaded'})
+
+                    time.sleep(server.latency + (server.load_seconds if loading else 0))
+                    text = server.responder(request)
+
+                    if self.path == '/api/chat':
+                        payload = {'message': {'role': 'assistant', 'content': text}, 'done': True}
+                    else:
+                        # A continued context is already evaluated; only the new prompt is
+                        prompt_tokens = tokenize(request.get('prompt', ''))
+                        prompt_eval = len(prompt_tokens) * server.prompt_token_seconds
+                        time.sleep(prompt_eval)
+                        payload = {
+                            'response': text, 'done': True,
+                            'context': list(request.get('context') or []) + prompt_tokens + tokenize(text),
+                            'prompt_eval_count': len(prompt_tokens),
+                            'prompt_eval_duration': int(prompt_eval * 1e9),
+                            'eval_count': len(tokenize(text))
+                        }
+
+                    if request.get('stream', True):
+                        # Newline-delimited JSON chunks like the real server
+                        chunks = [{'response': word + ' ', 'done': False} for word in text.split(' ')]
+                        chunks.append(dict(payload, response=''))
+                        if server.token_delay:
+                            return self._send_paced(chunks)
+                        body = b''.join(json.dumps(c).encode() + b'\n' for c in chunks)
+                        self.send_response(200)
+                        self.send_header('Content-Type', 'application/x-ndjson')
+                        self.send_header('Content-Length', str(len(body)))
+                        self.end_headers()
+                        self.wfile.write(body)
+                    else:
+                        self._send(200, payload)
+                finally:
+                    with server.lock:
+                        server.in_flight -= 1
+
+        return Handler
+
+
+if __name__ == '__main__':
+    with FakeOllamaServer(port=11435, latency=0.2) as fake:
+        print(f"Stub Ollama server running at {fake.url} (Ctrl+C to stop)")
+        try:
+            fake.thread.join()
+        except KeyboardInterrupt:
+            pass
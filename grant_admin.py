@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Grant or revoke admin privileges for a user
+
+    python grant_admin.py user@example.com [--revoke]
+"""
+import sys
+
+sys.path.append('.')
+
+def set_admin(email, is_admin=True):
+    """Set users.is_admin for the user with this email address"""
+    try:
+        from app import create_app
+        from app.models import db
+        from app.models.user import User
+        
+        app = create_app()
+        with app.app_context():
+            user = User.find_by_email(email)
+            if not user:
+                print(f"❌ No user with email {email}")
+                return False
+            
+            user.is_admin = is_admin
+            db.session.commit()
+            print(f"✅ {email} is {'now' if is_admin else 'no longer'} an admin")
+        
+        return True
+    
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        return False
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(__doc__.strip())
+        sys.exit(1)
+    success = set_admin(sys.argv[1], '--revoke' not in sys.argv)
+    sys.exit(0 if success else 1)
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Add the emails.body_fetched_at column used by header-only sync
+
+Rows that already have a stored body are marked as fetched so they are not
+downloaded again when opened.
+"""
+import sys
+
+sys.path.append('.')
+
+def migrate():
+    """Add and backfill emails.body_fetched_at"""
+    print("🔄 Adding body_fetched_at to emails")
+    print("=" * 35)
+    
+    try:
+        from sqlalchemy import inspect, text
+        from app import create_app
+        from app.models import db
+        
+        app = create_app()
+        with app.app_context():
+            columns = [col['name'] for col in inspect(db.engine).get_columns('emails')]
+            
+            if 'body_fetched_at' in columns:
+                print("✅ body_fetched_at already exists")
+            else:
+                column_type = 'TIMESTAMP' if db.engine.dialect.name == 'postgresql' else 'DATETIME'
+                db.session.execute(text(f"ALTER TABLE emails ADD COLUMN body_fetched_at {column_type}"))
+                print("✅ Added body_fetched_at")
+            
+            result = db.session.execute(text(
+                "UPDATE emails SET body_fetched_at = updated_at "
+                "WHERE body_fetched_at IS NULL AND (body_text IS NOT NULL OR body_html IS NOT NULL)"
+            ))
+            db.session.commit()
+            print(f"✅ Marked {result.rowcount} emails with stored bodies as fetched")
+        
+        return True
+    
+    except Exception as e:
+        print(f"❌ Migration error: {e}")
+        return False
+
+if __name__ == "__main__":
+    success = migrate()
+    sys.exit(0 if success else 1)
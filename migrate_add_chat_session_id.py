@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Add the chat_messages.session_id column used to group chat turns into conversations
+
+Older messages keep a null session and are simply not part of any conversation.
+"""
+import sys
+
+sys.path.append('.')
+
+def migrate():
+    """Add and index chat_messages.session_id"""
+    print("🔄 Adding session_id to chat_messages")
+    print("=" * 35)
+    
+    try:
+        from sqlalchemy import inspect, text
+        from app import create_app
+        from app.models import db
+        
+        app = create_app()
+        with app.app_context():
+            columns = [col['name'] for col in inspect(db.engine).get_columns('chat_messages')]
+            
+            if 'session_id' in columns:
+                print("✅ session_id already exists")
+            else:
+                db.session.execute(text("ALTER TABLE chat_messages ADD COLUMN session_id VARCHAR(100)"))
+                print("✅ Added session_id")
+            
+            db.session.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_chat_messages_session_id ON chat_messages (session_id)"
+            ))
+            db.session.commit()
+            print("✅ Indexed session_id")
+        
+        return True
+    
+    except Exception as e:
+        print(f"❌ Migration error: {e}")
+        return False
+
+if __name__ == "__main__":
+    success = migrate()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Add the emails.folder_name column used by folder filters in search
+
+Existing rows are left NULL (unknown folder) until their next sync.
+"""
+import sys
+
+sys.path.append('.')
+
+def migrate():
+    """Add and index emails.folder_name"""
+    print("🔄 Adding folder_name to emails")
+    print("=" * 35)
+    
+    try:
+        from sqlalchemy import inspect, text
+        from app import create_app
+        from app.models import db
+        
+        app = create_app()
+        with app.app_context():
+            inspector = inspect(db.engine)
+            columns = [col['name'] for col in inspector.get_columns('emails')]
+            
+            if 'folder_name' in columns:
+                print("✅ folder_name already exists")
+            else:
+                db.session.execute(text("ALTER TABLE emails ADD COLUMN folder_name VARCHAR(100)"))
+                print("✅ Added folder_name")
+            
+            indexes = [index['name'] for index in inspector.get_indexes('emails')]
+            if 'ix_emails_folder_name' not in indexes:
+                db.session.execute(text("CREATE INDEX ix_emails_folder_name ON emails (folder_name)"))
+                print("✅ Indexed folder_name")
+            
+            db.session.commit()
+        
+        return True
+    
+    except Exception as e:
+        print(f"❌ Migration error: {e}")
+        return False
+
+if __name__ == "__main__":
+    success = migrate()
+    sys.exit(0 if success else 1)
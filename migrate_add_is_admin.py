@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Add the users.is_admin column
+
+Admins can read service-wide stats such as the LLM response cache and purge it.
+Grant the flag with grant_admin.py once the column exists.
+"""
+import sys
+
+sys.path.append('.')
+
+def migrate():
+    """Add users.is_admin"""
+    print("🔄 Adding is_admin to users")
+    print("=" * 35)
+    
+    try:
+        from sqlalchemy import inspect, text
+        from app import create_app
+        from app.models import db
+        
+        app = create_app()
+        with app.app_context():
+            columns = [col['name'] for col in inspect(db.engine).get_columns('users')]
+            
+            if 'is_admin' in columns:
+                print("✅ is_admin already exists")
+            else:
+                db.session.execute(text("ALTER TABLE users ADD COLUMN is_admin BOOLEAN NOT NULL DEFAULT FALSE"))
+                db.session.commit()
+                print("✅ Added is_admin")
+        
+        return True
+    
+    except Exception as e:
+        print(f"❌ Migration error: {e}")
+        return False
+
+if __name__ == "__main__":
+    success = migrate()
+    sys.exit(0 if success else 1)
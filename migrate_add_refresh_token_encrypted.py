@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Add the users.refresh_token_encrypted column used by scheduled sync
+
+Users need to sign in once after the migration so their refresh token is stored.
+"""
+import sys
+
+sys.path.append('.')
+
+def migrate():
+    """Add users.refresh_token_encrypted"""
+    print("🔄 Adding refresh_token_encrypted to users")
+    print("=" * 42)
+    
+    try:
+        from sqlalchemy import inspect, text
+        from app import create_app
+        from app.models import db
+        
+        app = create_app()
+        with app.app_context():
+            columns = [col['name'] for col in inspect(db.engine).get_columns('users')]
+            
+            if 'refresh_token_encrypted' in columns:
+                print("✅ refresh_token_encrypted already exists")
+            else:
+                db.session.execute(text("ALTER TABLE users ADD COLUMN refresh_token_encrypted TEXT"))
+                db.session.commit()
+                print("✅ Added refresh_token_encrypted")
+        
+        return True
+    
+    except Exception as e:
+        print(f"❌ Migration error: {e}")
+        return False
+
+if __name__ == "__main__":
+    success = migrate()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Add the users.search_generation column that keys cached search results
+
+Syncs and read-state changes bump it, so every process drops its cached
+results for that user.
+"""
+import sys
+
+sys.path.append('.')
+
+def migrate():
+    """Add users.search_generation"""
+    print("🔄 Adding search_generation to users")
+    print("=" * 35)
+    
+    try:
+        from sqlalchemy import inspect, text
+        from app import create_app
+        from app.models import db
+        
+        app = create_app()
+        with app.app_context():
+            columns = [col['name'] for col in inspect(db.engine).get_columns('users')]
+            
+            if 'search_generation' in columns:
+                print("✅ search_generation already exists")
+            else:
+                db.session.execute(text("ALTER TABLE users ADD COLUMN search_generation INTEGER NOT NULL DEFAULT 0"))
+                db.session.commit()
+                print("✅ Added search_generation")
+        
+        return True
+    
+    except Exception as e:
+        print(f"❌ Migration error: {e}")
+        return False
+
+if __name__ == "__main__":
+    success = migrate()
+    sys.exit(0 if success else 1)
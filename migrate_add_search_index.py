@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Create (or rebuild) the full-text search index used by /api/email/search
+
+SQLite gets an FTS5 table kept in sync by triggers; PostgreSQL gets a generated
+tsvector column with a GIN index. The app creates the index on startup as well,
+but on a large mailbox database it is better to build it ahead of time.
+
+    python migrate_add_search_index.py [--rebuild]
+"""
+import sys
+import time
+
+sys.path.append('.')
+
+def migrate(rebuild=False):
+    """Create the search index and populate it from existing emails"""
+    print("🔄 Building full-text search index")
+    print("=" * 35)
+    
+    try:
+        from app import create_app
+        from app.models import db
+        from app.services.email_search import EmailSearchService
+        
+        app = create_app()
+        with app.app_context():
+            started = time.perf_counter()
+            search = EmailSearchService(app)
+            if not search.ensure_index(rebuild=rebuild):
+                print(f"❌ Full-text search is not available on {search.dialect}")
+                return False
+            
+            count = db.session.execute(db.text("SELECT COUNT(*) FROM emails")).scalar()
+            print(f"✅ Search index ready on {search.dialect} ({count} emails, {time.perf_counter() - started:.1f}s)")
+        
+        return True
+    
+    except Exception as e:
+        print(f"❌ Migration error: {e}")
+        return False
+
+if __name__ == "__main__":
+    success = migrate(rebuild='--rebuild' in sys.argv)
+    sys.exit(0 if success else 1)
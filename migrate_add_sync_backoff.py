@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Add the users.sync_failures and users.next_sync_at columns used by sync backoff
+
+The sync scheduler skips a user until next_sync_at after a failed sync, so a
+broken account is not retried on every poll.
+"""
+import sys
+
+sys.path.append('.')
+
+def migrate():
+    """Add users.sync_failures and users.next_sync_at"""
+    print("🔄 Adding sync backoff columns to users")
+    print("=" * 35)
+    
+    try:
+        from sqlalchemy import inspect, text
+        from app import create_app
+        from app.models import db
+        
+        app = create_app()
+        with app.app_context():
+            columns = [col['name'] for col in inspect(db.engine).get_columns('users')]
+            
+            if 'sync_failures' in columns:
+                print("✅ sync_failures already exists")
+            else:
+                db.session.execute(text("ALTER TABLE users ADD COLUMN sync_failures INTEGER NOT NULL DEFAULT 0"))
+                print("✅ Added sync_failures")
+            
+            if 'next_sync_at' in columns:
+                print("✅ next_sync_at already exists")
+            else:
+                column_type = 'TIMESTAMP' if db.engine.dialect.name == 'postgresql' else 'DATETIME'
+                db.session.execute(text(f"ALTER TABLE users ADD COLUMN next_sync_at {column_type}"))
+                print("✅ Added next_sync_at")
+            
+            db.session.commit()
+        
+        return True
+    
+    except Exception as e:
+        print(f"❌ Migration error: {e}")
+        return False
+
+if __name__ == "__main__":
+    success = migrate()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Add the users.sync_lease_until column used to claim a user for syncing
+
+The sync scheduler, sync_worker.py and the manual sync route all claim a user
+through this lease before syncing, so two processes never sync one mailbox at
+the same time.
+"""
+import sys
+
+sys.path.append('.')
+
+def migrate():
+    """Add users.sync_lease_until"""
+    print("🔄 Adding sync lease column to users")
+    print("=" * 35)
+    
+    try:
+        from sqlalchemy import inspect, text
+        from app import create_app
+        from app.models import db
+        
+        app = create_app()
+        with app.app_context():
+            columns = [col['name'] for col in inspect(db.engine).get_columns('users')]
+            
+            if 'sync_lease_until' in columns:
+                print("✅ sync_lease_until already exists")
+            else:
+                column_type = 'TIMESTAMP' if db.engine.dialect.name == 'postgresql' else 'DATETIME'
+                db.session.execute(text(f"ALTER TABLE users ADD COLUMN sync_lease_until {column_type}"))
+                print("✅ Added sync_lease_until")
+            
+            db.session.commit()
+        
+        return True
+    
+    except Exception as e:
+        print(f"❌ Migration error: {e}")
+        return False
+
+if __name__ == "__main__":
+    success = migrate()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Make emails.graph_id unique per user instead of across all users
+
+Graph message IDs are only unique within one mailbox. With a table-wide unique
+index, an ID already stored for another user could never be inserted for the
+user being synced. This replaces that index with a plain one on graph_id plus
+a unique index on (user_id, graph_id), which bulk inserts use for conflicts.
+"""
+import sys
+
+sys.path.append('.')
+
+def migrate():
+    """Replace the unique index on emails.graph_id with one on (user_id, graph_id)"""
+    print("🔄 Making emails.graph_id unique per user")
+    print("=" * 35)
+    
+    try:
+        from sqlalchemy import inspect, text
+        from app import create_app
+        from app.models import db
+        
+        app = create_app()
+        with app.app_context():
+            inspector = inspect(db.engine)
+            indexes = inspector.get_indexes('emails')
+            
+            if any(index['name'] == 'uq_emails_user_graph_id' for index in indexes):
+                print("✅ uq_emails_user_graph_id already exists")
+                return True
+            
+            constraints = [
+                constraint for constraint in inspector.get_unique_constraints('emails')
+                if constraint['column_names'] == ['graph_id']
+            ]
+            if constraints:
+                if db.engine.dialect.name == 'sqlite':
+                    print("❌ graph_id has an inline UNIQUE constraint, which SQLite cannot drop;")
+                    print("   rebuild the emails table from the current model instead")
+                    return False
+                for constraint in constraints:
+                    db.session.execute(text(f'ALTER TABLE emails DROP CONSTRAINT "{constraint["name"]}"'))
+                    print(f"✅ Dropped constraint {constraint['name']}")
+            
+            for index in indexes:
+                if index['column_names'] == ['graph_id'] and index['unique']:
+                    db.session.execute(text(f'DROP INDEX "{index["name"]}"'))
+                    print(f"✅ Dropped unique index {index['name']}")
+            
+            db.session.execute(text("CREATE INDEX IF NOT EXISTS ix_emails_graph_id ON emails (graph_id)"))
+            db.session.execute(text("CREATE UNIQUE INDEX uq_emails_user_graph_id ON emails (user_id, graph_id)"))
+            print("✅ Added uq_emails_user_graph_id")
+            
+            db.session.commit()
+        
+        return True
+    
+    except Exception as e:
+        print(f"❌ Migration error: {e}")
+        return False
+
+if __name__ == "__main__":
+    success = migrate()
+    sys.exit(0 if success else 1)
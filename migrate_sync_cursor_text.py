@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Widen users.email_sync_cursor from VARCHAR(255) to TEXT
+
+The column now holds a JSON map of mail folder to Graph delta link, and delta
+links alone are longer than 255 characters. SQLite does not enforce VARCHAR
+lengths, so only PostgreSQL and MySQL databases need the change.
+"""
+import sys
+
+sys.path.append('.')
+
+def migrate():
+    """Change users.email_sync_cursor to TEXT"""
+    print("🔄 Widening users.email_sync_cursor to TEXT")
+    print("=" * 35)
+    
+    try:
+        from sqlalchemy import inspect, text
+        from app import create_app
+        from app.models import db
+        
+        app = create_app()
+        with app.app_context():
+            columns = {col['name']: col for col in inspect(db.engine).get_columns('users')}
+            dialect = db.engine.dialect.name
+            
+            if 'email_sync_cursor' not in columns:
+                print("❌ users.email_sync_cursor not found")
+                return False
+            
+            if getattr(columns['email_sync_cursor']['type'], 'length', None) is None:
+                print("✅ email_sync_cursor is already unbounded")
+            elif dialect == 'postgresql':
+                db.session.execute(text("ALTER TABLE users ALTER COLUMN email_sync_cursor TYPE TEXT"))
+                print("✅ Changed email_sync_cursor to TEXT")
+            elif dialect == 'mysql':
+                db.session.execute(text("ALTER TABLE users MODIFY email_sync_cursor TEXT"))
+                print("✅ Changed email_sync_cursor to TEXT")
+            else:
+                print(f"✅ {dialect} does not enforce the VARCHAR length, nothing to change")
+            
+            db.session.commit()
+        
+        return True
+    
+    except Exception as e:
+        print(f"❌ Migration error: {e}")
+        return False
+
+if __name__ == "__main__":
+    success = migrate()
+    sys.exit(0 if success else 1)
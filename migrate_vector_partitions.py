@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Move email embeddings from the shared vector collection into per-user partitions
+
+Set VECTOR_PARTITION_MODE to 'user' (a collection per user) or 'bucket' (a
+collection per user_id % VECTOR_PARTITION_BUCKETS) first. Stored embeddings are
+copied as they are, so nothing is re-embedded; the shared collection is kept
+unless --drop-source is given, and the copy can be re-run safely.
+
+--remove-legacy replaces documents stored under the old random-suffix IDs in the
+shared collection with deterministic-ID ones (re-keying the stored embeddings). It
+also works without VECTOR_PARTITION_MODE, to clean up a shared-only store.
+
+    VECTOR_PARTITION_MODE=user python migrate_vector_partitions.py [--drop-source] [--remove-legacy]
+"""
+import sys
+import time
+
+sys.path.append('.')
+
+def migrate(drop_source=False, remove_legacy=False):
+    """Copy the shared collection into partitions and/or remove legacy documents"""
+    print("🔄 Partitioning vector database")
+    print("=" * 35)
+    
+    try:
+        from app import create_app
+        
+        app = create_app()
+        with app.app_context():
+            if not hasattr(app, 'vector_service'):
+                print("❌ Vector database is not available")
+                return False
+            
+            vector_service = app.vector_service
+            if remove_legacy:
+                removed = vector_service.remove_legacy_documents()
+                print(f"✅ Replaced {removed} legacy documents in {vector_service.collection_name}")
+                if not vector_service.partitioned:
+                    return True
+            
+            if not vector_service.partitioned:
+                print("❌ Set VECTOR_PARTITION_MODE to 'user' or 'bucket' first")
+                return False
+            
+            started = time.perf_counter()
+            stats = vector_service.migrate_to_partitions(drop_source=drop_source)
+            print(f"✅ Copied {stats['copied']} documents into {stats['partitions']} "
+                  f"{vector_service.partition_mode} partitions ({time.perf_counter() - started:.1f}s)")
+            if stats['skipped']:
+                print(f"⚠️ Skipped {stats['skipped']} documents without user_id/email_id metadata")
+            if stats['source_dropped']:
+                print(f"🗑️ Dropped shared collection {vector_service.collection_name}")
+        
+        return True
+    
+    except Exception as e:
+        print(f"❌ Migration error: {e}")
+        return False
+
+if __name__ == "__main__":
+    success = migrate(drop_source='--drop-source' in sys.argv, remove_legacy='--remove-legacy' in sys.argv)
+    sys.exit(0 if success else 1)
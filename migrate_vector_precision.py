@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Convert native vector collections to the configured storage precision
+
+Set VECTOR_NATIVE_PRECISION to float32, float16 or int8 first; new collections
+are created with it, and this rewrites the existing ones. With --refine, int8
+collections also keep float16 originals so searches can re-rank their top
+candidates (set VECTOR_NATIVE_RERANK as well). Stored vectors are converted
+directly, so nothing is re-embedded.
+
+    VECTOR_DB_TYPE=native VECTOR_NATIVE_PRECISION=int8 python migrate_vector_precision.py [--refine]
+"""
+import sys
+import time
+
+sys.path.append('.')
+
+def migrate(refine=False):
+    """Rewrite every native collection in the configured precision"""
+    print("🔄 Converting vector storage precision")
+    print("=" * 35)
+    
+    try:
+        from app import create_app
+        
+        app = create_app()
+        with app.app_context():
+            if not hasattr(app, 'vector_service'):
+                print("❌ Vector database is not available")
+                return False
+            
+            vector_service = app.vector_service
+            if vector_service.backend != 'native':
+                print("❌ Only the native backend (VECTOR_DB_TYPE=native) stores reduced-precision vectors")
+                return False
+            
+            precision = app.config.get('VECTOR_NATIVE_PRECISION', 'float16')
+            started = time.perf_counter()
+            converted = vector_service.convert_precision(precision, refine=refine)
+            for stats in converted:
+                print(f"   {stats['collection']}: {stats['vectors']} vectors, "
+                      f"{stats['disk_bytes'] / 1e6:.1f} MB on disk, {stats['scan_bytes'] / 1e6:.1f} MB per scan")
+            print(f"✅ Converted {len(converted)} collections to {precision}"
+                  f"{' with float16 originals' if refine and precision == 'int8' else ''} "
+                  f"({time.perf_counter() - started:.1f}s)")
+        
+        return True
+    
+    except Exception as e:
+        print(f"❌ Migration error: {e}")
+        return False
+
+if __name__ == "__main__":
+    success = migrate(refine='--refine' in sys.argv)
+    sys.exit(0 if success else 1)
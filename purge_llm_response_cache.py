@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Purge cached LLM responses from the on-disk response cache
+
+Run this after changing a prompt template's wording or swapping a model's
+weights under the same name, so stale answers are not served until they expire.
+
+    python purge_llm_response_cache.py [--model MODEL] [--expired-only]
+"""
+import sys
+
+sys.path.append('.')
+
+def purge(model=None, expired_only=False):
+    """Delete all cached responses, one model's, or only the expired ones"""
+    print("🧹 Purging LLM response cache")
+    print("=" * 35)
+    
+    try:
+        from app import create_app
+        from app.services.response_cache import init_response_cache
+        
+        app = create_app()
+        with app.app_context():
+            cache = getattr(app, 'response_cache', None) or init_response_cache(app)
+            if cache is None:
+                print("❌ LLM response cache is disabled")
+                return False
+            
+            purged = cache.purge(model=model, expired_only=expired_only)
+            stats = cache.get_stats()
+            print(f"✅ Purged {purged} responses; {stats['entries']} left ({stats['bytes'] / 1024:.0f} KB)")
+        
+        return True
+    
+    except Exception as e:
+        print(f"❌ Purge error: {e}")
+        return False
+
+if __name__ == "__main__":
+    model_arg = None
+    if '--model' in sys.argv:
+        model_arg = sys.argv[sys.argv.index('--model') + 1]
+    success = purge(model_arg, '--expired-only' in sys.argv)
+    sys.exit(0 if success else 1)
@@ -16,6 +16,9 @@ sys.path.insert(0, current_dir)
 def main():
     """Main application entry point"""
     try:
+        # The web server drains the AI analysis queue unless a separate analysis_worker.py does
+        os.environ.setdefault('ANALYSIS_WORKERS_ENABLED', 'true')
+        
         # Import the Flask app
         from app import create_app
         
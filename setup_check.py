@@ -26,7 +26,7 @@ def check_directory_structure():
     
     required_files = [
         'app/__init__.py',
-        'app/config.py',
+        'app/config/settings.py',
         'app/models/user.py',
         'app/models/email.py',
         'app/models/chat.py',
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+AI Email Assistant - Standalone Email Sync Worker
+
+Runs the periodic mailbox sync scheduler outside the web process:
+
+    python sync_worker.py          # sync due users every SYNC_SCHEDULER_POLL_SECONDS
+    python sync_worker.py --once   # one pass, print the run report and exit
+"""
+import argparse
+import json
+import os
+import sys
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Add the current directory to Python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, current_dir)
+
+def main():
+    """Worker entry point"""
+    parser = argparse.ArgumentParser(description='Run scheduled mailbox syncs')
+    parser.add_argument('--once', action='store_true', help='run a single sync pass and exit')
+    args = parser.parse_args()
+    
+    from app import create_app
+    from app.services.sync_scheduler import SyncScheduler
+    
+    app = create_app()
+    
+    # Reuse the app's scheduler if SYNC_SCHEDULER_ENABLED already started one
+    scheduler = getattr(app, 'sync_scheduler', None) or SyncScheduler(app)
+    
+    if args.once:
+        report = scheduler.run_once()
+        print(json.dumps(report, indent=2))
+        return 0 if not report['errors'] else 1
+    
+    print(f"🔄 Sync worker running: {scheduler.worker_count} workers, "
+          f"every {scheduler.poll_seconds}s, folders {', '.join(scheduler.folders)}")
+    try:
+        if scheduler.get_stats()['running']:
+            scheduler._thread.join()
+        else:
+            scheduler.run_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Stopping sync worker...")
+        scheduler.stop()
+    
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
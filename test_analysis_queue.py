@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Test the background AI analysis queue against stub Graph and Ollama servers
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append('.')
+
+from fake_graph_server import FakeGraphServer
+from fake_ollama_server import FakeOllamaServer
+from test_delta_sync import create_test_app
+
+
+def test_analysis_queue():
+    """Sync does not wait for the model; workers drain jobs with retries"""
+    print("🧵 Testing background analysis queue")
+
+    with FakeGraphServer() as graph_fake, FakeOllamaServer(latency=0.3) as ollama_fake, \
+            tempfile.TemporaryDirectory() as tmp:
+        for _ in range(8):
+            graph_fake.add_message('inbox')
+
+        # File database: worker threads need their own connections
+        app = create_test_app(graph_fake.url, f"sqlite:///{os.path.join(tmp, 'queue.db')}")
+        app.config.update({
+            'OLLAMA_BASE_URL': ollama_fake.url,
+            'OLLAMA_TIMEOUT': 10,
+            'ANALYSIS_QUEUE_WORKERS': 2,
+            'ANALYSIS_RETRY_BACKOFF_SECONDS': 0.1,
+            'ANALYSIS_QUEUE_POLL_SECONDS': 0.1,
+        })
+
+        with app.app_context():
+            from app.models import db
+            from app.models.user import User
+            from app.models.email import Email
+            from app.models.analysis_job import AnalysisJob
+            from app.services.ms_graph import GraphService
+            from app.services.email_processor import EmailProcessor
+            from app.services.analysis_queue import init_analysis_queue
+
+            db.create_all()
+            user = User(email='queue@example.com', display_name='Queue User')
+            db.session.add(user)
+            db.session.commit()
+            user_id = user.id
+
+            queue = init_analysis_queue(app)  # TESTING: workers not started yet
+
+            # Sync returns without any model calls
+            start = time.perf_counter()
+            result = EmailProcessor().sync_user_emails_delta(user, GraphService(), 'token')
+            elapsed = time.perf_counter() - start
+            print(f"   Sync: {result['new_count']} new in {elapsed:.2f}s")
+            assert result['new_count'] == 8
+            assert ollama_fake.generate_count == 0
+            assert AnalysisJob.get_queue_stats(user_id)['pending'] == 8
+
+            # First two model calls fail and are retried with backoff
+            ollama_fake.fail_next = 2
+            queue.start()
+            deadline = time.time() + 20
+            while AnalysisJob.get_queue_stats(user_id)['done'] < 8 and time.time() < deadline:
+                time.sleep(0.1)
+                db.session.expire_all()
+            queue.stop()
+
+            stats = AnalysisJob.get_queue_stats(user_id)
+            print(f"   Queue: {stats}")
+            print(f"   Workers: {queue.get_stats()}")
+            assert stats['done'] == 8 and stats['failed'] == 0
+            assert queue.get_stats()['retried'] == 2
+            assert ollama_fake.max_in_flight <= 2
+            db.session.expire_all()
+            assert all(e.ai_summary == 'Stub summary of the email.' for e in Email.query.all())
+
+    print("✅ Analysis queue working")
+    return True
+
+
+def test_queue_housekeeping():
+    """Workers start only when enabled, old done jobs are pruned, status is per user"""
+    print("🧹 Testing analysis queue housekeeping")
+
+    from datetime import datetime, timedelta
+
+    app = create_test_app('http://127.0.0.1:9')
+    app.secret_key = 'test-secret'
+    from app.routes.email import email_bp
+    app.register_blueprint(email_bp, url_prefix='/api/email')
+
+    with app.app_context():
+        from app.models import db
+        from app.models.user import User
+        from app.models.email import Email
+        from app.models.analysis_job import AnalysisJob
+        from app.services.analysis_queue import init_analysis_queue
+
+        # CLI scripts and migrations build the app too; they must not start workers
+        app.config['TESTING'] = False
+        queue = init_analysis_queue(app)
+        assert queue.get_stats()['workers_alive'] == 0
+        app.config['TESTING'] = True
+
+        db.create_all()
+        first = User(email='first@example.com', display_name='First User')
+        second = User(email='second@example.com', display_name='Second User')
+        db.session.add_all([first, second])
+        db.session.commit()
+
+        now = datetime.utcnow()
+        done_jobs = [(first, now - timedelta(hours=30)), (first, now), (second, now - timedelta(hours=30))]
+        for index, (user, completed_at) in enumerate(done_jobs):
+            email = Email(user_id=user.id, graph_id=f'job-{index}', subject='Job')
+            db.session.add(email)
+            db.session.flush()
+            db.session.add(AnalysisJob(email_id=email.id, user_id=user.id, status='done', completed_at=completed_at))
+        db.session.add(AnalysisJob(email_id=email.id, user_id=second.id, status='pending'))
+        db.session.commit()
+
+        client = app.test_client()
+        with client.session_transaction() as client_session:
+            client_session['user_id'] = second.id
+        status = client.get('/api/email/analysis/status').get_json()
+        print(f"   Status: {status}")
+        assert status['queue']['done'] == 1 and status['queue']['pending'] == 1
+
+        # Done jobs past ANALYSIS_JOB_RETENTION_HOURS go; recent and unfinished ones stay
+        assert queue.prune_if_due() == 2
+        assert queue.prune_if_due() == 0
+        assert AnalysisJob.query.filter_by(status='done').count() == 1
+        assert AnalysisJob.query.filter_by(status='pending').count() == 1
+
+    print("✅ Analysis queue housekeeping working")
+    return True
+
+
+if __name__ == "__main__":
+    test_analysis_queue()
+    test_queue_housekeeping()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Test Ollama context reuse across chat turns against the fake Ollama server
+"""
+import sys
+
+sys.path.append('.')
+
+from fake_ollama_server import FakeOllamaServer
+from test_delta_sync import create_test_app
+
+
+def long_answer(request):
+    return ' '.join(f'answer{i}' for i in range(150))
+
+
+def create_context_app(ollama_url, **config):
+    from app.services.conversation_context import init_conversation_contexts
+
+    app = create_test_app('http://127.0.0.1:9')
+    app.config.update({'OLLAMA_BASE_URL': ollama_url, 'OLLAMA_TIMEOUT': 10, 'CHAT_HISTORY_TURNS': 2, **config})
+    init_conversation_contexts(app)
+    return app
+
+
+def turn(processor, user, message, session_id):
+    """One chat turn; returns the done event and the generate request sent to Ollama"""
+    events = list(processor.stream_message(user.id, message, session_id=session_id))
+    assert events[-1]['event'] == 'done', events[-1]
+    return events[-1]
+
+
+def last_request(fake):
+    return [request for path, request in fake.requests if path == '/api/generate'][-1]
+
+
+def test_context_reuse():
+    """Follow-up turns send only the new prompt plus the previous turn's context"""
+    print("🧠 Testing conversation context reuse")
+
+    with FakeOllamaServer(responder=long_answer) as fake:
+        app = create_context_app(fake.url)
+        with app.app_context():
+            from app.models import db
+            from app.models.user import User
+            from app.models.chat import ChatMessage
+            from app.services.chat_processor import ChatProcessor
+
+            db.create_all()
+            user = User(email='context@example.com', display_name='Context User')
+            db.session.add(user)
+            db.session.commit()
+            processor = ChatProcessor()
+            contexts = app.conversation_contexts
+
+            first = turn(processor, user, 'Hello there', 's1')
+            request = last_request(fake)
+            assert not first['context_reused'] and 'context' not in request
+            assert request['prompt'].startswith('SYSTEM:') and request['keep_alive'] == '30m'
+            first_context = contexts.get(user.id, 's1', processor.ollama_service.model)
+            assert first_context and len(first_context) > first['prompt_eval_count']
+
+            evals = []
+            for i in range(2, 6):
+                done = turn(processor, user, f'Follow-up question {i}', 's1')
+                request = last_request(fake)
+                assert done['context_reused'] and request['context'][:len(first_context)] == first_context
+                assert 'SYSTEM:' not in request['prompt'] and 'Conversation so far' not in request['prompt']
+                evals.append(done['prompt_eval_count'])
+            # Constant per-turn cost, independent of the history length
+            assert len(set(evals)) == 1 and evals[0] < first['prompt_eval_count'], evals
+            assert [m.session_id for m in ChatMessage.get_session_messages('s1')] == ['s1'] * 5
+
+            # Other sessions and other users start their own conversation
+            assert not turn(processor, user, 'Hello again', 's2')['context_reused']
+            other = User(email='other@example.com', display_name='Other User')
+            db.session.add(other)
+            db.session.commit()
+            assert not turn(processor, other, 'Hello', 's1')['context_reused']
+
+            # A different model cannot continue the context: rebuild from the last turns
+            processor.ollama_service.model = 'other-model'
+            done = turn(processor, user, 'Now with another model', 's1')
+            prompt = last_request(fake)['prompt']
+            assert not done['context_reused'] and 'context' not in last_request(fake)
+            assert 'Conversation so far' in prompt and 'Follow-up question 5' in prompt
+            assert 'Follow-up question 3' not in prompt and 'Hello there' not in prompt  # Only CHAT_HISTORY_TURNS
+            assert 'answer149' not in prompt and '...' in prompt  # Earlier answers are shortened
+            assert done['prompt_eval_count'] < first['prompt_eval_count'] * 4
+            assert turn(processor, user, 'And again', 's1')['context_reused']
+
+            stats = contexts.get_stats()
+            assert stats['model_changed'] == 1 and stats['reused'] == 6, stats  # Five turns and the check above
+
+    print("✅ Conversation context reuse working")
+
+
+def test_context_limits():
+    """Contexts past CHAT_CONTEXT_MAX_TOKENS are dropped; reuse can be switched off"""
+    print("📏 Testing conversation context limits")
+
+    with FakeOllamaServer(responder=long_answer) as fake:
+        app = create_context_app(fake.url, CHAT_CONTEXT_MAX_TOKENS=300)
+        with app.app_context():
+            from app.models import db
+            from app.models.user import User
+            from app.services.chat_processor import ChatProcessor
+
+            db.create_all()
+            user = User(email='limits@example.com', display_name='Limits User')
+            db.session.add(user)
+            db.session.commit()
+            processor = ChatProcessor()
+
+            # About 220 context tokens after one turn and 380 after two
+            assert not turn(processor, user, 'First', 's1')['context_reused']
+            assert turn(processor, user, 'Second', 's1')['context_reused']
+            assert app.conversation_contexts.get_stats()['too_long'] == 1
+            assert not turn(processor, user, 'Third', 's1')['context_reused']
+
+            del app.conversation_contexts
+            assert not turn(processor, user, 'Fourth', 's1')['context_reused']
+            assert not turn(processor, user, 'Fifth', 's1')['context_reused']
+            assert 'Conversation so far' in last_request(fake)['prompt']
+
+    print("✅ Conversation context limits working")
+
+
+if __name__ == "__main__":
+    test_context_reuse()
+    test_context_limits()
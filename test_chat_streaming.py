@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Test streaming chat over Server-Sent Events and SocketIO against the fake Ollama server
+"""
+import json
+import sys
+import time
+
+sys.path.append('.')
+
+from fake_ollama_server import FakeOllamaServer
+from test_delta_sync import create_test_app
+
+WORDS = 40
+TOKEN_DELAY = 0.02
+
+
+def long_answer(request):
+    return ' '.join(f'word{i}' for i in range(WORDS))
+
+
+def create_chat_app(ollama_url):
+    from app.routes.chat import chat_bp
+
+    app = create_test_app('http://127.0.0.1:9')
+    app.config.update({'SECRET_KEY': 'test', 'OLLAMA_BASE_URL': ollama_url, 'OLLAMA_TIMEOUT': 10})
+    app.register_blueprint(chat_bp, url_prefix='/api/chat')
+    return app
+
+
+def setup_user(app):
+    from app.models import db
+    from app.models.user import User
+    from app.models.email import Email
+
+    db.create_all()
+    user = User(email='stream@example.com', display_name='Stream User')
+    db.session.add(user)
+    db.session.commit()
+    email = Email(user_id=user.id, graph_id='stream-1', subject='Quarterly budget',
+                  sender_email='cfo@example.com', body_text='Please review the attached budget.')
+    db.session.add(email)
+    db.session.commit()
+    return user, email
+
+
+def login(client, user):
+    with client.session_transaction() as flask_session:
+        flask_session['user_id'] = user.id
+
+
+def read_events(response):
+    """Yield (event, data) pairs from a streamed SSE response"""
+    buffer = ''
+    for chunk in response.response:
+        buffer += chunk.decode() if isinstance(chunk, bytes) else chunk
+        while '\n\n' in buffer:
+            block, buffer = buffer.split('\n\n', 1)
+            fields = dict(line.split(': ', 1) for line in block.splitlines())
+            yield fields['event'], json.loads(fields['data'])
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline, "Timed out waiting"
+        time.sleep(0.02)
+
+
+def test_sse_stream():
+    """Tokens arrive as they are generated and the exchange is saved once"""
+    print("📡 Testing SSE chat stream")
+
+    with FakeOllamaServer(responder=long_answer, token_delay=TOKEN_DELAY) as fake:
+        app = create_chat_app(fake.url)
+        with app.app_context():
+            from app.models.chat import ChatMessage
+
+            user, email = setup_user(app)
+            client = app.test_client()
+            login(client, user)
+
+            started = time.time()
+            response = client.post('/api/chat/stream', json={'message': 'What does this email want?',
+                                                             'email_id': email.id}, buffered=False)
+            assert response.status_code == 200 and response.mimetype == 'text/event-stream'
+
+            events, first_token = [], None
+            for name, data in read_events(response):
+                if name == 'token' and first_token is None:
+                    first_token = time.time() - started
+                    # Nothing is saved until the response completes
+                    assert ChatMessage.query.count() == 0
+                events.append((name, data))
+            total = time.time() - started
+            print(f"   First token after {first_token * 1000:.0f} ms, complete after {total * 1000:.0f} ms")
+
+            names = [name for name, _ in events]
+            assert names[0] == 'start' and names[-1] == 'done' and names.count('token') == WORDS
+            assert first_token < total / 4
+
+            done = events[-1][1]
+            streamed = ''.join(data['text'] for name, data in events if name == 'token')
+            assert done['response'] == streamed.strip() == long_answer(None)
+
+            messages = ChatMessage.query.all()
+            assert len(messages) == 1 and messages[0].id == done['message_id']
+            assert messages[0].response == done['response'] and messages[0].is_processed
+            assert (messages[0].context_type, messages[0].context_id) == ('email', email.id)
+
+            # The email is in the prompt
+            assert 'Please review the attached budget.' in fake.requests[-1][1]['prompt']
+
+            # Someone else's email is rejected before streaming
+            assert client.post('/api/chat/stream', json={'message': 'hi', 'email_id': email.id + 1}).status_code == 404
+            assert client.post('/api/chat/stream', json={'message': 'hi', 'email_id': 'abc'}).status_code == 400
+            assert client.post('/api/chat/stream', json={'message': ' '}).status_code == 400
+
+    print("✅ SSE chat stream working")
+
+
+def test_sse_disconnect():
+    """A client that goes away stops the upstream generation and nothing is saved"""
+    print("🔌 Testing SSE disconnect")
+
+    with FakeOllamaServer(responder=long_answer, token_delay=TOKEN_DELAY) as fake:
+        app = create_chat_app(fake.url)
+        with app.app_context():
+            from app.models.chat import ChatMessage
+
+            user, _ = setup_user(app)
+            client = app.test_client()
+            login(client, user)
+
+            response = client.post('/api/chat/stream', json={'message': 'Tell me a story'}, buffered=False)
+            tokens = 0
+            for name, _ in read_events(response):
+                tokens += name == 'token'
+                if tokens == 3:
+                    break
+            response.close()
+
+            wait_for(lambda: fake.cancelled == 1)
+            assert fake.streamed_chunks < WORDS
+            assert ChatMessage.query.count() == 0
+
+    print("✅ SSE disconnect working")
+
+
+def test_socketio_stream():
+    """chat_message is answered with ai_token events and one ai_response; chat_cancel stops it"""
+    print("🔁 Testing SocketIO chat stream")
+    from flask_socketio import SocketIO
+    from app.routes.chat import init_chat_socketio
+
+    with FakeOllamaServer(responder=long_answer, token_delay=TOKEN_DELAY) as fake:
+        app = create_chat_app(fake.url)
+        socketio = SocketIO(app, manage_session=False, async_mode='threading')
+        init_chat_socketio(socketio)
+
+        with app.app_context():
+            from app.models.chat import ChatMessage
+
+            user, email = setup_user(app)
+
+            # The session cookie authenticates the connection
+            assert not socketio.test_client(app).is_connected()
+            http_client = app.test_client()
+            login(http_client, user)
+            sio = socketio.test_client(app, flask_test_client=http_client)
+            assert sio.is_connected()
+
+            received = []
+            def events(name):
+                received.extend(sio.get_received())
+                return [packet['args'][0] for packet in received if packet['name'] == name]
+
+            sio.emit('chat_message', {'message': 'Summarize this', 'email_id': email.id})
+            wait_for(lambda: events('ai_response'))
+            tokens = events('ai_token')
+            response = events('ai_response')[0]
+            assert events('message_received') and events('ai_thinking')
+            assert len(tokens) == WORDS and ''.join(t['text'] for t in tokens).strip() == response['response']
+            assert ChatMessage.query.count() == 1
+
+            # An invalid or foreign email is reported, not raised
+            received.clear()
+            sio.emit('chat_message', {'message': 'Summarize this', 'email_id': 'abc'})
+            sio.emit('chat_message', {'message': 'Summarize this', 'email_id': email.id + 1})
+            wait_for(lambda: len(events('ai_error')) == 2)
+            assert [e['error'] for e in events('ai_error')] == ['Invalid email_id', 'Email not found']
+            assert sio.is_connected()
+
+            # Cancelling mid-stream stops the generation
+            received.clear()
+            sio.emit('chat_message', {'message': 'Tell me a story'})
+            wait_for(lambda: len(events('ai_token')) >= 3)
+            sio.emit('chat_cancel')
+            wait_for(lambda: fake.cancelled == 1)
+            time.sleep(TOKEN_DELAY * 5)
+            assert not events('ai_response') and ChatMessage.query.count() == 1
+
+            sio.disconnect()
+
+    print("✅ SocketIO chat stream working")
+
+
+def test_socketio_origins():
+    """Only the app's own origin may open a SocketIO connection unless SOCKETIO_CORS_ORIGINS allows more"""
+    print("🔒 Testing SocketIO allowed origins")
+    from flask_socketio import SocketIO
+    from app.config import Config
+
+    def handshake(allowed_origins, origin):
+        app = create_chat_app('http://127.0.0.1:9')
+        SocketIO(app, cors_allowed_origins=allowed_origins, manage_session=False, async_mode='threading')
+        return app.test_client().get('/socket.io/?EIO=4&transport=polling',
+                                     headers={'Origin': origin}).status_code
+
+    assert Config.SOCKETIO_CORS_ORIGINS is None
+    assert handshake(Config.SOCKETIO_CORS_ORIGINS, 'http://localhost') == 200
+    assert handshake(Config.SOCKETIO_CORS_ORIGINS, 'http://evil.example.com') == 400
+    assert handshake(['https://mail.example.com'], 'https://mail.example.com') == 200
+    assert handshake(['https://mail.example.com'], 'http://evil.example.com') == 400
+
+    print("✅ SocketIO allowed origins working")
+
+
+if __name__ == "__main__":
+    test_sse_stream()
+    test_sse_disconnect()
+    test_socketio_stream()
+    test_socketio_origins()
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Test delta-query incremental sync against the local fake Graph server
+"""
+import sys
+
+sys.path.append('.')
+
+from flask import Flask
+from fake_graph_server import FakeGraphServer
+
+
+def create_test_app(graph_url, database_url='sqlite:///:memory:'):
+    """Create a minimal app for sync tests (in-memory database by default)"""
+    from app.models import db
+
+    app = Flask(__name__)
+    app.config.update({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': database_url,
+        'SQLALCHEMY_TRACK_MODIFICATIONS': False,
+        'AZURE_CLIENT_ID': 'test-client',
+        'AZURE_CLIENT_SECRET': None,
+        'AZURE_TENANT_ID': 'test-tenant',
+        'AZURE_REDIRECT_URI': 'http://localhost:5000/auth/callback',
+        'GRAPH_SCOPES': ['Mail.Read'],
+        'GRAPH_API_ENDPOINT': graph_url,
+        # Unreachable Ollama so AI analysis falls back to the basic heuristics
+        'OLLAMA_BASE_URL': 'http://127.0.0.1:9',
+        'OLLAMA_MODEL': 'test-model',
+        'OLLAMA_TIMEOUT': 1,
+        'OLLAMA_STREAM': False,
+    })
+    db.init_app(app)
+    return app
+
+
+def test_delta_sync():
+    """Initial round, incremental changes and expired delta links"""
+    print("🔄 Testing delta email sync")
+
+    with FakeGraphServer() as fake:
+        message_ids = [fake.add_message('inbox') for _ in range(12)]
+
+        app = create_test_app(fake.url)
+        with app.app_context():
+            from app.models import db
+            from app.models.user import User
+            from app.models.email import Email
+            from app.services.ms_graph import GraphService
+            from app.services.email_processor import EmailProcessor
+
+            db.create_all()
+            user = User(email='delta@example.com', display_name='Delta User')
+            db.session.add(user)
+            db.session.commit()
+
+            graph = GraphService()
+            processor = EmailProcessor()
+
+            # Initial round walks the folder page by page
+            result = processor.sync_user_emails_delta(user, graph, 'token', page_size=5)
+            print(f"   Initial: {result}")
+            assert result['mode'] == 'delta_initial'
+            assert result['new_count'] == 12 and not result['errors']
+            assert Email.query.filter_by(user_id=user.id).count() == 12
+            assert '$deltatoken=12' in user.get_sync_cursor('inbox')
+
+            # Only changes since the stored delta link are fetched
+            fake.update_message(message_ids[0], isRead=True, subject='Edited subject')
+            fake.remove_message(message_ids[1])
+            fake.add_message('inbox')
+            request_count = sum(1 for _, path in fake.requests if '/delta' in path)
+
+            result = processor.sync_user_emails_delta(user, graph, 'token', page_size=5)
+            print(f"   Incremental: {result}")
+            assert result['mode'] == 'delta'
+            assert (result['new_count'], result['updated_count'], result['deleted_count']) == (1, 1, 1)
+            assert sum(1 for _, path in fake.requests if '/delta' in path) - request_count == 1
+            assert Email.find_by_graph_id(message_ids[1]) is None
+            edited = Email.find_by_graph_id(message_ids[0])
+            assert edited.is_read and edited.subject == 'Edited subject'
+
+            # Expired sync state restarts the round instead of failing
+            fake.expire_delta_tokens()
+            result = processor.sync_user_emails_delta(user, graph, 'token', page_size=5)
+            print(f"   After expiry: {result}")
+            assert result['mode'] == 'delta_reset' and not result['errors']
+            assert Email.query.filter_by(user_id=user.id).count() == 12
+
+    print("✅ Delta sync working")
+    return True
+
+
+def test_shared_graph_ids():
+    """Graph IDs stored for one user never shadow or overwrite another user's emails"""
+    print("🔄 Testing Graph IDs shared between users")
+
+    with FakeGraphServer() as fake:
+        for _ in range(6):
+            fake.add_message('inbox')
+
+        app = create_test_app(fake.url)
+        with app.app_context():
+            from app.models import db
+            from app.models.user import User
+            from app.models.email import Email
+            from app.services.ms_graph import GraphService
+            from app.services.email_processor import EmailProcessor
+
+            db.create_all()
+            first = User(email='first@example.com', display_name='First User')
+            second = User(email='second@example.com', display_name='Second User')
+            db.session.add_all([first, second])
+            db.session.commit()
+
+            graph = GraphService()
+            processor = EmailProcessor()
+
+            result = processor.sync_user_emails_delta(first, graph, 'token', page_size=4)
+            assert result['new_count'] == 6 and not result['errors']
+            first_subjects = {email.id: email.subject for email in Email.query.filter_by(user_id=first.id)}
+
+            # The same IDs arrive for the second user, as forced updates
+            result = processor.sync_user_emails_delta(second, graph, 'token', page_size=4)
+            print(f"   Second user: {result}")
+            assert (result['new_count'], result['updated_count']) == (6, 0) and not result['errors']
+            assert Email.query.filter_by(user_id=second.id).count() == 6
+            assert {email.id: email.subject for email in Email.query.filter_by(user_id=first.id)} == first_subjects
+
+            # Without force_refresh, known emails are neither written nor counted as updated
+            result = processor.sync_user_emails(second, graph, 'token', limit=50)
+            print(f"   Full resync: {result}")
+            assert (result['synced_count'], result['new_count'], result['updated_count']) == (6, 0, 0)
+
+    print("✅ Shared Graph IDs handled per user")
+    return True
+
+
+def test_sync_route():
+    """POST /api/email/sync runs a delta sync when the session holds a Graph token"""
+    print("🔄 Testing the sync route")
+
+    with FakeGraphServer() as fake:
+        for _ in range(7):
+            fake.add_message('inbox')
+
+        app = create_test_app(fake.url)
+        app.config.update({'SYNC_FOLDERS': ['inbox'], 'SYNC_PAGE_SIZE': 5})
+        app.secret_key = 'test-secret'
+        from app.routes.email import email_bp
+        app.register_blueprint(email_bp, url_prefix='/api/email')
+
+        with app.app_context():
+            from app.models import db
+            from app.models.user import User
+            from app.models.email import Email
+
+            db.create_all()
+            user = User(email='route@example.com', display_name='Route User')
+            db.session.add(user)
+            db.session.commit()
+            user_id = user.id
+
+            from app.services.graph_tokens import remember_access_token
+            remember_access_token(user, {'access_token': 'token'})
+
+            client = app.test_client()
+            with client.session_transaction() as client_session:
+                client_session['user_id'] = user_id
+
+            response = client.post('/api/email/sync').get_json()
+            print(f"   First sync: {response}")
+            assert response['success'] and response['new_count'] == 7
+            assert Email.query.filter_by(user_id=user_id).count() == 7
+            assert not Email.query.filter(Email.graph_id.like('demo-email-%')).count()
+            assert db.session.get(User, user_id).get_sync_cursor('inbox')
+
+            fake.add_message('inbox')
+            response = client.post('/api/email/sync').get_json()
+            assert response['success'] and response['new_count'] == 1 and response['total_emails'] == 8
+
+            # A sync already running elsewhere (e.g. the scheduler) is not started twice
+            assert User.claim_sync(user_id, 60)
+            response = client.post('/api/email/sync')
+            assert response.status_code == 409
+            User.release_sync(user_id)
+            assert client.post('/api/email/sync').get_json()['success']
+
+    print("✅ Sync route working")
+    return True
+
+
+if __name__ == "__main__":
+    test_delta_sync()
+    test_shared_graph_ids()
+    test_sync_route()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Test full-text email search (SQLite FTS5) behind /api/email/search
+"""
+import sys
+from datetime import datetime, timedelta
+
+sys.path.append('.')
+
+from test_delta_sync import create_test_app
+from app.services.email_search import parse_search_query, to_fts5_query
+
+
+def test_query_parsing():
+    """Phrases, prefixes and stray syntax become safe quoted FTS5 terms"""
+    print("🔤 Testing search query parsing")
+
+    assert parse_search_query('"quarterly report" budg* alice@example.com') == [
+        ('phrase', 'quarterly report'), ('prefix', 'budg'), ('phrase', 'alice@example.com')
+    ]
+    assert parse_search_query('* "" ( ) -') == []
+    assert to_fts5_query(parse_search_query('NEAR(a b) OR "x"')) == '"NEAR(a" "b)" "OR" "x"'
+    print("✅ Query parsing working")
+
+
+def test_email_search():
+    """Ranked results, highlighting, index maintenance and user isolation"""
+    print("🔎 Testing full-text email search")
+
+    app = create_test_app('http://127.0.0.1:9')
+    app.secret_key = 'test-secret'
+
+    with app.app_context():
+        from app.models import db
+        from app.models.user import User
+        from app.models.email import Email
+        from app.services.email_search import init_email_search
+        from app.services.hybrid_search import init_hybrid_search
+        from app.routes.email import email_bp
+
+        db.create_all()
+        alice = User(email='alice@example.com', display_name='Alice')
+        bob = User(email='bob@example.com', display_name='Bob')
+        db.session.add_all([alice, bob])
+        db.session.commit()
+
+        now = datetime.utcnow()
+        emails = [
+            (alice, 'Quarterly report draft', 'Here is the quarterly report for review.', 'carol@example.com'),
+            (alice, 'Lunch', 'The report is late, and quarterly numbers follow.', 'dave@example.com'),
+            (alice, 'Budget approval', 'Budgeting for next year needs approval.', 'erin@example.com'),
+            (alice, 'Résumé attached', 'Please see my resume.', 'frank@example.com'),
+            (bob, 'Quarterly report', 'Bob has his own quarterly report.', 'carol@example.com'),
+        ]
+        # Filler mail so the test terms are rare enough for BM25 to weigh them
+        emails += [(bob, f'Newsletter {i}', 'Weekly updates and events.', 'news@example.com') for i in range(20)]
+        for i, (user, subject, body, sender) in enumerate(emails):
+            db.session.add(Email(user_id=user.id, graph_id=f'search-{i}', subject=subject, body_text=body,
+                                 sender_email=sender, received_date=now - timedelta(hours=i)))
+        db.session.commit()
+
+        # Index built over existing rows
+        search = init_email_search(app)
+        assert search.available
+
+        results = search.search(alice.id, 'quarterly report')
+        assert [r['id'] for r in results] == [1, 2], results
+        assert results[0]['rank'] > results[1]['rank']
+        assert results[0]['subject_highlight'] == '<mark>Quarterly</mark> <mark>report</mark> draft'
+        assert '<mark>' in results[1]['snippet']
+
+        assert [r['id'] for r in search.search(alice.id, '"quarterly report"')] == [1]
+        assert [r['id'] for r in search.search(alice.id, 'budg*')] == [3]
+        assert [r['id'] for r in search.search(alice.id, 'resume')] == [4]
+        assert [r['id'] for r in search.search(alice.id, 'carol@example.com')] == [1]
+        assert search.search(alice.id, '***') is None
+
+        # Triggers keep the index current on insert, update and delete
+        db.session.add(Email(user_id=alice.id, graph_id='search-new', subject='Zeppelin tickets',
+                             body_text='Boarding passes', received_date=now))
+        db.session.commit()
+        new_id = Email.query.filter_by(graph_id='search-new').first().id
+        assert [r['id'] for r in search.search(alice.id, 'zeppelin')] == [new_id]
+
+        # Email text is escaped; only the match markers become HTML
+        db.session.add(Email(user_id=alice.id, graph_id='search-html', subject='<img src=x onerror=alert(1)> Zebra & co',
+                             body_text='<script>steal()</script> zebra crossing', received_date=now))
+        db.session.commit()
+        result, = search.search(alice.id, 'zebra')
+        assert result['subject_highlight'] == '&lt;img src=x onerror=alert(1)&gt; <mark>Zebra</mark> &amp; co'
+        assert '<mark>' in result['snippet'] and '<script>' not in result['snippet'] and '<img' not in result['snippet']
+
+        email = db.session.get(Email, 2)
+        email.subject = 'Lunch plans'
+        email.body_text = 'Sandwiches only.'
+        db.session.commit()
+        assert [r['id'] for r in search.search(alice.id, 'quarterly')] == [1]
+        assert [r['id'] for r in search.search(alice.id, 'sandwich')] == [2]
+
+        db.session.delete(db.session.get(Email, 1))
+        db.session.commit()
+        assert search.search(alice.id, 'quarterly') == []
+
+        # Same endpoint, now ranked and highlighted
+        init_hybrid_search(app)
+        app.register_blueprint(email_bp, url_prefix='/api/email')
+        client = app.test_client()
+        with client.session_transaction() as client_session:
+            client_session['user_id'] = bob.id
+
+        data = client.get('/api/email/search?q=quarterly').get_json()
+        assert data['success'] and data['search_mode'] == 'fulltext'
+        assert [e['id'] for e in data['emails']] == [5]
+        assert data['emails'][0]['subject_highlight'] == '<mark>Quarterly</mark> report'
+
+    print("✅ Full-text email search working")
+    return True
+
+
+if __name__ == "__main__":
+    test_query_parsing()
+    test_email_search()
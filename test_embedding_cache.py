@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Test the content-hash embedding cache used by the vector database service
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append('.')
+
+from app.services.embedding_cache import EmbeddingCache, CachedEmbeddingFunction
+
+
+class CountingModel:
+    """Stand-in embedding model: 384-dim vectors, fixed cost per document"""
+
+    def __init__(self, cost=0.0005):
+        self.cost = cost
+        self.embedded = 0
+
+    def __call__(self, input):
+        self.embedded += len(input)
+        time.sleep(self.cost * len(input))
+        return [np.random.default_rng(abs(hash(text)) % 2 ** 32).random(384).tolist() for text in input]
+
+
+def test_embedding_cache():
+    """Unchanged documents are never embedded twice, across restarts too"""
+    print("🧠 Testing embedding cache")
+
+    documents = [f"Subject: Message {i}\nFrom: Sender {i % 40}\nContent: Body {i}" for i in range(2000)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'cache.sqlite3')
+        model = CountingModel()
+        embed = CachedEmbeddingFunction(model, EmbeddingCache(path), 'test-model')
+
+        start = time.perf_counter()
+        first = embed(documents)
+        cold = time.perf_counter() - start
+        assert model.embedded == 2000 and len(first) == 2000 and len(first[0]) == 384
+
+        # Re-sync after a restart with 20 edited emails
+        documents[:20] = [doc + ' (edited)' for doc in documents[:20]]
+        model = CountingModel()
+        embed = CachedEmbeddingFunction(model, EmbeddingCache(path), 'test-model')
+        start = time.perf_counter()
+        second = embed(documents)
+        warm = time.perf_counter() - start
+
+        print(f"   Cold: {cold:.2f}s, re-sync: {warm:.2f}s ({model.embedded} re-embedded), "
+              f"stats {embed.cache.get_stats()}")
+        assert model.embedded == 20
+        assert np.allclose(first[20:], second[20:])
+        assert warm < cold / 3
+
+        # Duplicate texts in one call are embedded once; other models keep separate entries
+        model = CountingModel()
+        other = CachedEmbeddingFunction(model, EmbeddingCache(path), 'other-model')
+        other(['same text', 'same text', documents[100]])
+        assert model.embedded == 2
+
+    print("✅ Embedding cache working")
+    return True
+
+
+if __name__ == "__main__":
+    test_embedding_cache()
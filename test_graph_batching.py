@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Test Graph JSON batching and the bulk mark-read routes against the local fake Graph server
+"""
+import sys
+
+sys.path.append('.')
+
+from fake_graph_server import FakeGraphServer
+from test_delta_sync import create_test_app
+
+
+def test_graph_batching():
+    """Sub-requests are coalesced 20 per call and throttled items are retried"""
+    print("📦 Testing Graph $batch requests")
+
+    with FakeGraphServer() as fake:
+        message_ids = [fake.add_message('inbox') for _ in range(45)]
+
+        app = create_test_app(fake.url)
+        app.config.update({'GRAPH_RETRY_BACKOFF_SECONDS': 0.05})
+
+        with app.app_context():
+            from app.services.ms_graph import GraphService
+
+            graph = GraphService()
+
+            # 45 updates -> 3 batch calls, plus one resend for the throttled items
+            fake.throttle_batch_items = 3
+            fake.retry_after = '0.1'
+            results = graph.mark_emails_read('token', message_ids + ['missing-id'])
+            batch_calls = [path for method, path in fake.requests if path.endswith('/$batch')]
+            print(f"   Mark read: {sum(results.values())} ok in {len(batch_calls)} batch calls")
+            assert all(results[message_id] for message_id in message_ids)
+            assert results['missing-id'] is False
+            assert len(batch_calls) == 4
+            assert all(fake.get_message(message_id)['isRead'] for message_id in message_ids)
+
+            # Per-item results come back in input order
+            emails = graph.get_emails_by_ids('token', message_ids[:25], select='id,subject')
+            assert [emails[message_id]['id'] for message_id in message_ids[:25]] == message_ids[:25]
+
+    print("✅ Graph batching working")
+    return True
+
+
+def test_bulk_mark_routes():
+    """Bulk routes update local rows and write back through $batch"""
+    print("📬 Testing bulk mark-read routes")
+
+    with FakeGraphServer() as fake:
+        message_ids = [fake.add_message('inbox') for _ in range(30)]
+
+        app = create_test_app(fake.url)
+        app.secret_key = 'test-secret'
+        from app.routes.email import email_bp
+        app.register_blueprint(email_bp, url_prefix='/api/email')
+
+        with app.app_context():
+            from app.models import db
+            from app.models.user import User
+            from app.models.email import Email
+
+            db.create_all()
+            user = User(email='bulk@example.com', display_name='Bulk User')
+            db.session.add(user)
+            db.session.commit()
+            for message_id in message_ids:
+                db.session.add(Email(user_id=user.id, graph_id=message_id, subject='Bulk', is_read=False))
+            db.session.commit()
+            user_id = user.id
+
+            from app.services.graph_tokens import remember_access_token
+            remember_access_token(user, {'access_token': 'token'})
+
+            client = app.test_client()
+            with client.session_transaction() as client_session:
+                client_session['user_id'] = user_id
+
+            response = client.post('/api/email/bulk/mark-read', json={'all': True}).get_json()
+            print(f"   Mark all read: {len(response['email_ids'])} local, {response['graph_updated']} in Graph")
+            assert response['success'] and len(response['email_ids']) == 30
+            assert response['graph_updated'] == 30 and not response['graph_failed']
+            assert Email.query.filter_by(user_id=user_id, is_read=False).count() == 0
+            assert all(fake.get_message(message_id)['isRead'] for message_id in message_ids)
+
+            first_ids = response['email_ids'][:5]
+            response = client.post('/api/email/bulk/mark-unread', json={'email_ids': first_ids}).get_json()
+            assert response['success'] and sorted(response['email_ids']) == sorted(first_ids)
+            assert Email.query.filter_by(user_id=user_id, is_read=False).count() == 5
+
+            assert client.post('/api/email/bulk/mark-read', json={}).status_code == 400
+
+    print("✅ Bulk mark-read routes working")
+    return True
+
+
+if __name__ == "__main__":
+    test_graph_batching()
+    test_bulk_mark_routes()
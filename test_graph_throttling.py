@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Test Graph request retries and throttling against the local fake Graph server
+"""
+import sys
+import threading
+import time
+
+sys.path.append('.')
+
+from fake_graph_server import FakeGraphServer
+from test_delta_sync import create_test_app
+
+
+def test_graph_throttling():
+    """429 responses honour Retry-After, concurrency stays within the tenant limit"""
+    print("🚦 Testing Graph throttling and retries")
+
+    with FakeGraphServer() as fake:
+        for _ in range(5):
+            fake.add_message('inbox')
+
+        app = create_test_app(fake.url)
+        app.config.update({
+            'GRAPH_TENANT_CONCURRENCY': 2,
+            'GRAPH_RETRY_BACKOFF_SECONDS': 0.05,
+            'GRAPH_MAX_RETRIES': 3,
+        })
+
+        with app.app_context():
+            from app.services.ms_graph import GraphService, get_graph_stats
+
+            graph = GraphService(tenant_id='throttle-tenant')
+            before = get_graph_stats()
+
+            # Throttled twice, then served after waiting out Retry-After
+            fake.throttle_next = 2
+            fake.retry_after = '0.2'
+            start = time.perf_counter()
+            emails = graph.get_emails('token', limit=5)['value']
+            elapsed = time.perf_counter() - start
+            stats = get_graph_stats()
+            print(f"   Throttled fetch: {len(emails)} emails in {elapsed:.2f}s, stats {stats}")
+            assert len(emails) == 5
+            assert elapsed >= 0.4
+            assert stats['throttled'] - before['throttled'] == 2
+            assert stats['retries'] - before['retries'] == 2
+
+            # Gives up after GRAPH_MAX_RETRIES and surfaces the 429
+            fake.throttle_next = 10
+            fake.retry_after = '0'
+            assert graph.get_emails('token', limit=5) is None
+            assert get_graph_stats()['gave_up'] - before['gave_up'] == 1
+            fake.throttle_next = 0
+
+            # Sends are only retried when Graph cannot have acted on them
+            send_url = f"{fake.url}/v1.0/me/sendMail"
+            for status, retry_after, attempts in ((504, '0', 1), (503, None, 1), (503, '0', 2), (429, '0', 2)):
+                fake.throttle_status, fake.retry_after, fake.throttle_next = status, retry_after, 1
+                sent = len(fake.requests)
+                graph._request('POST', send_url, json={})
+                assert len(fake.requests) - sent == attempts, (status, retry_after)
+            fake.throttle_status, fake.throttle_next = 504, 1
+            assert len(graph.get_emails('token', limit=5)['value']) == 5
+            fake.throttle_status, fake.retry_after = 429, '0'
+
+            # Requests from many threads share the per-tenant limit
+            in_flight = [0, 0]
+            lock = threading.Lock()
+            original = graph.session.request
+
+            def tracking_request(*args, **kwargs):
+                with lock:
+                    in_flight[0] += 1
+                    in_flight[1] = max(in_flight[1], in_flight[0])
+                try:
+                    time.sleep(0.05)
+                    return original(*args, **kwargs)
+                finally:
+                    with lock:
+                        in_flight[0] -= 1
+
+            graph.session.request = tracking_request
+            try:
+                def fetch():
+                    with app.app_context():
+                        assert len(graph.get_emails('token', limit=5)['value']) == 5
+
+                threads = [threading.Thread(target=fetch) for _ in range(8)]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+            finally:
+                del graph.session.request
+            print(f"   Max concurrent requests for tenant: {in_flight[1]}")
+            assert in_flight[1] <= 2
+
+    print("✅ Graph throttling working")
+    return True
+
+
+def test_health_routes():
+    """/health answers without internals; the Graph retry counters are served to admins"""
+    print("🩺 Testing health routes")
+
+    with FakeGraphServer() as fake:
+        fake.add_message('inbox')
+
+        app = create_test_app(fake.url)
+        app.config.update({'GRAPH_RETRY_BACKOFF_SECONDS': 0.01})
+        app.secret_key = 'test-secret'
+        from app.routes.main import main_bp
+        app.register_blueprint(main_bp)
+
+        with app.app_context():
+            from app.models import db
+            from app.models.user import User
+            from app.services.ms_graph import GraphService, get_graph_stats
+
+            db.create_all()
+            user = User(email='monitor@example.com', display_name='Monitor')
+            db.session.add(user)
+            db.session.commit()
+
+            fake.throttle_next, fake.retry_after = 1, '0'
+            assert len(GraphService().get_emails('token', limit=5)['value']) == 1
+
+            client = app.test_client()
+            response = client.get('/health')
+            health = response.get_json()
+            print(f"   Health: {health}")
+            assert response.status_code == 200 and health['status'] == 'healthy'
+            assert health['database'] == 'connected' and 'graph_requests' not in health
+
+            assert client.get('/api/health/stats').status_code == 401
+            with client.session_transaction() as client_session:
+                client_session['user_id'] = user.id
+            assert client.get('/api/health/stats').status_code == 403
+
+            user.is_admin = True
+            db.session.commit()
+            stats = client.get('/api/health/stats').get_json()
+            print(f"   Stats: {stats}")
+            assert stats['graph_requests'] == get_graph_stats()
+            assert stats['graph_requests']['throttled'] >= 1 and stats['graph_requests']['retries'] >= 1
+
+    print("✅ Health routes working")
+    return True
+
+
+if __name__ == "__main__":
+    test_graph_throttling()
+    test_health_routes()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Test hybrid full-text + vector retrieval with reciprocal-rank fusion
+"""
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.append('.')
+
+from test_delta_sync import create_test_app
+from app.services.hybrid_search import reciprocal_rank_fusion
+
+
+class FakeVectorService:
+    """Vector store stand-in: returns a fixed similarity ranking, honouring $in filters"""
+
+    def __init__(self, ranking, delay=0.0):
+        self.available = True
+        self.ranking = ranking
+        self.delay = delay
+        self.calls = []
+
+    def search_emails(self, user_id, query, limit=10, where=None):
+        self.calls.append(where)
+        time.sleep(self.delay)
+        allowed = where['email_id']['$in'] if where else None
+        ids = [i for i in self.ranking if allowed is None or i in allowed]
+        return [{'email_id': i, 'similarity_score': round(1 - n * 0.05, 2)} for n, i in enumerate(ids[:limit])]
+
+
+def test_rrf():
+    """Documents ranked well by both retrievers beat those ranked first by one"""
+    print("🔀 Testing reciprocal-rank fusion")
+    fused = reciprocal_rank_fusion({'lexical': [1, 2, 3], 'vector': [4, 2, 3]}, k=60)
+    assert [email_id for email_id, _ in fused][:2] == [2, 3]
+    print("✅ RRF working")
+
+
+def test_hybrid_search():
+    """Both retrievers fused, filters applied before ranking, budgets enforced"""
+    print("🔎 Testing hybrid search")
+
+    app = create_test_app('http://127.0.0.1:9', 'sqlite:///:memory:')
+    app.secret_key = 'test-secret'
+    # Results are not cached here; each search swaps the vector store under the same query
+    app.config.update({'HYBRID_VECTOR_BUDGET_MS': 200, 'SEARCH_CACHE_SIZE': 0})
+
+    with app.app_context():
+        from app.models import db
+        from app.models.user import User
+        from app.models.email import Email
+        from app.services.email_search import init_email_search
+        from app.services.hybrid_search import init_hybrid_search
+        from app.services.chat_processor import ChatProcessor
+        from app.routes.email import email_bp
+
+        db.create_all()
+        user = User(email='hybrid@example.com', display_name='Hybrid User')
+        db.session.add(user)
+        db.session.commit()
+
+        now = datetime.utcnow()
+        rows = [
+            ('Budget review', 'The budget review is on Friday.', 'cfo@example.com', 'inbox', False),
+            ('Spending plan', 'Costs for next quarter, see the plan.', 'cfo@example.com', 'inbox', True),
+            ('Budget draft', 'Budget numbers attached.', 'me@example.com', 'sentitems', True),
+            ('Team lunch', 'Pizza on Thursday.', 'office@example.com', 'inbox', False),
+        ]
+        rows += [(f'Newsletter {i}', 'Weekly updates.', 'news@example.com', 'inbox', True) for i in range(20)]
+        for i, (subject, body, sender, folder, is_read) in enumerate(rows):
+            db.session.add(Email(user_id=user.id, graph_id=f'hybrid-{i}', subject=subject, body_text=body,
+                                 sender_email=sender, folder_name=folder, is_read=is_read,
+                                 received_date=now - timedelta(days=i)))
+        db.session.commit()
+
+        init_email_search(app)
+        hybrid = init_hybrid_search(app)
+
+        # Lexical only until a vector store is attached
+        search = hybrid.search(user.id, 'budget')
+        assert search['mode'] == 'fulltext' and {r['id'] for r in search['results']} == {1, 3}
+
+        # "Spending plan" has no lexical match but is the closest vector match
+        app.vector_service = FakeVectorService([2, 1, 4, 3])
+        search = hybrid.search(user.id, 'budget')
+        assert search['mode'] == 'hybrid', search
+        ids = [r['id'] for r in search['results']]
+        assert ids[0] == 1 and set(ids) == {1, 2, 3, 4}
+        # Second on both lists outranks first on one
+        assert search['results'][0]['lexical_rank'] == 2 and search['results'][0]['vector_rank'] == 2
+        assert '<mark>' in search['results'][0]['subject_highlight']
+
+        # Filters reach both retrievers before ranking
+        search = hybrid.search(user.id, 'budget', filters={'folder': 'inbox', 'unread': False})
+        assert [r['id'] for r in search['results']] == [2], search
+        assert sorted(app.vector_service.calls[-1]['email_id']['$in'])[:1] == [2]
+
+        search = hybrid.search(user.id, 'budget', filters={'sender': 'CFO', 'date_to': now - timedelta(hours=12)})
+        assert [r['id'] for r in search['results']] == [2]
+
+        # A slow vector store is dropped once its budget is spent
+        app.vector_service = FakeVectorService([2, 1], delay=1.0)
+        started = time.perf_counter()
+        search = hybrid.search(user.id, 'budget')
+        elapsed = time.perf_counter() - started
+        assert search['skipped'] == ['vector'] and search['mode'] == 'fulltext'
+        assert elapsed < 0.6, elapsed
+        assert hybrid.get_stats()['timeouts']['vector'] == 1
+        print(f"   Slow vector store skipped after {elapsed * 1000:.0f}ms")
+
+        # Same endpoint, with filters from the query string
+        app.vector_service = FakeVectorService([2, 1, 4, 3])
+        app.register_blueprint(email_bp, url_prefix='/api/email')
+        client = app.test_client()
+        with client.session_transaction() as client_session:
+            client_session['user_id'] = user.id
+
+        data = client.get('/api/email/search?q=budget&folder=sentitems').get_json()
+        assert data['success'] and data['search_mode'] == 'hybrid'
+        assert [e['id'] for e in data['emails']] == [3] and data['emails'][0]['is_sent_item']
+        assert client.get('/api/email/search?q=budget&date_from=yesterday').status_code == 400
+
+        # Chat context is assembled from the same retrieval
+        chat = ChatProcessor()
+        context = chat._get_relevant_context(user.id, 'find the budget review please', 'search_emails')
+        assert 'Subject: Budget review' in context and '<mark>' not in context
+        assert [email.id for email in chat._find_related_emails(user.id, 'find the budget review please',
+                                                                'search_emails')][0] == 1
+
+    print("✅ Hybrid search working")
+    return True
+
+
+if __name__ == "__main__":
+    test_rrf()
+    test_hybrid_search()
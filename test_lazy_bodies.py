@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Test header-only sync with lazy body hydration against the local fake Graph server
+"""
+import shutil
+import sys
+import tempfile
+
+sys.path.append('.')
+
+from fake_graph_server import FakeGraphServer
+from test_delta_sync import create_test_app
+from test_vector_partitions import MODEL_NAME, use_test_model
+
+LARGE_BODY = {'contentType': 'html', 'content': '<div>' + '<p>Quarterly report paragraph.</p>' * 200 + '</div>'}
+
+
+def make_mailbox(sync_bodies):
+    """Build a fake mailbox of 30 messages (every third unread) and an app for it"""
+    fake = FakeGraphServer().start()
+    for i in range(30):
+        fake.add_message('inbox', body=LARGE_BODY, isRead=i % 3 != 0)
+
+    app = create_test_app(fake.url)
+    app.config.update({'EMAIL_SYNC_BODIES': sync_bodies, 'EMAIL_BODY_PREFETCH_COUNT': 4,
+                       'VECTOR_DB_TYPE': 'native', 'VECTOR_DB_PATH': tempfile.mkdtemp(),
+                       'VECTOR_COLLECTION_NAME': 'email_embeddings', 'EMBEDDING_MODEL': MODEL_NAME,
+                       'EMBEDDING_CACHE_ENABLED': False})
+    return fake, app
+
+
+def test_lazy_bodies():
+    """Sync skips bodies, prefetches the newest unread ones and hydrates on open"""
+    print("📨 Testing header-only sync with lazy bodies")
+
+    served = {}
+    for sync_bodies in (True, False):
+        fake, app = make_mailbox(sync_bodies)
+        try:
+            with app.app_context():
+                from app.models import db
+                from app.models.user import User
+                from app.models.email import Email
+                from app.services.ms_graph import GraphService
+                from app.services.email_processor import EmailProcessor
+                from app.services.vector_db import VectorDBService
+
+                db.create_all()
+                use_test_model()
+                app.vector_service = VectorDBService()
+                assert app.vector_service.initialize()
+
+                def embedded_document(email):
+                    doc_id = app.vector_service._doc_id(email.id, user.id)
+                    return app.vector_service.collection.get(ids=[doc_id], include=['documents'])['documents'][0]
+
+                user = User(email='lazy@example.com', display_name='Lazy User')
+                db.session.add(user)
+                db.session.commit()
+
+                result = EmailProcessor().sync_user_emails_delta(user, GraphService(), 'token')
+                assert result['new_count'] == 30 and not result['errors']
+                served[sync_bodies] = fake.bytes_sent
+                fetched = Email.query.filter(Email.body_fetched_at.isnot(None)).count()
+                print(f"   {'Full' if sync_bodies else 'Header-only'} sync: "
+                      f"{fake.bytes_sent / 1024:.0f} KB served, {fetched} bodies stored")
+
+                if sync_bodies:
+                    assert fetched == 30
+                    continue
+
+                # Only the newest unread emails were prefetched
+                assert fetched == 4
+                prefetched = Email.query.filter(Email.body_fetched_at.isnot(None)).all()
+                assert all(not email.is_read and 'Quarterly report' in email.body_text for email in prefetched)
+
+                # Prefetched emails were re-embedded from the full body, the rest from the preview
+                assert all('Quarterly report' in embedded_document(email) for email in prefetched)
+                unfetched = Email.query.filter(Email.body_fetched_at.is_(None)).first()
+                assert 'Quarterly report' not in embedded_document(unfetched)
+
+                # Opening an email downloads its body once
+                app.secret_key = 'test-secret'
+                from app.routes.email import email_bp
+                app.register_blueprint(email_bp, url_prefix='/api/email')
+                from app.services.graph_tokens import remember_access_token
+                remember_access_token(user, {'access_token': 'token'})
+
+                client = app.test_client()
+                with client.session_transaction() as client_session:
+                    client_session['user_id'] = user.id
+
+                email = Email.query.filter(Email.body_fetched_at.is_(None)).first()
+                assert email.body_text is None and email.body_preview
+                data = client.get(f'/api/email/{email.id}').get_json()
+                assert data['success'] and data['email']['body_fetched']
+                assert 'Quarterly report' in data['email']['body_text']
+
+                batch_calls = sum(1 for _, path in fake.requests if path.endswith('/$batch'))
+                client.get(f'/api/email/{email.id}')
+                assert sum(1 for _, path in fake.requests if path.endswith('/$batch')) == batch_calls
+        finally:
+            fake.stop()
+            shutil.rmtree(app.config['VECTOR_DB_PATH'], ignore_errors=True)
+
+    print(f"   Sync bandwidth reduced {served[True] / served[False]:.1f}x")
+    assert served[False] * 3 < served[True]
+
+    print("✅ Lazy body fetching working")
+    return True
+
+
+if __name__ == "__main__":
+    test_lazy_bodies()
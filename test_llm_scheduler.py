@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Test the priority LLM request scheduler and load shedding against the fake Ollama server
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.append('.')
+
+from fake_ollama_server import FakeOllamaServer
+from test_delta_sync import create_test_app
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline, "Timed out waiting"
+        time.sleep(0.005)
+
+
+def test_priority_order():
+    """A free slot goes to the most urgent class first, oldest request first"""
+    print("🚦 Testing scheduler priority order")
+    from app.services.llm_scheduler import LLMScheduler
+
+    scheduler = LLMScheduler(concurrency=1)
+    order = []
+
+    def request(priority, name):
+        with scheduler.slot(priority):
+            order.append(name)
+
+    scheduler.acquire('batch')
+    threads = []
+    for priority, name in (('batch', 'batch-1'), ('near_real_time', 'sync-1'), ('batch', 'batch-2'),
+                           ('interactive', 'chat-1'), ('interactive', 'chat-2')):
+        thread = threading.Thread(target=request, args=(priority, name))
+        thread.start()
+        threads.append(thread)
+        wait_for(lambda: sum(c['waiting'] for c in scheduler.get_stats()['classes'].values()) == len(threads))
+
+    scheduler.release('batch')
+    for thread in threads:
+        thread.join(5)
+    assert order == ['chat-1', 'chat-2', 'sync-1', 'batch-1', 'batch-2'], order
+
+    stats = scheduler.get_stats()
+    assert stats['running'] == 0 and stats['classes']['interactive']['admitted'] == 2
+    assert stats['classes']['batch']['queue_ms_max'] > 0
+
+    try:
+        scheduler.acquire('urgent')
+        assert False, "Unknown class accepted"
+    except ValueError:
+        pass
+
+    print("✅ Scheduler priority order working")
+
+
+def test_batch_slots_and_shedding():
+    """Batch work cannot hold every slot; requests past their budget are shed"""
+    print("🪓 Testing batch slot limit and load shedding")
+    from app.services.llm_scheduler import LLMScheduler, LLMOverloaded
+
+    scheduler = LLMScheduler(concurrency=2, budgets_ms={'near_real_time': 50, 'batch': 50})
+    assert scheduler.limits['batch'] == 1
+
+    scheduler.acquire('batch')
+    # The second slot is kept for interactive and near-real-time requests
+    started = time.monotonic()
+    try:
+        scheduler.acquire('batch')
+        assert False, "Second batch request admitted"
+    except LLMOverloaded:
+        assert 0.04 < time.monotonic() - started < 1
+    with scheduler.slot('interactive') as waited:
+        assert waited < 20
+
+        # Both slots busy: near-real-time waits for its budget, then is shed
+        try:
+            scheduler.acquire('near_real_time')
+            assert False, "Request admitted past concurrency"
+        except LLMOverloaded:
+            pass
+    scheduler.release('batch')
+
+    classes = scheduler.get_stats()['classes']
+    assert classes['batch']['shed'] == 1 and classes['near_real_time']['shed'] == 1
+    assert all(c['waiting'] == 0 and c['running'] == 0 for c in classes.values())
+
+    print("✅ Batch slot limit and load shedding working")
+
+
+def create_scheduled_app(ollama_url, database_url, **config):
+    from app.services.llm_scheduler import init_llm_scheduler
+
+    app = create_test_app('http://127.0.0.1:9', database_url)
+    app.config.update({'OLLAMA_BASE_URL': ollama_url, 'OLLAMA_TIMEOUT': 10, 'LLM_SCHEDULER_CONCURRENCY': 1,
+                       'LLM_QUEUE_BUDGET_NEAR_REAL_TIME_MS': 100, **config})
+    init_llm_scheduler(app)
+    return app
+
+
+def test_chat_during_analysis_backlog():
+    """Chat jumps an analysis backlog; inline analysis past its budget falls back to heuristics"""
+    print("📬 Testing chat latency during an analysis backlog")
+    latency = 0.15
+
+    # A file database, shared by the worker threads
+    with tempfile.TemporaryDirectory() as tmp, FakeOllamaServer(latency=latency) as fake:
+        app = create_scheduled_app(fake.url, f"sqlite:///{os.path.join(tmp, 'app.db')}")
+        with app.app_context():
+            from app.models import db
+            from app.models.user import User
+            from app.models.email import Email
+            from app.services.email_processor import EmailProcessor, AnalysisError
+            from app.services.chat_processor import ChatProcessor
+
+            db.create_all()
+            user = User(email='sched@example.com', display_name='Scheduler User')
+            db.session.add(user)
+            db.session.commit()
+            user_id = user.id
+            emails = [Email(user_id=user.id, graph_id=f'sched-{i}', subject=f'Report {i}',
+                            sender_email='team@example.com', body_preview=f'Numbers for week {i}.')
+                      for i in range(8)]
+            db.session.add_all(emails)
+            db.session.commit()
+            email_ids = [email.id for email in emails]
+
+        # Four background workers analyse one email per request
+        def worker(offset):
+            with app.app_context():
+                processor = EmailProcessor()
+                for email_id in email_ids[offset::4]:
+                    processor._analyze_emails_batch([db.session.get(Email, email_id)], fallback=False)
+
+        workers = [threading.Thread(target=worker, args=(i,)) for i in range(4)]
+        for thread in workers:
+            thread.start()
+        wait_for(lambda: app.llm_scheduler.get_stats()['classes']['batch']['waiting'] >= 3)
+
+        with app.app_context():
+            result = ChatProcessor().process_message(user_id, 'Anything urgent today?')
+            chat_queue_ms = result['queue_ms']
+            assert result['text'] and not result.get('error')
+
+            # Near-real-time analysis waits at most its budget, then uses the heuristics
+            email = db.session.get(Email, email_ids[0])
+            started = time.monotonic()
+            EmailProcessor()._analyze_email_with_ai(email)
+            fallback_ms = (time.monotonic() - started) * 1000
+            assert fallback_ms < latency * 1000 and email.ai_summary.startswith('Email from')
+
+        for thread in workers:
+            thread.join(10)
+        stats = app.llm_scheduler.get_stats()
+        print(f"   Chat queued {chat_queue_ms:.0f} ms behind 8 analyses of {latency * 1000:.0f} ms each")
+        assert chat_queue_ms < latency * 1000 * 1.5
+        assert fake.max_in_flight == 1 and stats['classes']['batch']['admitted'] == 8
+        assert stats['classes']['near_real_time']['shed'] == 1
+
+        # Without fallback (analysis queue jobs) a shed request is an error to retry later
+        with app.app_context(), app.llm_scheduler.slot('interactive'):
+            app.llm_scheduler.budgets_ms['batch'] = 50
+            try:
+                EmailProcessor()._analyze_emails_batch([db.session.get(Email, email_ids[0])], fallback=False)
+                assert False, "Shed analysis did not raise"
+            except AnalysisError:
+                pass
+        assert app.llm_scheduler.get_stats()['classes']['batch']['shed'] == 1
+
+    print("✅ Chat latency during an analysis backlog working")
+
+
+if __name__ == "__main__":
+    test_priority_order()
+    test_batch_slots_and_shedding()
+    test_chat_during_analysis_backlog()
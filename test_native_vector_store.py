@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Test the native (NumPy memmap) vector store backend
+"""
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+sys.path.append('.')
+
+from app.services.vector_backends import NativeVectorClient
+
+
+def clustered_vectors(count, dim=64, clusters=50, seed=0):
+    """Unit vectors scattered around random cluster centres, like real embeddings"""
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((clusters, dim))
+    vectors = centres[rng.integers(clusters, size=count)] + 0.35 * rng.standard_normal((count, dim))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def test_collection_api():
+    """Upsert, filtered get/query, tombstones and persistence"""
+    print("🧮 Testing native collection API")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        client = NativeVectorClient(tmp)
+        collection = client.get_or_create_collection('emails', metadata={'description': 'test'})
+        vectors = clustered_vectors(3000)
+        ids = [f'email_{i % 3}_{i}' for i in range(3000)]
+        metadatas = [{'email_id': i, 'user_id': i % 3, 'folder_name': 'inbox' if i % 2 else 'sent'} for i in range(3000)]
+        collection.upsert(ids=ids, documents=[f'doc {i}' for i in range(3000)], metadatas=metadatas,
+                          embeddings=vectors.tolist())
+        assert collection.count() == 3000 and collection.metadata == {'description': 'test'}
+
+        # Exact top-k matches a brute-force float32 search
+        results = collection.query(query_embeddings=[vectors[42].tolist()], n_results=5)
+        expected = np.argsort(-(vectors @ vectors[42]))[:5]
+        assert results['ids'][0] == [ids[i] for i in expected]
+        assert abs(results['distances'][0][0]) < 1e-3 and results['documents'][0][0] == 'doc 42'
+
+        # Metadata filters
+        results = collection.query(query_embeddings=[vectors[42].tolist()], n_results=10,
+                                   where={"$and": [{"user_id": 1}, {"email_id": {"$ne": 43}}]})
+        assert all(m['user_id'] == 1 and m['email_id'] != 43 for m in results['metadatas'][0])
+        results = collection.query(query_embeddings=[vectors[42].tolist()], n_results=10,
+                                   where={"email_id": {"$in": [7, 8, 9]}})
+        assert sorted(m['email_id'] for m in results['metadatas'][0]) == [7, 8, 9]
+        assert len(collection.get(where={"folder_name": "sent"}, include=[])['ids']) == 1500
+        page = collection.get(where={"user_id": 2}, limit=10, offset=5, include=['metadatas'])
+        assert [m['email_id'] for m in page['metadatas']] == list(range(17, 47, 3))
+
+        # Overwrite in place, tombstone, then reuse the freed row
+        collection.upsert(ids=[ids[0]], documents=['edited'], metadatas=[metadatas[0]], embeddings=[vectors[1].tolist()])
+        assert collection.get(ids=[ids[0]])['documents'] == ['edited']
+        collection.delete(where={"user_id": 0})
+        assert collection.count() == 2000
+        assert collection.query(query_embeddings=[vectors[0].tolist()], n_results=3, where={"user_id": 0})['ids'] == [[]]
+        collection.upsert(ids=['new'], documents=['new'], metadatas=[{'email_id': -1, 'user_id': 9}],
+                          embeddings=[vectors[0].tolist()])
+        size = os.path.getsize(os.path.join(tmp, 'emails', 'vectors.f16'))
+
+        # Everything survives a reopen; the vector file did not grow
+        reopened = NativeVectorClient(tmp).get_collection('emails')
+        assert reopened.count() == 2001
+        assert reopened.query(query_embeddings=[vectors[0].tolist()], n_results=1)['ids'] == [['new']]
+        assert os.path.getsize(os.path.join(tmp, 'emails', 'vectors.f16')) == size
+        assert reopened.get(ids=['new'], include=['embeddings'])['embeddings'][0][:3] == \
+            vectors[0][:3].astype(np.float16).astype(np.float32).tolist()
+
+        try:
+            reopened.upsert(ids=['bad'], embeddings=[[1.0, 2.0]])
+            assert False, 'dimension mismatch accepted'
+        except ValueError:
+            pass
+
+        client.delete_collection('emails')
+        assert client.list_collections() == []
+
+    print("✅ Native collection API working")
+
+
+def test_ivf_index():
+    """Large collections are searched through the IVF index with high recall"""
+    print("🗺️ Testing IVF index")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        collection = NativeVectorClient(tmp, ivf_threshold=5000, ivf_probes=12).get_or_create_collection('big')
+        vectors = clustered_vectors(20000, clusters=200)
+        collection.upsert(ids=[str(i) for i in range(20000)], embeddings=vectors.tolist(),
+                          metadatas=[{'email_id': i} for i in range(20000)])
+        assert collection.index_stale()
+        stats = collection.build_index()
+        assert stats['vectors'] == 20000 and not collection.index_stale()
+
+        # Rows written after training are assigned to lists as they arrive
+        extra = clustered_vectors(10, clusters=200, seed=1)
+        collection.upsert(ids=[f'extra-{i}' for i in range(10)], embeddings=extra.tolist())
+        assert collection.query(query_embeddings=[extra[3].tolist()], n_results=1)['ids'] == [['extra-3']]
+
+        queries = clustered_vectors(200, clusters=200, seed=2)
+        all_vectors = np.vstack([vectors, extra])
+        recall = []
+        for query in queries:
+            found = collection.query(query_embeddings=[query.tolist()], n_results=10, include=[])['ids'][0]
+            truth = np.argsort(-(all_vectors @ query))[:10]
+            truth_ids = {str(i) if i < 20000 else f'extra-{i - 20000}' for i in truth}
+            recall.append(len(truth_ids & set(found)) / 10)
+        print(f"   Recall@10 with 12 of {stats['lists']} lists probed: {np.mean(recall):.3f}")
+        assert np.mean(recall) > 0.9
+
+        # The index is loaded with the collection
+        reopened = NativeVectorClient(tmp, ivf_threshold=5000).get_collection('big')
+        assert reopened.query(query_embeddings=[extra[3].tolist()], n_results=1)['ids'] == [['extra-3']]
+
+    print("✅ IVF index working")
+
+
+def recall_at_10(collection, vectors, queries):
+    recall = []
+    for query in queries:
+        found = {int(i) for i in collection.query(query_embeddings=[query.tolist()], n_results=10, include=[])['ids'][0]}
+        recall.append(len(found & set(np.argsort(-(vectors @ query))[:10].tolist())) / 10)
+    return float(np.mean(recall))
+
+
+def test_quantized_storage():
+    """float32 / float16 / int8 storage, float re-ranking and conversion between them"""
+    print("🗜️ Testing quantized vector storage")
+
+    vectors = clustered_vectors(8000, clusters=100)
+    queries = clustered_vectors(100, clusters=100, seed=3)
+    ids = [str(i) for i in range(8000)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        stats = {}
+        recalls = {}
+        for precision, rerank in [('float32', 0), ('float16', 0), ('int8', 0), ('int8', 4)]:
+            label = f'{precision}+rerank' if rerank else precision
+            collection = NativeVectorClient(os.path.join(tmp, label), precision=precision, rerank=rerank) \
+                .get_or_create_collection('emails')
+            collection.upsert(ids=ids, embeddings=vectors.tolist())
+            stats[label] = collection.get_storage_stats()
+            recalls[label] = recall_at_10(collection, vectors, queries)
+            assert stats[label]['precision'] == precision and stats[label]['refine'] == bool(rerank)
+
+            # Stored embeddings come back close to the originals
+            stored = np.array(collection.get(ids=ids[:50], include=['embeddings'])['embeddings'])
+            assert np.abs(stored - vectors[:50]).max() < 0.01, label
+        print("   " + ", ".join(f"{label}: recall {recall:.3f}, {stats[label]['disk_bytes'] // 1024} KB"
+                                 for label, recall in recalls.items()))
+
+        assert recalls['float32'] == 1.0 and recalls['float16'] > 0.99
+        assert recalls['int8'] > 0.95 and recalls['int8+rerank'] >= recalls['int8']
+        assert stats['int8']['disk_bytes'] * 3 < stats['float32']['disk_bytes']
+        assert stats['int8']['scan_bytes'] * 3 < stats['float32']['scan_bytes']
+        assert stats['float16']['disk_bytes'] * 2 == stats['float32']['disk_bytes']
+
+        # Precision is recorded with the collection, so a differently configured client keeps it
+        reopened = NativeVectorClient(os.path.join(tmp, 'int8'), precision='float32').get_collection('emails')
+        assert reopened.precision == 'int8' and recall_at_10(reopened, vectors, queries) == recalls['int8']
+
+        # Convert in place: float32 -> int8 with originals -> float16
+        collection = NativeVectorClient(os.path.join(tmp, 'float32'), rerank=4).get_collection('emails')
+        converted = collection.convert('int8', refine=True)
+        assert converted['precision'] == 'int8' and converted['refine']
+        files = sorted(f for f in os.listdir(os.path.join(tmp, 'float32', 'emails')) if not f.startswith('records'))
+        assert files == ['scales.f32', 'vectors.f16', 'vectors.i8'], files
+        assert recall_at_10(collection, vectors, queries) >= recalls['int8']
+        collection.convert('float16')
+        reopened = NativeVectorClient(os.path.join(tmp, 'float32')).get_collection('emails')
+        assert reopened.precision == 'float16' and recall_at_10(reopened, vectors, queries) > 0.99
+        assert 'vectors.i8' not in os.listdir(os.path.join(tmp, 'float32', 'emails'))
+
+        try:
+            NativeVectorClient(tmp, precision='int4')
+            assert False, 'unknown precision accepted'
+        except ValueError:
+            pass
+
+    print("✅ Quantized vector storage working")
+
+
+if __name__ == "__main__":
+    test_collection_api()
+    test_ivf_index()
+    test_quantized_storage()
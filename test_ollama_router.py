@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Test routing Ollama requests across several fake Ollama servers
+"""
+import sys
+import threading
+from contextlib import ExitStack
+
+sys.path.append('.')
+
+from fake_ollama_server import FakeOllamaServer
+from test_delta_sync import create_test_app
+
+DEAD_URL = 'http://127.0.0.1:9'
+
+
+def create_router_app(urls, **config):
+    from app.services.ollama_router import init_ollama_router
+
+    app = create_test_app('http://127.0.0.1:9')
+    app.config.update({'OLLAMA_BASE_URL': urls[0], 'OLLAMA_BASE_URLS': ','.join(urls), 'OLLAMA_TIMEOUT': 10,
+                       'OLLAMA_CONNECT_TIMEOUT': 1, **config})
+    init_ollama_router(app)
+    return app
+
+
+def start_servers(stack, count, **options):
+    return [stack.enter_context(FakeOllamaServer(**options)) for _ in range(count)]
+
+
+def generate(app, model, results=None):
+    from app.services.ollama_engine import get_ollama_service
+
+    with app.app_context():
+        service = get_ollama_service()
+        service.model = model
+        result = service.generate_response('Summarize my week')
+    if results is not None:
+        results.append(result)
+    return result
+
+
+def test_least_loaded():
+    """Concurrent requests spread over the servers that have the model loaded"""
+    print("⚖️ Testing least-loaded routing")
+
+    with ExitStack() as stack:
+        fakes = start_servers(stack, 3, latency=0.2)
+        app = create_router_app([fake.url for fake in fakes])
+        for fake in fakes:
+            fake.loaded = ['test-model']
+        app.ollama_router.refresh()
+
+        results = []
+        threads = [threading.Thread(target=generate, args=(app, 'test-model', results)) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(10)
+
+        assert len(results) == 6 and not any(result.get('error') for result in results)
+        assert [fake.generate_count for fake in fakes] == [2, 2, 2]
+        assert all(fake.max_in_flight <= 2 for fake in fakes)
+
+        stats = app.ollama_router.get_stats()
+        assert stats['healthy'] == 3 and all(b['in_flight'] == 0 and b['latency_ms'] for b in stats['backends'])
+
+        # Streams and embeddings are routed too
+        with app.app_context():
+            from app.services.ollama_engine import get_ollama_service
+            chunks = list(get_ollama_service().generate_streaming_response('Hello'))
+            assert chunks[-1]['done'] and not chunks[-1].get('error')
+            assert get_ollama_service().generate_embedding('Hello') is not None
+        assert sum(b['requests'] for b in app.ollama_router.get_stats()['backends']) == 8
+
+    print("✅ Least-loaded routing working")
+
+
+def test_model_affinity():
+    """Requests go to a server that already has their model loaded"""
+    print("🧲 Testing model affinity")
+    models = ['model-a', 'model-b']
+
+    with ExitStack() as stack:
+        fakes = start_servers(stack, 2, models=models, load_seconds=0.05)
+        # One server with both models, where every switch means a reload
+        single = stack.enter_context(FakeOllamaServer(models=models, load_seconds=0.05))
+        app = create_router_app([fake.url for fake in fakes])
+        single_app = create_test_app('http://127.0.0.1:9')
+        single_app.config.update({'OLLAMA_BASE_URL': single.url, 'OLLAMA_TIMEOUT': 10})
+
+        for i in range(10):
+            assert not generate(app, models[i % 2]).get('error')
+            assert not generate(single_app, models[i % 2]).get('error')
+
+        # Each model was loaded once, on its own server
+        print(f"   Model loads for 10 alternating requests: {sum(f.model_loads for f in fakes)} routed, "
+              f"{single.model_loads} on one server")
+        assert sorted(fake.model_loads for fake in fakes) == [1, 1] and single.model_loads == 10
+        assert sorted(fake.generate_count for fake in fakes) == [5, 5]
+
+        app.ollama_router.refresh()
+        loaded = sorted(tuple(b['loaded_models']) for b in app.ollama_router.get_stats()['backends'])
+        assert loaded == [('model-a',), ('model-b',)]
+
+    with ExitStack() as stack:
+        # Servers without the model pulled are skipped
+        has_model, lacks_model = start_servers(stack, 1, models=['model-a']) + start_servers(stack, 1, models=['model-b'])
+        app = create_router_app([lacks_model.url, has_model.url])
+        app.ollama_router.refresh()
+        for _ in range(3):
+            assert not generate(app, 'model-a').get('error')
+        assert has_model.generate_count == 3 and lacks_model.generate_count == 0
+
+    print("✅ Model affinity working")
+
+
+def test_failover():
+    """An unreachable server is skipped and its requests fail over"""
+    print("🛟 Testing failover to healthy servers")
+
+    with ExitStack() as stack:
+        fake, = start_servers(stack, 1)
+        app = create_router_app([DEAD_URL, fake.url], OLLAMA_ROUTER_RETRY_SECONDS=60)
+
+        for _ in range(3):
+            assert not generate(app, 'test-model').get('error')
+        assert fake.generate_count == 3
+
+        dead, live = app.ollama_router.get_stats()['backends']
+        assert not dead['healthy'] and dead['failures'] == 1 and dead['requests'] == 1
+        assert live['healthy'] and live['requests'] == 3
+
+        with app.app_context():
+            from app.services.ollama_engine import get_ollama_service
+            assert get_ollama_service().check_health()
+
+    with ExitStack() as stack:
+        # Nothing reachable: the error is reported, not raised
+        app = create_router_app([DEAD_URL, 'http://127.0.0.1:8'])
+        result = generate(app, 'test-model')
+        assert result.get('error') and app.ollama_router.get_stats()['healthy'] == 0
+
+    print("✅ Failover to healthy servers working")
+
+
+if __name__ == "__main__":
+    test_least_loaded()
+    test_model_affinity()
+    test_failover()
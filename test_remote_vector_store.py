@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Test the ChromaDB client/server mode against an in-process Chroma server
+
+The stand-in is chromadb's own FastAPI server app run by uvicorn on a thread, so
+requests go over real HTTP. Skipped when chromadb is not installed.
+"""
+import importlib.util
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+import pytest
+
+sys.path.append('.')
+
+from test_vector_partitions import create_vector_app, mailbox, use_test_model
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class ChromaServer:
+    """chromadb's server app on a background uvicorn thread"""
+
+    def __init__(self, path):
+        import uvicorn
+        from chromadb.config import Settings
+        from chromadb.server.fastapi import FastAPI
+
+        settings = Settings(is_persistent=True, persist_directory=path, anonymized_telemetry=False)
+        self.port = free_port()
+        self.server = uvicorn.Server(uvicorn.Config(
+            FastAPI(settings).app(), host='127.0.0.1', port=self.port, log_level='error'
+        ))
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        deadline = time.time() + 10
+        while not self.server.started:
+            assert time.time() < deadline, "Chroma server did not start"
+            time.sleep(0.05)
+        return self
+
+    def __exit__(self, *exc):
+        self.server.should_exit = True
+        self.thread.join(timeout=10)
+
+
+def create_remote_app(path, port, **config):
+    app = create_vector_app(path, 'chromadb', 'shared')
+    app.config.update({
+        'CHROMADB_MODE': 'http',
+        'CHROMADB_HOST': '127.0.0.1',
+        'CHROMADB_PORT': port,
+        'CHROMADB_TIMEOUT': 5,
+        **config
+    })
+    return app
+
+
+def test_remote_mode():
+    """Writes are batched and embedded here; processes share one pooled client"""
+    pytest.importorskip('chromadb')
+    pytest.importorskip('uvicorn')
+    print("🌐 Testing ChromaDB server mode")
+    from app.services.vector_db import VectorDBService
+    model = use_test_model()
+
+    with tempfile.TemporaryDirectory() as server_dir, tempfile.TemporaryDirectory() as local_dir:
+        server = ChromaServer(server_dir)
+        with create_remote_app(local_dir, server.port, CHROMADB_BATCH_SIZE=4).app_context():
+            with server:
+                service = VectorDBService()
+                assert service.initialize() and service.available and service.remote
+
+                # Ten documents in batches of four, with vectors computed by the app's model
+                encoded = model.encoded
+                stats = service.client.get_stats()
+                upserts = stats['operations'].get('upsert', 0)
+                assert service.batch_add_emails(mailbox(1, 10, 'budget')) == 10
+                assert model.encoded - encoded == 10
+                stats = service.client.get_stats()
+                assert stats['operations']['upsert'] - upserts == 3, stats
+                assert stats['healthy'] and stats['failures'] == 0
+
+                results = service.search_emails(1, 'budget notes', limit=5)
+                assert len(results) == 5 and {r['email_id'] for r in results} <= set(range(100, 110))
+
+                info = service.get_collection_info()
+                assert info['chromadb_mode'] == 'http' and info['document_count'] == 10
+
+                # A second service (another worker in the same process) reuses the client
+                other = VectorDBService()
+                assert other.initialize() and other.client is service.client
+                assert other.collection.count() == 10
+
+            # Nothing was written to the local path
+            assert not any(name.endswith('.sqlite3') for name in os.listdir(local_dir))
+
+            # Server gone: the first failed request marks it down and the service stops using it
+            assert service.search_emails(1, 'budget notes') == []
+            assert not service.client.healthy and not service.available
+            assert service.client.get_stats()['failures'] >= 1
+            assert service.search_emails(1, 'budget notes') == []
+
+    print("✅ ChromaDB server mode working")
+
+
+def test_fallback():
+    """An unreachable server falls back to the embedded store, or disables vector search"""
+    pytest.importorskip('chromadb')
+    print("🛟 Testing ChromaDB server fallback")
+    from app.services.vector_db import VectorDBService
+    use_test_model()
+
+    port = free_port()
+    with tempfile.TemporaryDirectory() as tmp:
+        with create_remote_app(tmp, port).app_context():
+            service = VectorDBService()
+            assert service.initialize() and service.available and not service.remote
+            assert service.batch_add_emails(mailbox(1, 3, 'travel')) == 3
+            assert service.get_collection_info()['chromadb_mode'] == 'embedded'
+
+        with create_remote_app(tmp, port, CHROMADB_FALLBACK='none').app_context():
+            service = VectorDBService()
+            assert not service.initialize() and not service.available
+
+    print("✅ ChromaDB server fallback working")
+
+
+if __name__ == "__main__":
+    if not importlib.util.find_spec('chromadb'):
+        print("⏭️ chromadb not installed, skipping")
+        sys.exit(0)
+
+    test_remote_mode()
+    test_fallback()
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Test the persistent LLM response cache against the fake Ollama server
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append('.')
+
+from fake_ollama_server import FakeOllamaServer
+from test_delta_sync import create_test_app
+
+
+def create_cache_app(ollama_url, cache_path, **config):
+    from app.services.response_cache import init_response_cache
+
+    app = create_test_app('http://127.0.0.1:9')
+    app.config.update({'SECRET_KEY': 'test', 'OLLAMA_BASE_URL': ollama_url, 'OLLAMA_TIMEOUT': 10,
+                       'LLM_RESPONSE_CACHE_PATH': cache_path, **config})
+    init_response_cache(app)
+    return app
+
+
+def test_task_calls_cached():
+    """Email analyses, drafts and reply suggestions are generated once; chat is never cached"""
+    print("🗄️ Testing LLM response cache for task calls")
+
+    with tempfile.TemporaryDirectory() as tmp, FakeOllamaServer(latency=0.05) as fake:
+        cache_path = os.path.join(tmp, 'llm_cache.sqlite3')
+        app = create_cache_app(fake.url, cache_path)
+        with app.app_context():
+            from app.models import db
+            from app.models.user import User
+            from app.models.email import Email
+            from app.services.email_processor import EmailProcessor
+            from app.services.chat_processor import ChatProcessor
+
+            db.create_all()
+            user = User(email='cache@example.com', display_name='Cache User')
+            db.session.add(user)
+            db.session.commit()
+            email = Email(user_id=user.id, graph_id='cache-1', subject='Invoice overdue',
+                          sender_email='billing@example.com', body_preview='Please pay the attached invoice.')
+            db.session.add(email)
+            db.session.commit()
+            processor = EmailProcessor()
+
+            started = time.perf_counter()
+            processor._analyze_email_with_ai(email)
+            miss_ms = (time.perf_counter() - started) * 1000
+            summary = email.ai_summary
+            started = time.perf_counter()
+            processor._analyze_email_with_ai(email)
+            hit_ms = (time.perf_counter() - started) * 1000
+            print(f"   Email analysis: {miss_ms:.1f} ms generated, {hit_ms:.1f} ms cached")
+            assert fake.generate_count == 1 and email.ai_summary == summary and hit_ms < miss_ms
+
+            # Analysis is sent with the deterministic task options
+            options = fake.requests[-1][1]['options']
+            assert options['temperature'] == 0.2 and options['seed'] == 42
+
+            # Different content or model is a different key
+            email.body_preview = 'Please pay the attached invoice by Friday.'
+            processor._analyze_email_with_ai(email)
+            assert fake.generate_count == 2
+
+            processor.ollama_service.model = 'other-model'
+            processor._analyze_email_with_ai(email)
+            assert fake.generate_count == 3
+            processor.ollama_service.model = 'test-model'
+
+            # Drafts and reply suggestions use the task options too, so a repeat is a hit
+            reply = processor.suggest_email_reply(email)
+            assert processor.suggest_email_reply(email) == reply
+            assert fake.requests[-1][1]['options']['seed'] == 42
+            draft = processor.generate_email_draft('Q3 numbers', 'cfo@example.com', 'Share the report')
+            assert processor.generate_email_draft('Q3 numbers', 'cfo@example.com', 'Share the report') == draft
+            assert fake.generate_count == 5
+
+            # Conversational chat keeps the default sampling and always reaches the model
+            chat = ChatProcessor()
+            chat.process_message(user.id, 'What is overdue?')
+            chat.process_message(user.id, 'What is overdue?')
+            assert fake.generate_count == 7
+
+            stats = app.response_cache.get_stats()
+            assert stats['hits'] == 3 and stats['misses'] == 5 and stats['entries'] == 5, stats
+
+        # Entries survive a restart
+        app = create_cache_app(fake.url, cache_path)
+        with app.app_context():
+            db.create_all()
+            email = Email(user_id=1, graph_id='cache-2', subject='Invoice overdue',
+                          sender_email='billing@example.com', body_preview='Please pay the attached invoice.')
+            EmailProcessor()._analyze_email_with_ai(email)
+            assert email.ai_summary == summary
+            assert fake.generate_count == 7 and app.response_cache.get_stats()['hits'] == 1
+
+    print("✅ LLM response cache for task calls working")
+
+
+def test_eviction_and_expiry():
+    """Entries expire after their TTL; past max_bytes the least recently used go first"""
+    print("♻️ Testing LLM response cache eviction and expiry")
+    from app.services.response_cache import ResponseCache
+
+    with tempfile.TemporaryDirectory() as tmp:
+        def request(n, model='m'):
+            return {'model': model, 'prompt': f'prompt {n}', 'options': {'temperature': 0.2}}
+
+        answer = {'text': 'x' * 1000, 'token_count': 250}
+        cache = ResponseCache(os.path.join(tmp, 'cache.sqlite3'), max_bytes=3500, ttl_seconds=60)
+
+        for n in range(3):
+            cache.put(request(n), answer)
+        assert cache.get(request(0)) == answer  # Most recently used now
+        cache.put(request(3), answer)
+        assert cache.get(request(1)) is None and cache.get(request(0)) and cache.get(request(3))
+        assert cache.get_stats()['evictions'] == 1
+
+        # The key ignores prompt whitespace but not options
+        assert cache.get({'model': 'm', 'prompt': '  prompt\n 0 ', 'options': {'temperature': 0.2}}) == answer
+        assert cache.get({'model': 'm', 'prompt': 'prompt 0', 'options': {'temperature': 0.1}}) is None
+        assert not cache.accepts({'prompt': 'p', 'options': {'temperature': 0.7}})
+        assert not cache.accepts({'prompt': 'p', 'options': {'temperature': 0.2}, 'context': [1, 2]})
+
+        # Per-entry TTL
+        cache.put(request(9), answer, ttl_seconds=0.05)
+        time.sleep(0.1)
+        assert cache.get(request(9)) is None and cache.get_stats()['expired'] == 1
+
+        cache.put(request(7, model='other'), answer, ttl_seconds=0.05)
+        time.sleep(0.1)
+        assert cache.purge(expired_only=True) == 1
+        cache.put(request(8, model='other'), answer)
+        assert cache.purge(model='other') == 1 and cache.get_stats()['entries'] == 2
+        assert cache.purge() == 2 and cache.get_stats()['entries'] == 0
+
+    print("✅ LLM response cache eviction and expiry working")
+
+
+def test_cache_routes():
+    """Stats and purge endpoints are admin-only"""
+    print("🧹 Testing LLM response cache routes")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_cache_app('http://127.0.0.1:9', os.path.join(tmp, 'cache.sqlite3'))
+        from app.routes.email import email_bp
+        app.register_blueprint(email_bp, url_prefix='/api/email')
+
+        with app.app_context():
+            from app.models import db
+            from app.models.user import User
+
+            db.create_all()
+            user = User(email='routes@example.com', display_name='Routes User')
+            db.session.add(user)
+            db.session.commit()
+
+            app.response_cache.put({'model': 'm', 'prompt': 'p', 'options': {}}, {'text': 'answer'})
+            client = app.test_client()
+            assert client.get('/api/email/ai-cache').status_code in (302, 401)
+            with client.session_transaction() as flask_session:
+                flask_session['user_id'] = user.id
+
+            # Cache stats span every user's prompts, so ordinary users are refused
+            assert client.get('/api/email/ai-cache').status_code == 403
+            assert client.post('/api/email/ai-cache/purge', json={}).status_code == 403
+            assert app.response_cache.get_stats()['entries'] == 1
+
+            user.is_admin = True
+            db.session.commit()
+            stats = client.get('/api/email/ai-cache').get_json()
+            assert stats['success'] and stats['cache']['entries'] == 1
+            result = client.post('/api/email/ai-cache/purge', json={}).get_json()
+            assert result['purged'] == 1 and result['cache']['entries'] == 0
+
+    print("✅ LLM response cache routes working")
+
+
+if __name__ == "__main__":
+    test_task_calls_cached()
+    test_eviction_and_expiry()
+    test_cache_routes()
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Test query-embedding and search-result caching with generation-based invalidation
+"""
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.append('.')
+
+from test_delta_sync import create_test_app
+from test_hybrid_search import FakeVectorService
+from test_vector_partitions import BagOfWordsModel, MODEL_NAME, mailbox
+from app.services import embedding_models
+from app.services.search_cache import LRUCache, normalize_query
+
+
+def test_lru_cache():
+    """LRU eviction, TTL expiry and hit-rate counters"""
+    print("🗃️ Testing LRU cache")
+
+    cache = LRUCache(max_entries=2, ttl_seconds=0.2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)  # Evicts b, the least recently used
+    assert cache.get('b') is None and cache.get('c') == 3
+    time.sleep(0.25)
+    assert cache.get('a') is None
+
+    stats = cache.get_stats()
+    assert (stats['hits'], stats['misses'], stats['evictions'], stats['expired']) == (2, 2, 1, 1), stats
+    assert stats['hit_rate'] == 0.5
+    assert normalize_query('  Budget\tREVIEW  ') == 'budget review'
+    print("✅ LRU cache working")
+
+
+def test_result_cache():
+    """Repeat searches are served from the cache until the user's emails change"""
+    print("🔁 Testing search result cache")
+
+    app = create_test_app('http://127.0.0.1:9')
+    app.secret_key = 'test-secret'
+
+    with app.app_context():
+        from app.models import db
+        from app.models.user import User
+        from app.models.email import Email
+        from app.services.email_search import init_email_search
+        from app.services.hybrid_search import init_hybrid_search
+        from app.services.chat_processor import ChatProcessor
+        from app.routes.email import email_bp
+
+        db.create_all()
+        alice = User(email='alice@example.com', display_name='Alice')
+        bob = User(email='bob@example.com', display_name='Bob')
+        db.session.add_all([alice, bob])
+        db.session.commit()
+
+        now = datetime.utcnow()
+        for i in range(30):
+            db.session.add(Email(user_id=alice.id, graph_id=f'cache-{i}', subject=f'Budget item {i}',
+                                 body_text='Quarterly budget numbers.' if i < 5 else 'Weekly updates.',
+                                 is_read=bool(i % 2), received_date=now - timedelta(hours=i)))
+        db.session.commit()
+
+        init_email_search(app)
+        hybrid = init_hybrid_search(app)
+        vector = app.vector_service = FakeVectorService([3, 1, 2])
+
+        first = hybrid.search(alice.id, 'budget numbers')
+        second = hybrid.search(alice.id, '  Budget   NUMBERS ')
+        assert not first['cached'] and second['cached']
+        assert [r['id'] for r in second['results']] == [r['id'] for r in first['results']]
+        assert len(vector.calls) == 1
+
+        # Pages, other filters and other users are separate
+        assert hybrid.search(alice.id, 'budget numbers', limit=2, offset=1)['cached']
+        assert not hybrid.search(alice.id, 'budget numbers', filters={'unread': True})['cached']
+        assert not hybrid.search(bob.id, 'budget numbers')['cached']
+
+        # Marking an email read bumps the generation and drops Alice's cached results
+        app.register_blueprint(email_bp, url_prefix='/api/email')
+        client = app.test_client()
+        with client.session_transaction() as client_session:
+            client_session['user_id'] = alice.id
+
+        unread = [r['id'] for r in hybrid.search(alice.id, 'budget numbers', filters={'unread': True})['results']]
+        assert client.post(f'/api/email/{unread[0]}/mark-read').get_json()['success']
+        after = hybrid.search(alice.id, 'budget numbers', filters={'unread': True})
+        assert not after['cached'] and unread[0] not in [r['id'] for r in after['results']]
+
+        # So does a sync; the counter is on the user row, so this holds across processes
+        assert not hybrid.search(alice.id, 'budget numbers')['cached']
+        assert hybrid.search(alice.id, 'budget numbers')['cached']
+        alice.update_sync_info()
+        assert not hybrid.search(alice.id, 'budget numbers')['cached']
+
+        # Route reports cache hits; chat context and related emails share one search
+        assert client.get('/api/email/search?q=budget').get_json()['cached'] is False
+        assert client.get('/api/email/search?q=budget').get_json()['cached'] is True
+
+        calls = len(vector.calls)
+        chat = ChatProcessor()
+        chat._get_relevant_context(alice.id, 'find budget numbers', 'search_emails')
+        chat._find_related_emails(alice.id, 'find budget numbers', 'search_emails')
+        assert len(vector.calls) == calls + 1
+
+        stats = hybrid.get_stats()['result_cache']
+        print(f"   Result cache: {stats}")
+        assert stats['hits'] >= 5 and stats['hit_rate'] > 0.3
+
+    print("✅ Search result cache working")
+
+
+def test_query_embedding_cache():
+    """Query text is embedded once; similar-email lookups reuse stored embeddings"""
+    print("🧠 Testing query embedding cache")
+
+    model = embedding_models._models[MODEL_NAME] = BagOfWordsModel()
+    app = create_test_app('http://127.0.0.1:9')
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app.config.update({
+            'VECTOR_DB_TYPE': 'native',
+            'VECTOR_DB_PATH': tmp,
+            'VECTOR_COLLECTION_NAME': 'email_embeddings',
+            'EMBEDDING_MODEL': MODEL_NAME,
+            'EMBEDDING_CACHE_ENABLED': False,
+        })
+        with app.app_context():
+            from app.services.vector_db import VectorDBService
+
+            service = VectorDBService()
+            assert service.initialize()
+            service.batch_add_emails(mailbox(1, 10, 'travel'))
+            encoded = model.encoded
+
+            first = service.search_emails(1, 'travel notes', limit=3)
+            second = service.search_emails(1, 'Travel  notes', limit=3)
+            assert [r['email_id'] for r in first] == [r['email_id'] for r in second]
+            assert model.encoded == encoded + 1
+
+            assert len(service.get_similar_emails(100, 1, limit=3)) == 3
+            assert model.encoded == encoded + 1
+
+            stats = service.get_collection_info()['query_embedding_cache']
+            assert stats['hits'] == 1 and stats['misses'] == 1, stats
+
+    print("✅ Query embedding cache working")
+
+
+if __name__ == "__main__":
+    test_lru_cache()
+    test_result_cache()
+    test_query_embedding_cache()
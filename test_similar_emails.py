@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Test precomputed similar-email lists and single-query related emails
+"""
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.append('.')
+
+from test_delta_sync import create_test_app
+from test_vector_partitions import BagOfWordsModel, MODEL_NAME
+from app.services import embedding_models
+
+TOPICS = {
+    'budget': 'quarterly budget forecast spreadsheet finance numbers',
+    'travel': 'flight hotel booking itinerary airport travel',
+    'hiring': 'candidate interview resume hiring offer recruiter',
+}
+
+
+def add_emails(db, Email, user, topic, count, start=0):
+    now = datetime.utcnow()
+    emails = [
+        Email(user_id=user.id, graph_id=f'{user.id}-{topic}-{i}', subject=f'{topic} {topic}{i}',
+              sender_email=f'{topic}@example.com', body_preview=TOPICS[topic],
+              received_date=now - timedelta(hours=i))
+        for i in range(start, start + count)
+    ]
+    db.session.add_all(emails)
+    db.session.commit()
+    return emails
+
+
+def embed(service, user, emails):
+    assert service.batch_add_emails([(email.id, email.to_dict(include_body=True), user.id) for email in emails]) == len(emails)
+
+
+def test_related_emails():
+    """Conversation first (oldest first), then the sender's newest emails, in one query"""
+    print("🔗 Testing related emails")
+
+    app = create_test_app('http://127.0.0.1:9')
+    with app.app_context():
+        from app.models import db
+        from app.models.user import User
+        from app.models.email import Email
+
+        db.create_all()
+        alice = User(email='alice@example.com', display_name='Alice')
+        bob = User(email='bob@example.com', display_name='Bob')
+        db.session.add_all([alice, bob])
+        db.session.commit()
+
+        now = datetime.utcnow()
+        def email(user, name, conversation, sender, hours):
+            row = Email(user_id=user.id, graph_id=name, subject=name, conversation_id=conversation,
+                        sender_email=sender, received_date=now - timedelta(hours=hours))
+            db.session.add(row)
+            return row
+
+        current = email(alice, 'current', 'conv-1', 'carol@example.com', 0)
+        email(alice, 'reply-old', 'conv-1', 'dave@example.com', 5)
+        email(alice, 'reply-new', 'conv-1', 'erin@example.com', 1)
+        email(alice, 'carol-old', 'conv-2', 'carol@example.com', 9)
+        email(alice, 'carol-new', 'conv-3', 'carol@example.com', 2)
+        email(alice, 'unrelated', 'conv-4', 'frank@example.com', 3)
+        email(bob, 'other-user', 'conv-1', 'carol@example.com', 1)
+        db.session.commit()
+
+        related = [e.graph_id for e in current.get_related_emails(limit=5)]
+        assert related == ['reply-old', 'reply-new', 'carol-new', 'carol-old'], related
+        assert [e.graph_id for e in current.get_related_emails(limit=3)] == ['reply-old', 'reply-new', 'carol-new']
+
+    print("✅ Related emails working")
+
+
+def test_similar_email_index():
+    """Full rebuild, incremental updates from sync, and deletions"""
+    print("🧭 Testing similar-email index")
+
+    embedding_models._models[MODEL_NAME] = BagOfWordsModel()
+    app = create_test_app('http://127.0.0.1:9')
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app.config.update({
+            'VECTOR_DB_TYPE': 'native',
+            'VECTOR_DB_PATH': tmp,
+            'VECTOR_COLLECTION_NAME': 'email_embeddings',
+            'EMBEDDING_MODEL': MODEL_NAME,
+            'EMBEDDING_CACHE_ENABLED': False,
+            'SIMILAR_EMAILS_K': 3,
+            'ANALYSIS_QUEUE_ENABLED': True,
+        })
+        with app.app_context():
+            from app.models import db
+            from app.models.user import User
+            from app.models.email import Email
+            from app.models.email_neighbor import EmailNeighbor
+            from app.services.vector_db import VectorDBService
+            from app.services.similar_emails import init_similar_emails
+            from app.services.email_processor import EmailProcessor
+
+            db.create_all()
+            alice = User(email='alice@example.com', display_name='Alice')
+            db.session.add(alice)
+            db.session.commit()
+
+            service = VectorDBService()
+            assert service.initialize()
+            app.vector_service = service
+            index = init_similar_emails(app)
+
+            mailbox = {topic: add_emails(db, Email, alice, topic, 5) for topic in TOPICS}
+            embed(service, alice, [email for emails in mailbox.values() for email in emails])
+
+            # Rebuild: every email gets k neighbors from its own topic
+            assert index.rebuild_user(alice.id) == 15
+            assert EmailNeighbor.query.count() == 15 * 3
+            for topic, emails in mailbox.items():
+                topic_ids = {email.id for email in emails}
+                for email in emails:
+                    similar = email.get_similar_emails(limit=5)
+                    assert len(similar) == 3 and email not in similar
+                    assert {e.id for e in similar} <= topic_ids, (topic, [e.subject for e in similar])
+
+            # The stored scores match a live vector query
+            budget = mailbox['budget'][0]
+            live = [r['similarity_score'] for r in service.get_similar_emails(budget.id, alice.id, limit=3)]
+            stored = EmailNeighbor.get_lists([budget.id])[budget.id]
+            assert all(abs(score - expected) < 1e-4 for (_, score), expected in zip(stored, live)), (stored, live)
+            assert all(a[1] >= b[1] for a, b in zip(stored, stored[1:]))
+
+            # Sync path: new emails are embedded, get their own lists and enter their neighbors' lists
+            processor = EmailProcessor()
+            original = mailbox['travel'][0]
+            new_travel = add_emails(db, Email, alice, 'travel', 2, start=5)
+            for email in new_travel:
+                # Forwarded copies of an existing email
+                email.subject, email.received_date = original.subject, original.received_date
+            db.session.commit()
+            processor._process_new_emails(alice, new_travel, 'inbox')
+            new_ids = {email.id for email in new_travel}
+            for email in new_travel:
+                assert {e.id for e in email.get_similar_emails()} <= {e.id for e in mailbox['travel']} | new_ids
+            assert new_ids <= {e.id for e in original.get_similar_emails(limit=2)}
+            travel_lists = EmailNeighbor.get_lists([email.id for email in mailbox['travel']])
+            assert all(len(neighbors) == 3 for neighbors in travel_lists.values())
+
+            # Deleting emails removes them everywhere and tops the affected lists back up
+            deleted = [email.id for email in new_travel]
+            Email.query.filter(Email.id.in_(deleted)).delete(synchronize_session=False)
+            stale = EmailNeighbor.delete_for_emails(deleted)
+            db.session.commit()
+            for email_id in deleted:
+                service.delete_email(email_id, alice.id)
+            assert stale and not set(stale) & set(deleted)
+            processor._index_similar_emails(alice.id, stale_ids=stale)
+
+            remaining = EmailNeighbor.query.filter(
+                db.or_(EmailNeighbor.email_id.in_(deleted), EmailNeighbor.neighbor_id.in_(deleted))
+            ).count()
+            assert remaining == 0
+            for neighbors in EmailNeighbor.get_lists(stale).values():
+                assert len(neighbors) == 3
+
+    print("✅ Similar-email index working")
+
+
+if __name__ == "__main__":
+    test_related_emails()
+    test_similar_email_index()
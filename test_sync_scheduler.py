@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Test the periodic sync scheduler against the local fake Graph server
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+sys.path.append('.')
+
+from fake_graph_server import FakeGraphServer
+from test_delta_sync import create_test_app
+
+
+def test_sync_scheduler():
+    """Due users are synced in parallel, by priority, never twice at once"""
+    print("⏰ Testing sync scheduler")
+
+    with FakeGraphServer() as fake, tempfile.TemporaryDirectory() as tmp:
+        for _ in range(10):
+            fake.add_message('inbox')
+        for _ in range(3):
+            fake.add_message('sentitems')
+
+        # File database: pool threads need their own connections
+        app = create_test_app(fake.url, f"sqlite:///{os.path.join(tmp, 'sync.db')}")
+        app.config.update({
+            'SYNC_SCHEDULER_WORKERS': 3,
+            'SYNC_FOLDERS': ['inbox', 'sentitems'],
+            'EMAIL_SYNC_INTERVAL_MINUTES': 30,
+        })
+
+        with app.app_context():
+            from app.models import db
+            from app.models.user import User
+            from app.models.email import Email
+            from app.models.analysis_job import AnalysisJob
+            from app.services.sync_scheduler import SyncScheduler
+
+            db.create_all()
+            now = datetime.utcnow()
+            users = [
+                User(email='fresh@example.com', last_email_sync=now - timedelta(minutes=5)),
+                User(email='stale@example.com', last_email_sync=now - timedelta(hours=2)),
+                User(email='stale-active@example.com', last_email_sync=now - timedelta(hours=2),
+                     last_login=now - timedelta(hours=1)),
+                User(email='never@example.com'),
+                User(email='inactive@example.com', is_active=False),
+            ] + [User(email=f'user{i}@example.com') for i in range(4)]
+            db.session.add_all(users)
+            db.session.commit()
+            ids = {user.email: user.id for user in users}
+
+            in_flight = [0, 0]
+            lock = threading.Lock()
+
+            def token_provider(user):
+                with lock:
+                    in_flight[0] += 1
+                    in_flight[1] = max(in_flight[1], in_flight[0])
+                time.sleep(0.2)
+                with lock:
+                    in_flight[0] -= 1
+                return 'token'
+
+            scheduler = SyncScheduler(app, token_provider=token_provider)
+
+            # Never-synced users first, then stale users with recent activity ahead of idle ones
+            due = scheduler.get_due_user_ids()
+            print(f"   Due order: {due}")
+            assert ids['fresh@example.com'] not in due and ids['inactive@example.com'] not in due
+            assert due.index(ids['stale-active@example.com']) < due.index(ids['stale@example.com'])
+            assert due.index(ids['never@example.com']) < due.index(ids['stale-active@example.com'])
+
+            # A user already being synced (here by another process) is skipped
+            assert User.claim_sync(ids['stale@example.com'], 60)
+            report = scheduler.run_once()
+            User.release_sync(ids['stale@example.com'])
+            print(f"   Run: {report['users_synced']} synced, {report['users_skipped']} skipped "
+                  f"in {report['duration_seconds']:.2f}s, max parallel {in_flight[1]}")
+            statuses = {r['user_id']: r['status'] for r in report['users']}
+            assert statuses[ids['stale@example.com']] == 'already_syncing'
+            assert report['users_synced'] == 6 and report['errors'] == 0
+            assert 1 < in_flight[1] <= 3
+            assert all(set(r['folders']) == {'inbox', 'sentitems'}
+                       for r in report['users'] if r['status'] == 'synced')
+            assert all(Email.query.filter_by(user_id=r['user_id']).count() == 13
+                       for r in report['users'] if r['status'] == 'synced')
+
+            # Synced users are not due again until the interval passes
+            db.session.expire_all()
+            assert scheduler.get_due_user_ids() == [ids['stale@example.com']]
+            stats = scheduler.get_stats()
+            assert stats['runs'] == 1 and stats['last_run']['users_due'] == 7 and stats['syncing_users'] == 0
+
+            # Two schedulers (as in two processes) racing for the same user sync it once
+            other = SyncScheduler(app, token_provider=token_provider)
+            results = []
+            racers = [threading.Thread(target=lambda s=s: results.append(s.sync_user_now(ids['stale@example.com'])))
+                      for s in (scheduler, other)]
+            for racer in racers:
+                racer.start()
+            for racer in racers:
+                racer.join()
+            assert sorted(r['status'] for r in results) == ['already_syncing', 'synced']
+            other.stop()
+
+            # A lease left behind by a crashed process expires
+            db.session.expire_all()
+            assert db.session.get(User, ids['stale@example.com']).sync_lease_until is None
+            assert User.claim_sync(ids['stale@example.com'], -1)
+            assert User.claim_sync(ids['stale@example.com'], 60)
+            assert not User.claim_sync(ids['stale@example.com'], 60)
+            User.release_sync(ids['stale@example.com'])
+            scheduler.stop()
+
+            # Refresh tokens for background sync are stored encrypted
+            app.config['SECRET_KEY'] = 'test-secret'
+            user = db.session.get(User, ids['never@example.com'])
+            user.set_refresh_token('refresh-token-value')
+            assert 'refresh-token-value' not in user.refresh_token_encrypted
+            assert user.get_refresh_token() == 'refresh-token-value'
+
+            # Access tokens are minted from it server-side, cached, and rotate the refresh token
+            from app.services import graph_tokens
+            from app.services.ms_graph import GraphService
+            refreshes = []
+
+            def refresh_access_token(self, refresh_token):
+                refreshes.append(refresh_token)
+                return {'access_token': f'access-{len(refreshes)}', 'refresh_token': 'rotated', 'expires_in': 3600}
+
+            original = GraphService.refresh_access_token
+            GraphService.refresh_access_token = refresh_access_token
+            try:
+                assert graph_tokens.get_access_token(user) == 'access-1'
+                assert graph_tokens.get_access_token(user) == 'access-1'
+                assert refreshes == ['refresh-token-value'] and user.get_refresh_token() == 'rotated'
+                graph_tokens.forget_access_token(user.id)
+                assert graph_tokens.get_access_token(user) == 'access-2'
+            finally:
+                GraphService.refresh_access_token = original
+                graph_tokens.forget_access_token(user.id)
+            assert graph_tokens.get_access_token(db.session.get(User, ids['fresh@example.com'])) is None
+
+    print("✅ Sync scheduler working")
+    return True
+
+
+def test_failure_backoff():
+    """A user whose sync fails is retried after a growing delay, not on every poll"""
+    print("🐢 Testing sync failure backoff")
+
+    with FakeGraphServer() as fake, tempfile.TemporaryDirectory() as tmp:
+        fake.add_message('inbox')
+        app = create_test_app(fake.url, f"sqlite:///{os.path.join(tmp, 'backoff.db')}")
+        app.config.update({'SYNC_FOLDERS': ['inbox'], 'EMAIL_SYNC_INTERVAL_MINUTES': 30,
+                           'SYNC_FAILURE_BACKOFF_MAX_HOURS': 1})
+
+        with app.app_context():
+            from app.models import db
+            from app.models.user import User
+            from app.services.sync_scheduler import SyncScheduler
+
+            db.create_all()
+            user = User(email='broken@example.com')
+            db.session.add(user)
+            db.session.commit()
+            user_id = user.id
+
+            tokens = [None]
+
+            def token_provider(user):
+                if isinstance(tokens[0], Exception):
+                    raise tokens[0]
+                return tokens[0]
+
+            scheduler = SyncScheduler(app, token_provider=token_provider)
+            now = datetime.utcnow()
+
+            # No token: not due again for one interval
+            report = scheduler.run_once()
+            assert report['users'][0]['status'] == 'no_token' and report['users'][0]['next_sync_at']
+            db.session.expire_all()
+            user = db.session.get(User, user_id)
+            assert user.sync_failures == 1 and user.last_email_sync is None
+            assert timedelta(minutes=29) < user.next_sync_at - now < timedelta(minutes=31)
+            assert scheduler.run_once()['users_due'] == 0
+            assert scheduler.get_due_user_ids(now + timedelta(minutes=31)) == [user_id]
+
+            # Each further failure doubles the delay, up to the cap
+            tokens[0] = RuntimeError('token endpoint down')
+            assert scheduler.sync_user_now(user_id)['status'] == 'error'
+            db.session.expire_all()
+            user = db.session.get(User, user_id)
+            assert user.sync_failures == 2
+            assert timedelta(minutes=59) < user.next_sync_at - now < timedelta(minutes=61)
+            scheduler.sync_user_now(user_id)
+            db.session.expire_all()
+            user = db.session.get(User, user_id)
+            assert user.sync_failures == 3 and user.next_sync_at - now < timedelta(minutes=61)
+
+            # A clean sync clears the backoff
+            tokens[0] = 'token'
+            assert scheduler.sync_user_now(user_id)['status'] == 'synced'
+            db.session.expire_all()
+            user = db.session.get(User, user_id)
+            assert user.sync_failures == 0 and user.next_sync_at is None and user.last_email_sync
+            scheduler.stop()
+
+    print("✅ Sync failure backoff working")
+    return True
+
+
+if __name__ == "__main__":
+    test_sync_scheduler()
+    test_failure_backoff()
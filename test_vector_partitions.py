@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Test per-user vector partitions and migration from the shared collection
+"""
+import importlib.util
+import sys
+import tempfile
+import zlib
+
+import numpy as np
+import pytest
+
+sys.path.append('.')
+
+from flask import Flask
+from app.services import embedding_models
+
+MODEL_NAME = 'test-bag-of-words'
+BACKENDS = ['native'] + (['chromadb'] if importlib.util.find_spec('chromadb') else [])
+
+
+class BagOfWordsModel:
+    """Stand-in SentenceTransformer: hashed, normalised word counts"""
+
+    def __init__(self):
+        self.encoded = 0
+
+    def encode(self, texts, batch_size=32, convert_to_numpy=True):
+        self.encoded += len(texts)
+        vectors = np.zeros((len(texts), 64), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in text.lower().split():
+                vectors[row, zlib.crc32(word.encode()) % 64] += 1
+        return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-9)
+
+
+def use_test_model():
+    """Register the stand-in model under MODEL_NAME and return it"""
+    return embedding_models._models.setdefault(MODEL_NAME, BagOfWordsModel())
+
+
+def create_vector_app(db_path, backend, mode, buckets=32):
+    app = Flask(__name__)
+    app.config.update({
+        'VECTOR_DB_TYPE': backend,
+        'VECTOR_DB_PATH': db_path,
+        'VECTOR_COLLECTION_NAME': 'email_embeddings',
+        'VECTOR_PARTITION_MODE': mode,
+        'VECTOR_PARTITION_BUCKETS': buckets,
+        'EMBEDDING_MODEL': MODEL_NAME,
+        'EMBEDDING_CACHE_ENABLED': False,
+    })
+    return app
+
+
+def mailbox(user_id, count, topic):
+    return [
+        (user_id * 100 + i, {'subject': f'{topic} {i}', 'sender_email': f'{topic}@example.com',
+                             'body_preview': f'{topic} notes number {i}'}, user_id)
+        for i in range(count)
+    ]
+
+
+def partition_names(service):
+    return sorted(collection.name for collection in service.client.list_collections())
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_user_partitions(backend):
+    """Each user gets a collection; deleting a user drops it"""
+    print(f"🗂️ Testing per-user partitions ({backend})")
+    from app.services.vector_db import VectorDBService
+    use_test_model()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        with create_vector_app(tmp, backend, 'user').app_context():
+            service = VectorDBService()
+            assert service.initialize() and service.available
+
+            assert service.batch_add_emails(mailbox(1, 5, 'budget') + mailbox(2, 5, 'budget')) == 10
+            assert partition_names(service) == ['email_embeddings_user_1', 'email_embeddings_user_2']
+
+            results = service.search_emails(1, 'budget notes', limit=10)
+            assert len(results) == 5 and {r['email_id'] for r in results} == set(range(100, 105))
+            assert service.search_emails(3, 'budget') == []
+
+            similar = service.get_similar_emails(100, 1, limit=3)
+            assert len(similar) == 3 and 100 not in {r['email_id'] for r in similar}
+
+            assert service.delete_email(100, 1)
+            assert len(service.search_emails(1, 'budget', limit=10)) == 4
+
+            assert service.delete_user_emails(2)
+            assert partition_names(service) == ['email_embeddings_user_1']
+            assert service.search_emails(2, 'budget') == []
+            assert service.delete_user_emails(2)
+
+            info = service.get_collection_info()
+            assert info['partition_count'] == 1 and info['document_count'] == 4, info
+
+    print("✅ Per-user partitions working")
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_bucket_partitions(backend):
+    """Users sharing a bucket stay isolated by the user filter"""
+    print(f"🪣 Testing bucketed partitions ({backend})")
+    from app.services.vector_db import VectorDBService
+    use_test_model()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        with create_vector_app(tmp, backend, 'bucket', buckets=2).app_context():
+            service = VectorDBService()
+            assert service.initialize()
+
+            emails = mailbox(1, 4, 'invoice') + mailbox(2, 4, 'invoice') + mailbox(3, 4, 'invoice')
+            assert service.backfill_emails(iter(emails)) == 12
+            assert partition_names(service) == ['email_embeddings_bucket_000', 'email_embeddings_bucket_001']
+
+            assert {r['email_id'] for r in service.search_emails(3, 'invoice', limit=10)} == set(range(300, 304))
+            assert service.delete_user_emails(1)
+            assert service.search_emails(1, 'invoice') == []
+            assert len(service.search_emails(3, 'invoice', limit=10)) == 4
+
+    print("✅ Bucketed partitions working")
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_migration(backend):
+    """The shared collection is copied into partitions without re-embedding"""
+    print(f"🔄 Testing migration from the shared collection ({backend})")
+    from app.services.vector_db import VectorDBService
+    model = use_test_model()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        with create_vector_app(tmp, backend, 'shared').app_context():
+            shared = VectorDBService()
+            assert shared.initialize()
+            shared.batch_add_emails(mailbox(1, 30, 'travel') + mailbox(2, 20, 'hiring'))
+            before = shared.search_emails(1, 'travel notes', limit=5)
+
+        encoded = model.encoded
+
+        with create_vector_app(tmp, backend, 'user').app_context():
+            service = VectorDBService()
+            assert service.initialize()
+            stats = service.migrate_to_partitions(batch_size=16)
+            assert stats['copied'] == 50 and stats['partitions'] == 2 and stats['skipped'] == 0, stats
+            assert model.encoded == encoded, 'migration re-embedded documents'
+
+            after = service.search_emails(1, 'travel notes', limit=5)
+            assert [r['email_id'] for r in after] == [r['email_id'] for r in before]
+
+            # Re-running is harmless; dropping the source leaves only partitions
+            stats = service.migrate_to_partitions(drop_source=True)
+            assert stats['copied'] == 50 and stats['source_dropped']
+            assert partition_names(service) == ['email_embeddings_user_1', 'email_embeddings_user_2']
+            assert service.get_collection_info()['document_count'] == 50
+
+    print("✅ Migration working")
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_remove_legacy(backend):
+    """Random-suffix documents are replaced by deterministic ones, keeping their vectors"""
+    print(f"🧽 Testing legacy document removal ({backend})")
+    from app.services.vector_db import VectorDBService
+    model = use_test_model()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        with create_vector_app(tmp, backend, 'shared').app_context():
+            service = VectorDBService()
+            assert service.initialize()
+            service.batch_add_emails(mailbox(1, 3, 'audit'))
+
+            # Old-style IDs: a duplicate of email 100, and the only copy of email 105
+            stored = service.collection.get(ids=['email_1_100'], include=['documents', 'metadatas'])
+            legacy_metadata = dict(stored['metadatas'][0], email_id=105)
+            service._upsert(service.collection, ids=['email_1_100_1a2b', 'email_1_105_3c4d'],
+                            documents=[stored['documents'][0]] * 2,
+                            metadatas=[stored['metadatas'][0], legacy_metadata])
+            encoded = model.encoded
+
+            assert service.remove_legacy_documents(batch_size=1) == 2
+            assert model.encoded == encoded, 'legacy removal re-embedded documents'
+            assert sorted(service.collection.get(include=[])['ids']) == \
+                ['email_1_100', 'email_1_101', 'email_1_102', 'email_1_105']
+            assert 105 in {r['email_id'] for r in service.search_emails(1, 'audit notes', limit=10)}
+            assert service.remove_legacy_documents() == 0
+
+    print("✅ Legacy document removal working")
+
+
+if __name__ == "__main__":
+    for backend in BACKENDS:
+        test_user_partitions(backend)
+        test_bucket_partitions(backend)
+        test_migration(backend)
+        test_remove_legacy(backend)